@@ -1,4 +1,17 @@
-from .planner import DesignAgent, ALGORITHM_LIBRARY
+import importlib
+
+# Resolved on first access so importing one agent submodule does not load the planner
+_LAZY = {
+    "DesignAgent": ".planner",
+    "ALGORITHM_LIBRARY": ".planner",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "DesignAgent",
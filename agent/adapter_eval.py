@@ -0,0 +1,468 @@
+"""
+Batched LoRA adapter evaluation for /api/finetuning/compare
+
+The base model is loaded once per (model, device) and kept warm. Adapters are
+hot-swapped onto it (PEFT load_adapter/set_adapter) instead of reloading the
+model for every candidate; the least recently used ones are deleted again once
+more than MAX_LOADED_ADAPTERS are loaded. Every candidate generates over the same evaluation
+set in batches, with prompts sorted by length so a batch pads as little as
+possible. Base-model generations don't depend on the adapters being compared,
+so they are cached per prompt and only new prompts are generated again.
+
+Each candidate is reported with:
+- quality against the references (exact match, token F1, ROUGE-L) and, when
+  requested, perplexity of the references;
+- mean and p95 per-example latency, and generated tokens/sec;
+- adapter size and peak memory (CUDA allocator peak, or process RSS on CPU).
+
+Everything runs on CPU with a tiny model, for example
+``AdapterEvalHarness(PeftBackend("sshleifer/tiny-gpt2"))``.
+
+Requires the optional torch, transformers and peft packages (HAS_EVAL_DEPS).
+"""
+
+import hashlib
+import importlib.util
+import logging
+import math
+import re
+import resource
+import statistics
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# torch/transformers/peft are imported by PeftBackend, off the API's import path
+HAS_EVAL_DEPS = all(
+    importlib.util.find_spec(name) is not None for name in ("torch", "transformers", "peft")
+)
+
+QUALITY_METRICS = ("exact_match", "f1", "rouge_l")
+# Names the old /compare template used
+METRIC_ALIASES = {"accuracy": "exact_match"}
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_MAX_NEW_TOKENS = 64
+BASE_CACHE_SIZE = 10_000
+# LoRA weights kept loaded on a warm base model between comparisons
+MAX_LOADED_ADAPTERS = 8
+
+# Adapters are swapped on shared model state, so evaluations run one at a time
+_eval_lock = threading.Lock()
+
+
+@dataclass
+class EvalExample:
+    prompt: str
+    reference: str = ""
+
+
+@dataclass
+class Generation:
+    text: str
+    new_tokens: int
+
+
+# ─── Quality Metrics ─────────────────────────────────────────────────────────
+
+
+def _normalize(text: str) -> List[str]:
+    return re.sub(r"[^\w\s]", " ", text.lower()).split()
+
+
+def exact_match(prediction: str, reference: str) -> float:
+    return float(_normalize(prediction) == _normalize(reference))
+
+
+def token_f1(prediction: str, reference: str) -> float:
+    pred, ref = _normalize(prediction), _normalize(reference)
+    if not pred or not ref:
+        return float(pred == ref)
+    common = sum((Counter(pred) & Counter(ref)).values())
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(pred), common / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_l(prediction: str, reference: str) -> float:
+    """F-measure over the longest common token subsequence."""
+    pred, ref = _normalize(prediction), _normalize(reference)
+    if not pred or not ref:
+        return float(pred == ref)
+    previous = [0] * (len(ref) + 1)
+    for p in pred:
+        current = [0]
+        for j, r in enumerate(ref):
+            current.append(previous[j] + 1 if p == r else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if lcs == 0:
+        return 0.0
+    precision, recall = lcs / len(pred), lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+_SCORERS = {"exact_match": exact_match, "f1": token_f1, "rouge_l": rouge_l}
+
+
+def score(predictions: Sequence[str], references: Sequence[str], metrics: Iterable[str]):
+    """Mean of each quality metric over the examples that have a reference."""
+    pairs = [(p, r) for p, r in zip(predictions, references) if r]
+    results = {}
+    for metric in metrics:
+        scorer = _SCORERS.get(metric)
+        if scorer is not None:
+            results[metric] = sum(scorer(p, r) for p, r in pairs) / len(pairs) if pairs else None
+    return results
+
+
+# ─── Backends ────────────────────────────────────────────────────────────────
+
+
+class GenerationBackend(ABC):
+    """A base model with swappable adapters; subclasses implement the model calls."""
+
+    model_id = ""
+    device = "cpu"
+
+    @abstractmethod
+    def activate(self, adapter: Optional[str]) -> None:
+        """Route generation through an adapter (loaded on first use); None = base model."""
+
+    @abstractmethod
+    def generate(self, prompts: List[str], max_new_tokens: int) -> List[Generation]:
+        """Greedy completions of prompts, in order."""
+
+    @abstractmethod
+    def nll(self, prompts: List[str], references: List[str]) -> Tuple[float, int]:
+        """(summed negative log-likelihood, token count) of references given prompts."""
+
+    def adapter_bytes(self, adapter: Optional[str]) -> int:
+        return 0
+
+    def reset_peak_memory(self) -> None:
+        pass
+
+    def peak_memory_bytes(self) -> int:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeftBackend(GenerationBackend):
+    """transformers causal LM with PEFT LoRA adapters hot-swapped onto one base model."""
+
+    def __init__(
+        self,
+        model_id: str,
+        device: str = "cpu",
+        dtype: Optional[str] = None,
+        max_adapters: int = MAX_LOADED_ADAPTERS,
+    ):
+        if not HAS_EVAL_DEPS:
+            raise RuntimeError("Adapter evaluation needs torch, transformers and peft installed")
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        self.model_id = model_id
+        self.device = device
+        torch_dtype = getattr(torch, dtype) if dtype else torch.float32
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.tokenizer.padding_side = "left"  # decoder-only batches pad on the left
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.base = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=torch_dtype)
+        self.base.to(device).eval()
+        self.model = self.base
+        self.max_adapters = max(1, max_adapters)
+        # adapter source -> PEFT adapter name, least recently used first
+        self._loaded: "OrderedDict[str, str]" = OrderedDict()
+        self._names = 0
+        self._active: Optional[str] = None
+
+    def activate(self, adapter: Optional[str]) -> None:
+        if adapter is not None and adapter not in self._loaded:
+            self._unload_oldest(self.max_adapters - 1)
+            name = f"a{self._names}"
+            self._names += 1
+            if self.model is self.base:
+                from peft import PeftModel
+
+                self.model = PeftModel.from_pretrained(self.base, adapter, adapter_name=name)
+                self.model.to(self.device).eval()
+            else:
+                self.model.load_adapter(adapter, adapter_name=name)
+            self._loaded[adapter] = name
+            logger.info(f"[AdapterEval] Loaded adapter {adapter} onto {self.model_id}")
+        if adapter is not None:
+            self._loaded.move_to_end(adapter)
+            self.model.set_adapter(self._loaded[adapter])
+        self._active = adapter
+
+    def _unload_oldest(self, keep: int) -> None:
+        """Delete least recently used adapters until at most keep are loaded."""
+        while len(self._loaded) > keep:
+            adapter, name = self._loaded.popitem(last=False)
+            self.model.delete_adapter(name)
+            logger.info(f"[AdapterEval] Unloaded adapter {adapter} from {self.model_id}")
+
+    def _forward_context(self):
+        import contextlib
+
+        if self._active is None and self.model is not self.base:
+            return self.model.disable_adapter()
+        return contextlib.nullcontext()
+
+    def generate(self, prompts: List[str], max_new_tokens: int) -> List[Generation]:
+        torch = self.torch
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+        with torch.inference_mode(), self._forward_context():
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        new = output[:, inputs["input_ids"].shape[1] :]
+        results = []
+        for row in new.tolist():
+            if self.tokenizer.eos_token_id in row:
+                row = row[: row.index(self.tokenizer.eos_token_id)]
+            text = self.tokenizer.decode(row, skip_special_tokens=True)
+            results.append(Generation(text, len(row)))
+        return results
+
+    def nll(self, prompts: List[str], references: List[str]) -> Tuple[float, int]:
+        torch = self.torch
+        tok = self.tokenizer
+        prompt_lengths = [len(tok(p)["input_ids"]) for p in prompts]
+        batch = tok([p + r for p, r in zip(prompts, references)], return_tensors="pt", padding=True)
+        batch = batch.to(self.device)
+        labels = batch["input_ids"].clone()
+        labels[batch["attention_mask"] == 0] = -100
+        width = labels.shape[1]
+        for i, length in enumerate(prompt_lengths):
+            padding = width - int(batch["attention_mask"][i].sum())
+            labels[i, : padding + length] = -100  # only score the reference tokens
+        with torch.inference_mode(), self._forward_context():
+            logits = self.model(**batch).logits[:, :-1].float()
+        targets = labels[:, 1:]
+        losses = torch.nn.functional.cross_entropy(
+            logits.reshape(-1, logits.shape[-1]), targets.reshape(-1), reduction="sum"
+        )
+        return float(losses), int((targets != -100).sum())
+
+    def adapter_bytes(self, adapter: Optional[str]) -> int:
+        if adapter is None or adapter not in self._loaded:
+            return 0
+        name = self._loaded[adapter]
+        return sum(
+            p.numel() * p.element_size()
+            for key, p in self.model.named_parameters()
+            if f".{name}." in key
+        )
+
+    def reset_peak_memory(self) -> None:
+        if self.device.startswith("cuda"):
+            self.torch.cuda.reset_peak_memory_stats()
+
+    def peak_memory_bytes(self) -> int:
+        if self.device.startswith("cuda"):
+            return int(self.torch.cuda.max_memory_allocated())
+        return super().peak_memory_bytes()
+
+
+_backends: "OrderedDict[Tuple[str, str], GenerationBackend]" = OrderedDict()
+# Keyed on the backend object, so a harness never outlives its backend's eviction
+_harnesses: Dict[Tuple[GenerationBackend, int, int], "AdapterEvalHarness"] = {}
+_backends_lock = threading.Lock()
+MAX_WARM_BACKENDS = 1
+
+
+def get_eval_backend(model_id: str, device: str = "cpu") -> GenerationBackend:
+    """Warm backend for a base model; loading another one evicts the oldest.
+
+    An evicted backend's harnesses (and their base-output caches) go with it.
+    """
+    key = (model_id, device)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = _backends[key] = PeftBackend(model_id, device=device)
+            while len(_backends) > MAX_WARM_BACKENDS:
+                _, evicted = _backends.popitem(last=False)
+                for harness_key in [k for k in _harnesses if k[0] is evicted]:
+                    del _harnesses[harness_key]
+        _backends.move_to_end(key)
+        return backend
+
+
+# ─── Harness ─────────────────────────────────────────────────────────────────
+
+
+class AdapterEvalHarness:
+    """Runs the base model and each adapter over one evaluation set and compares them."""
+
+    def __init__(
+        self,
+        backend: GenerationBackend,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+        cache_size: int = BASE_CACHE_SIZE,
+    ):
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.max_new_tokens = max_new_tokens
+        self.cache_size = cache_size
+        self._base_cache: "OrderedDict[str, Generation]" = OrderedDict()
+        self.cache_hits = 0
+
+    def _cache_key(self, prompt: str) -> str:
+        raw = f"{self.backend.model_id}\0{self.max_new_tokens}\0{prompt}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _batches(self, prompts: List[str]) -> List[List[int]]:
+        order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+        return [order[i : i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+
+    def _generate(self, prompts: List[str]) -> Tuple[List[Generation], List[float]]:
+        """Batched generations in input order, plus each example's share of batch time."""
+        results: List[Optional[Generation]] = [None] * len(prompts)
+        latencies = [0.0] * len(prompts)
+        for batch in self._batches(prompts):
+            start = time.perf_counter()
+            generations = self.backend.generate([prompts[i] for i in batch], self.max_new_tokens)
+            elapsed = time.perf_counter() - start
+            for i, generation in zip(batch, generations):
+                results[i] = generation
+                latencies[i] = elapsed / len(batch)
+        return results, latencies
+
+    def _base_generations(self, prompts: List[str]) -> Tuple[List[Generation], List[float]]:
+        keys = [self._cache_key(p) for p in prompts]
+        missing = [i for i, key in enumerate(keys) if key not in self._base_cache]
+        self.cache_hits += len(prompts) - len(missing)
+        latencies = [0.0] * len(prompts)
+        if missing:
+            generated, missing_latencies = self._generate([prompts[i] for i in missing])
+            for i, generation, latency in zip(missing, generated, missing_latencies):
+                self._base_cache[keys[i]] = generation
+                latencies[i] = latency
+            while len(self._base_cache) > self.cache_size:
+                self._base_cache.popitem(last=False)
+        for key in keys:
+            self._base_cache.move_to_end(key)
+        return [self._base_cache[key] for key in keys], latencies
+
+    def _perplexity(self, examples: List[EvalExample]) -> Optional[float]:
+        scored = [e for e in examples if e.reference]
+        total, count = 0.0, 0
+        for batch in self._batches([e.prompt for e in scored]):
+            nll, tokens = self.backend.nll(
+                [scored[i].prompt for i in batch], [scored[i].reference for i in batch]
+            )
+            total, count = total + nll, count + tokens
+        return math.exp(total / count) if count else None
+
+    def _run(self, adapter: Optional[str], examples: List[EvalExample], metrics: List[str]):
+        self.backend.activate(adapter)
+        self.backend.reset_peak_memory()
+        prompts = [e.prompt for e in examples]
+        if adapter is None:
+            generations, latencies = self._base_generations(prompts)
+        else:
+            generations, latencies = self._generate(prompts)
+        timed = [t for t in latencies if t > 0]  # cached base outputs cost nothing
+        new_tokens = sum(g.new_tokens for g, t in zip(generations, latencies) if t > 0)
+        report = {
+            "adapter": adapter,
+            "metrics": score(
+                [g.text for g in generations], [e.reference for e in examples], metrics
+            ),
+            "latency_ms": {
+                "mean": round(statistics.fmean(timed) * 1000, 2) if timed else None,
+                "p95": round(_percentile(timed, 0.95) * 1000, 2) if timed else None,
+            },
+            "tokens_per_sec": round(new_tokens / sum(timed), 1) if timed else None,
+            "cached_examples": len(latencies) - len(timed),
+            "outputs": [g.text for g in generations],
+        }
+        if "perplexity" in metrics:
+            report["metrics"]["perplexity"] = self._perplexity(examples)
+        report["memory_mb"] = {
+            "adapter": round(self.backend.adapter_bytes(adapter) / 2**20, 2),
+            "peak": round(self.backend.peak_memory_bytes() / 2**20, 1),
+        }
+        return report
+
+    def compare(
+        self,
+        examples: List[EvalExample],
+        adapters: List[str],
+        metrics: Iterable[str] = QUALITY_METRICS,
+    ) -> Dict[str, Any]:
+        """Evaluate the base model, then every adapter, on the same examples."""
+        metrics = list(dict.fromkeys(METRIC_ALIASES.get(m, m) for m in metrics))
+        with _eval_lock:
+            start = time.perf_counter()
+            base = self._run(None, examples, metrics)
+            candidates = [self._run(adapter, examples, metrics) for adapter in adapters]
+            self.backend.activate(None)
+        for candidate in candidates:
+            candidate["improvement"] = {
+                metric: round(value - base["metrics"][metric], 4)
+                for metric, value in candidate["metrics"].items()
+                if value is not None and base["metrics"].get(metric) is not None
+            }
+        return {
+            "base_model": self.backend.model_id,
+            "device": self.backend.device,
+            "examples": len(examples),
+            "batch_size": self.batch_size,
+            "max_new_tokens": self.max_new_tokens,
+            "base": base,
+            "adapters": candidates,
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+        }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)]
+
+
+def get_eval_harness(
+    model_id: str,
+    device: str = "cpu",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+) -> AdapterEvalHarness:
+    """Harness over the warm backend; the base-output cache lives as long as it does."""
+    backend = get_eval_backend(model_id, device)
+    key = (backend, batch_size, max_new_tokens)
+    with _backends_lock:
+        harness = _harnesses.get(key)
+        if harness is None:
+            harness = _harnesses[key] = AdapterEvalHarness(backend, batch_size, max_new_tokens)
+        return harness
+
+
+__all__ = [
+    "AdapterEvalHarness",
+    "EvalExample",
+    "Generation",
+    "GenerationBackend",
+    "HAS_EVAL_DEPS",
+    "PeftBackend",
+    "QUALITY_METRICS",
+    "exact_match",
+    "get_eval_backend",
+    "get_eval_harness",
+    "rouge_l",
+    "score",
+    "token_f1",
+]
@@ -1,43 +1,97 @@
 """
 AI-powered design service using Groq or Ollama.
 Tries local Ollama first, falls back to Groq cloud API.
+
+All backends are reached through the shared pooled client in agent.llm_client.
+With an on_partial callback the design is streamed, and each section is handed
+over as soon as its JSON closes.
+
+Accepted designs are remembered in memory.design_index, so a request whose dataset
+profile and constraints closely match an earlier one gets that design back as a
+warm start, without an LLM call.
 """
 
 import os
 import json
 import logging
 import time
-from typing import Dict, Any, Optional, List
-from groq import Groq
-from openai import OpenAI
+from typing import Dict, Any, Callable, Optional, List, Tuple
+
+from agent.json_extract import extract_candidate
+from agent.json_stream import WILDCARD, IncrementalJSONParser
+from agent.llm_cache import cache_bypass
+from agent.llm_client import (
+    ChatAttempt,
+    LLMError,
+    LLMResponse,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    get_llm_client,
+    hedging_enabled,
+    user_message,
+)
+from agent.notebook.validators import normalize_notebook
+from memory.design_index import DesignIndex, get_design_index, warm_start
 
 logger = logging.getLogger(__name__)
 
+# Parts of a streamed design handed to on_partial as soon as they are complete
+PIPELINE_STREAM_PATHS = [
+    ("decision_summary",),
+    ("pipeline", WILDCARD),
+    ("cost_estimate",),
+    ("carbon_estimate",),
+    ("risk_register", WILDCARD),
+    ("alternatives_considered", WILDCARD),
+]
+
+
+def _is_design(data: Any) -> bool:
+    return isinstance(data, dict) and ("pipeline" in data or "decision_summary" in data)
+
+
+def _is_notebook(data: Any) -> bool:
+    return isinstance(data, dict) and "cells" in data
+
+
+def _replay_sections(design: Dict[str, Any], on_partial: Callable[[Tuple, Any], None]) -> None:
+    """Hand a ready design to on_partial section by section, as if it had been streamed."""
+    for path in PIPELINE_STREAM_PATHS:
+        value = design.get(path[0])
+        if value is None:
+            continue
+        if len(path) == 1:
+            on_partial(path, value)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                on_partial((path[0], key), item)
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                on_partial((path[0], i), item)
+
 
 class AIDesignService:
     """AI-powered design using Groq or Ollama"""
 
-    def __init__(self, api_key: Optional[str] = None, prefer_backend: str = "auto"):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        prefer_backend: str = "auto",
+        hedge: Optional[bool] = None,
+        design_index: Optional[DesignIndex] = None,
+    ):
         self.api_key = api_key or os.environ.get("GROQ_API_KEY", "")
         self.openrouter_key = os.environ.get("OPENROUTER_API_KEY", "")
-        self.groq_client = None
-        self.openrouter_client = None
-        self.ollama_available = False
-        self.ollama_models: List[str] = []
-        self.ollama_model = "llama3.1:8b"
+        self.llm = get_llm_client()
 
-        self._check_ollama()
-
-        if self.api_key:
-            self.groq_client = Groq(api_key=self.api_key)
-
-        if self.openrouter_key:
-            self.openrouter_client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=self.openrouter_key,
-            )
+        self.groq_available = bool(self.api_key)
+        self.openrouter_available = bool(self.openrouter_key)
 
         self.prefer_backend = prefer_backend
+        # Hedged mode overlaps the fallback chain instead of waiting out each backend
+        self.hedge = hedging_enabled() if hedge is None else hedge
+        # Past accepted designs, searched before any backend is asked (None: disabled)
+        self.design_index = design_index if design_index is not None else get_design_index()
         logger.info(f"[AIDesignService] Initialized with prefer_backend={prefer_backend}")
 
     def _select_best_ollama_model(self, available: List[str]) -> str:
@@ -68,56 +122,202 @@ class AIDesignService:
         # Fallback to first available
         return available[0] if available else "llama3.1:8b"
 
-    def _check_ollama(self):
-        """Check if Ollama is available locally and get available models"""
-        try:
-            import requests
-
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                models = data.get("models", [])
-                self.ollama_models = [m.get("name", "") for m in models]
-                self.ollama_model = self._select_best_ollama_model(self.ollama_models)
-                self.ollama_available = True
-                logger.info(f"[Ollama] Available: {self.ollama_models}, using: {self.ollama_model}")
-        except Exception as e:
-            self.ollama_available = False
-            self.ollama_models = []
-            self.ollama_model = "llama3.1:8b"
-            logger.info(f"[Ollama] Not available: {e}, will use Groq")
+    # Ollama health comes from the shared client: the model list is cached and a dead
+    # server is skipped by its circuit breaker instead of being probed per request
+
+    @property
+    def ollama_models(self) -> List[str]:
+        return self.llm.cached_models("ollama")
+
+    @property
+    def ollama_available(self) -> bool:
+        return self.llm.is_healthy("ollama") and bool(self.ollama_models)
+
+    @property
+    def ollama_model(self) -> str:
+        return self._select_best_ollama_model(self.ollama_models)
 
     def generate_pipeline(
-        self, dataset_profile: Dict, constraints: Dict, infra_context: Dict = None
+        self,
+        dataset_profile: Dict,
+        constraints: Dict,
+        infra_context: Dict = None,
+        use_cache: bool = True,
+        on_partial: Optional[Callable[[Tuple, Any], None]] = None,
+    ) -> Dict[str, Any]:
+        """Generate AI-powered pipeline design
+
+        Identical requests are served from the LLM response cache, and requests close
+        to an earlier one from the design index (tagged "warm_start"), unless
+        use_cache=False. With on_partial, the response is streamed and
+        on_partial(path, value) is called for each section listed in
+        PIPELINE_STREAM_PATHS as it completes, e.g. (("pipeline", "model_training"),
+        {...}). It runs on the LLM client's loop thread.
+        """
+        index = self.design_index
+        if use_cache and index is not None:
+            match = index.lookup(dataset_profile, constraints, extra=infra_context)
+            if match is not None:
+                logger.info(
+                    f"[Pipeline] Warm start from design {match.id} "
+                    f"(similarity {match.similarity:.3f})"
+                )
+                design = warm_start(match)
+                if on_partial is not None:
+                    _replay_sections(design, on_partial)
+                return design
+
+        with cache_bypass(not use_cache):
+            result = self._generate(dataset_profile, constraints, infra_context, on_partial)
+        if index is not None and self._accepted(result, dataset_profile, constraints):
+            index.add(dataset_profile, constraints, result, extra=infra_context)
+        return result
+
+    def _generate(
+        self,
+        dataset_profile: Dict,
+        constraints: Dict,
+        infra_context: Optional[Dict],
+        on_partial: Optional[Callable[[Tuple, Any], None]],
     ) -> Dict[str, Any]:
-        """Generate AI-powered pipeline design"""
         prompt = self._build_pipeline_prompt(dataset_profile, constraints, infra_context)
+        chain = self._pipeline_chain()
 
-        # 1. Try OpenRouter (High quality cloud)
-        if self.openrouter_client:
-            result = self._generate_with_openrouter(prompt, dataset_profile, constraints)
+        if on_partial is None and self.hedge and len(chain) > 1:
+            result = self._generate_hedged(prompt, chain)
+            if result:
+                return result
+            chain = []
+
+        for backend in chain:
+            if not self.llm.is_healthy(backend):
+                logger.info(f"[Pipeline] Skipping {backend}: circuit open")
+                continue
+            if on_partial is not None:
+                result = self._generate_streamed(backend, prompt, on_partial)
+            else:
+                result = self._pipeline_generators[backend](prompt, dataset_profile, constraints)
             if result:
-                logger.info("[Pipeline] Generated via OpenRouter")
+                logger.info(f"[Pipeline] Generated via {backend}")
                 return result
 
-        # 2. Try Ollama (Local/Self-hosted)
+        logger.warning("[Pipeline] No AI backend available, using fallback")
+        return self._generate_fallback(dataset_profile, constraints)
+
+    def _accepted(self, result: Dict[str, Any], dataset: Dict, constraints: Dict) -> bool:
+        """Whether a design is worth reusing: complete, and not the rule-based fallback."""
+        if result.get("status") != "success" or result.get("truncated"):
+            return False
+        if not result.get("pipeline"):
+            return False
+        # Unparseable LLM output is answered with the fallback too, so compare, not trace
+        return result != self._generate_fallback(dataset, constraints)
+
+    @property
+    def _pipeline_generators(self):
+        return {
+            "openrouter": self._generate_with_openrouter,
+            "ollama": self._generate_with_ollama,
+            "groq": self._generate_with_groq,
+        }
+
+    def _pipeline_chain(self) -> List[str]:
+        """Backends to try, in order; with prefer_backend="auto" the fastest healthy one first."""
+        chain = []
+        # OpenRouter (high quality cloud), Ollama (local), Groq (fast cloud)
+        if self.openrouter_available:
+            chain.append("openrouter")
         if self.prefer_backend == "ollama" or (
             self.prefer_backend == "auto" and self.ollama_available
         ):
-            result = self._generate_with_ollama(prompt, dataset_profile, constraints)
-            if result:
-                logger.info("[Pipeline] Generated via Ollama")
-                return result
+            chain.append("ollama")
+        if self.prefer_backend == "groq" or (
+            self.prefer_backend == "auto" and self.groq_available
+        ):
+            chain.append("groq")
+        if self.prefer_backend == "auto":
+            chain = self.llm.order(chain)
+        return chain
+
+    def _pipeline_attempt(self, backend: str, prompt: str) -> ChatAttempt:
+        """Model and sampling settings each backend is asked for a pipeline design with."""
+        if backend == "openrouter":
+            return ChatAttempt(
+                "openrouter",
+                "meta-llama/llama-3.3-70b-instruct",
+                user_message(prompt),
+                temperature=0.2,
+                max_tokens=3000,
+                api_key=self.openrouter_key,
+            )
+        if backend == "ollama":
+            return ChatAttempt("ollama", self.ollama_model, user_message(prompt), timeout=300)
+        return ChatAttempt(
+            "groq",
+            "llama-3.3-70b-versatile",  # Updated from deprecated 3.1 70b
+            user_message(prompt),
+            temperature=0.2,
+            max_tokens=3000,
+            json_mode=True,
+            api_key=self.api_key,
+        )
+
+    def _generate_hedged(self, prompt: str, chain: List[str]) -> Optional[Dict[str, Any]]:
+        """Run the chain with overlapping requests; first parseable design wins."""
+        attempts = [self._pipeline_attempt(b, prompt) for b in chain if self.llm.is_healthy(b)]
+        if not attempts:
+            return None
+        try:
+            result = self.llm.hedged_chat_sync(
+                attempts, parse=self._design_or_forget
+            )
+        except LLMError as e:
+            logger.warning(f"[Pipeline] Hedged generation failed: {e}")
+            return None
+        logger.info(
+            f"[Pipeline] Generated via {result.response.backend} "
+            f"(hedged, launched {result.launched}, est. ${result.estimated_cost_usd:.4f})"
+        )
+        return result.value
+
+    def _generate_streamed(
+        self, backend: str, prompt: str, on_partial: Callable[[Tuple, Any], None]
+    ) -> Optional[Dict[str, Any]]:
+        """Stream one backend's design; a cut-off response keeps its completed sections."""
+        parser = IncrementalJSONParser(PIPELINE_STREAM_PATHS)
 
-        # 3. Try Groq (Fast cloud fallback)
-        if self.prefer_backend == "groq" or (self.prefer_backend == "auto" and self.groq_client):
-            result = self._generate_with_groq(prompt, dataset_profile, constraints)
-            if result:
-                logger.info("[Pipeline] Generated via Groq")
-                return result
+        def on_delta(text: str) -> None:
+            for path, value in parser.feed(text):
+                on_partial(path, value)
 
-        logger.warning("[Pipeline] No AI backend available, using fallback")
-        return self._generate_fallback(dataset_profile, constraints)
+        try:
+            response = self.llm.stream_chat_sync(
+                **self._pipeline_attempt(backend, prompt).kwargs(), on_delta=on_delta
+            )
+        except LLMError as e:
+            logger.warning(f"[Pipeline] Streaming from {backend} failed: {e}")
+            return self._salvage_design(parser.assemble())
+
+        data = parser.result()
+        if _is_design(data):
+            return data
+        # Truncated or unparseable: don't replay it from the cache next time
+        self.llm.forget(response)
+        return self._extract_pipeline_json(response.text) or self._salvage_design(
+            parser.assemble()
+        )
+
+    @staticmethod
+    def _salvage_design(data: Any) -> Optional[Dict[str, Any]]:
+        """A design recovered from a cut-off response, if at least one stage completed."""
+        if not isinstance(data, dict) or not data.get("pipeline"):
+            return None
+        logger.warning(
+            f"[Pipeline] Response was cut off; keeping {len(data['pipeline'])} completed stages"
+        )
+        data.setdefault("status", "success")
+        data["truncated"] = True
+        return data
 
     def _generate_with_openrouter(
         self, prompt: str, dataset: Dict = None, constraints: Dict = None
@@ -127,14 +327,8 @@ class AIDesignService:
         constraints = constraints or {}
 
         try:
-            response = self.openrouter_client.chat.completions.create(
-                model="meta-llama/llama-3.3-70b-instruct",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=3000,
-            )
-            content = response.choices[0].message.content
-            return self._parse_ai_response(content, dataset, constraints)
+            response = self.llm.chat_sync(**self._pipeline_attempt("openrouter", prompt).kwargs())
+            return self._parse_ai_response(response, dataset, constraints)
         except Exception as e:
             logger.error(f"[OpenRouter] Error: {e}")
             return None
@@ -201,39 +395,32 @@ Return ONLY valid JSON in this exact format:
     def _generate_with_ollama(
         self, prompt: str, dataset: Dict = None, constraints: Dict = None
     ) -> Optional[Dict[str, Any]]:
-        """Generate using local Ollama with retry mechanism"""
+        """Generate using local Ollama with retry mechanism
+
+        Returns None when Ollama is down or too slow so the next backend is tried;
+        timeouts and open circuits are not retried.
+        """
         dataset = dataset or {}
         constraints = constraints or {}
 
-        # Use the best available model from _check_ollama
-        model_to_use = self.ollama_model
+        # Best model from the cached model list
+        request = self._pipeline_attempt("ollama", prompt)
 
         # Retry logic - try 2 times
         for attempt in range(2):
             try:
-                import requests
-
-                response = requests.post(
-                    "http://localhost:11434/api/generate",
-                    json={
-                        "model": model_to_use,
-                        "prompt": prompt,
-                        "stream": False,
-                    },
-                    timeout=300,  # Increased timeout
-                )
-                if response.status_code == 200:
-                    result = response.json()
-                    parsed = self._parse_ai_response(
-                        result.get("response", ""), dataset, constraints
-                    )
-                    if parsed:
-                        return parsed
-
-                logger.warning(
-                    f"[Ollama] Attempt {attempt + 1} failed, status: {response.status_code}"
-                )
-
+                response = self.llm.chat_sync(**request.kwargs())
+                parsed = self._parse_ai_response(response, dataset, constraints)
+                if parsed:
+                    return parsed
+
+                logger.warning(f"[Ollama] Attempt {attempt + 1} failed, unparseable response")
+
+            except (LLMTimeoutError, LLMUnavailableError) as e:
+                logger.warning(f"[Ollama] Giving up: {e}")
+                return None
+            except LLMError as e:
+                logger.warning(f"[Ollama] Attempt {attempt + 1} failed: {e}")
             except Exception as e:
                 logger.error(f"[Ollama] Attempt {attempt + 1} error: {e}")
 
@@ -241,8 +428,8 @@ Return ONLY valid JSON in this exact format:
             if attempt == 0:
                 time.sleep(1)
 
-        # All retries failed, use fallback
-        return self._generate_fallback(dataset, constraints)
+        # All retries failed; let the next backend (or the rule-based fallback) answer
+        return None
 
     def _generate_with_groq(
         self, prompt: str, dataset: Dict = None, constraints: Dict = None
@@ -252,53 +439,42 @@ Return ONLY valid JSON in this exact format:
         constraints = constraints or {}
 
         try:
-            response = self.groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",  # Updated from deprecated 3.1 70b
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=3000,
-                response_format={"type": "json_object"},
-            )
-            content = response.choices[0].message.content
-            return self._parse_ai_response(content, dataset, constraints)
+            response = self.llm.chat_sync(**self._pipeline_attempt("groq", prompt).kwargs())
+            return self._parse_ai_response(response, dataset, constraints)
         except Exception as e:
             logger.error(f"[Groq] Error: {e}")
-            return self._generate_fallback(dataset, constraints)
+            return None
 
     def _parse_ai_response(
-        self, content: str, dataset: Dict = None, constraints: Dict = None
+        self, response: LLMResponse, dataset: Dict = None, constraints: Dict = None
     ) -> Optional[Dict[str, Any]]:
         """Parse AI response to pipeline with improved extraction"""
         dataset = dataset or {}
         constraints = constraints or {}
 
-        try:
-            data = json.loads(content)
+        data = self._design_or_forget(response)
+        if data is not None:
             return data
-        except json.JSONDecodeError:
-            import re
-
-            start = content.find("{")
-            end = content.rfind("}")
-            if start != -1 and end != -1 and end > start:
-                try:
-                    data = json.loads(content[start : end + 1])
-                    if "pipeline" in data or "decision_summary" in data:
-                        return data
-                except:
-                    pass
-
-            matches = re.findall(r"\{[^{}]*\}", content)
-            for match in matches:
-                try:
-                    data = json.loads(match)
-                    if "pipeline" in data or "decision_summary" in data:
-                        return data
-                except:
-                    continue
-
-            logger.warning("[Parser] Could not parse AI response, using fallback")
-            return self._generate_fallback(dataset, constraints)
+
+        logger.warning("[Parser] Could not parse AI response, using fallback")
+        return self._generate_fallback(dataset, constraints)
+
+    def _design_or_forget(self, response: LLMResponse) -> Optional[Dict[str, Any]]:
+        """The design in a response; an unparseable or cut-off one is dropped from the cache."""
+        data = self._extract_pipeline_json(response.text)
+        if data is None or data.get("truncated"):
+            self.llm.forget(response)
+        return data
+
+    @staticmethod
+    def _extract_pipeline_json(content: str) -> Optional[Dict[str, Any]]:
+        """The pipeline JSON in an LLM response, or None if there is none."""
+        # A cut-off design keeps only whole stages: {"pipeline": {stage: {...}}}
+        found = extract_candidate(content, accept=_is_design, complete_depth=2)
+        if found is None:
+            return None
+        data, candidate = found
+        return AIDesignService._salvage_design(data) if candidate.truncated else data
 
     def _generate_fallback(self, dataset: Dict, constraints: Dict) -> Dict[str, Any]:
         """Fallback deterministic generation with smarter algorithm selection"""
@@ -400,12 +576,12 @@ Return ONLY valid JSON in this exact format:
             "alternatives_considered": [],
         }
 
-    def generate_notebook(self, config: Dict[str, Any]) -> str:
+    def generate_notebook(self, config: Dict[str, Any], use_cache: bool = True) -> str:
         """Generate AI-powered Colab notebook using the specialized notebook generator"""
         from agent.notebook.ai_generator import get_ai_generator
 
         ai_gen = get_ai_generator()
-        result, method = ai_gen.generate_notebook(config, prefer_local=False)
+        result, method = ai_gen.generate_notebook(config, prefer_local=False, use_cache=use_cache)
 
         if result:
             logger.info(f"[Notebook] Generated via {method}")
@@ -417,14 +593,15 @@ Return ONLY valid JSON in this exact format:
     def _generate_notebook_with_openrouter(self, prompt: str) -> str:
         """Generate notebook using OpenRouter"""
         try:
-            response = self.openrouter_client.chat.completions.create(
+            response = self.llm.chat_sync(
+                "openrouter",
+                user_message(prompt),
                 model="meta-llama/llama-3.3-70b-instruct",
-                messages=[{"role": "user", "content": prompt}],
                 temperature=0.1,
                 max_tokens=4000,
+                api_key=self.openrouter_key,
             )
-            content = response.choices[0].message.content
-            return self._parse_notebook_response(content)
+            return self._parse_notebook_response(response)
         except Exception as e:
             logger.error(f"[OpenRouter Notebook] Error: {e}")
             return ""
@@ -432,15 +609,16 @@ Return ONLY valid JSON in this exact format:
     def _generate_notebook_with_groq(self, prompt: str) -> str:
         """Generate notebook using Groq cloud API"""
         try:
-            response = self.groq_client.chat.completions.create(
+            response = self.llm.chat_sync(
+                "groq",
+                user_message(prompt),
                 model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
                 temperature=0.1,
                 max_tokens=4000,
-                response_format={"type": "json_object"},
+                json_mode=True,
+                api_key=self.api_key,
             )
-            content = response.choices[0].message.content
-            return self._parse_notebook_response(content)
+            return self._parse_notebook_response(response)
         except Exception as e:
             logger.error(f"[Groq Notebook] Error: {e}")
             return ""
@@ -551,20 +729,15 @@ Return ONLY valid JSON with: cells, metadata, nbformat=4, nbformat_minor=4. Each
 
     def _generate_notebook_with_ollama(self, prompt: str) -> str:
         """Generate notebook using Ollama with retry mechanism"""
-        # Use the best model from initialization
-        model_to_use = self.ollama_model
+        # Model list is fetched once and cached by the shared client
+        available = self.ollama_models
+        model_to_use = (
+            self._select_best_llama_model(available) if available else self.ollama_model
+        )
 
         # Retry logic - 2 attempts
         for attempt in range(2):
             try:
-                import requests
-
-                # Get fresh model list
-                resp = requests.get("http://localhost:11434/api/tags", timeout=5)
-                if resp.status_code == 200:
-                    available = [m["name"] for m in resp.json().get("models", [])]
-                    if available:
-                        model_to_use = self._select_best_llama_model(available)
 
                 logger.info(f"[Ollama Notebook] Using model: {model_to_use}")
 
@@ -573,26 +746,23 @@ Return ONLY valid JSON with: cells, metadata, nbformat=4, nbformat_minor=4. Each
 
 Generate COMPLETE valid JSON notebook. Return ONLY JSON starting with {{ and ending with }}. Include keys: cells, metadata, nbformat=4, nbformat_minor=4."""
 
-                response = requests.post(
-                    "http://localhost:11434/api/generate",
-                    json={
-                        "model": model_to_use,
-                        "prompt": full_prompt,
-                        "stream": False,
-                    },
+                response = self.llm.chat_sync(
+                    "ollama",
+                    user_message(full_prompt),
+                    model=model_to_use,
                     timeout=600,  # Increased timeout for large models
                 )
-                if response.status_code == 200:
-                    result = response.json()
-                    raw_response = result.get("response", "")
-                    logger.info(f"[Ollama] Response length: {len(raw_response)}")
+                logger.info(f"[Ollama] Response length: {len(response.text)}")
 
-                    parsed = self._parse_notebook_response(raw_response)
-                    if parsed and parsed != "{}":
-                        return parsed
+                parsed = self._parse_notebook_response(response)
+                if parsed and parsed != "{}":
+                    return parsed
 
                 logger.warning(f"[Ollama] Attempt {attempt + 1} failed")
 
+            except (LLMTimeoutError, LLMUnavailableError) as e:
+                logger.warning(f"[Ollama Notebook] Giving up: {e}")
+                return ""
             except Exception as e:
                 logger.error(f"[Ollama] Attempt {attempt + 1} error: {e}")
 
@@ -616,37 +786,18 @@ Generate COMPLETE valid JSON notebook. Return ONLY JSON starting with {{ and end
                 return model
         return available[0] if available else "llama3.1:8b"
 
-    def _parse_notebook_response(self, content: str) -> str:
+    def _parse_notebook_response(self, response: LLMResponse) -> str:
         """Parse AI response to notebook JSON with improved extraction"""
-        try:
-            data = json.loads(content)
-            if "cells" not in data or "metadata" not in data:
-                raise ValueError("Invalid notebook format - missing required keys")
-            return json.dumps(data, indent=2)
-        except (json.JSONDecodeError, ValueError):
-            import re
-
-            start = content.find("{")
-            end = content.rfind("}")
-            if start != -1 and end != -1 and end > start:
-                try:
-                    data = json.loads(content[start : end + 1])
-                    if "cells" in data:
-                        return json.dumps(data, indent=2)
-                except:
-                    pass
-
-            matches = re.findall(r"\{[^{}]*\}", content)
-            for match in matches:
-                try:
-                    data = json.loads(match)
-                    if "cells" in data:
-                        return json.dumps(data, indent=2)
-                except:
-                    continue
-
-            logger.warning("[Notebook Parser] Could not parse, using template")
-            return self._generate_notebook_fallback({})
+        found = extract_candidate(response.text, accept=_is_notebook, complete_depth=2)
+        notebook = normalize_notebook(found[0]) if found else None
+        if notebook is None or found[1].truncated:
+            # Unusable or cut off: don't replay it from the cache on the next attempt
+            self.llm.forget(response)
+        if notebook is not None:
+            return json.dumps(notebook, indent=2)
+
+        logger.warning("[Notebook Parser] Could not parse, using template")
+        return self._generate_notebook_fallback({})
 
     def _generate_notebook_fallback(self, config: Dict) -> str:
         """Generate fallback notebook template with proper labels and QLoRA support"""
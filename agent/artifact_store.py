@@ -0,0 +1,341 @@
+"""
+Content-addressed artifact store for fine-tuned adapters
+
+Adapter output directories used to be kept as whole directories and zipped
+per version, even though consecutive versions usually share tokenizer files
+and configs byte for byte. Here every file is stored once, as a blob named by
+its SHA-256, and each artifact (an adapter version or a training job's output)
+is a manifest listing its relative paths, digests and sizes:
+
+    <root>/objects/ab/cdef...   file contents, written once
+    <root>/manifests/<id>.json  {"id", "files": [{"path", "sha256", "size"}], ...}
+    <root>/checkouts/<id>-<tag> the files laid out again, for loaders that need a path
+
+A new version that changes only the adapter weights adds one blob, and one
+that changes nothing (metadata only) adds no blobs at all. Downloads are
+streamed as a ZIP_STORED archive built on the fly from the blobs, so nothing
+is zipped or copied on disk.
+
+Only directories under the staging root (where training jobs write their
+output) are ingested, and symlinks are refused, so ingesting cannot copy
+arbitrary server files into a downloadable artifact.
+
+Configuration: ADAPTER_ARTIFACT_DIR, ADAPTER_STAGING_DIR.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_DIR = "./adapter_artifacts"
+# Training jobs write to ./outputs/<job_id> (agent/tasks.py)
+DEFAULT_STAGING_DIR = "./outputs"
+HASH_CHUNK_BYTES = 1 << 20
+STREAM_CHUNK_BYTES = 1 << 20
+# Fixed timestamp so the same manifest always streams the same bytes
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_ARTIFACT_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+class _ChunkSink:
+    """Write-only stream for zipfile; the writer generator drains it as it goes."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.written = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.written += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class AdapterArtifactStore:
+    """Deduplicated adapter files plus one manifest per artifact id."""
+
+    def __init__(self, root: str = DEFAULT_ARTIFACT_DIR, staging_root: str = DEFAULT_STAGING_DIR):
+        self.root = Path(root)
+        self.staging_root = Path(staging_root)
+        self.objects_dir = self.root / "objects"
+        self.manifests_dir = self.root / "manifests"
+        self.checkouts_dir = self.root / "checkouts"
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AdapterArtifactStore":
+        return cls(
+            os.environ.get("ADAPTER_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR),
+            os.environ.get("ADAPTER_STAGING_DIR", DEFAULT_STAGING_DIR),
+        )
+
+    # ─── Blobs ────────────────────────────────────────────────────────────
+
+    def blob_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def _atomic_write(self, path: Path, write) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _put_file(self, source: Path) -> Dict[str, Any]:
+        """Hash a file and store it unless a blob with that digest exists."""
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_BYTES):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        size = source.stat().st_size
+        target = self.blob_path(sha)
+        stored = not target.exists()
+        if stored:
+
+            def copy(sink):
+                with open(source, "rb") as f:
+                    while chunk := f.read(HASH_CHUNK_BYTES):
+                        sink.write(chunk)
+
+            self._atomic_write(target, copy)
+        return {"sha256": sha, "size": size, "stored": stored}
+
+    # ─── Manifests ────────────────────────────────────────────────────────
+
+    def _manifest_path(self, artifact_id: str) -> Path:
+        if not _ARTIFACT_ID.match(artifact_id):
+            raise ValueError(f"Invalid artifact id: {artifact_id!r}")
+        return self.manifests_dir / f"{artifact_id}.json"
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        body = json.dumps(manifest, sort_keys=True, indent=1).encode("utf-8")
+        self._atomic_write(self._manifest_path(manifest["id"]), lambda f: f.write(body))
+        return manifest
+
+    def _staged_files(self, directory: str) -> Tuple[Path, List[Path]]:
+        """Regular files under a directory inside the staging root; any symlink is refused."""
+        base = Path(directory)
+        if base.is_symlink() or not base.is_dir():
+            raise ValueError(f"Artifact directory not found: {directory}")
+        base = base.resolve()
+        if not base.is_relative_to(self.staging_root.resolve()):
+            raise ValueError(f"Artifact directory is outside {self.staging_root}: {directory}")
+        files = []
+        # os.walk does not descend into symlinked directories; they are listed and refused
+        for dirpath, dirnames, filenames in os.walk(base):
+            for path in (Path(dirpath) / name for name in dirnames + filenames):
+                if path.is_symlink():
+                    raise ValueError(f"Symlinks are not stored: {path.relative_to(base)}")
+            files.extend(p for p in (Path(dirpath) / name for name in filenames) if p.is_file())
+        return base, sorted(files)
+
+    def ingest(self, artifact_id: str, directory: str, parent: Optional[str] = None):
+        """Store every file under directory and record them as artifact_id's manifest."""
+        base, paths = self._staged_files(directory)
+        files, new_bytes = [], 0
+        with self._lock:
+            for path in paths:
+                entry = self._put_file(path)
+                new_bytes += entry["size"] if entry.pop("stored") else 0
+                files.append({"path": path.relative_to(base).as_posix(), **entry})
+            manifest = self._write_manifest(
+                {
+                    "id": artifact_id,
+                    "parent": parent,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "files": files,
+                    "total_bytes": sum(f["size"] for f in files),
+                    "new_bytes": new_bytes,
+                }
+            )
+        logger.info(
+            f"[Artifacts] {artifact_id}: {len(files)} files, {manifest['total_bytes']} bytes, "
+            f"{new_bytes} new"
+        )
+        return manifest
+
+    def link(
+        self, artifact_id: str, source_id: str, parent: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """New manifest for artifact_id sharing every file of source_id (no blob writes)."""
+        source = self.manifest(source_id)
+        if source is None:
+            return None
+        return self._write_manifest(
+            {
+                **source,
+                "id": artifact_id,
+                "parent": parent or source_id,
+                "created_at": datetime.utcnow().isoformat(),
+                "new_bytes": 0,
+            }
+        )
+
+    def manifest(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        if not _ARTIFACT_ID.match(artifact_id):
+            return None
+        path = self._manifest_path(artifact_id)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def delete(self, artifact_id: str) -> bool:
+        """Drop a manifest; its blobs stay until gc() finds them unreferenced."""
+        if not _ARTIFACT_ID.match(artifact_id):
+            return False
+        path = self._manifest_path(artifact_id)
+        if not path.exists():
+            return False
+        path.unlink()
+        with self._lock:
+            self._remove_checkouts(lambda name: name.startswith(f"{artifact_id}-"))
+        return True
+
+    def _manifests(self) -> Iterator[Dict[str, Any]]:
+        if self.manifests_dir.exists():
+            for path in self.manifests_dir.glob("*.json"):
+                yield json.loads(path.read_text(encoding="utf-8"))
+
+    def gc(self) -> int:
+        """Remove blobs no manifest refers to; returns the bytes freed."""
+        with self._lock:
+            manifests = list(self._manifests())
+            current = {self._checkout_name(m) for m in manifests}
+            self._remove_checkouts(lambda name: name not in current)
+            referenced = {f["sha256"] for m in manifests for f in m["files"]}
+            freed = 0
+            for blob in self.objects_dir.glob("*/*"):
+                if blob.suffix != ".tmp" and blob.parent.name + blob.name not in referenced:
+                    freed += blob.stat().st_size
+                    blob.unlink()
+        return freed
+
+    def stats(self) -> Dict[str, Any]:
+        """Logical bytes (sum over manifests) vs bytes actually on disk."""
+        manifests = list(self._manifests())
+        logical = sum(m["total_bytes"] for m in manifests)
+        blobs = [b for b in self.objects_dir.glob("*/*") if b.suffix != ".tmp"]
+        physical = sum(b.stat().st_size for b in blobs)
+        return {
+            "artifacts": len(manifests),
+            "blobs": len(blobs),
+            "logical_bytes": logical,
+            "stored_bytes": physical,
+            "saved_bytes": logical - physical,
+            "dedup_ratio": round(logical / physical, 3) if physical else 1.0,
+        }
+
+    # ─── Checkouts ────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _checkout_name(manifest: Dict[str, Any]) -> str:
+        files = json.dumps(manifest["files"], sort_keys=True).encode("utf-8")
+        return f"{manifest['id']}-{hashlib.sha256(files).hexdigest()[:16]}"
+
+    def _remove_checkouts(self, matches) -> None:
+        if self.checkouts_dir.exists():
+            for path in self.checkouts_dir.iterdir():
+                if not path.name.startswith(".") and matches(path.name):
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def checkout(self, artifact_id: str) -> Optional[Path]:
+        """A directory holding the artifact's files, for loaders that only take paths.
+
+        Files are hard links to the blobs where the filesystem allows (copies
+        otherwise), so treat the directory as read-only. It is reused until the
+        manifest changes and removed by delete() or gc().
+        """
+        manifest = self.manifest(artifact_id)
+        if manifest is None:
+            return None
+        target = self.checkouts_dir / self._checkout_name(manifest)
+        with self._lock:
+            if target.is_dir():
+                return target
+            self.checkouts_dir.mkdir(parents=True, exist_ok=True)
+            staging = Path(tempfile.mkdtemp(dir=self.checkouts_dir, prefix=".tmp-"))
+            try:
+                for entry in manifest["files"]:
+                    dest = staging / entry["path"]
+                    dest.parent.mkdir(parents=True, exist_ok=True)
+                    try:
+                        os.link(self.blob_path(entry["sha256"]), dest)
+                    except OSError:
+                        shutil.copyfile(self.blob_path(entry["sha256"]), dest)
+                os.replace(staging, target)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+        return target
+
+    # ─── Downloads ────────────────────────────────────────────────────────
+
+    def stream_zip(
+        self, artifact_id: str, chunk_size: int = STREAM_CHUNK_BYTES
+    ) -> Optional[Iterator[bytes]]:
+        """Chunks of an uncompressed zip of the artifact, read straight from the blobs."""
+        manifest = self.manifest(artifact_id)
+        if manifest is None:
+            return None
+        return self._zip_chunks(manifest["files"], chunk_size)
+
+    def _zip_chunks(self, files: List[Dict[str, Any]], chunk_size: int) -> Iterator[bytes]:
+        sink = _ChunkSink()
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for entry in files:
+                info = zipfile.ZipInfo(entry["path"], date_time=ZIP_DATE_TIME)
+                info.file_size = entry["size"]
+                force_zip64 = entry["size"] >= zipfile.ZIP64_LIMIT
+                with archive.open(info, "w", force_zip64=force_zip64) as dst, open(
+                    self.blob_path(entry["sha256"]), "rb"
+                ) as src:
+                    while chunk := src.read(chunk_size):
+                        dst.write(chunk)
+                        yield sink.drain()
+                if data := sink.drain():
+                    yield data
+        if data := sink.drain():
+            yield data
+
+
+_store: Optional[AdapterArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> AdapterArtifactStore:
+    """Process-wide artifact store configured from the environment."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AdapterArtifactStore.from_env()
+    return _store
+
+
+__all__ = [
+    "AdapterArtifactStore",
+    "get_artifact_store",
+]
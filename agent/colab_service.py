@@ -5,9 +5,10 @@ Generates AI-powered notebooks for fine-tuning LLMs in Google Colab
 
 import os
 import json
+import functools
 import uuid
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
 from fastapi import HTTPException
@@ -16,124 +17,31 @@ from fastapi import HTTPException
 logger = logging.getLogger(__name__)
 
 
-class ColabTrainingService:
-    def __init__(self):
-        self.jobs: Dict[str, Dict[str, Any]] = {}
-
-    def create_notebook(
-        self, config: Dict[str, Any], use_ai: bool = True, prefer_local: bool = False
-    ) -> str:
-        """Create a Jupyter notebook for Colab training."""
-        model_id = config.get("model_id", "")
-        method = config.get("method", "qlora")
-        dataset_name = config.get("dataset_name", "dataset")
+# ─── Static cells ────────────────────────────────────────────────────────────
+#
+# _build_notebook() renders two cells per request. Every other cell is fixed
+# (or fixed per training method), so its JSON is serialized once per process and
+# spliced into a pre-serialized notebook skeleton.
 
-        logger.info(f"Creating notebook: model={model_id}, method={method}")
+_INSTALL_SOURCE = "!pip install transformers datasets peft accelerate bitsandbytes torch"
 
-        # Try AI generation first
-        notebook_json = None
-        if use_ai:
-            try:
-                from agent.notebook.ai_generator import get_ai_generator
-
-                ai_gen = get_ai_generator()
-                notebook_json, _ = ai_gen.generate_notebook(
-                    config=config, prefer_local=prefer_local
-                )
-            except Exception as e:
-                logger.warning(f"AI generation failed: {e}")
-
-        if not notebook_json:
-            notebook_json = self._build_notebook(config)
-
-        return notebook_json
-
-    def _build_notebook(self, config: Dict[str, Any]) -> str:
-        """Build notebook programmatically."""
-        model_id = config.get("model_id", "meta-llama/Llama-3.1-8B-Instruct")
-        model_name = config.get("model_name", model_id.split("/")[-1].replace("-Instruct", ""))
-        method = config.get("method", "qlora")
-
-        # Hyperparameters
-        num_epochs = config.get("num_epochs", 3)
-        batch_size = config.get("batch_size", 4)
-        learning_rate = config.get("learning_rate", 2e-4)
-        lora_r = config.get("lora_r", 16)
-        lora_alpha = config.get("lora_alpha", 32)
-        max_length = config.get("max_length", 512)
-
-        def cell(source: str) -> Dict[str, Any]:
-            return {
-                "cell_type": "code",
-                "execution_count": None,
-                "metadata": {},
-                "outputs": [],
-                "source": [source],
-            }
-
-        def markdown(source: str) -> Dict[str, Any]:
-            return {"cell_type": "markdown", "metadata": {}, "source": [source]}
-
-        cells = []
-
-        # Header
-        cells.append(
-            markdown(
-                f"# Fine-Tuning {model_name} with {method.upper()}\n\nSystem2ML - AI-Powered Pipeline Training"
-            )
-        )
+_INSTALL_UNSLOTH_SOURCE = (
+    "!pip install unsloth transformers datasets peft accelerate bitsandbytes torch"
+)
 
-        # Install
-        if method == "unsloth":
-            cells.append(
-                cell(
-                    "!pip install unsloth transformers datasets peft accelerate bitsandbytes torch"
-                )
-            )
-        else:
-            cells.append(
-                cell("!pip install transformers datasets peft accelerate bitsandbytes torch")
-            )
-
-        # Upload
-        cells.append(
-            cell("""from google.colab import files
+_UPLOAD_SOURCE = """from google.colab import files
 uploaded = files.upload()
 dataset_file = list(uploaded.keys())[0]
-print('Uploaded:', dataset_file)""")
-        )
-
-        # Config
-        cells.append(
-            cell(f"""MODEL_NAME = "{model_id}"
-TRAINING_METHOD = "{method}"
-DATASET_PATH = dataset_file
-OUTPUT_DIR = "/content/model_adapter"
-NUM_EPOCHS = {num_epochs}
-BATCH_SIZE = {batch_size}
-LEARNING_RATE = {learning_rate}
-LORA_R = {lora_r}
-LORA_ALPHA = {lora_alpha}
-MAX_LENGTH = {max_length}
+print('Uploaded:', dataset_file)"""
 
-print('Model:', MODEL_NAME)
-print('Method:', TRAINING_METHOD)
-print('Dataset:', DATASET_PATH)""")
-        )
-
-        # Load data
-        cells.append(
-            cell("""import pandas as pd
+_LOAD_DATA_SOURCE = """import pandas as pd
 from datasets import Dataset
 
 df = pd.read_csv(DATASET_PATH)
 print('Dataset loaded:', len(df), 'rows')
-print('Columns:', list(df.columns))""")
-        )
+print('Columns:', list(df.columns))"""
 
-        # Create text
-        cells.append(
-            cell("""# Create text column for training
+_TEXT_COLUMN_SOURCE = """# Create text column for training
 label_cols = ['label', 'target', 'y', 'class', 'output']
 label_col = next((c for c in df.columns if c.lower() in label_cols), None)
 
@@ -144,13 +52,9 @@ if label_col:
 else:
     df['text'] = df.apply(lambda row: ' | '.join([str(k) + ': ' + str(v) for k, v in row.items()]), axis=1)
 
-print('Sample text:', df['text'].iloc[0][:100])""")
-        )
+print('Sample text:', df['text'].iloc[0][:100])"""
 
-        # Load model based on method
-        if method == "qlora":
-            cells.append(
-                cell("""import torch
+_LOAD_QLORA_SOURCE = """import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
 from peft import LoraConfig, get_peft_model, TaskType
 
@@ -169,11 +73,9 @@ model = AutoModelForCausalLM.from_pretrained(
     trust_remote_code=True,
 )
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-print('Model loaded with 4-bit QLoRA')""")
-            )
-        elif method == "lora":
-            cells.append(
-                cell("""import torch
+print('Model loaded with 4-bit QLoRA')"""
+
+_LOAD_LORA_SOURCE = """import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
 model = AutoModelForCausalLM.from_pretrained(
@@ -183,11 +85,9 @@ model = AutoModelForCausalLM.from_pretrained(
     trust_remote_code=True,
 )
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-print('Model loaded')""")
-            )
-        else:  # unsloth
-            cells.append(
-                cell("""from unsloth import FastLanguageModel
+print('Model loaded')"""
+
+_LOAD_UNSLOTH_SOURCE = """from unsloth import FastLanguageModel
 import torch
 
 model, tokenizer = FastLanguageModel.from_pretrained(
@@ -196,13 +96,9 @@ model, tokenizer = FastLanguageModel.from_pretrained(
     dtype=torch.float16,
     load_in_4bit=True,
 )
-print('Model loaded with Unsloth')""")
-            )
+print('Model loaded with Unsloth')"""
 
-        # LoRA config (if not full_ft)
-        if method != "full_ft":
-            cells.append(
-                cell("""from peft import LoraConfig, get_peft_model, TaskType
+_LORA_CONFIG_SOURCE = """from peft import LoraConfig, get_peft_model, TaskType
 
 lora_config = LoraConfig(
     r=LORA_R,
@@ -213,12 +109,9 @@ lora_config = LoraConfig(
     task_type=TaskType.CAUSAL_LM,
 )
 model = get_peft_model(model, lora_config)
-model.print_trainable_parameters()""")
-            )
+model.print_trainable_parameters()"""
 
-        # Tokenize
-        cells.append(
-            cell("""# Tokenize
+_TOKENIZE_SOURCE = """# Tokenize
 if tokenizer.pad_token is None:
     tokenizer.pad_token = tokenizer.eos_token
 
@@ -232,12 +125,9 @@ def tokenize_function(examples):
 
 train_dataset = Dataset.from_pandas(df[["text"]])
 tokenized_dataset = train_dataset.map(tokenize_function, batched=True, remove_columns=["text"])
-print('Tokenized:', len(tokenized_dataset), 'samples')""")
-        )
+print('Tokenized:', len(tokenized_dataset), 'samples')"""
 
-        # Training
-        cells.append(
-            cell("""from transformers import TrainingArguments, Trainer
+_TRAIN_SOURCE = """from transformers import TrainingArguments, Trainer
 
 training_args = TrainingArguments(
     output_dir=OUTPUT_DIR,
@@ -257,12 +147,9 @@ trainer = Trainer(
 )
 print('Starting training...')
 trainer.train()
-print('Training completed!')""")
-        )
+print('Training completed!')"""
 
-        # Save
-        cells.append(
-            cell("""# Save model
+_SAVE_SOURCE = """# Save model
 model.save_pretrained(OUTPUT_DIR)
 tokenizer.save_pretrained(OUTPUT_DIR)
 print('Model saved to:', OUTPUT_DIR)
@@ -270,12 +157,9 @@ print('Model saved to:', OUTPUT_DIR)
 # Create ZIP for download
 import shutil
 shutil.make_archive('/content/model_adapter', 'zip', '/content/model_adapter')
-print('ZIP created for download')""")
-        )
+print('ZIP created for download')"""
 
-        # Results
-        cells.append(
-            cell("""# Results summary
+_RESULTS_SOURCE = """# Results summary
 results = {
     'status': 'completed',
     'model': MODEL_NAME,
@@ -285,29 +169,169 @@ results = {
 }
 print('Training Results:')
 for k, v in results.items():
-    print(' ', k, ':', v)""")
-        )
+    print(' ', k, ':', v)"""
 
-        # Test inference
-        cells.append(
-            cell("""# Test inference
+_TEST_INFERENCE_SOURCE = """# Test inference
 test_text = df['text'].iloc[0]
 print('Testing with:', test_text[:100], '...')
-print('Note: For production use, merge LoRA adapters first')""")
+print('Note: For production use, merge LoRA adapters first')"""
+
+_STATIC_SOURCES = {
+    "install": _INSTALL_SOURCE,
+    "install-unsloth": _INSTALL_UNSLOTH_SOURCE,
+    "upload": _UPLOAD_SOURCE,
+    "load-data": _LOAD_DATA_SOURCE,
+    "text-column": _TEXT_COLUMN_SOURCE,
+    "load-qlora": _LOAD_QLORA_SOURCE,
+    "load-lora": _LOAD_LORA_SOURCE,
+    "load-unsloth": _LOAD_UNSLOTH_SOURCE,
+    "lora-config": _LORA_CONFIG_SOURCE,
+    "tokenize": _TOKENIZE_SOURCE,
+    "train": _TRAIN_SOURCE,
+    "save": _SAVE_SOURCE,
+    "results": _RESULTS_SOURCE,
+    "test-inference": _TEST_INFERENCE_SOURCE,
+}
+
+_NOTEBOOK_METADATA = {
+    "colab": {"accelerator": "GPU", "gpuType": "T4", "provenance": []},
+    "kernelspec": {"display_name": "Python 3", "language": "python", "name": "python3"},
+}
+
+
+def _code_cell(source: str) -> Dict[str, Any]:
+    return {
+        "cell_type": "code",
+        "execution_count": None,
+        "metadata": {},
+        "outputs": [],
+        "source": [source],
+    }
+
+
+def _markdown_cell(source: str) -> Dict[str, Any]:
+    return {"cell_type": "markdown", "metadata": {}, "source": [source]}
+
+
+@functools.lru_cache(maxsize=None)
+def _static_cell_json(name: str) -> str:
+    return json.dumps(_code_cell(_STATIC_SOURCES[name]))
+
+
+@functools.lru_cache(maxsize=None)
+def _method_cells_json(method: str) -> str:
+    """The cells after the config cell, from loading the data to the test inference."""
+    if method in ("qlora", "lora"):
+        load_model = f"load-{method}"
+    else:
+        load_model = "load-unsloth"
+    names = ["load-data", "text-column", load_model]
+    if method != "full_ft":
+        names.append("lora-config")
+    names += ["tokenize", "train", "save", "results", "test-inference"]
+    return ", ".join(_static_cell_json(name) for name in names)
+
+
+def _notebook_skeleton() -> Tuple[str, str]:
+    placeholder = "@@cells@@"
+    notebook = {
+        "cells": [placeholder],
+        "metadata": _NOTEBOOK_METADATA,
+        "nbformat": 4,
+        "nbformat_minor": 0,
+    }
+    head, tail = json.dumps(notebook).split(json.dumps(placeholder), 1)
+    return head, tail
+
+
+_NOTEBOOK_SKELETON = _notebook_skeleton()
+
+
+class ColabTrainingService:
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    def create_notebook(
+        self,
+        config: Dict[str, Any],
+        use_ai: bool = True,
+        prefer_local: bool = False,
+        use_cache: bool = True,
+        on_partial=None,
+    ) -> str:
+        """Create a Jupyter notebook for Colab training.
+
+        on_partial(path, cell) receives each AI-generated cell as it streams in.
+        """
+        model_id = config.get("model_id", "")
+        method = config.get("method", "qlora")
+        dataset_name = config.get("dataset_name", "dataset")
+
+        logger.info(f"Creating notebook: model={model_id}, method={method}")
+
+        # Try AI generation first
+        notebook_json = None
+        if use_ai:
+            try:
+                from agent.notebook.ai_generator import get_ai_generator
+
+                ai_gen = get_ai_generator()
+                notebook_json, _ = ai_gen.generate_notebook(
+                    config=config,
+                    prefer_local=prefer_local,
+                    use_cache=use_cache,
+                    on_partial=on_partial,
+                )
+            except Exception as e:
+                logger.warning(f"AI generation failed: {e}")
+
+        if not notebook_json:
+            notebook_json = self._build_notebook(config)
+
+        return notebook_json
+
+    def _build_notebook(self, config: Dict[str, Any]) -> str:
+        """Build notebook programmatically."""
+        model_id = config.get("model_id", "meta-llama/Llama-3.1-8B-Instruct")
+        model_name = config.get("model_name", model_id.split("/")[-1].replace("-Instruct", ""))
+        method = config.get("method", "qlora")
+
+        # Hyperparameters
+        num_epochs = config.get("num_epochs", 3)
+        batch_size = config.get("batch_size", 4)
+        learning_rate = config.get("learning_rate", 2e-4)
+        lora_r = config.get("lora_r", 16)
+        lora_alpha = config.get("lora_alpha", 32)
+        max_length = config.get("max_length", 512)
+
+        # Only the header and config cells depend on the config; the rest is cached
+        header = _markdown_cell(
+            f"# Fine-Tuning {model_name} with {method.upper()}\n\nSystem2ML - AI-Powered Pipeline Training"
         )
+        config_cell = _code_cell(f"""MODEL_NAME = "{model_id}"
+TRAINING_METHOD = "{method}"
+DATASET_PATH = dataset_file
+OUTPUT_DIR = "/content/model_adapter"
+NUM_EPOCHS = {num_epochs}
+BATCH_SIZE = {batch_size}
+LEARNING_RATE = {learning_rate}
+LORA_R = {lora_r}
+LORA_ALPHA = {lora_alpha}
+MAX_LENGTH = {max_length}
 
-        # Build notebook
-        notebook = {
-            "cells": cells,
-            "metadata": {
-                "colab": {"accelerator": "GPU", "gpuType": "T4", "provenance": []},
-                "kernelspec": {"display_name": "Python 3", "language": "python", "name": "python3"},
-            },
-            "nbformat": 4,
-            "nbformat_minor": 0,
-        }
+print('Model:', MODEL_NAME)
+print('Method:', TRAINING_METHOD)
+print('Dataset:', DATASET_PATH)""")
 
-        return json.dumps(notebook)
+        head, tail = _NOTEBOOK_SKELETON
+        cells = (
+            json.dumps(header),
+            _static_cell_json("install-unsloth" if method == "unsloth" else "install"),
+            _static_cell_json("upload"),
+            json.dumps(config_cell),
+            _method_cells_json(method),
+        )
+        return head + ", ".join(cells) + tail
 
     def create_job(self, config: Dict[str, Any]) -> str:
         job_id = f"job_{uuid.uuid4().hex[:8]}"
@@ -5,6 +5,7 @@ Features:
 - Dynamic AI-Generated Notebooks (Groq integration)
 - Training Progress Streaming (WebSocket)
 - LoRA Rank Auto-Tuning
+- Calibrated Time/Cost Estimates
 - Model Comparison View
 - Dataset Format Converter
 - Adapter Hub
@@ -12,6 +13,7 @@ Features:
 
 import os
 import json
+import logging
 import uuid
 import time
 import tempfile
@@ -22,16 +24,95 @@ from datetime import datetime
 from typing import Optional, Dict, Any, List, Literal
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from starlette.websockets import WebSocket
 
-router = APIRouter(prefix="/api/finetuning", tags=["finetuning"])
-
-# ─── In-memory job store (replace with DB in production) ──────────────────────
-_jobs: Dict[str, Dict] = {}
-_adapters: Dict[str, Dict] = {}  # Adapter Hub storage
-_active_connections: Dict[str, List[WebSocket]] = {}  # WebSocket connections per job
+from agent.adapter_eval import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_NEW_TOKENS,
+    HAS_EVAL_DEPS,
+    EvalExample,
+    get_eval_harness,
+)
+from agent.artifact_store import get_artifact_store
+from agent.finetuning_store import MAX_PAGE_SIZE, TERMINAL_JOB_STATUSES, get_finetuning_store
+from agent.throughput_calibration import (
+    PLATFORM_HARDWARE,
+    benchmark_tokens_per_sec,
+    get_throughput_calibration,
+    hardware_fingerprint,
+    params_from_model_id,
+    record_job_throughput,
+    run_cpu_benchmark,
+)
+from lib.realtime.backplane import get_backplane
+from lib.realtime.event_log import DEFAULT_BUFFER_SIZE, EventLogRegistry
+from lib.realtime.fanout import FanoutHub
+from lib.realtime.sse import SSE_HEADERS, parse_last_event_id, stream_event_log
+from ui.responses import FastJSONResponse, FastJSONRoute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/finetuning",
+    tags=["finetuning"],
+    route_class=FastJSONRoute,
+    default_response_class=FastJSONResponse,
+)
+
+# ─── Job store ────────────────────────────────────────────────────────────────
+# Jobs and adapters are persisted in agent.finetuning_store (SQLite, shared by all
+# workers); its per-table change counters drive the /jobs ETag.
+
+
+def jobs_version() -> tuple:
+    return get_finetuning_store().versions("finetuning_jobs")
+
+
+def _job_progress_key(message: Dict[str, Any]) -> Optional[str]:
+    """Untyped/progress messages are full snapshots, so only the latest needs sending."""
+    return "progress" if message.get("type", "progress") == "progress" else None
+
+
+# Recent progress/metric/log events per job, replayed to SSE watchers (Last-Event-ID)
+# and to WebSocket clients (?last_seq=). The worker that broadcasts an event assigns
+# its seq; every other worker mirrors it with the same seq as it arrives over the
+# backplane, so a client can resume on any worker.
+# A finished job's log is dropped from memory once it has been idle for
+# FINETUNING_FINISHED_TTL_SECONDS; the job itself stays in the store.
+_job_events = EventLogRegistry(
+    maxlen=int(os.environ.get("FINETUNING_EVENT_BUFFER_SIZE", str(DEFAULT_BUFFER_SIZE)))
+)
+
+
+def _mirror_job_event(job_id: str, message: Dict[str, Any]) -> None:
+    seq = message.get("seq")
+    if not isinstance(seq, int):
+        return
+    log = _job_events.get(job_id)
+    data = {k: v for k, v in message.items() if k != "seq"}
+    log.append(data.get("type", "progress"), data, seq=seq)  # no-op on the producer
+    if data.get("status") in TERMINAL_JOB_STATUSES:
+        log.close()
+
+
+# WebSocket clients per job; each job id is a fan-out channel with per-client send queues
+_progress_hub = FanoutHub(coalesce_key=_job_progress_key, on_publish=_mirror_job_event)
+get_backplane().attach("finetuning", _progress_hub)
+
+_FINISHED_LOG_TTL_SECONDS = float(os.environ.get("FINETUNING_FINISHED_TTL_SECONDS", "3600"))
+_PRUNE_INTERVAL_SECONDS = 60.0
+_last_prune = 0.0
+
+
+def _prune_finished_logs() -> None:
+    global _last_prune
+    now = time.time()
+    if now - _last_prune >= _PRUNE_INTERVAL_SECONDS:
+        _last_prune = now
+        _job_events.prune_closed(_FINISHED_LOG_TTL_SECONDS)
 
 
 # ─── Pydantic Models ──────────────────────────────────────────────────────────
@@ -50,6 +131,10 @@ class DatasetProfile(BaseModel):
     text_columns: List[str] = []
     numeric_columns: List[str] = []
     size_mb: float = 0.0
+    approximate: bool = False
+    distinct_counts: Dict[str, int] = {}
+    text_lengths: Dict[str, Dict[str, float]] = {}
+    error_bounds: Dict[str, Any] = {}
 
 
 # ─── Pydantic Models ──────────────────────────────────────────────────────────
@@ -154,13 +239,76 @@ def convert_dataset_format(
     return output.getvalue()
 
 
+# ─── Dataset Profiling ────────────────────────────────────────────────────────
+# Small files are profiled exactly in memory. Above FINETUNING_PROFILE_EXACT_MAX_MB
+# the file is streamed in chunks through fixed-size sketches (lib.profiling) and
+# the profile reports error bounds for every estimated field.
+
+PROFILE_EXACT_MAX_MB = float(os.environ.get("FINETUNING_PROFILE_EXACT_MAX_MB", "64"))
+PROFILE_CHUNK_ROWS = 10_000
+# Same rough chars-per-token ratio the LLM client budgets prompts with.
+CHARS_PER_TOKEN = 4
+_LABEL_HINTS = ["label", "target", "y", "class", "output", "class_"]
+_TEXT_MIN_MEAN_CHARS = 50
+
+
+def _is_label_column(col: str) -> bool:
+    col_lower = col.lower()
+    return any(x in col_lower for x in _LABEL_HINTS)
+
+
+def _nunique(series) -> int:
+    try:
+        return int(series.nunique())
+    except TypeError:  # list/dict cells from JSON records
+        return int(series.dropna().astype(str).nunique())
+
+
+def _length_stats(mean: float, quantiles: Dict[str, float], max_chars: float) -> Dict[str, float]:
+    stats = {"mean_chars": mean, **{f"{k}_chars": v for k, v in quantiles.items()}}
+    stats["max_chars"] = max_chars
+    for key in list(stats):
+        stats[key.replace("_chars", "_tokens")] = stats[key] / CHARS_PER_TOKEN
+    return {key: round(float(value), 1) for key, value in stats.items()}
+
+
+def _read_dataset_chunks(file_content: bytes, file_format: str, chunk_rows: int):
+    """Yield the dataset as DataFrames of at most chunk_rows rows."""
+    import pandas as pd
+    from io import BytesIO
+
+    if file_format == "csv":
+        yield from pd.read_csv(BytesIO(file_content), chunksize=chunk_rows)
+    elif file_format == "jsonl":
+        yield from pd.read_json(BytesIO(file_content), lines=True, chunksize=chunk_rows)
+    elif file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(BytesIO(file_content)).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+
 def profile_dataset(
-    file_content: bytes, file_format: str, file_name: str = "dataset"
+    file_content: bytes,
+    file_format: str,
+    file_name: str = "dataset",
+    approximate: Optional[bool] = None,
 ) -> DatasetProfile:
     """
     Analyze a dataset to extract column names, task type, class balance, etc.
     Used for AI-aware notebook generation.
+
+    approximate=None profiles exactly up to PROFILE_EXACT_MAX_MB and switches to
+    the streaming, sketch-based profiler above it.
     """
+    size_mb = len(file_content) / (1024 * 1024)
+    if approximate is None:
+        approximate = size_mb > PROFILE_EXACT_MAX_MB
+    if approximate:
+        return _profile_dataset_approximate(file_content, file_format, file_name)
+
     import pandas as pd
     from io import BytesIO
 
@@ -177,7 +325,6 @@ def profile_dataset(
 
     columns = list(df.columns)
     rows = len(df)
-    size_mb = len(file_content) / (1024 * 1024)
 
     # Identify label column
     label_column = None
@@ -186,10 +333,10 @@ def profile_dataset(
     class_balance = {}
     text_columns = []
     numeric_columns = []
+    text_lengths = {}
 
     for col in columns:
-        col_lower = col.lower()
-        if any(x in col_lower for x in ["label", "target", "y", "class", "output", "class_"]):
+        if _is_label_column(col):
             label_column = col
             if pd.api.types.is_numeric_dtype(df[col]):
                 unique_ratio = df[col].nunique() / max(rows, 1)
@@ -214,13 +361,19 @@ def profile_dataset(
             numeric_columns.append(col)
         elif pd.api.types.is_string_dtype(df[col]) or df[col].dtype == object:
             # Check if it looks like text
-            if df[col].str.len().mean() > 50:
+            lengths = df[col].str.len()
+            if lengths.mean() > _TEXT_MIN_MEAN_CHARS:
                 text_columns.append(col)
+                quantiles = lengths.quantile([0.5, 0.9, 0.99])
+                text_lengths[col] = _length_stats(
+                    lengths.mean(),
+                    {"p50": quantiles[0.5], "p90": quantiles[0.9], "p99": quantiles[0.99]},
+                    lengths.max(),
+                )
 
     # Detect missing values
-    missing_values = {
-        col: int(df[col].isnull().sum()) for col in columns if df[col].isnull().sum() > 0
-    }
+    null_counts = df.isna().sum()
+    missing_values = {col: int(n) for col, n in null_counts.items() if n > 0}
 
     # Infer task type if no label column
     if not task_type:
@@ -242,6 +395,116 @@ def profile_dataset(
         text_columns=text_columns,
         numeric_columns=numeric_columns,
         size_mb=round(size_mb, 2),
+        distinct_counts={col: _nunique(df[col]) for col in columns},
+        text_lengths=text_lengths,
+    )
+
+
+def _label_key(value: Any) -> str:
+    # Chunks with missing labels are upcast to float; keep 1 and 1.0 in one class.
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _profile_dataset_approximate(
+    file_content: bytes, file_format: str, file_name: str
+) -> DatasetProfile:
+    """Single streaming pass: exact rows and null counts, sketched everything else."""
+    import pandas as pd
+
+    from lib.profiling.sketches import Z_95, HyperLogLog, QuantileSketch, ReservoirSample
+
+    columns: List[str] = []
+    null_counts: Dict[str, int] = {}
+    distinct: Dict[str, HyperLogLog] = {}
+    lengths: Dict[str, QuantileSketch] = {}
+    non_numeric = set()
+    label_column = None
+    label_sample = ReservoirSample()
+    rows = 0
+
+    for chunk in _read_dataset_chunks(file_content, file_format, PROFILE_CHUNK_ROWS):
+        new_columns = [col for col in chunk.columns if col not in distinct]
+        for col in new_columns:
+            columns.append(col)
+            null_counts[col] = rows  # absent from every earlier chunk
+            distinct[col] = HyperLogLog()
+            if label_column is None and _is_label_column(col):
+                label_column = col
+        if len(chunk.columns) != len(columns):
+            chunk = chunk.reindex(columns=columns)
+        rows += len(chunk)
+
+        for col, n in chunk.isna().sum().items():
+            null_counts[col] += int(n)
+        for col in columns:
+            present = chunk[col].dropna()
+            if present.empty:
+                continue
+            distinct[col].update(present)
+            if col == label_column:
+                label_sample.extend(present.to_numpy())
+            if not pd.api.types.is_numeric_dtype(present):
+                non_numeric.add(col)
+                if col != label_column and (
+                    pd.api.types.is_string_dtype(present) or present.dtype == object
+                ):
+                    sketch = lengths.setdefault(col, QuantileSketch())
+                    sketch.update(present.str.len())
+
+    distinct_counts = {col: round(hll.estimate()) for col, hll in distinct.items()}
+    error_bounds: Dict[str, Any] = {
+        "confidence": 0.95,
+        "distinct_counts_relative_error": round(Z_95 * HyperLogLog().relative_error, 4),
+        "text_lengths_relative_error": QuantileSketch().relative_accuracy,
+    }
+
+    label_type = None
+    task_type = None
+    class_balance = {}
+    if label_column is not None:
+        label_type = task_type = "classification"
+        if label_column not in non_numeric and distinct_counts[label_column] / max(rows, 1) >= 0.1:
+            label_type = task_type = "regression"
+        else:
+            sampled = pd.Series([_label_key(v) for v in label_sample.items]).value_counts()
+            scale = label_sample.seen / max(len(label_sample.items), 1)
+            class_balance = {str(k): round(int(v) * scale) for k, v in sampled.items()}
+            error_bounds["class_balance_sample_size"] = len(label_sample.items)
+            error_bounds["class_balance"] = {
+                str(k): round(
+                    label_sample.proportion_margin(int(v) / len(label_sample.items))
+                    * label_sample.seen
+                )
+                for k, v in sampled.items()
+            }
+
+    text_columns = []
+    text_lengths = {}
+    for col, sketch in lengths.items():
+        if sketch.mean > _TEXT_MIN_MEAN_CHARS:
+            text_columns.append(col)
+            quantiles = {f"p{round(q * 100)}": sketch.quantile(q) for q in (0.5, 0.9, 0.99)}
+            text_lengths[col] = _length_stats(sketch.mean, quantiles, sketch.max)
+
+    return DatasetProfile(
+        name=file_name,
+        format=file_format,
+        rows=rows,
+        columns=columns,
+        label_column=label_column,
+        label_type=label_type,
+        task_type=task_type or "causal_lm",
+        class_balance=class_balance,
+        missing_values={col: n for col, n in null_counts.items() if n > 0},
+        text_columns=text_columns,
+        numeric_columns=[c for c in columns if c != label_column and c not in non_numeric],
+        size_mb=round(len(file_content) / (1024 * 1024), 2),
+        approximate=True,
+        distinct_counts=distinct_counts,
+        text_lengths=text_lengths,
+        error_bounds=error_bounds,
     )
 
 
@@ -270,43 +533,59 @@ class AdapterMetadata(BaseModel):
 
 def save_adapter(adapter_id: str, adapter_data: Dict[str, Any]) -> AdapterMetadata:
     """Save a LoRA adapter to the hub."""
-    _adapters[adapter_id] = adapter_data
-    return AdapterMetadata(**adapter_data)
+    get_finetuning_store().save_adapter({**adapter_data, "id": adapter_id})
+    return AdapterMetadata(**{**adapter_data, "id": adapter_id})
 
 
 def get_adapter(adapter_id: str) -> Optional[Dict[str, Any]]:
     """Get an adapter by ID."""
-    return _adapters.get(adapter_id)
-
-
-def list_adapters(filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-    """List adapters with optional filters."""
-    adapters = list(_adapters.values())
-
-    if filters:
-        if filters.get("model_id"):
-            adapters = [a for a in adapters if a.get("model_id") == filters["model_id"]]
-        if filters.get("is_public") is not None:
-            adapters = [a for a in adapters if a.get("is_public") == filters["is_public"]]
-
-    return sorted(adapters, key=lambda x: x.get("created_at", ""), reverse=True)
+    return get_finetuning_store().get_adapter(adapter_id)
+
+
+def list_adapters(
+    filters: Dict[str, Any] = None, limit: Optional[int] = None, offset: int = 0
+) -> List[Dict[str, Any]]:
+    """List adapters, newest first, with optional model_id / is_public filters."""
+    adapters, _ = get_finetuning_store().list_adapters(
+        model_id=(filters or {}).get("model_id") or None,
+        is_public=(filters or {}).get("is_public"),
+        limit=limit,
+        offset=offset,
+    )
+    return adapters
 
 
 def version_adapter(adapter_id: str, new_version_data: Dict[str, Any]) -> Optional[AdapterMetadata]:
-    """Create a new version of an adapter."""
-    adapter = _adapters.get(adapter_id)
+    """
+    Create a new version of an adapter, stored under a new id.
+
+    With an ``artifact_id`` (an artifact already in the store, such as the
+    training job that produced the new weights) the new version gets that
+    artifact's files. Without one it reuses the previous version's files.
+    Files are shared in the store either way.
+    """
+    store = get_finetuning_store()
+    adapter = store.get_adapter(adapter_id)
     if not adapter:
         return None
 
     new_version = adapter.get("version", 1) + 1
+    new_version_data = dict(new_version_data)
+    artifact_id = new_version_data.pop("artifact_id", None)
     new_adapter_data = {
         **adapter,
         **new_version_data,
+        "id": str(uuid.uuid4())[:12],
         "version": new_version,
         "created_at": datetime.utcnow().isoformat(),
     }
-    new_id = str(uuid.uuid4())[:12]
-    _adapters[new_id] = new_adapter_data
+    artifacts = get_artifact_store()
+    if artifact_id:
+        if artifacts.link(new_adapter_data["id"], artifact_id, parent=adapter_id) is None:
+            raise ValueError(f"Source artifact not found: {artifact_id}")
+    else:
+        artifacts.link(new_adapter_data["id"], adapter_id)
+    store.save_adapter(new_adapter_data)
     return AdapterMetadata(**new_adapter_data)
 
 
@@ -943,15 +1222,19 @@ def generate_training_notebook(req: NotebookRequest):
     job_id = str(uuid.uuid4())[:12]
     notebook = generate_notebook(req)
 
-    _jobs[job_id] = {
-        "job_id": job_id,
-        "status": "notebook_ready",
-        "model_id": req.model_id,
-        "method": req.method,
-        "platform": req.platform,
-        "created_at": datetime.utcnow().isoformat(),
-        "notebook": notebook,
-    }
+    get_finetuning_store().create_job(
+        {
+            "job_id": job_id,
+            "status": "notebook_ready",
+            "model_id": req.model_id,
+            "method": req.method,
+            "platform": req.platform,
+            "lora_r": req.lora_config.r,
+            "max_seq_length": req.hyperparams.max_seq_length,
+            "created_at": datetime.utcnow().isoformat(),
+            "notebook": notebook,
+        }
+    )
 
     return {
         "job_id": job_id,
@@ -985,11 +1268,10 @@ def download_notebook(job_id: str):
     """Get notebook JSON for download."""
     from fastapi.responses import Response
 
-    job = _jobs.get(job_id)
+    job, notebook = get_finetuning_store().get_notebook(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    notebook = job.get("notebook")
     if not notebook:
         raise HTTPException(status_code=404, detail="Notebook not generated yet")
 
@@ -1116,43 +1398,110 @@ def list_available_models():
 
 
 @router.get("/jobs")
-def list_jobs():
-    """List all fine-tuning jobs."""
-    return {"jobs": [{k: v for k, v in job.items() if k != "notebook"} for job in _jobs.values()]}
+def list_jobs(
+    status: Optional[str] = None,
+    model_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+):
+    """List fine-tuning jobs, newest first, optionally filtered by status and base model."""
+    jobs, total = get_finetuning_store().list_jobs(
+        status=status, model_id=model_id, limit=limit, offset=offset
+    )
+    return {
+        "jobs": jobs,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + len(jobs) if offset + len(jobs) < total else None,
+    }
 
 
 @router.get("/jobs/{job_id}")
 def get_job(job_id: str):
     """Get job status."""
-    job = _jobs.get(job_id)
+    job = get_finetuning_store().get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return {k: v for k, v in job.items() if k != "notebook"}
+    return job
 
 
 @router.delete("/jobs/{job_id}")
 def delete_job(job_id: str):
     """Delete a job."""
-    if job_id not in _jobs:
+    if not get_finetuning_store().delete_job(job_id):
         raise HTTPException(status_code=404, detail="Job not found")
-    del _jobs[job_id]
+    _job_events.discard(job_id)
     return {"deleted": True}
 
 
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, last_event_id: Optional[str] = None):
+    """Server-Sent Events stream of a job's progress updates.
+
+    Starts with a snapshot of the job, then relays each progress update once.
+    """
+    store = get_finetuning_store()
+    if not store.job_exists(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    _prune_finished_logs()
+    stream = stream_event_log(
+        _job_events.get(job_id),
+        snapshot=lambda: store.get_job(job_id) or {},
+        last_event_id=parse_last_event_id(request.headers, last_event_id),
+        is_disconnected=request.is_disconnected,
+    )
+    return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+class EstimateRequest(NotebookRequest):
+    # Dataset size; without it (or a profile) ~500 samples of 256 tokens are assumed
+    dataset_rows: Optional[int] = Field(None, ge=1)
+    avg_tokens_per_sample: Optional[int] = Field(None, ge=1)
+    dataset_profile: Optional[DatasetProfile] = None
+    # GPU name or fingerprint; defaults to the platform's usual GPU
+    hardware: Optional[str] = None
+    model_params_b: Optional[float] = Field(None, gt=0)
+
+
+def _dataset_tokens(req: EstimateRequest) -> tuple:
+    """(rows, tokens per sample, whether either was assumed)."""
+    profile = req.dataset_profile
+    rows = req.dataset_rows or (profile.rows if profile and profile.rows else None)
+    tokens = req.avg_tokens_per_sample
+    if tokens is None and profile and profile.text_lengths:
+        tokens = sum(stats.get("mean_tokens", 0) for stats in profile.text_lengths.values())
+    assumed = not rows or not tokens
+    return rows or 500, int(tokens or 256), assumed
+
+
 @router.post("/estimate")
-def estimate_training_cost(req: NotebookRequest):
-    """Estimate training time and cost for a configuration."""
+def estimate_training_cost(req: EstimateRequest):
+    """Estimate training time and cost for a configuration.
+
+    Throughput comes from the calibration store (measured jobs, manual samples or
+    CPU micro-benchmarks for the same model, LoRA rank, sequence length and
+    hardware), with a 95% interval that widens as the match gets looser.
+    """
     hp = req.hyperparams
     eff_batch = hp.batch_size * hp.gradient_accumulation_steps
 
-    # Very rough estimates (tokens/sec on T4 GPU)
-    tokens_per_sec = {"qlora": 800, "lora": 600, "full_ft": 300}.get(req.method, 600)
+    hardware = req.hardware or PLATFORM_HARDWARE.get(req.platform) or hardware_fingerprint()
+    throughput = get_throughput_calibration().estimate(
+        req.model_id,
+        req.method,
+        req.lora_config.r,
+        hp.max_seq_length,
+        hardware,
+        params_b=req.model_params_b,
+    )
 
-    # Assume ~500 training samples, average 256 tokens
-    assumed_samples = 500
-    tokens_per_epoch = assumed_samples * min(hp.max_seq_length, 256)
+    rows, tokens_per_sample, assumed_dataset = _dataset_tokens(req)
+    tokens_per_epoch = rows * min(hp.max_seq_length, tokens_per_sample)
     total_tokens = tokens_per_epoch * hp.epochs
-    estimated_secs = total_tokens / tokens_per_sec
+    estimated_secs = total_tokens / throughput.tokens_per_sec
+    secs_range = (total_tokens / throughput.high, total_tokens / throughput.low)
 
     # Colab T4 free tier: 12h/day
     colab_hours_used = estimated_secs / 3600
@@ -1162,6 +1511,7 @@ def estimate_training_cost(req: NotebookRequest):
         vram_needed = max(6, req.model_vram_gb // 4)
     elif req.method == "lora":
         vram_needed = max(8, req.model_vram_gb // 2)
+    hourly_cost = 0 if vram_needed <= 15 else 0.5
 
     return {
         "estimated_time_minutes": round(estimated_secs / 60, 1),
@@ -1169,7 +1519,15 @@ def estimate_training_cost(req: NotebookRequest):
         "fits_colab_t4": vram_needed <= 15,
         "fits_colab_a100": vram_needed <= 40,
         "colab_free_hours_used": round(colab_hours_used, 2),
-        "estimated_cost_usd": 0 if vram_needed <= 15 else round(colab_hours_used * 0.5, 2),
+        "estimated_cost_usd": round(colab_hours_used * hourly_cost, 2),
+        "confidence_interval": {
+            "level": 0.95,
+            "time_minutes": [round(secs / 60, 1) for secs in secs_range],
+            "cost_usd": [round(secs / 3600 * hourly_cost, 2) for secs in secs_range],
+        },
+        "throughput": throughput.to_dict(),
+        "total_tokens": total_tokens,
+        "assumed_dataset": assumed_dataset,
         "recommendation": (
             "✅ Fits Colab T4 FREE tier"
             if vram_needed <= 15
@@ -1186,6 +1544,90 @@ def estimate_training_cost(req: NotebookRequest):
     }
 
 
+# ─── Throughput Calibration API ──────────────────────────────────────────────
+
+
+class CalibrationSample(BaseModel):
+    model_id: str
+    method: Literal["lora", "qlora", "full_ft"] = "qlora"
+    lora_r: int = Field(16, ge=1, le=1024)
+    seq_len: int = Field(2048, ge=1)
+    hardware: str = Field(..., description="GPU name (e.g. 'Tesla T4') or fingerprint")
+    tokens_per_sec: float = Field(..., gt=0)
+    params_b: Optional[float] = Field(None, gt=0)
+    job_id: Optional[str] = None
+
+
+class CalibrationBenchmarkRequest(BaseModel):
+    model_id: str
+    method: Literal["lora", "qlora", "full_ft"] = "qlora"
+    lora_r: int = Field(16, ge=1, le=1024)
+    seq_len: int = Field(2048, ge=1)
+    params_b: Optional[float] = Field(None, gt=0)
+    seconds: float = Field(0.5, gt=0, le=5)
+
+
+@router.post("/calibration/samples")
+def record_calibration_sample(sample: CalibrationSample):
+    """Record a measured training throughput (e.g. posted by a finished notebook)."""
+    source = "job" if sample.job_id else "manual"
+    return get_throughput_calibration().record(**sample.model_dump(), source=source)
+
+
+@router.get("/calibration/samples")
+def list_calibration_samples(
+    hardware: Optional[str] = None,
+    method: Optional[str] = None,
+    model_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Most recent throughput samples, newest first."""
+    samples = get_throughput_calibration().samples(hardware, method, model_id, limit=limit)
+    return {"samples": samples, "hardware": hardware_fingerprint()}
+
+
+@router.post("/calibration/benchmark")
+def run_calibration_benchmark(req: CalibrationBenchmarkRequest):
+    """Time a short matmul micro-benchmark on this machine's CPU and record the result."""
+    params_b = req.params_b or params_from_model_id(req.model_id)
+    if not params_b:
+        raise HTTPException(status_code=400, detail="params_b is required for this model_id")
+    flops = run_cpu_benchmark(seconds=req.seconds)
+    return get_throughput_calibration().record(
+        req.model_id,
+        req.method,
+        req.lora_r,
+        req.seq_len,
+        hardware_fingerprint(),
+        benchmark_tokens_per_sec(flops, params_b, req.method),
+        params_b=params_b,
+        source="benchmark",
+    ) | {"gflops": round(flops / 1e9, 1)}
+
+
+def _record_job_throughput(job: Dict[str, Any], progress_data: Dict[str, Any]) -> None:
+    """Calibrate from a completed job that reported its throughput and hardware."""
+    tokens_per_sec = progress_data.get("tokens_per_sec") or progress_data.get(
+        "train_tokens_per_second"
+    )
+    hardware = (
+        progress_data.get("hardware")
+        or progress_data.get("gpu_name")
+        or PLATFORM_HARDWARE.get(job.get("platform"))
+    )
+    if not hardware or not job.get("model_id"):
+        return
+    record_job_throughput(
+        job.get("job_id"),
+        job["model_id"],
+        job.get("method", "qlora"),
+        job.get("lora_r", 16),
+        job.get("max_seq_length", 2048),
+        tokens_per_sec,
+        hardware,
+    )
+
+
 # ─── LoRA Auto-Tuning API ────────────────────────────────────────────────────
 
 
@@ -1227,12 +1669,14 @@ async def convert_dataset(
 
 
 @router.post("/dataset/profile")
-async def profile_dataset_endpoint(file: UploadFile = File(...), file_format: str = "csv"):
+async def profile_dataset_endpoint(
+    file: UploadFile = File(...), file_format: str = "csv", approximate: Optional[bool] = None
+):
     """Profile a dataset to extract columns, task type, class balance for AI notebook generation."""
     content = await file.read()
 
     try:
-        profile = profile_dataset(content, file_format, file.filename)
+        profile = profile_dataset(content, file_format, file.filename, approximate=approximate)
         return profile.model_dump()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1246,18 +1690,25 @@ def create_adapter(adapter: AdapterMetadata):
     """Save a new LoRA adapter to the hub."""
     adapter_data = adapter.model_dump()
     adapter_data["created_at"] = datetime.utcnow().isoformat()
-    _adapters[adapter.id] = adapter_data
+    get_finetuning_store().save_adapter(adapter_data)
     return {"success": True, "adapter_id": adapter.id}
 
 
 @router.get("/adapters")
-def list_adapter_hub(model_id: str = None, include_public: bool = True):
-    """List saved LoRA adapters."""
-    filters = {"model_id": model_id} if model_id else {}
-    if not include_public:
-        filters["is_public"] = False
-    adapters = list_adapters(filters)
-    return {"adapters": adapters, "count": len(adapters)}
+def list_adapter_hub(
+    model_id: str = None,
+    include_public: bool = True,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+):
+    """List saved LoRA adapters, newest first."""
+    adapters, total = get_finetuning_store().list_adapters(
+        model_id=model_id or None,
+        is_public=None if include_public else False,
+        limit=limit,
+        offset=offset,
+    )
+    return {"adapters": adapters, "count": len(adapters), "total": total, "offset": offset}
 
 
 @router.get("/adapters/{adapter_id}")
@@ -1272,22 +1723,75 @@ def get_adapter_hub(adapter_id: str):
 @router.put("/adapters/{adapter_id}/version")
 def version_adapter_endpoint(adapter_id: str, update_data: Dict[str, Any]):
     """Create a new version of an adapter."""
-    adapter = version_adapter(adapter_id, update_data)
+    try:
+        adapter = version_adapter(adapter_id, update_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not adapter:
         raise HTTPException(status_code=404, detail="Adapter not found")
     return {"success": True, "adapter": adapter.model_dump()}
 
 
+class AdapterArtifactsRequest(BaseModel):
+    # An artifact already in the store (a training job's id) to share files with.
+    # Directories are only ingested by the training worker, never from a request.
+    from_artifact: str
+
+
+@router.post("/adapters/{adapter_id}/artifacts")
+def upload_adapter_artifacts(adapter_id: str, req: AdapterArtifactsRequest):
+    """Give an adapter the files of a stored artifact (e.g. its training job); nothing is copied."""
+    if not get_adapter(adapter_id):
+        raise HTTPException(status_code=404, detail="Adapter not found")
+    try:
+        manifest = get_artifact_store().link(adapter_id, req.from_artifact)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Source artifact not found")
+    return {"success": True, "manifest": manifest}
+
+
+@router.get("/adapters/{adapter_id}/manifest")
+def get_adapter_manifest(adapter_id: str):
+    """Files of an adapter version with their SHA-256 digests and sizes."""
+    manifest = get_artifact_store().manifest(adapter_id) if get_adapter(adapter_id) else None
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Adapter artifacts not found")
+    return manifest
+
+
+@router.get("/adapters/{adapter_id}/download")
+def download_adapter(adapter_id: str):
+    """Stream an adapter version as a zip assembled from the artifact store."""
+    adapter = get_adapter(adapter_id)
+    chunks = get_artifact_store().stream_zip(adapter_id) if adapter else None
+    if chunks is None:
+        raise HTTPException(status_code=404, detail="Adapter artifacts not found")
+    get_finetuning_store().update_adapter(
+        adapter_id, download_count=adapter.get("download_count", 0) + 1
+    )
+    filename = f"{adapter.get('name') or adapter_id}-v{adapter.get('version', 1)}.zip"
+    return StreamingResponse(
+        chunks,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/artifacts/stats")
+def artifact_store_stats():
+    """Bytes referenced by all adapter manifests vs bytes stored after deduplication."""
+    return get_artifact_store().stats()
+
+
 @router.post("/adapters/{adapter_id}/share")
 def share_adapter(adapter_id: str, make_public: bool = True):
     """Toggle public/private sharing of an adapter."""
-    adapter = _adapters.get(adapter_id)
+    adapter = get_finetuning_store().update_adapter(adapter_id, is_public=make_public)
     if not adapter:
         raise HTTPException(status_code=404, detail="Adapter not found")
 
-    adapter["is_public"] = make_public
-    _adapters[adapter_id] = adapter
-
     return {
         "success": True,
         "is_public": make_public,
@@ -1298,14 +1802,47 @@ def share_adapter(adapter_id: str, make_public: bool = True):
 # ─── Training Progress WebSocket API ─────────────────────────────────────────
 
 
+def _replay_job_events(websocket: WebSocket, job_id: str, last_seq: int) -> None:
+    """Queue one "replay" frame with every buffered event after last_seq.
+
+    Runs on the event loop between live publishes, and the session skips any live
+    event at or below the seq replayed here, so clients see each event exactly once
+    and in order. An explicit subscribe replays from the last_seq it asks for, even
+    events already sent on this connection (the client may have dropped them). When
+    last_seq has already been evicted the frame is marked as a gap and carries a job
+    snapshot instead of the missing events.
+    """
+    session = _progress_hub.session(websocket)
+    if session is None:
+        return
+    log = _job_events.get(job_id)
+    events, gap = log.since(last_seq)
+    frame: Dict[str, Any] = {
+        "type": "replay",
+        "job_id": job_id,
+        "events": [{**event.data, "seq": event.seq} for event in events],
+        "gap": gap,
+        "last_seq": log.last_seq,
+    }
+    if gap:
+        frame["snapshot"] = get_finetuning_store().get_job(job_id) or {}
+    session.enqueue(frame)
+    if log.last_seq > (session.last_seq or 0):
+        session.last_seq = log.last_seq
+
+
 @router.websocket("/ws/training/{job_id}")
-async def training_progress_websocket(websocket: WebSocket, job_id: str):
-    """WebSocket endpoint for real-time training progress streaming."""
-    await websocket.accept()
+async def training_progress_websocket(websocket: WebSocket, job_id: str, last_seq: int = 0):
+    """WebSocket endpoint for real-time training progress streaming.
 
-    if job_id not in _active_connections:
-        _active_connections[job_id] = []
-    _active_connections[job_id].append(websocket)
+    Every connection first gets a replay of the job's buffered events after
+    last_seq (0 = everything still buffered), then live events, each carrying its
+    seq. Reconnecting clients pass the last seq they saw to resume without gaps;
+    a later {"type": "subscribe", "last_seq": n} message replays again from n.
+    """
+    _prune_finished_logs()
+    await _progress_hub.connect(websocket, job_id)
+    _replay_job_events(websocket, job_id, last_seq)
 
     try:
         while True:
@@ -1315,55 +1852,185 @@ async def training_progress_websocket(websocket: WebSocket, job_id: str):
 
             if message.get("type") == "subscribe":
                 # Client subscribing to updates
-                await websocket.send_json(
+                if "last_seq" in message:
+                    _replay_job_events(websocket, job_id, int(message["last_seq"]))
+                _progress_hub.send_to(
+                    websocket,
                     {
                         "type": "subscribed",
                         "job_id": job_id,
                         "message": "Now receiving training updates",
-                    }
+                        "last_seq": _job_events.get(job_id).last_seq,
+                    },
                 )
 
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        if job_id in _active_connections:
-            _active_connections[job_id] = [w for w in _active_connections[job_id] if w != websocket]
+        _progress_hub.disconnect(websocket, job_id)
 
 
 async def broadcast_training_progress(job_id: str, progress_data: Dict[str, Any]):
-    """Broadcast training progress to all connected clients."""
-    if job_id in _active_connections:
-        for websocket in _active_connections[job_id]:
-            try:
-                await websocket.send_json(progress_data)
-            except:
-                pass
+    """Broadcast training progress to all connected clients.
+
+    Only enqueues: each client's writer task drains its own queue, and queued
+    progress snapshots for the same job are coalesced to the latest one. The event
+    is numbered in this worker's job log and the backplane carries that seq to
+    clients and logs on other workers.
+    """
+    log = _job_events.get(job_id)
+    event = log.append(progress_data.get("type", "progress"), progress_data)
+    status = progress_data.get("status")
+    if status:
+        # Persisted, so /jobs and other workers see the job's latest status
+        job = await asyncio.to_thread(get_finetuning_store().update_job, job_id, status=status)
+        if job and status == "completed":
+            await asyncio.to_thread(_record_job_throughput, job, progress_data)
+    if status in TERMINAL_JOB_STATUSES:
+        log.close()
+    _prune_finished_logs()
+    await get_backplane().publish("finetuning", job_id, {**progress_data, "seq": event.seq})
 
 
 # ─── Model Comparison API ───────────────────────────────────────────────────
 
 
+COMPARE_MAX_EXAMPLES = 500
+EVAL_PROMPT_COLUMNS = ("prompt", "input", "instruction", "question", "text")
+EVAL_REFERENCE_COLUMNS = ("reference", "output", "response", "answer", "label", "completion")
+EVAL_FILE_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl", ".parquet": "parquet"}
+# benchmark_dataset names a file in this directory; nothing outside it is read
+EVAL_DATASET_DIR = os.environ.get("EVAL_DATASET_DIR", "./eval_datasets")
+# Hub or local adapters that may be compared besides Adapter Hub ids (comma-separated)
+EVAL_ADAPTER_ALLOWLIST = frozenset(
+    ref.strip() for ref in os.environ.get("EVAL_ADAPTER_ALLOWLIST", "").split(",") if ref.strip()
+)
+
+
 class ModelComparisonRequest(BaseModel):
     base_model_id: str
     fine_tuned_model_id: str
-    benchmark_dataset: str
+    benchmark_dataset: str = ""
     metrics: List[str] = ["accuracy", "f1", "perplexity"]
+    # Further adapters evaluated against the same base model and examples
+    adapters: List[str] = []
+    # Inline evaluation set; otherwise benchmark_dataset names a csv/jsonl/parquet file
+    # in EVAL_DATASET_DIR
+    examples: List[EvalExample] = []
+    max_examples: int = Field(default=200, ge=1, le=COMPARE_MAX_EXAMPLES)
+    batch_size: int = Field(default=DEFAULT_BATCH_SIZE, ge=1, le=64)
+    max_new_tokens: int = Field(default=DEFAULT_MAX_NEW_TOKENS, ge=1, le=512)
+    device: str = "cpu"
+
+
+def _resolve_adapter(adapter_ref: str) -> str:
+    """Adapter Hub ids resolve to a checkout of their stored files; other refs must be allow-listed.
+
+    A Hub entry's model_id names the base model the adapter was trained on, so
+    it cannot be loaded as the adapter itself.
+    """
+    if get_adapter(adapter_ref) is None:
+        if adapter_ref not in EVAL_ADAPTER_ALLOWLIST:
+            raise ValueError(f"Unknown adapter {adapter_ref}; use an Adapter Hub id")
+        return adapter_ref
+    checkout = get_artifact_store().checkout(adapter_ref)
+    if checkout is None:
+        raise ValueError(f"Adapter {adapter_ref} has no stored artifacts")
+    return str(checkout)
+
+
+def _load_eval_examples(dataset: str, limit: int) -> List[EvalExample]:
+    if not dataset:
+        return []
+    root = Path(EVAL_DATASET_DIR).resolve()
+    path = (root / dataset).resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"Benchmark dataset must be a file in {EVAL_DATASET_DIR}: {dataset}")
+    if not path.is_file():
+        return []
+    file_format = EVAL_FILE_FORMATS.get(path.suffix.lower())
+    if file_format is None:
+        raise ValueError(f"Unsupported benchmark dataset format: {path.suffix}")
+    examples: List[EvalExample] = []
+    for chunk in _read_dataset_chunks(path.read_bytes(), file_format, PROFILE_CHUNK_ROWS):
+        prompt = next((c for c in EVAL_PROMPT_COLUMNS if c in chunk.columns), None)
+        if prompt is None:
+            raise ValueError(f"No prompt column in {path.name}; expected {EVAL_PROMPT_COLUMNS}")
+        reference = next((c for c in EVAL_REFERENCE_COLUMNS if c in chunk.columns), None)
+        for row in chunk.head(limit - len(examples)).itertuples(index=False):
+            row = row._asdict()
+            examples.append(
+                EvalExample(
+                    prompt=str(row[prompt]),
+                    reference="" if reference is None else str(row[reference]),
+                )
+            )
+        if len(examples) >= limit:
+            break
+    return examples
 
 
 @router.post("/compare")
 def compare_models(req: ModelComparisonRequest):
-    """Compare base model vs fine-tuned model on benchmarks."""
-    # This would typically run actual inference on benchmark data
-    # For now, return a comparison template
+    """
+    Compare the base model with one or more LoRA adapters on a shared evaluation set.
+
+    The base model is loaded once and adapters are hot-swapped onto it; base
+    outputs are cached across calls. Without examples, or without the optional
+    torch/transformers/peft stack, the comparison template is returned instead.
+    """
+    try:
+        examples = req.examples[: req.max_examples] or _load_eval_examples(
+            req.benchmark_dataset, req.max_examples
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not HAS_EVAL_DEPS or not examples:
+        return {
+            "base_model": {"id": req.base_model_id, "metrics": {m: None for m in req.metrics}},
+            "fine_tuned_model": {
+                "id": req.fine_tuned_model_id,
+                "metrics": {m: None for m in req.metrics},
+            },
+            "improvement": {},
+            "benchmark_dataset": req.benchmark_dataset,
+            "status": "ready_for_benchmark",
+            "harness": {
+                "available": HAS_EVAL_DEPS,
+                "reason": (
+                    "no evaluation examples" if HAS_EVAL_DEPS else "torch, transformers and peft "
+                    "are required to run the comparison"
+                ),
+            },
+        }
+
+    candidates = list(dict.fromkeys([req.fine_tuned_model_id, *req.adapters]))
+    try:
+        harness = get_eval_harness(
+            req.base_model_id, req.device, req.batch_size, req.max_new_tokens
+        )
+        report = harness.compare(
+            examples, [_resolve_adapter(ref) for ref in candidates], req.metrics
+        )
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Comparison failed: {e}")
+
+    for ref, result in zip(candidates, report["adapters"]):
+        result["id"] = ref
+    fine_tuned = report["adapters"][0]
     return {
-        "base_model": {"id": req.base_model_id, "metrics": {m: None for m in req.metrics}},
-        "fine_tuned_model": {
-            "id": req.fine_tuned_model_id,
-            "metrics": {m: None for m in req.metrics},
-        },
-        "improvement": {},
+        "base_model": {"id": req.base_model_id, **report["base"]},
+        "fine_tuned_model": fine_tuned,
+        "improvement": fine_tuned["improvement"],
+        "adapters": report["adapters"],
         "benchmark_dataset": req.benchmark_dataset,
-        "status": "ready_for_benchmark",
+        "examples": report["examples"],
+        "batch_size": report["batch_size"],
+        "max_new_tokens": report["max_new_tokens"],
+        "device": report["device"],
+        "elapsed_seconds": report["elapsed_seconds"],
+        "status": "completed",
     }
 
 
@@ -0,0 +1,348 @@
+"""
+Persistent store for fine-tuning jobs and Adapter Hub entries
+
+Jobs and adapters live in a small SQLite file instead of module-level dicts, so
+they survive restarts. Every API worker opened on the same file sees the same
+jobs. Listing is paginated and filtered in SQL, on indexes over status, base
+model and created_at, instead of sorting everything in Python.
+
+Each table has a change counter. Triggers bump it, so writes from any worker or
+connection count. The /jobs ETag is computed from these counters, and one worker's
+change invalidates the ETags every worker hands out.
+
+A job's notebook is stored in its own column and only read by get_notebook(),
+so listings and status polls never load it.
+
+Finished jobs are kept. Only their in-memory event logs expire, in
+agent.finetuning_service.
+
+Configuration: FINETUNING_DB_PATH.
+"""
+
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_JOB_STATUSES = ("completed", "failed", "cancelled")
+VERSIONED_TABLES = ("finetuning_jobs", "finetuning_adapters")
+MAX_PAGE_SIZE = 500
+
+_SCHEMA = """
+-- Filtered and sorted columns are real columns; everything else lives in the data JSON
+CREATE TABLE IF NOT EXISTS finetuning_jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    model_id TEXT,
+    method TEXT,
+    platform TEXT,
+    created_at TEXT NOT NULL,
+    finished_at TEXT,
+    data TEXT NOT NULL,
+    notebook TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_finetuning_jobs_status ON finetuning_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_finetuning_jobs_model ON finetuning_jobs(model_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_finetuning_jobs_created ON finetuning_jobs(created_at);
+
+CREATE TABLE IF NOT EXISTS finetuning_adapters (
+    id TEXT PRIMARY KEY,
+    model_id TEXT,
+    is_public INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_finetuning_adapters_model
+    ON finetuning_adapters(model_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_finetuning_adapters_public
+    ON finetuning_adapters(is_public, created_at);
+CREATE INDEX IF NOT EXISTS idx_finetuning_adapters_created ON finetuning_adapters(created_at);
+
+CREATE TABLE IF NOT EXISTS store_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _page(limit: Optional[int], offset: int) -> Tuple[int, int]:
+    limit = MAX_PAGE_SIZE if limit is None else max(0, min(int(limit), MAX_PAGE_SIZE))
+    return limit, max(0, int(offset))
+
+
+def _where(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class FinetuningStore:
+    """SQLite-backed jobs and adapters, shared by every worker using the same path."""
+
+    def __init__(self, path: str = "finetuning.db"):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FinetuningStore":
+        return cls(path=os.environ.get("FINETUNING_DB_PATH", "finetuning.db"))
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None, timeout=10
+            )
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Random per-database epoch so counters restarting on a fresh file never
+            # repeat an ETag (same scheme as ui.database.table_versions)
+            conn.execute(
+                "INSERT OR IGNORE INTO store_versions (table_name, version) "
+                "VALUES ('__epoch__', ?)",
+                (secrets.randbits(62),),
+            )
+            for table in VERSIONED_TABLES:
+                for event in ("INSERT", "UPDATE", "DELETE"):
+                    conn.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                        AFTER {event} ON {table}
+                        BEGIN
+                            INSERT INTO store_versions (table_name, version) VALUES ('{table}', 1)
+                            ON CONFLICT(table_name) DO UPDATE SET version = version + 1;
+                        END
+                    """)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params=()) -> int:
+        """Run a write; returns the number of rows changed."""
+        with self._lock:
+            return max(self._connection().execute(sql, params).rowcount, 0)
+
+    def _fetchone(self, sql: str, params=()) -> Optional[tuple]:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchone()
+
+    def versions(self, *tables: str) -> Tuple[int, ...]:
+        """(epoch, change counter per table); one primary-key lookup."""
+        names = ("__epoch__",) + tables
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT table_name, version FROM store_versions "
+                f"WHERE table_name IN ({','.join('?' * len(names))})",
+                names,
+            ).fetchall()
+        found = dict(rows)
+        return tuple(found.get(name, 0) for name in names)
+
+    # ─── Jobs ────────────────────────────────────────────────────────────────
+
+    def create_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a job; its "notebook" field is stored apart from the rest."""
+        data = {k: v for k, v in job.items() if k != "notebook"}
+        notebook = job.get("notebook")
+        self._execute(
+            "INSERT INTO finetuning_jobs "
+            "(job_id, status, model_id, method, platform, created_at, data, notebook) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                data["job_id"],
+                data.get("status", "pending"),
+                data.get("model_id"),
+                data.get("method"),
+                data.get("platform"),
+                data.get("created_at") or datetime.utcnow().isoformat(),
+                json.dumps(data, default=str),
+                json.dumps(notebook) if notebook is not None else None,
+            ),
+        )
+        return data
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job without its notebook, or None."""
+        row = self._fetchone(
+            "SELECT data FROM finetuning_jobs WHERE job_id = ?", (job_id,)
+        )
+        return json.loads(row[0]) if row else None
+
+    def get_notebook(self, job_id: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """(job, notebook) for a download; (None, None) for an unknown job."""
+        row = self._fetchone(
+            "SELECT data, notebook FROM finetuning_jobs WHERE job_id = ?", (job_id,)
+        )
+        if row is None:
+            return None, None
+        return json.loads(row[0]), json.loads(row[1]) if row[1] else None
+
+    def job_exists(self, job_id: str) -> bool:
+        row = self._fetchone(
+            "SELECT 1 FROM finetuning_jobs WHERE job_id = ?", (job_id,)
+        )
+        return row is not None
+
+    def update_job(self, job_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        """Merge fields into a job; returns the updated job, or None if it doesn't exist."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT data FROM finetuning_jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                data = {**json.loads(row[0]), **fields, "job_id": job_id}
+                status = data.get("status", "pending")
+                finished_at = None
+                if status in TERMINAL_JOB_STATUSES:
+                    finished_at = data.setdefault("finished_at", datetime.utcnow().isoformat())
+                conn.execute(
+                    "UPDATE finetuning_jobs SET status = ?, finished_at = ?, data = ? "
+                    "WHERE job_id = ?",
+                    (status, finished_at, json.dumps(data, default=str), job_id),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return data
+
+    def delete_job(self, job_id: str) -> bool:
+        return self._execute("DELETE FROM finetuning_jobs WHERE job_id = ?", (job_id,)) > 0
+
+    def list_jobs(
+        self,
+        status: Optional[str] = None,
+        model_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """(one page of jobs, newest first, without notebooks; total matching jobs)."""
+        limit, offset = _page(limit, offset)
+        where, params = _where({"status": status, "model_id": model_id})
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM finetuning_jobs{where}", params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT data FROM finetuning_jobs{where} "
+                f"ORDER BY created_at DESC, job_id DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows], total
+
+    # ─── Adapters ────────────────────────────────────────────────────────────
+
+    def save_adapter(self, adapter: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert or replace an adapter by id."""
+        self._execute(
+            "INSERT OR REPLACE INTO finetuning_adapters "
+            "(id, model_id, is_public, created_at, data) VALUES (?, ?, ?, ?, ?)",
+            (
+                adapter["id"],
+                adapter.get("model_id"),
+                int(bool(adapter.get("is_public"))),
+                adapter.get("created_at") or datetime.utcnow().isoformat(),
+                json.dumps(adapter, default=str),
+            ),
+        )
+        return adapter
+
+    def get_adapter(self, adapter_id: str) -> Optional[Dict[str, Any]]:
+        row = self._fetchone(
+            "SELECT data FROM finetuning_adapters WHERE id = ?", (adapter_id,)
+        )
+        return json.loads(row[0]) if row else None
+
+    def update_adapter(self, adapter_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT data FROM finetuning_adapters WHERE id = ?", (adapter_id,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                data = {**json.loads(row[0]), **fields}
+                conn.execute(
+                    "UPDATE finetuning_adapters SET model_id = ?, is_public = ?, data = ? "
+                    "WHERE id = ?",
+                    (
+                        data.get("model_id"),
+                        int(bool(data.get("is_public"))),
+                        json.dumps(data, default=str),
+                        adapter_id,
+                    ),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return data
+
+    def list_adapters(
+        self,
+        model_id: Optional[str] = None,
+        is_public: Optional[bool] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """(one page of adapters, newest first; total matching adapters)."""
+        limit, offset = _page(limit, offset)
+        where, params = _where(
+            {"model_id": model_id, "is_public": None if is_public is None else int(is_public)}
+        )
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM finetuning_adapters{where}", params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT data FROM finetuning_adapters{where} "
+                f"ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows], total
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store: Optional[FinetuningStore] = None
+_store_lock = threading.Lock()
+
+
+def get_finetuning_store() -> FinetuningStore:
+    """Process-wide store configured from the environment."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FinetuningStore.from_env()
+    return _store
+
+
+__all__ = [
+    "FinetuningStore",
+    "get_finetuning_store",
+    "TERMINAL_JOB_STATUSES",
+    "MAX_PAGE_SIZE",
+]
@@ -1,21 +1,18 @@
 """
 Groq Service - AI-powered pipeline explanations using Groq API
+Calls go through the shared pooled client in agent.llm_client.
 """
 
 import os
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any
 
-logger = logging.getLogger(__name__)
+from agent.llm_client import LLMResponse, get_llm_client, user_message
 
-try:
-    from groq import Groq
+logger = logging.getLogger(__name__)
 
-    HAS_GROQ = True
-except ImportError:
-    HAS_GROQ = False
-    Groq = None
+EXPLAIN_MODEL = "llama-3.3-70b-versatile"
 
 
 class GroqExplainAgent:
@@ -23,23 +20,9 @@ class GroqExplainAgent:
 
     def __init__(self, api_key: str):
         self.api_key = api_key
-        self.client = None
-        if HAS_GROQ and api_key:
-            try:
-                self.client = Groq(api_key=api_key)
-            except Exception as e:
-                logger.warning(f"Failed to initialize Groq client: {e}")
-
-    def explain(
-        self,
-        pipeline_dsl: Dict[str, Any],
-        audience: str = "product_manager",
-        explain_level: str = "executive",
-    ) -> Dict[str, Any]:
-        """Explain a pipeline design with structured output."""
-        if not self.client:
-            return self._stub_explanation(pipeline_dsl, audience, explain_level)
+        self.llm = get_llm_client()
 
+    def _request_kwargs(self, pipeline_dsl: Dict[str, Any], audience: str) -> Dict[str, Any]:
         prompt = f"""You are an ML pipeline explainer. Given this pipeline configuration, explain it for a {audience} audience.
 
 Pipeline: {json.dumps(pipeline_dsl, indent=2)}
@@ -52,18 +35,65 @@ Return ONLY valid JSON with these exact fields:
   "deployment_readiness": {{"status": "ready|not_ready", "blockers": [], "next_steps": []}},
   "ui_blocks": {{"pipeline_graph": true, "cost_meter": true, "carbon_meter": true, "risk_panel": true, "approval_panel": false}}
 }}"""
+        return {
+            "backend": "groq",
+            "messages": user_message(prompt),
+            "model": EXPLAIN_MODEL,
+            "temperature": 0.2,
+            "max_tokens": 2000,
+            "json_mode": True,
+            "api_key": self.api_key,
+        }
+
+    def _parse(self, response: LLMResponse) -> Dict[str, Any]:
+        try:
+            result = json.loads(response.text)
+        except ValueError:
+            self.llm.forget(response)
+            raise
+        result["model_used"] = EXPLAIN_MODEL
+        result["cached"] = response.cached
+        return result
+
+    def explain(
+        self,
+        pipeline_dsl: Dict[str, Any],
+        audience: str = "product_manager",
+        explain_level: str = "executive",
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """Explain a pipeline design with structured output.
+
+        Repeat explanations come from the LLM response cache unless use_cache=False.
+        """
+        if not self.api_key:
+            return self._stub_explanation(pipeline_dsl, audience, explain_level)
+
+        try:
+            response = self.llm.chat_sync(
+                **self._request_kwargs(pipeline_dsl, audience), cache=None if use_cache else False
+            )
+            return self._parse(response)
+        except Exception as e:
+            logger.error(f"Groq API error: {e}")
+            return self._stub_explanation(pipeline_dsl, audience, explain_level)
+
+    async def aexplain(
+        self,
+        pipeline_dsl: Dict[str, Any],
+        audience: str = "product_manager",
+        explain_level: str = "executive",
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """explain() for async callers; does not tie up a worker thread while waiting."""
+        if not self.api_key:
+            return self._stub_explanation(pipeline_dsl, audience, explain_level)
 
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=2000,
-                response_format={"type": "json_object"},
+            response = await self.llm.chat(
+                **self._request_kwargs(pipeline_dsl, audience), cache=None if use_cache else False
             )
-            result = json.loads(response.choices[0].message.content)
-            result["model_used"] = "llama-3.3-70b-versatile"
-            return result
+            return self._parse(response)
         except Exception as e:
             logger.error(f"Groq API error: {e}")
             return self._stub_explanation(pipeline_dsl, audience, explain_level)
@@ -89,4 +119,4 @@ Return ONLY valid JSON with these exact fields:
     def is_available() -> bool:
         """Check if Groq is available and configured."""
         api_key = os.environ.get("GROQ_API_KEY", "")
-        return HAS_GROQ and bool(api_key)
+        return bool(api_key)
@@ -0,0 +1,291 @@
+"""
+Single-pass JSON extraction from LLM output
+
+Model responses wrap their JSON in prose and Markdown fences, add trailing commas
+and get cut off by max_tokens. extract_json() recovers the document in one linear
+scan instead of a cascade of rfind/regex passes and repeated json.loads attempts:
+
+    design = extract_json(text, accept=lambda d: isinstance(d, dict) and "pipeline" in d)
+
+Each top-level span is first decoded in place by the C scanner, so well-formed
+output costs one parse. Only a span that fails is scanned in Python, and complete
+values nested inside it are again handed to the C scanner. The Python scan hops
+between structural tokens with one compiled regex. It tracks strings, so braces
+inside them do not count, and the stack of open brackets. It yields every
+balanced top-level span as a candidate, and each candidate is parsed at most once.
+Trailing commas are dropped on the way. If the text ends inside a span, the span
+is cut back to its last complete value and its open brackets are closed. The
+repair is deterministic and never invents a value. Callers whose elements are
+only useful whole (pipeline stages, notebook cells) pass complete_depth: a
+container left open deeper than that is dropped entirely instead of being closed
+half-received:
+
+    extract_json('{"cells": [{"source": "a"}, {"source": "b', complete_depth=2)
+    # {"cells": [{"source": "a"}]}
+
+Nesting too deep for the C scanner is treated like any other unparsable span.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+# Between top-level spans only an opening bracket that can start JSON matters:
+# prose like "{name}" is skipped without a decode attempt
+_OPENER = re.compile(r'[{\[](?=\s*(?:["{}\[\]\-0-9tfn]|$))')
+# One token inside a span: a string (closing quote captured separately, so an
+# unterminated string is recognisable), a structural character, or a bare scalar
+_TOKEN = re.compile(
+    r'\s*(?:(?P<string>"(?:[^"\\]+|\\.)*(?P<closed>")?)'
+    r"|(?P<punct>[{}\[\],:])"
+    r'|(?P<scalar>[^\s{}\[\],:"]+))',
+    re.S,
+)
+_CLOSERS = {"{": "}", "[": "]"}
+_DECODER = json.JSONDecoder(strict=False)
+# The decoder's scanner: (value, end), or StopIteration/JSONDecodeError on failure
+# (RecursionError on very deep nesting)
+_scan_once = _DECODER.scan_once
+_SCAN_ERRORS = (StopIteration, ValueError, RecursionError)
+# Nested values are handed to the C scanner this deep; a failed attempt costs a
+# pass over the value, so this bounds the extra work on a truncated spine
+_FAST_DEPTH = 8
+_UNPARSED = object()
+
+# Scanner states: what the innermost container expects next
+_KEY = 0  # an object key (or "}")
+_COLON = 1
+_VALUE = 2  # a value (or "]" right after "[")
+_AFTER = 3  # "," or the closing bracket
+
+
+@dataclass
+class JSONCandidate:
+    """A balanced (or repaired) span of the input, ready for json.loads."""
+
+    start: int
+    end: int
+    text: str
+    truncated: bool = False  # input ended inside the span; closed after its last value
+    repaired: bool = False  # trailing commas dropped and/or brackets closed
+    value: Any = field(default=_UNPARSED, repr=False)
+
+    def parse(self) -> Any:
+        """The decoded value; raises ValueError if the span is not valid JSON."""
+        if self.value is _UNPARSED:
+            try:
+                self.value = _DECODER.decode(self.text)
+            except RecursionError as e:
+                raise ValueError("JSON nested too deeply") from e
+        return self.value
+
+
+def _closers(stack: Optional[Tuple]) -> str:
+    out = []
+    while stack is not None:
+        out.append(stack[0])
+        stack = stack[1]
+    return "".join(out)
+
+
+def _span_text(text: str, start: int, end: int, drops: List[int]) -> str:
+    if not drops:
+        return text[start:end]
+    pieces, cursor = [], start
+    for index in drops:
+        if index < end:
+            pieces.append(text[cursor:index])
+            cursor = index + 1
+    pieces.append(text[cursor:end])
+    return "".join(pieces)
+
+
+def _open_member_cut(
+    stack: Tuple, depth: int, complete_depth: int
+) -> Optional[Tuple[int, Optional[Tuple]]]:
+    """The cut that drops the outermost container open below complete_depth, if any."""
+    if depth <= complete_depth:
+        return None
+    node = stack
+    for _ in range(depth - complete_depth - 1):
+        node = node[1]
+    return node[2]
+
+
+def iter_candidates(
+    text: str, repair: bool = True, complete_depth: Optional[int] = None
+) -> Iterator[JSONCandidate]:
+    """Top-level JSON spans of text in order; with repair, a truncated tail span too.
+
+    With complete_depth (the span itself is depth 1), a truncated span drops any
+    container still open below that depth rather than closing it after its last
+    complete value.
+    """
+    n = len(text)
+    pos = 0
+    while True:
+        opener = _OPENER.search(text, pos)
+        if opener is None:
+            return
+        start = opener.start()
+        try:
+            value, end = _scan_once(text, start)
+        except _SCAN_ERRORS:
+            pass
+        else:
+            yield JSONCandidate(start, end, text[start:end], value=value)
+            pos = end
+            continue
+
+        # Persistent stack of expected closers, (closer, parent, safe cut before the
+        # container's member began): snapshots are O(1)
+        bracket = text[start]
+        stack: Optional[Tuple] = (_CLOSERS[bracket], None, None)
+        state = _KEY if bracket == "{" else _VALUE
+        safe: Tuple[int, Optional[Tuple]] = (start + 1, stack)
+        drops: List[int] = []
+        comma = -1
+        depth = 1
+        pos = start + 1
+        abandoned = False
+
+        while stack is not None:
+            m = _TOKEN.match(text, pos)
+            if m is None:
+                break  # only whitespace left
+            pos = m.end()
+            if m.group("string") is not None:
+                if m.group("closed") is None:
+                    break  # unterminated string: the input was cut off
+                if state == _KEY:
+                    state = _COLON
+                elif state == _VALUE:
+                    state = _AFTER
+                    safe = (pos, stack)
+                else:
+                    abandoned = True
+                    break
+                comma = -1
+            elif m.group("scalar") is not None:
+                if pos >= n:
+                    break  # "tru", "12" at the very end may be incomplete
+                if state != _VALUE:
+                    abandoned = True  # e.g. the "{name}" of a prose placeholder
+                    break
+                comma = -1
+                state = _AFTER
+                safe = (pos, stack)
+            else:
+                ch = m.group("punct")
+                if ch in "{[":
+                    if state != _VALUE:
+                        abandoned = True
+                        break
+                    comma = -1
+                    if depth < _FAST_DEPTH:
+                        try:
+                            _, end = _scan_once(text, pos - 1)
+                        except _SCAN_ERRORS:
+                            pass
+                        else:
+                            pos = end  # a complete nested value, decoded in C
+                            state = _AFTER
+                            safe = (pos, stack)
+                            continue
+                    # Not a safe cut: an empty {} would stand in for a value never sent
+                    stack = (_CLOSERS[ch], stack, safe)
+                    depth += 1
+                    state = _KEY if ch == "{" else _VALUE
+                elif ch in "}]":
+                    if ch != stack[0] or state == _COLON:
+                        abandoned = True
+                        break
+                    if comma >= 0:
+                        drops.append(comma)  # trailing comma before the closer
+                        comma = -1
+                    stack = stack[1]
+                    depth -= 1
+                    state = _AFTER
+                    safe = (pos, stack)
+                elif ch == ",":
+                    if state != _AFTER:
+                        abandoned = True
+                        break
+                    comma = pos - 1
+                    state = _KEY if stack[0] == "}" else _VALUE
+                elif state == _COLON:
+                    state = _VALUE
+                else:
+                    abandoned = True
+                    break
+
+        if abandoned:
+            # Not JSON after all; resume after the offending token, so scanning stays linear
+            continue
+        if stack is None:
+            span = _span_text(text, start, pos, drops)
+            yield JSONCandidate(start, pos, span, repaired=bool(drops))
+            continue
+        # The input ended inside this span
+        if repair:
+            cut = None
+            if complete_depth is not None:
+                cut = _open_member_cut(stack, depth, complete_depth)
+            end, open_stack = cut or safe
+            fragment = _span_text(text, start, end, drops) + _closers(open_stack)
+            yield JSONCandidate(start, end, fragment, truncated=True, repaired=True)
+        return
+
+
+def _any_container(value: Any) -> bool:
+    return isinstance(value, (dict, list))
+
+
+def extract_candidate(
+    text: str,
+    accept: Optional[Callable[[Any], bool]] = None,
+    repair: bool = True,
+    complete_depth: Optional[int] = None,
+) -> Optional[Tuple[Any, JSONCandidate]]:
+    """(value, candidate) for the first span that parses and that accept() approves."""
+    accept = accept or _any_container
+    for candidate in iter_candidates(text, repair=repair, complete_depth=complete_depth):
+        try:
+            value = candidate.parse()
+        except ValueError:
+            continue
+        if accept(value):
+            return value, candidate
+    return None
+
+
+def extract_json(
+    text: str,
+    accept: Optional[Callable[[Any], bool]] = None,
+    repair: bool = True,
+    complete_depth: Optional[int] = None,
+) -> Any:
+    """The first JSON object/array in text that accept() approves, or None."""
+    found = extract_candidate(text, accept, repair, complete_depth)
+    return found[0] if found else None
+
+
+def repair_json(fragment: str) -> Optional[str]:
+    """fragment with its first JSON span balanced (and trailing commas dropped), or None."""
+    for candidate in iter_candidates(fragment, repair=True):
+        try:
+            candidate.parse()
+        except ValueError:
+            continue
+        return candidate.text
+    return None
+
+
+__all__ = [
+    "JSONCandidate",
+    "iter_candidates",
+    "extract_candidate",
+    "extract_json",
+    "repair_json",
+]
@@ -0,0 +1,220 @@
+"""
+Incremental JSON parser for streamed LLM output
+
+Feed the completion text as it arrives; every value whose path matches one of the
+watched patterns is decoded and returned as soon as its closing character has been
+seen, long before the whole document is complete:
+
+    parser = IncrementalJSONParser([("pipeline", "*"), ("cells", "*")])
+    for chunk in deltas:
+        for path, value in parser.feed(chunk):
+            ...   # ("pipeline", "model_training"), {...}
+
+Text before the first `{` or `[` (chatter, Markdown fences) and after the root value
+closes is ignored. If the stream is cut off, assemble() rebuilds the document from
+the values that did complete, so a truncated response still yields its finished parts.
+"""
+
+import json
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+PathKey = Union[str, int]
+Path = Tuple[PathKey, ...]
+
+WILDCARD = "*"
+
+_WHITESPACE = " \t\r\n"
+
+
+class _Frame:
+    __slots__ = ("kind", "key", "index", "expect_key", "start")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind  # "object" | "array"
+        self.key: Optional[str] = None
+        self.index = -1
+        # Objects alternate between expecting a key and a value
+        self.expect_key = kind == "object"
+        self.start = start
+
+
+class IncrementalJSONParser:
+    """Single-pass, chunk-boundary-safe scanner that emits completed values by path."""
+
+    def __init__(self, patterns: Iterable[Tuple[PathKey, ...]] = ()):
+        self.patterns = [tuple(p) for p in patterns]
+        self.buffer = ""
+        self.pos = 0
+        self.stack: List[_Frame] = []
+        self.started = False
+        self.done = False
+        self.root: Any = None
+        self.emitted: List[Tuple[Path, Any]] = []
+        # Lexer state carried across chunks
+        self._in_string = False
+        self._escape = False
+        self._token_start: Optional[int] = None  # start of the string/scalar being read
+        self._string_is_key = False
+
+    # ─── Paths ───────────────────────────────────────────────────────────────
+
+    def _path(self) -> Path:
+        """Path of the value currently being read (the innermost container's slot)."""
+        path: List[PathKey] = []
+        for frame in self.stack:
+            path.append(frame.key if frame.kind == "object" else frame.index)
+        return tuple(path)
+
+    def _matches(self, path: Path) -> bool:
+        for pattern in self.patterns:
+            if len(pattern) == len(path) and all(
+                p == WILDCARD or p == k for p, k in zip(pattern, path)
+            ):
+                return True
+        return False
+
+    def _complete(self, path: Path, start: int, end: int) -> List[Tuple[Path, Any]]:
+        if not self._matches(path):
+            return []
+        try:
+            value = json.loads(self.buffer[start:end])
+        except ValueError:
+            return []
+        self.emitted.append((path, value))
+        return [(path, value)]
+
+    # ─── Scanning ────────────────────────────────────────────────────────────
+
+    def _begin_value(self) -> None:
+        """A value starts in the innermost container: advance its slot."""
+        if self.stack:
+            frame = self.stack[-1]
+            if frame.kind == "array":
+                frame.index += 1
+
+    def _end_scalar(self, end: int) -> List[Tuple[Path, Any]]:
+        start, self._token_start = self._token_start, None
+        events = self._complete(self._path(), start, end)
+        if self.stack and self.stack[-1].kind == "object":
+            self.stack[-1].expect_key = True
+        return events
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Consume more text; returns the watched values completed by it."""
+        if self.done or not chunk:
+            return []
+        self.buffer += chunk
+        events: List[Tuple[Path, Any]] = []
+        buffer = self.buffer
+        i = self.pos
+        n = len(buffer)
+
+        while i < n and not self.done:
+            ch = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    start, self._token_start = self._token_start, None
+                    frame = self.stack[-1] if self.stack else None
+                    if self._string_is_key:
+                        try:
+                            frame.key = json.loads(buffer[start : i + 1])
+                        except ValueError:
+                            frame.key = buffer[start + 1 : i]
+                    else:
+                        events.extend(self._complete(self._path(), start, i + 1))
+                        if frame is not None and frame.kind == "object":
+                            frame.expect_key = True
+                i += 1
+                continue
+
+            if self._token_start is not None:
+                # Inside a bare scalar (number, true, false, null)
+                if ch in ",}]" or ch in _WHITESPACE:
+                    events.extend(self._end_scalar(i))
+                    continue  # re-read the delimiter
+                i += 1
+                continue
+
+            if not self.started:
+                if ch in "{[":
+                    self.started = True
+                    self.stack.append(_Frame("object" if ch == "{" else "array", i))
+                i += 1
+                continue
+
+            frame = self.stack[-1]
+            if ch in _WHITESPACE or ch == ",":
+                pass
+            elif ch == ":":
+                frame.expect_key = False
+            elif ch == '"':
+                self._in_string = True
+                self._token_start = i
+                self._string_is_key = frame.kind == "object" and frame.expect_key
+                if not self._string_is_key:
+                    self._begin_value()
+            elif ch in "{[":
+                self._begin_value()
+                self.stack.append(_Frame("object" if ch == "{" else "array", i))
+            elif ch in "}]":
+                closed = self.stack.pop()
+                if not self.stack:
+                    self.done = True
+                    try:
+                        self.root = json.loads(buffer[closed.start : i + 1])
+                    except ValueError:
+                        self.root = None
+                else:
+                    events.extend(self._complete(self._path(), closed.start, i + 1))
+                    parent = self.stack[-1]
+                    if parent.kind == "object":
+                        parent.expect_key = True
+            else:
+                self._begin_value()
+                self._token_start = i
+            i += 1
+
+        self.pos = i
+        return events
+
+    # ─── Results ─────────────────────────────────────────────────────────────
+
+    def result(self) -> Any:
+        """The whole document once the root value has closed, else None."""
+        return self.root if self.done else None
+
+    def assemble(self) -> Any:
+        """The complete document, or one rebuilt from the watched values seen so far."""
+        if self.done and self.root is not None:
+            return self.root
+        if not self.emitted:
+            return None
+        root: Any = [] if isinstance(self.emitted[0][0][0], int) else {}
+        for path, value in self.emitted:
+            node = root
+            for key, next_key in zip(path, path[1:]):
+                container = [] if isinstance(next_key, int) else {}
+                if isinstance(node, list):
+                    while len(node) <= key:
+                        node.append(None)
+                    if node[key] is None:
+                        node[key] = container
+                    node = node[key]
+                else:
+                    node = node.setdefault(key, container)
+            last = path[-1]
+            if isinstance(node, list):
+                # Array items are emitted in order; indices of skipped items are compacted
+                node.append(value)
+            else:
+                node[last] = value
+        return root
+
+
+__all__ = ["IncrementalJSONParser", "WILDCARD"]
@@ -0,0 +1,323 @@
+"""
+Persistent response cache for LLM completions
+
+Every generator (pipeline design, notebook generation, explanations) goes through
+agent.llm_client, so completions are cached there, keyed by a hash of the backend,
+model, normalized messages and sampling parameters. Entries live in a small SQLite
+file, expire after a TTL and are evicted least-recently-used once the cache grows
+past its entry or byte budget.
+
+Bypass for one call with chat(..., cache=False), or for a block of calls with:
+
+    with cache_bypass():
+        service.generate_pipeline(...)
+
+Configuration: LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS,
+LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_MB.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate every existing entry when the key or row format changes
+CACHE_KEY_VERSION = 1
+
+_bypass: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextlib.contextmanager
+def cache_bypass(enabled: bool = True):
+    """Skip cache reads (responses are still stored) for LLM calls made inside the block.
+
+    cache_bypass(False) is a no-op, so callers can pass `not use_cache` straight through.
+    """
+    token = _bypass.set(enabled or _bypass.get())
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def bypass_active() -> bool:
+    return _bypass.get()
+
+
+def normalize_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Collapse whitespace runs so prompts that differ only in formatting share an entry."""
+    return [
+        {"role": m.get("role", "user"), "content": " ".join(str(m.get("content", "")).split())}
+        for m in messages
+    ]
+
+
+def cache_key(
+    backend: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    **params: Any,
+) -> str:
+    payload = {
+        "v": CACHE_KEY_VERSION,
+        "backend": backend,
+        "model": model,
+        "messages": normalize_messages(messages),
+        "params": params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed, TTL- and size-bounded store of completion texts."""
+
+    def __init__(
+        self,
+        path: str = "llm_cache.db",
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 5000,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "expired": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+        self._saved_ms = 0.0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Cache configured from the environment; None when LLM_CACHE_ENABLED is off."""
+        if os.environ.get("LLM_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            path=os.environ.get("LLM_CACHE_PATH", "llm_cache.db"),
+            ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+            max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000")),
+            max_bytes=int(float(os.environ.get("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    backend TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    usage TEXT,
+                    latency_ms REAL DEFAULT 0,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    hits INTEGER DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used "
+                "ON llm_responses(last_used_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        self._counters[name] += amount
+
+    # ─── Lookups ─────────────────────────────────────────────────────────────
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cached entry for key, or None on a miss (or an expired entry)."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT backend, model, text, usage, latency_ms, created_at "
+                    "FROM llm_responses WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    self._count("misses")
+                    return None
+                backend, model, text, usage, latency_ms, created_at = row
+                if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    self._count("expired")
+                    self._count("misses")
+                    return None
+                conn.execute(
+                    "UPDATE llm_responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?",
+                    (now, key),
+                )
+            except sqlite3.Error as e:
+                self._count("errors")
+                logger.warning(f"[LLMCache] Lookup failed: {e}")
+                return None
+            self._count("hits")
+            self._saved_ms += latency_ms or 0.0
+        return {
+            "backend": backend,
+            "model": model,
+            "text": text,
+            "usage": json.loads(usage) if usage else {},
+            "latency_ms": latency_ms,
+            "age_seconds": round(now - created_at, 1),
+        }
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self._count("bypassed")
+
+    # ─── Writes ──────────────────────────────────────────────────────────────
+
+    def put(
+        self,
+        key: str,
+        backend: str,
+        model: str,
+        text: str,
+        usage: Optional[Dict[str, Any]] = None,
+        latency_ms: float = 0.0,
+    ) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses "
+                    "(key, backend, model, text, usage, latency_ms, size, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, backend, model, text, json.dumps(usage or {}), latency_ms, size, now, now),
+                )
+                self._count("stores")
+                self._evict(conn)
+            except sqlite3.Error as e:
+                self._count("errors")
+                logger.warning(f"[LLMCache] Store failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop expired entries, then least recently used ones until within budget."""
+        if self.ttl_seconds:
+            cursor = conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._count("expired", max(cursor.rowcount, 0))
+
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+        ).fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM llm_responses ORDER BY last_used_at ASC"
+        ):
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            entries -= 1
+            total -= size
+        conn.executemany("DELETE FROM llm_responses WHERE key = ?", victims)
+        self._count("evictions", len(victims))
+
+    def invalidate(self, key: str) -> bool:
+        with self._lock:
+            try:
+                cursor = self._connection().execute(
+                    "DELETE FROM llm_responses WHERE key = ?", (key,)
+                )
+            except sqlite3.Error as e:
+                self._count("errors")
+                logger.warning(f"[LLMCache] Invalidate failed: {e}")
+                return False
+        return cursor.rowcount > 0
+
+    def clear(self) -> int:
+        with self._lock:
+            cursor = self._connection().execute("DELETE FROM llm_responses")
+        return max(cursor.rowcount, 0)
+
+    # ─── Metrics ─────────────────────────────────────────────────────────────
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            saved_ms = self._saved_ms
+            try:
+                conn = self._connection()
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+                ).fetchone()
+                by_backend = {
+                    backend: {"entries": count, "hits": hits}
+                    for backend, count, hits in conn.execute(
+                        "SELECT backend, COUNT(*), COALESCE(SUM(hits), 0) "
+                        "FROM llm_responses GROUP BY backend"
+                    )
+                }
+            except sqlite3.Error as e:
+                logger.warning(f"[LLMCache] Stats query failed: {e}")
+                entries, size, by_backend = 0, 0, {}
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": True,
+            "path": self.path,
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "saved_latency_ms": round(saved_ms, 1),
+            "entries": entries,
+            "size_bytes": size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "by_backend": by_backend,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+            self._saved_ms = 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+__all__ = [
+    "ResponseCache",
+    "cache_bypass",
+    "bypass_active",
+    "cache_key",
+    "normalize_messages",
+    "CACHE_KEY_VERSION",
+]
@@ -0,0 +1,1113 @@
+"""
+Shared HTTP client for LLM backends (Groq, OpenRouter, Ollama)
+
+One pooled httpx.AsyncClient per backend, all owned by a single background event
+loop thread, so every caller -- async endpoints, sync endpoints on worker threads,
+Celery tasks -- reuses the same keep-alive connections instead of opening a fresh
+one per request. Each backend has its own concurrency limit and timeouts.
+
+- async callers:  await get_llm_client().chat("groq", messages, model=...)
+- sync callers:   get_llm_client().chat_sync("ollama", messages, model=...)
+
+Groq and OpenRouter are called through their OpenAI-compatible /chat/completions
+API; Ollama through its native /api/chat. HTTP/2 is used when the h2 package is
+installed.
+
+Completions are cached in a persistent ResponseCache (agent.llm_cache) when the
+client has one, as the process-wide get_llm_client() does: identical prompts for
+the same model and parameters return the stored text without a network call.
+Pass cache=False, or wrap the calls in llm_cache.cache_bypass(), to force a fresh
+generation.
+
+Each backend also has a circuit breaker (agent.llm_health): once a backend keeps
+failing, calls to it raise LLMUnavailableError immediately until a backoff probe
+succeeds. is_available(), cached_models() and order() let fallback chains skip
+dead backends and try the fastest healthy one first.
+
+hedged_chat() runs a fallback chain with overlap instead of strictly in turn: the
+first attempt starts at once, the next one after `delay` seconds (or as soon as an
+earlier one fails), the first response the caller's parser accepts wins and the
+rest are cancelled. A cost cap bounds what the extra requests may spend.
+
+stream_chat() / stream_chat_sync() request a streamed completion (SSE for the
+OpenAI-compatible backends, NDJSON for Ollama) and hand each text fragment to a
+callback as it arrives; pair it with agent.json_stream to act on partial JSON.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from agent.llm_cache import ResponseCache, bypass_active, cache_key
+from agent.llm_health import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+KIND_OPENAI = "openai"
+KIND_OLLAMA = "ollama"
+
+
+class LLMError(RuntimeError):
+    """A backend call failed (transport error or non-2xx response)."""
+
+    def __init__(self, backend: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"[{backend}] {message}")
+        self.backend = backend
+        self.status_code = status_code
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+class LLMUnavailableError(LLMError):
+    """The backend's circuit is open; the call was not attempted."""
+
+
+@dataclass
+class BackendConfig:
+    name: str
+    base_url: str
+    kind: str = KIND_OPENAI
+    api_key: str = ""
+    max_concurrency: int = 8
+    timeout: float = 60.0
+    connect_timeout: float = 5.0
+    http2: bool = True
+    headers: Dict[str, str] = field(default_factory=dict)
+    # Circuit breaker: consecutive failures before opening, first/max probe backoff
+    failure_threshold: int = 2
+    probe_backoff: float = 5.0
+    max_probe_backoff: float = 300.0
+    # Rough blended USD price per 1k tokens, used to cap hedged requests
+    cost_per_1k_tokens: float = 0.0
+    # Whether JSON mode may be combined with streaming (Groq rejects the combination)
+    stream_json_mode: bool = True
+
+    @property
+    def configured(self) -> bool:
+        # Hosted backends need a real key; Ollama only needs to be reachable
+        if self.kind == KIND_OLLAMA:
+            return True
+        return bool(self.api_key) and not self.api_key.startswith("your_")
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    backend: str
+    model: str
+    latency_ms: float
+    usage: Dict[str, Any] = field(default_factory=dict)
+    cached: bool = False
+    cache_key: Optional[str] = None
+
+
+@dataclass
+class ChatAttempt:
+    """One backend/model choice in a fallback chain (the arguments of chat())."""
+
+    backend: str
+    model: str
+    messages: List[Dict[str, str]]
+    temperature: float = 0.2
+    max_tokens: Optional[int] = None
+    json_mode: bool = False
+    timeout: Optional[float] = None
+    api_key: Optional[str] = None
+
+    def kwargs(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "messages": self.messages,
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "json_mode": self.json_mode,
+            "timeout": self.timeout,
+            "api_key": self.api_key,
+        }
+
+    def estimated_tokens(self) -> int:
+        prompt_chars = sum(len(m.get("content", "")) for m in self.messages)
+        return prompt_chars // 4 + (self.max_tokens or 1024)
+
+
+@dataclass
+class HedgeResult:
+    value: Any
+    response: LLMResponse
+    launched: List[str]
+    estimated_cost_usd: float
+
+
+@dataclass
+class _BackendStats:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    waiting: int = 0
+    total_ms: float = 0.0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def default_backends() -> Dict[str, BackendConfig]:
+    """Backend configuration from the environment.
+
+    LLM_MAX_CONCURRENCY_<NAME> and LLM_TIMEOUT_<NAME> override the per-backend defaults;
+    LLM_BREAKER_FAILURES, LLM_BREAKER_BACKOFF_SECONDS and LLM_BREAKER_MAX_BACKOFF_SECONDS
+    tune every backend's circuit breaker; LLM_COST_PER_1K_<NAME> its price estimate.
+    """
+    backends = [
+        BackendConfig(
+            name="groq",
+            base_url=os.environ.get("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
+            api_key=os.environ.get("GROQ_API_KEY", ""),
+            max_concurrency=8,
+            timeout=45.0,
+            cost_per_1k_tokens=0.0007,
+            stream_json_mode=False,
+        ),
+        BackendConfig(
+            name="openrouter",
+            base_url=os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+            api_key=os.environ.get("OPENROUTER_API_KEY", ""),
+            max_concurrency=8,
+            timeout=90.0,
+            cost_per_1k_tokens=0.0004,
+        ),
+        BackendConfig(
+            name="ollama",
+            base_url=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"),
+            kind=KIND_OLLAMA,
+            # A local model serves one generation at a time; queue here, not in Ollama
+            max_concurrency=2,
+            timeout=300.0,
+            connect_timeout=2.0,
+            http2=False,
+        ),
+    ]
+    for config in backends:
+        suffix = config.name.upper()
+        config.max_concurrency = int(
+            _env_float(f"LLM_MAX_CONCURRENCY_{suffix}", config.max_concurrency)
+        )
+        config.timeout = _env_float(f"LLM_TIMEOUT_{suffix}", config.timeout)
+        config.failure_threshold = int(
+            _env_float("LLM_BREAKER_FAILURES", config.failure_threshold)
+        )
+        config.probe_backoff = _env_float("LLM_BREAKER_BACKOFF_SECONDS", config.probe_backoff)
+        config.max_probe_backoff = _env_float(
+            "LLM_BREAKER_MAX_BACKOFF_SECONDS", config.max_probe_backoff
+        )
+        config.cost_per_1k_tokens = _env_float(
+            f"LLM_COST_PER_1K_{suffix}", config.cost_per_1k_tokens
+        )
+    return {config.name: config for config in backends}
+
+
+class LLMClient:
+    """Pooled, concurrency-limited HTTP access to every configured LLM backend."""
+
+    def __init__(
+        self,
+        backends: Optional[Dict[str, BackendConfig]] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.backends: Dict[str, BackendConfig] = (
+            default_backends() if backends is None else dict(backends)
+        )
+        self.cache = cache
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _BackendStats] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._models_cache: Dict[str, tuple] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def register(self, config: BackendConfig) -> None:
+        """Add or replace a backend; an existing pool for it is closed."""
+        with self._lock:
+            self.backends[config.name] = config
+            old = self._clients.pop(config.name, None)
+            self._semaphores.pop(config.name, None)
+            self._breakers.pop(config.name, None)
+            self._models_cache.pop(config.name, None)
+        if old is not None and self._loop is not None:
+            asyncio.run_coroutine_threadsafe(old.aclose(), self._loop)
+
+    def is_configured(self, backend: str) -> bool:
+        config = self.backends.get(backend)
+        return config is not None and config.configured
+
+    # ─── Backend health ──────────────────────────────────────────────────────
+
+    def breaker(self, backend: str) -> CircuitBreaker:
+        breaker = self._breakers.get(backend)
+        if breaker is None:
+            config = self._config(backend)
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    backend,
+                    CircuitBreaker(
+                        failure_threshold=config.failure_threshold,
+                        backoff=config.probe_backoff,
+                        max_backoff=config.max_probe_backoff,
+                    ),
+                )
+        return breaker
+
+    def is_healthy(self, backend: str) -> bool:
+        """Not behind an open circuit (or waiting on its probe); never touches the network."""
+        return self.breaker(backend).available()
+
+    def is_available(self, backend: str) -> bool:
+        return self.is_configured(backend) and self.is_healthy(backend)
+
+    def order(self, backends: List[str], by_latency: bool = True) -> List[str]:
+        """Fallback chain order: healthy backends first, fastest (EWMA) first.
+
+        Backends without a latency sample yet sort ahead of measured ones so each
+        gets tried; ties keep the caller's preference order.
+        """
+
+        def key(item):
+            index, name = item
+            breaker = self.breaker(name)
+            latency = (breaker.latency_ms or 0.0) if by_latency else 0.0
+            return (0 if breaker.available() else 1, latency, index)
+
+        return [name for _, name in sorted(enumerate(backends), key=key)]
+
+    def cached_models(
+        self, backend: str, max_age: float = 60.0, timeout: float = 5.0
+    ) -> List[str]:
+        """list_models_sync() cached for max_age seconds; [] while the backend is down."""
+        now = time.monotonic()
+        cached = self._models_cache.get(backend)
+        if cached is not None and now - cached[0] < max_age:
+            return cached[1]
+        if not self.is_healthy(backend):
+            return cached[1] if cached is not None else []
+        try:
+            models = self.list_models_sync(backend, timeout=timeout)
+        except LLMError as e:
+            logger.info(f"[LLMClient] {backend} models unavailable: {e}")
+            models = []
+        self._models_cache[backend] = (now, models)
+        return models
+
+    # ─── Event loop thread ───────────────────────────────────────────────────
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="llm-client", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    async def _on_loop(self, coro):
+        """Run a coroutine on the client's loop and await it from any other loop."""
+        loop = self._ensure_loop()
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if current is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def _blocking(self, coro):
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("LLMClient sync methods cannot be called from its own loop")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    # ─── Connection pools (only touched on the loop thread) ─────────────────
+
+    def _client_for(self, config: BackendConfig) -> httpx.AsyncClient:
+        client = self._clients.get(config.name)
+        if client is None:
+            headers = {"Content-Type": "application/json", **config.headers}
+            if config.api_key and config.kind == KIND_OPENAI:
+                headers["Authorization"] = f"Bearer {config.api_key}"
+            client = httpx.AsyncClient(
+                base_url=config.base_url.rstrip("/"),
+                headers=headers,
+                http2=HAS_H2 and config.http2,
+                timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=config.max_concurrency,
+                    max_keepalive_connections=config.max_concurrency,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            self._clients[config.name] = client
+            self._semaphores[config.name] = asyncio.Semaphore(config.max_concurrency)
+        return client
+
+    def _config(self, backend: str) -> BackendConfig:
+        config = self.backends.get(backend)
+        if config is None:
+            raise LLMError(backend, "unknown backend")
+        return config
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, backend: str):
+        """Breaker check, concurrency slot and stats around one HTTP exchange."""
+        config = self._config(backend)
+        breaker = self.breaker(backend)
+        if not breaker.allow():
+            retry_in = breaker.snapshot()["retry_in_seconds"]
+            raise LLMUnavailableError(backend, f"circuit open, next probe in {retry_in}s")
+        client = self._client_for(config)
+        semaphore = self._semaphores[backend]
+        stats = self._stats.setdefault(backend, _BackendStats())
+
+        stats.waiting += 1
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            breaker.release_probe()  # cancelled while queued
+            raise
+        finally:
+            stats.waiting -= 1
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield config, client, breaker, stats
+        except BaseException:
+            # Failures already reopened the circuit; a cancelled probe just frees its slot
+            breaker.release_probe()
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.requests += 1
+            stats.total_ms += (time.perf_counter() - start) * 1000
+            semaphore.release()
+
+    def _request_kwargs(
+        self,
+        config: BackendConfig,
+        json_body: Optional[Dict[str, Any]],
+        timeout: Optional[float],
+        api_key: Optional[str],
+    ) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {}
+        if json_body is not None:
+            kwargs["json"] = json_body
+        if timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(timeout, connect=config.connect_timeout)
+        if api_key:
+            kwargs["headers"] = {"Authorization": f"Bearer {api_key}"}
+        return kwargs
+
+    @staticmethod
+    def _transport_error(backend: str, breaker: CircuitBreaker, e: Exception) -> LLMError:
+        if isinstance(e, httpx.TimeoutException):
+            # Timeouts are the expensive failure; stop waiting on this backend at once
+            breaker.record_failure(f"timeout: {e!r}", trip=True)
+            return LLMTimeoutError(backend, f"timed out: {e!r}")
+        breaker.record_failure(f"request failed: {e!r}")
+        return LLMError(backend, f"request failed: {e!r}")
+
+    @staticmethod
+    def _status_error(backend: str, breaker: CircuitBreaker, status: int, body: str) -> LLMError:
+        error = f"HTTP {status}: {body[:200]}"
+        if _is_backend_failure(status):
+            breaker.record_failure(error)
+        else:
+            breaker.release_probe()  # a bad request says nothing about the backend
+        return LLMError(backend, error, status)
+
+    async def _request(
+        self,
+        backend: str,
+        method: str,
+        path: str,
+        json_body: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        api_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        async with self._slot(backend) as (config, client, breaker, stats):
+            kwargs = self._request_kwargs(config, json_body, timeout, api_key)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+            except httpx.HTTPError as e:
+                stats.errors += 1
+                raise self._transport_error(backend, breaker, e) from e
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if response.status_code >= 400:
+                stats.errors += 1
+                raise self._status_error(backend, breaker, response.status_code, response.text)
+            try:
+                data = response.json()
+            except ValueError as e:
+                stats.errors += 1
+                breaker.record_failure("response is not JSON")
+                raise LLMError(backend, "response is not JSON", response.status_code) from e
+            breaker.record_success(elapsed_ms)
+            return data
+
+    async def _stream_lines(
+        self,
+        backend: str,
+        path: str,
+        json_body: Dict[str, Any],
+        timeout: Optional[float],
+        api_key: Optional[str],
+    ) -> AsyncIterator[str]:
+        """POST and yield the response body line by line as it arrives.
+
+        Stops at an SSE "data: [DONE]" line without yielding it, so the stream ends
+        (and the success is recorded) here rather than by the consumer breaking off.
+        """
+        async with self._slot(backend) as (config, client, breaker, stats):
+            kwargs = self._request_kwargs(config, json_body, timeout, api_key)
+            start = time.perf_counter()
+            try:
+                async with client.stream("POST", path, **kwargs) as response:
+                    if response.status_code >= 400:
+                        body = (await response.aread()).decode("utf-8", "replace")
+                        stats.errors += 1
+                        raise self._status_error(backend, breaker, response.status_code, body)
+                    lines = response.aiter_lines()
+                    async with contextlib.aclosing(lines):
+                        async for line in lines:
+                            if _is_sse_done(line):
+                                break
+                            if line:
+                                yield line
+            except httpx.HTTPError as e:
+                stats.errors += 1
+                raise self._transport_error(backend, breaker, e) from e
+            breaker.record_success((time.perf_counter() - start) * 1000)
+
+    def _chat_body(
+        self,
+        config: BackendConfig,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        json_mode: bool,
+        stream: bool = False,
+    ) -> Dict[str, Any]:
+        if config.kind == KIND_OLLAMA:
+            options: Dict[str, Any] = {"temperature": temperature}
+            if max_tokens:
+                options["num_predict"] = max_tokens
+            body: Dict[str, Any] = {
+                "model": model,
+                "messages": messages,
+                "stream": stream,
+                "options": options,
+            }
+            if json_mode:
+                body["format"] = "json"
+            return body
+        body = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens:
+            body["max_tokens"] = max_tokens
+        if json_mode:
+            body["response_format"] = {"type": "json_object"}
+        if stream:
+            body["stream"] = True
+        return body
+
+    async def _cached(
+        self,
+        backend: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        json_mode: bool,
+        read_cache: bool,
+        start: float,
+    ):
+        """(cache key, cached response or None); the key is None without a cache."""
+        if self.cache is None:
+            return None, None
+        key = cache_key(
+            backend,
+            model,
+            messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            json_mode=json_mode,
+        )
+        if not read_cache:
+            self.cache.record_bypass()
+            return key, None
+        hit = await asyncio.to_thread(self.cache.get, key)
+        if hit is None:
+            return key, None
+        return key, LLMResponse(
+            text=hit["text"],
+            backend=backend,
+            model=hit["model"],
+            latency_ms=round((time.perf_counter() - start) * 1000, 2),
+            usage=hit["usage"],
+            cached=True,
+            cache_key=key,
+        )
+
+    async def _store(self, response: LLMResponse) -> None:
+        if response.cache_key is not None and response.text.strip():
+            await asyncio.to_thread(
+                self.cache.put,
+                response.cache_key,
+                response.backend,
+                response.model,
+                response.text,
+                response.usage,
+                response.latency_ms,
+            )
+
+    async def _chat(
+        self,
+        backend: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        json_mode: bool,
+        timeout: Optional[float],
+        api_key: Optional[str],
+        read_cache: bool = True,
+    ) -> LLMResponse:
+        config = self._config(backend)
+        start = time.perf_counter()
+        key, hit = await self._cached(
+            backend, messages, model, temperature, max_tokens, json_mode, read_cache, start
+        )
+        if hit is not None:
+            return hit
+
+        body = self._chat_body(config, messages, model, temperature, max_tokens, json_mode)
+        if config.kind == KIND_OLLAMA:
+            data = await self._request(backend, "POST", "/api/chat", body, timeout)
+            text = (data.get("message") or {}).get("content", "")
+            usage = {
+                "prompt_tokens": data.get("prompt_eval_count"),
+                "completion_tokens": data.get("eval_count"),
+            }
+        else:
+            data = await self._request(
+                backend, "POST", "/chat/completions", body, timeout, api_key=api_key
+            )
+            choices = data.get("choices") or []
+            if not choices:
+                raise LLMError(backend, "response has no choices")
+            text = (choices[0].get("message") or {}).get("content") or ""
+            usage = data.get("usage") or {}
+
+        response = LLMResponse(
+            text=text,
+            backend=backend,
+            model=data.get("model", model),
+            latency_ms=round((time.perf_counter() - start) * 1000, 2),
+            usage=usage,
+            cache_key=key,
+        )
+        await self._store(response)
+        return response
+
+    async def _stream_chat(
+        self,
+        backend: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        json_mode: bool,
+        timeout: Optional[float],
+        api_key: Optional[str],
+        read_cache: bool,
+        on_delta: Callable[[str], None],
+    ) -> LLMResponse:
+        config = self._config(backend)
+        start = time.perf_counter()
+        key, hit = await self._cached(
+            backend, messages, model, temperature, max_tokens, json_mode, read_cache, start
+        )
+        if hit is not None:
+            on_delta(hit.text)  # a cached completion arrives as one delta
+            return hit
+
+        body = self._chat_body(
+            config,
+            messages,
+            model,
+            temperature,
+            max_tokens,
+            json_mode and config.stream_json_mode,
+            stream=True,
+        )
+        path = "/api/chat" if config.kind == KIND_OLLAMA else "/chat/completions"
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+        served_model = model
+        lines = self._stream_lines(backend, path, body, timeout, api_key)
+        async with contextlib.aclosing(lines):
+            async for line in lines:
+                if config.kind == KIND_OLLAMA:
+                    # Native API: one JSON object per line, the last one has done=true
+                    chunk = _json_line(backend, line)
+                    delta = (chunk.get("message") or {}).get("content") or ""
+                    if chunk.get("done"):
+                        usage = {
+                            "prompt_tokens": chunk.get("prompt_eval_count"),
+                            "completion_tokens": chunk.get("eval_count"),
+                        }
+                else:
+                    # Server-sent events: "data: {...}" lines (_stream_lines ends at [DONE])
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = _json_line(backend, line[5:].strip())
+                    if chunk.get("error"):
+                        raise LLMError(backend, f"stream error: {chunk['error']}")
+                    choices = chunk.get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content") or ""
+                    usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or usage
+                served_model = chunk.get("model") or served_model
+                if delta:
+                    parts.append(delta)
+                    on_delta(delta)
+
+        response = LLMResponse(
+            text="".join(parts),
+            backend=backend,
+            model=served_model,
+            latency_ms=round((time.perf_counter() - start) * 1000, 2),
+            usage=usage,
+            cache_key=key,
+        )
+        await self._store(response)
+        return response
+
+    def estimate_cost(self, attempt: ChatAttempt) -> float:
+        config = self.backends.get(attempt.backend)
+        if config is None:
+            return 0.0
+        return attempt.estimated_tokens() / 1000 * config.cost_per_1k_tokens
+
+    async def _hedge(
+        self,
+        attempts: List[ChatAttempt],
+        parse: Callable[[LLMResponse], Any],
+        delay: float,
+        max_cost_usd: Optional[float],
+        read_cache: bool,
+    ) -> HedgeResult:
+        queue = list(attempts)
+        pending: Dict[asyncio.Task, ChatAttempt] = {}
+        launched: List[str] = []
+        errors: List[str] = []
+        spent = 0.0
+
+        def launch_next() -> bool:
+            nonlocal spent
+            while queue:
+                attempt = queue.pop(0)
+                if not self.is_healthy(attempt.backend):
+                    errors.append(f"{attempt.backend}: circuit open")
+                    continue
+                cost = self.estimate_cost(attempt)
+                # The first attempt always runs; hedges only while within the cap
+                if launched and max_cost_usd is not None and spent + cost > max_cost_usd:
+                    errors.append(f"{attempt.backend}: over hedge cost cap")
+                    continue
+                spent += cost
+                task = asyncio.ensure_future(
+                    self._chat(**attempt.kwargs(), read_cache=read_cache)
+                )
+                pending[task] = attempt
+                launched.append(attempt.backend)
+                return True
+            return False
+
+        launch_next()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=delay if queue else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    launch_next()  # the running attempts are slow: hedge
+                    continue
+                failed = False
+                for task in done:
+                    attempt = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except LLMError as e:
+                        errors.append(str(e))
+                        failed = True
+                        continue
+                    value = parse(response)
+                    if value is not None:
+                        return HedgeResult(value, response, launched, round(spent, 6))
+                    self.forget(response)
+                    errors.append(f"{attempt.backend}: response rejected by parser")
+                    failed = True
+                if failed:
+                    launch_next()  # no point waiting out the delay
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        raise LLMError("hedge", "no attempt succeeded: " + "; ".join(errors))
+
+    async def _list_models(self, backend: str, timeout: Optional[float]) -> List[str]:
+        config = self._config(backend)
+        if config.kind == KIND_OLLAMA:
+            data = await self._request(backend, "GET", "/api/tags", timeout=timeout)
+            return [m.get("name", "") for m in data.get("models", [])]
+        data = await self._request(backend, "GET", "/models", timeout=timeout)
+        return [m.get("id", "") for m in data.get("data", [])]
+
+    # ─── Public API ──────────────────────────────────────────────────────────
+
+    async def chat(
+        self,
+        backend: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        timeout: Optional[float] = None,
+        api_key: Optional[str] = None,
+        cache: Optional[bool] = None,
+    ) -> LLMResponse:
+        """Run a chat completion; raises LLMError (or LLMTimeoutError) on failure.
+
+        cache=False skips the cached response (the fresh one is still stored); the
+        default follows llm_cache.cache_bypass().
+        """
+        read_cache = not bypass_active() if cache is None else cache
+        return await self._on_loop(
+            self._chat(
+                backend,
+                messages,
+                model,
+                temperature,
+                max_tokens,
+                json_mode,
+                timeout,
+                api_key,
+                read_cache,
+            )
+        )
+
+    def chat_sync(
+        self,
+        backend: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        timeout: Optional[float] = None,
+        api_key: Optional[str] = None,
+        cache: Optional[bool] = None,
+    ) -> LLMResponse:
+        """Blocking chat() for sync code; the request itself still runs on the shared pool."""
+        read_cache = not bypass_active() if cache is None else cache
+        return self._blocking(
+            self._chat(
+                backend,
+                messages,
+                model,
+                temperature,
+                max_tokens,
+                json_mode,
+                timeout,
+                api_key,
+                read_cache,
+            )
+        )
+
+    async def stream_chat(
+        self,
+        backend: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        on_delta: Callable[[str], None],
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        timeout: Optional[float] = None,
+        api_key: Optional[str] = None,
+        cache: Optional[bool] = None,
+    ) -> LLMResponse:
+        """chat() with the completion streamed: on_delta gets each text fragment as it arrives.
+
+        on_delta runs on the client's loop thread, so keep it cheap (or hand off with
+        call_soon_threadsafe). A cached completion is delivered as a single delta. The
+        returned response holds the full text, as chat() would.
+        """
+        read_cache = not bypass_active() if cache is None else cache
+        return await self._on_loop(
+            self._stream_chat(
+                backend,
+                messages,
+                model,
+                temperature,
+                max_tokens,
+                json_mode,
+                timeout,
+                api_key,
+                read_cache,
+                on_delta,
+            )
+        )
+
+    def stream_chat_sync(
+        self,
+        backend: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        on_delta: Callable[[str], None],
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        timeout: Optional[float] = None,
+        api_key: Optional[str] = None,
+        cache: Optional[bool] = None,
+    ) -> LLMResponse:
+        read_cache = not bypass_active() if cache is None else cache
+        return self._blocking(
+            self._stream_chat(
+                backend,
+                messages,
+                model,
+                temperature,
+                max_tokens,
+                json_mode,
+                timeout,
+                api_key,
+                read_cache,
+                on_delta,
+            )
+        )
+
+    async def hedged_chat(
+        self,
+        attempts: List[ChatAttempt],
+        parse: Optional[Callable[[LLMResponse], Any]] = None,
+        delay: Optional[float] = None,
+        max_cost_usd: Optional[float] = None,
+        cache: Optional[bool] = None,
+    ) -> HedgeResult:
+        """Run attempts with overlap; the first response parse() accepts (not None) wins.
+
+        Attempts start in order, each `delay` seconds after the previous one or as
+        soon as one fails; the losers are cancelled. Hedges that would push the
+        estimated spend past max_cost_usd are skipped. parse runs on the client's
+        loop thread, so keep it cheap; the default accepts any non-empty text.
+        Raises LLMError when every attempt fails or is rejected.
+        """
+        read_cache = not bypass_active() if cache is None else cache
+        return await self._on_loop(
+            self._hedge(
+                attempts,
+                parse or _non_empty,
+                default_hedge_delay() if delay is None else delay,
+                default_hedge_cost_cap() if max_cost_usd is None else max_cost_usd,
+                read_cache,
+            )
+        )
+
+    def hedged_chat_sync(
+        self,
+        attempts: List[ChatAttempt],
+        parse: Optional[Callable[[LLMResponse], Any]] = None,
+        delay: Optional[float] = None,
+        max_cost_usd: Optional[float] = None,
+        cache: Optional[bool] = None,
+    ) -> HedgeResult:
+        read_cache = not bypass_active() if cache is None else cache
+        return self._blocking(
+            self._hedge(
+                attempts,
+                parse or _non_empty,
+                default_hedge_delay() if delay is None else delay,
+                default_hedge_cost_cap() if max_cost_usd is None else max_cost_usd,
+                read_cache,
+            )
+        )
+
+    async def list_models(self, backend: str, timeout: Optional[float] = None) -> List[str]:
+        return await self._on_loop(self._list_models(backend, timeout))
+
+    def list_models_sync(self, backend: str, timeout: Optional[float] = None) -> List[str]:
+        return self._blocking(self._list_models(backend, timeout))
+
+    def forget(self, response: LLMResponse) -> None:
+        """Drop a response from the cache, e.g. when the caller could not parse it."""
+        if self.cache is not None and response.cache_key:
+            self.cache.invalidate(response.cache_key)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        if self.cache is None:
+            return {"enabled": False}
+        return self.cache.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        result = {}
+        for name, config in self.backends.items():
+            s = self._stats.get(name, _BackendStats())
+            result[name] = {
+                "configured": config.configured,
+                "max_concurrency": config.max_concurrency,
+                "timeout_seconds": config.timeout,
+                "http2": HAS_H2 and config.http2,
+                "requests": s.requests,
+                "errors": s.errors,
+                "in_flight": s.in_flight,
+                "waiting": s.waiting,
+                "avg_latency_ms": round(s.total_ms / s.requests, 2) if s.requests else 0.0,
+                "circuit": self.breaker(name).snapshot(),
+            }
+        return result
+
+    def close(self) -> None:
+        """Close every pool and stop the loop thread."""
+        if self.cache is not None:
+            self.cache.close()
+        with self._lock:
+            loop, self._loop = self._loop, None
+            clients, self._clients = self._clients, {}
+            self._semaphores = {}
+        if loop is None or loop.is_closed():
+            return
+
+        async def shutdown():
+            for client in clients.values():
+                await client.aclose()
+            # Finalize stream generators still being cleaned up before the loop stops
+            await loop.shutdown_asyncgens()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"[LLMClient] Error closing connection pools: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        loop.close()
+
+
+def _is_sse_done(line: str) -> bool:
+    return line.startswith("data:") and line[5:].strip() == "[DONE]"
+
+
+def _json_line(backend: str, line: str) -> Dict[str, Any]:
+    try:
+        chunk = json.loads(line)
+    except ValueError as e:
+        raise LLMError(backend, f"malformed stream chunk: {line[:200]}") from e
+    return chunk if isinstance(chunk, dict) else {}
+
+
+def _non_empty(response: LLMResponse) -> Optional[LLMResponse]:
+    return response if response.text.strip() else None
+
+
+def hedging_enabled() -> bool:
+    """LLM_HEDGED=1 switches the generators' fallback chains to hedged mode."""
+    return os.environ.get("LLM_HEDGED", "0").lower() in ("1", "true", "yes")
+
+
+def default_hedge_delay() -> float:
+    return _env_float("LLM_HEDGE_DELAY_SECONDS", 2.0)
+
+
+def default_hedge_cost_cap() -> float:
+    return _env_float("LLM_HEDGE_MAX_COST_USD", 0.05)
+
+
+def _is_backend_failure(status_code: int) -> bool:
+    """Statuses that count against the circuit: server errors, rate limits, bad credentials."""
+    return status_code >= 500 or status_code in (401, 403, 408, 429)
+
+
+def user_message(prompt: str) -> List[Dict[str, str]]:
+    return [{"role": "user", "content": prompt}]
+
+
+_llm_client: Optional[LLMClient] = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client shared by every LLM integration."""
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = LLMClient(cache=ResponseCache.from_env())
+    return _llm_client
+
+
+__all__ = [
+    "LLMClient",
+    "LLMResponse",
+    "ChatAttempt",
+    "HedgeResult",
+    "LLMError",
+    "LLMTimeoutError",
+    "LLMUnavailableError",
+    "BackendConfig",
+    "default_backends",
+    "hedging_enabled",
+    "default_hedge_delay",
+    "default_hedge_cost_cap",
+    "get_llm_client",
+    "user_message",
+    "HAS_H2",
+    "KIND_OPENAI",
+    "KIND_OLLAMA",
+]
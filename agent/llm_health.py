@@ -0,0 +1,139 @@
+"""
+Per-backend circuit breaker and latency tracking for LLM providers
+
+LLMClient keeps one CircuitBreaker per backend. Consecutive failures (or a single
+timeout, the expensive failure mode) open the circuit: calls to that backend then
+fail immediately with LLMUnavailableError instead of waiting on a dead host. Once
+the backoff has elapsed, one call is let through as a probe (half-open); success
+closes the circuit, failure reopens it with the backoff doubled up to a cap.
+
+Successful calls feed an exponentially weighted latency average, which
+LLMClient.order() uses to try the fastest healthy backend first.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed -> open after failures -> half-open probe after an exponential backoff."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 2,
+        backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        latency_alpha: float = 0.3,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self.latency_alpha = latency_alpha
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.backoff = backoff
+        self.opened_at: Optional[float] = None
+        self.probe_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.latency_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.trips = 0
+        self.rejected = 0
+
+    def _transition(self, now: float) -> None:
+        if self.state == STATE_OPEN and now >= self.probe_at:
+            self.state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+
+    def available(self) -> bool:
+        """Whether a call would be allowed now (does not claim the probe slot)."""
+        with self._lock:
+            self._transition(self._clock())
+            if self.state == STATE_HALF_OPEN:
+                return not self._probe_in_flight
+            return self.state == STATE_CLOSED
+
+    def allow(self) -> bool:
+        """Claim permission for one call; in half-open state only one probe at a time."""
+        with self._lock:
+            self._transition(self._clock())
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency_ms: Optional[float] = None) -> None:
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+            self.backoff = self.base_backoff
+            self.opened_at = self.probe_at = None
+            self._probe_in_flight = False
+            if latency_ms is not None:
+                if self.latency_ms is None:
+                    self.latency_ms = latency_ms
+                else:
+                    a = self.latency_alpha
+                    self.latency_ms = a * latency_ms + (1 - a) * self.latency_ms
+
+    def record_failure(self, error: str = "", trip: bool = False) -> None:
+        """Count a failure; trip=True opens the circuit regardless of the threshold."""
+        now = self._clock()
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error or self.last_error
+            if self.state == STATE_HALF_OPEN:
+                # The probe failed: wait twice as long before the next one
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+            elif not trip and self.consecutive_failures < self.failure_threshold:
+                return
+            if self.state != STATE_OPEN:
+                self.trips += 1
+            self.state = STATE_OPEN
+            self.opened_at = now
+            self.probe_at = now + self.backoff
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """A probe call ended without a verdict (e.g. a 400 caused by the prompt)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+            self.backoff = self.base_backoff
+            self.opened_at = self.probe_at = None
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            self._transition(now)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_seconds": (
+                    round(max(self.probe_at - now, 0.0), 1) if self.state == STATE_OPEN else 0.0
+                ),
+                "backoff_seconds": self.backoff,
+                "ewma_latency_ms": round(self.latency_ms, 1) if self.latency_ms else None,
+                "last_error": self.last_error,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+__all__ = ["CircuitBreaker", "STATE_CLOSED", "STATE_OPEN", "STATE_HALF_OPEN"]
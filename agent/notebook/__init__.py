@@ -1,11 +1,17 @@
 # Colab Service - Notebook Package
 # Public API for notebook generation
 
-from .generator import NotebookGenerator, validate_notebook, validate_config
+from .generator import (
+    NotebookGenerator,
+    clear_template_cache,
+    validate_notebook,
+    validate_config,
+)
 from .validators import validate_notebook as validate, validate_config as check_config
 
 __all__ = [
     "NotebookGenerator",
     "validate_notebook",
     "validate_config",
+    "clear_template_cache",
 ]
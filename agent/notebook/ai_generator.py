@@ -6,17 +6,39 @@ Provides multiple backends for notebook generation:
 2. Cloud Groq (fast inference)
 3. Template-based (fallback)
 
-Chains them together with proper fallback logic.
+Chains them together with proper fallback logic. Every backend goes through the
+shared pooled client in agent.llm_client; with an on_partial callback the notebook
+is streamed and each cell is handed over as soon as it is complete.
 """
 
 import json
 import logging
 import os
-from typing import Any, Dict, Optional, Tuple
-from openai import OpenAI
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from agent.json_extract import extract_candidate
+from agent.json_stream import WILDCARD, IncrementalJSONParser
+from agent.llm_cache import cache_bypass
+from agent.notebook.validators import normalize_notebook
+from agent.llm_client import (
+    ChatAttempt,
+    LLMError,
+    LLMResponse,
+    LLMTimeoutError,
+    get_llm_client,
+    hedging_enabled,
+    user_message,
+)
 
 logger = logging.getLogger(__name__)
 
+# Notebook cells are handed to on_partial one by one while the response streams in
+NOTEBOOK_STREAM_PATHS = [("cells", WILDCARD)]
+
+
+def _has_cells(data: Any) -> bool:
+    return isinstance(data, dict) and "cells" in data
+
 
 class AINotebookGenerator:
     """
@@ -25,22 +47,17 @@ class AINotebookGenerator:
     Tries Ollama first (local, free), then Groq (cloud), then falls back to template.
     """
 
-    def __init__(self):
-        self.ollama_available = self._check_ollama()
+    def __init__(self, hedge: Optional[bool] = None):
+        self.llm = get_llm_client()
         self.groq_available = self._check_groq()
         self.openrouter_available = self._check_openrouter()
-        self._groq_client = None
-        self._openrouter_client = None
-
-    def _check_ollama(self) -> bool:
-        """Check if Ollama is running locally."""
-        try:
-            import requests
+        # Hedged mode overlaps the backends instead of waiting out each one in turn
+        self.hedge = hedging_enabled() if hedge is None else hedge
 
-            resp = requests.get("http://localhost:11434/api/tags", timeout=2)
-            return resp.status_code == 200
-        except Exception:
-            return False
+    @property
+    def ollama_available(self) -> bool:
+        """Ollama is up: circuit closed and the cached model list is non-empty."""
+        return self.llm.is_healthy("ollama") and bool(self.llm.cached_models("ollama"))
 
     def _check_groq(self) -> bool:
         """Check if Groq API key is configured."""
@@ -50,70 +67,68 @@ class AINotebookGenerator:
         """Check if OpenRouter API key is configured."""
         return bool(os.environ.get("OPENROUTER_API_KEY", ""))
 
-    def _get_groq_client(self):
-        """Lazy-load Groq client."""
-        if self._groq_client is None:
-            try:
-                from groq import Groq
-
-                api_key = os.environ.get("GROQ_API_KEY", "")
-                self._groq_client = Groq(api_key=api_key)
-            except Exception as e:
-                logger.warning(f"Failed to initialize Groq client: {e}")
-        return self._groq_client
-
-    def _get_openrouter_client(self):
-        """Lazy-load OpenRouter client."""
-        if self._openrouter_client is None:
-            try:
-                api_key = os.environ.get("OPENROUTER_API_KEY", "")
-                self._openrouter_client = OpenAI(
-                    base_url="https://openrouter.ai/api/v1",
-                    api_key=api_key,
-                )
-            except Exception as e:
-                logger.warning(f"Failed to initialize OpenRouter client: {e}")
-        return self._openrouter_client
-
     def generate_notebook(
         self,
         config: Dict[str, Any],
         prefer_local: bool = False,
+        use_cache: bool = True,
+        on_partial: Optional[Callable[[Tuple, Any], None]] = None,
     ) -> Tuple[str, str]:
         """
         Generate notebook using AI backends.
 
         Prioritizes speed (Groq) or quality (OpenRouter) over local (Ollama) unless requested.
+        Identical configs are served from the LLM response cache unless use_cache=False.
+        With on_partial, the response is streamed and on_partial(("cells", i), cell) is
+        called for each cell as it completes (on the LLM client's loop thread).
         """
+        with cache_bypass(not use_cache):
+            return self._generate_notebook(config, on_partial)
+
+    def _generate_notebook(
+        self, config: Dict[str, Any], on_partial: Optional[Callable[[Tuple, Any], None]] = None
+    ) -> Tuple[str, str]:
         # Build the prompt
         prompt = self._build_prompt(config)
 
-        # Try backends in order of quality (OpenRouter first), then speed (Groq), then local (Ollama)
-        # 1. OpenRouter (High quality)
-        if self.openrouter_available:
-            result = self._generate_openrouter(prompt, config)
+        # Try backends in order of quality (OpenRouter first), then speed (Groq), then local
+        # (Ollama); backends behind an open circuit are skipped without a request
+        chain = [
+            ("openrouter", self._generate_openrouter),
+            ("groq", self._generate_groq),
+            ("ollama", self._generate_ollama),
+        ]
+        if on_partial is not None:
+            chain = [
+                (backend, lambda p, c, b=backend: self._generate_streamed(b, p, c, on_partial))
+                for backend, _ in chain
+            ]
+        elif self.hedge:
+            ready = [backend for backend, _ in chain if self._backend_ready(backend)]
+            if len(ready) > 1:
+                result = self._generate_hedged(prompt, config, ready)
+                if result:
+                    return result
+                chain = []  # every healthy backend was already tried
+
+        for backend, generate in chain:
+            if not self._backend_ready(backend):
+                continue
+            result = generate(prompt, config)
             if result:
-                logger.info("Notebook generated via OpenRouter (Highest Quality)")
-                return result, "openrouter"
-
-        # 2. Groq (Fast)
-        if self.groq_available:
-            result = self._generate_groq(prompt, config)
-            if result:
-                logger.info("Notebook generated via Groq (Fast)")
-                return result, "groq"
-
-        # 3. Ollama (Local)
-        if self.ollama_available:
-            result = self._generate_ollama(prompt, config)
-            if result:
-                logger.info("Notebook generated via Ollama (Local)")
-                return result, "ollama"
+                logger.info(f"Notebook generated via {backend}")
+                return result, backend
 
         # All AI backends failed
         logger.error("All AI backends failed")
         raise RuntimeError("AI notebook generation failed: no backend succeeded")
 
+    def _backend_ready(self, backend: str) -> bool:
+        if backend == "ollama":
+            return self.ollama_available
+        configured = self.openrouter_available if backend == "openrouter" else self.groq_available
+        return configured and self.llm.is_healthy(backend)
+
     def _build_prompt(self, config: Dict[str, Any]) -> str:
         """Build a comprehensive prompt for a 'perfect' AI notebook."""
         model_id = config.get("model_id", "meta-llama/Llama-3.1-8B-Instruct")
@@ -186,64 +201,129 @@ DO NOT include markdown wrappers like ```json.
 """
         return prompt
 
+    def _attempt(self, backend: str, prompt: str, config: Dict[str, Any]) -> Optional[ChatAttempt]:
+        """The request each backend gets for a notebook; None if Ollama has no models."""
+        if backend == "openrouter":
+            return ChatAttempt(
+                "openrouter",
+                config.get("openrouter_model", "meta-llama/llama-3.3-70b-instruct"),
+                user_message(prompt),
+                temperature=0.1,
+                max_tokens=4000,
+                timeout=90,  # 90s timeout for complex generation
+                api_key=os.environ.get("OPENROUTER_API_KEY", ""),
+            )
+        if backend == "groq":
+            return ChatAttempt(
+                "groq",
+                config.get("groq_model", "llama-3.3-70b-versatile"),
+                user_message(prompt),
+                temperature=0.3,
+                max_tokens=4000,
+                json_mode=True,
+                timeout=45,  # Groq is fast, 45s is plenty
+                api_key=os.environ.get("GROQ_API_KEY", ""),
+            )
+        model = self._ollama_model()
+        if not model:
+            return None
+        # Use shorter timeout for Ollama to avoid blocking
+        return ChatAttempt("ollama", model, user_message(prompt), timeout=60)
+
+    def _generate_hedged(
+        self, prompt: str, config: Dict[str, Any], backends: list
+    ) -> Optional[Tuple[str, str]]:
+        """Overlapping requests across backends; the first parseable notebook wins."""
+        attempts = [a for a in (self._attempt(b, prompt, config) for b in backends) if a]
+        if not attempts:
+            return None
+        try:
+            result = self.llm.hedged_chat_sync(
+                attempts, parse=self._parse_or_forget
+            )
+        except LLMError as e:
+            logger.error(f"Hedged notebook generation failed: {e}")
+            return None
+        logger.info(
+            f"Notebook generated via {result.response.backend} "
+            f"(hedged, launched {result.launched})"
+        )
+        return result.value, result.response.backend
+
+    def _generate_streamed(
+        self,
+        backend: str,
+        prompt: str,
+        config: Dict[str, Any],
+        on_partial: Callable[[Tuple, Any], None],
+    ) -> Optional[str]:
+        """Stream one backend's notebook; a cut-off response keeps its completed cells."""
+        request = self._attempt(backend, prompt, config)
+        if request is None:
+            return None
+        parser = IncrementalJSONParser(NOTEBOOK_STREAM_PATHS)
+
+        def on_delta(text: str) -> None:
+            for path, cell in parser.feed(text):
+                on_partial(path, cell)
+
+        try:
+            response = self.llm.stream_chat_sync(**request.kwargs(), on_delta=on_delta)
+        except LLMError as e:
+            logger.error(f"{backend} notebook stream failed: {e}")
+            return self._salvage_notebook(parser)
+
+        if parser.done:
+            return self._parse_or_forget(response)
+        # Cut off (e.g. by max_tokens): don't replay the truncated text from the cache
+        self.llm.forget(response)
+        return self._salvage_notebook(parser) or self._parse_ai_response(response.text)
+
+    def _salvage_notebook(self, parser: IncrementalJSONParser) -> Optional[str]:
+        """A notebook of the cells that completed before the stream was cut off."""
+        data = parser.assemble()
+        cells = data.get("cells") if isinstance(data, dict) else None
+        notebook = normalize_notebook({"cells": cells})
+        if notebook is None:
+            return None
+        logger.warning(f"Notebook stream was cut off; keeping {len(cells)} completed cells")
+        return json.dumps(notebook, indent=2)
+
+    def _ollama_model(self) -> Optional[str]:
+        """Best installed Ollama model (from the cached model list), None if there is none."""
+        # Check available models (cached by the shared client) and use the best one
+        available = self.llm.cached_models("ollama")
+
+        # Try gpt-oss:20b first as requested
+        model_preferences = [
+            "gpt-oss:20b",
+            "gpt-oss",
+            "llama3.3-70b",
+            "llama3.1:70b",
+            "llama3.1:8b",
+            "mistral:latest",
+        ]
+
+        # Find first available model
+        for pref in model_preferences:
+            if pref in available:
+                return pref
+
+        return available[0] if available else None  # Use any available model
+
     def _generate_ollama(self, prompt: str, config: Dict[str, Any]) -> Optional[str]:
         """Generate notebook using local Ollama."""
         try:
-            import requests
-
-            # Check available models and use the best one
-            resp = requests.get("http://localhost:11434/api/tags", timeout=5)
-            if resp.status_code == 200:
-                models = resp.json().get("models", [])
-
-                # Try gpt-oss:20b first as requested
-                model_preferences = [
-                    "gpt-oss:20b",
-                    "gpt-oss",
-                    "llama3.3-70b",
-                    "llama3.1:70b",
-                    "llama3.1:8b",
-                    "mistral:latest",
-                ]
-
-                # Find first available model
-                available = [m["name"] for m in models]
-                model = None
-                for pref in model_preferences:
-                    if pref in available:
-                        model = pref
-                        break
-
-                if not model and available:
-                    model = available[0]  # Use any available model
-
-                if not model:
-                    logger.warning("No Ollama models available")
-                    return None
-
-                logger.info(f"Using Ollama model: {model}")
-
-                # Use shorter timeout for Ollama to avoid blocking
-                response = requests.post(
-                    "http://localhost:11434/api/generate",
-                    json={
-                        "model": model,
-                        "prompt": prompt,
-                        "stream": False,
-                    },
-                    timeout=60,  # Reduced to 60s
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    text = result.get("response", "")
-                    return self._parse_ai_response(text)
-                else:
-                    logger.warning(
-                        f"Ollama request failed: {response.status_code} - {response.text[:200]}"
-                    )
-
-        except requests.exceptions.Timeout:
+            request = self._attempt("ollama", prompt, config)
+            if request is None:
+                logger.warning("No Ollama models available")
+                return None
+
+            logger.info(f"Using Ollama model: {request.model}")
+            response = self.llm.chat_sync(**request.kwargs())
+            return self._parse_or_forget(response)
+
+        except LLMTimeoutError:
             logger.error("Ollama request timed out (60s)")
         except Exception as e:
             logger.error(f"Ollama generation failed: {e}")
@@ -253,23 +333,8 @@ DO NOT include markdown wrappers like ```json.
     def _generate_openrouter(self, prompt: str, config: Dict[str, Any]) -> Optional[str]:
         """Generate notebook using OpenRouter API."""
         try:
-            client = self._get_openrouter_client()
-            if not client:
-                return None
-
-            model = config.get("openrouter_model", "meta-llama/llama-3.3-70b-instruct")
-
-            response = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=4000,
-                timeout=90,  # 90s timeout for complex generation
-            )
-
-            if response.choices:
-                text = response.choices[0].message.content
-                return self._parse_ai_response(text)
+            response = self.llm.chat_sync(**self._attempt("openrouter", prompt, config).kwargs())
+            return self._parse_or_forget(response)
 
         except Exception as e:
             logger.error(f"OpenRouter generation failed: {e}")
@@ -279,98 +344,41 @@ DO NOT include markdown wrappers like ```json.
     def _generate_groq(self, prompt: str, config: Dict[str, Any]) -> Optional[str]:
         """Generate notebook using Groq cloud API."""
         try:
-            client = self._get_groq_client()
-            if not client:
-                return None
-
-            model = config.get("groq_model", "llama-3.3-70b-versatile")
-
-            response = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=4000,
-                response_format={"type": "json_object"},
-                timeout=45,  # Groq is fast, 45s is plenty
-            )
-
-            if response.choices:
-                text = response.choices[0].message.content
-                return self._parse_ai_response(text)
+            response = self.llm.chat_sync(**self._attempt("groq", prompt, config).kwargs())
+            return self._parse_or_forget(response)
 
         except Exception as e:
             logger.error(f"Groq generation failed: {e}")
 
         return None
 
-    def _parse_ai_response(self, text: str) -> Optional[str]:
-        """Parse AI response to extract JSON notebook."""
-        try:
-            text = text.strip()
-
-            start_idx = text.find("{")
-            end_idx = text.rfind("}")
-
-            if start_idx == -1 or end_idx == -1:
-                logger.warning("No JSON found in AI response")
-                return None
+    def _parse_or_forget(self, response: LLMResponse) -> Optional[str]:
+        """Parse a response; an unusable or cut-off one is dropped from the cache."""
+        notebook, truncated = self._parse_notebook(response.text)
+        if notebook is None or truncated:
+            self.llm.forget(response)
+        return notebook
 
-            json_str = text[start_idx : end_idx + 1]
-
-            try:
-                nb = json.loads(json_str)
-                if "cells" in nb:
-                    return json.dumps(nb, indent=2)
-                return json.dumps({"cells": nb}, indent=2)
-            except json.JSONDecodeError as e:
-                # Try to fix common issues like missing commas
-                fixed_json = self._fix_incomplete_json(json_str)
-                if fixed_json:
-                    nb = json.loads(fixed_json)
-                    if "cells" in nb:
-                        return json.dumps(nb, indent=2)
-                    return json.dumps({"cells": nb}, indent=2)
-                logger.error(f"Failed to parse AI response as JSON: {e}")
-                return None
-
-        except Exception as e:
-            logger.error(f"Error parsing AI response: {e}")
-            return None
-
-    def _fix_incomplete_json(self, json_str: str) -> Optional[str]:
-        """Attempt to fix incomplete JSON by adding missing braces and fixing common issues."""
-        try:
-            # Try to find a valid prefix of the JSON that can be parsed
-            # Count braces to find where we might be truncated
-            brace_count = 0
-            last_complete = len(json_str)
-
-            for i, char in enumerate(json_str):
-                if char == "{":
-                    brace_count += 1
-                elif char == "}":
-                    brace_count -= 1
-                    if brace_count == 0:
-                        last_complete = i + 1
-                        break
-
-            # Try parsing up to the last complete object
-            if last_complete < len(json_str):
-                try:
-                    return json_str[:last_complete]
-                except:
-                    pass
-
-            # Try adding missing closing braces
-            open_count = json_str.count("{") - json_str.count("}")
-            if open_count > 0:
-                json_str += "}" * open_count
-
-            json.loads(json_str)
-            return json_str
-
-        except:
-            return None
+    def _parse_ai_response(self, text: str) -> Optional[str]:
+        """Parse AI response to extract JSON notebook (a truncated one keeps its whole cells)."""
+        return self._parse_notebook(text)[0]
+
+    def _parse_notebook(self, text: str) -> Tuple[Optional[str], bool]:
+        """(notebook JSON or None, whether the response was cut off)."""
+        # Cells are only kept whole: {"cells": [...]} is depth 2, a bare cell list depth 1
+        found = extract_candidate(text, accept=_has_cells, complete_depth=2)
+        found = found or extract_candidate(text, complete_depth=1)
+        if found is None:
+            logger.warning("No JSON found in AI response")
+            return None, False
+        nb, candidate = found
+        notebook = normalize_notebook(nb)
+        if notebook is None:
+            logger.warning("AI response is not a usable notebook")
+            return None, candidate.truncated
+        if candidate.truncated:
+            logger.warning("AI response was cut off; keeping the complete cells of the notebook")
+        return json.dumps(notebook, indent=2), candidate.truncated
 
     def get_available_backends(self) -> Dict[str, bool]:
         """Get status of available backends."""
@@ -3,12 +3,13 @@
 
 from __future__ import annotations
 
+import functools
 import json
 import uuid
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Mapping, Optional, Sequence
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +19,14 @@ HAS_JINJA2 = False
 try:
     import nbformat
     from nbformat import NotebookNode, v4
+    from nbformat.v4 import nbformat_minor as NBFORMAT_MINOR
 
     HAS_NBFORMAT = True
 except ImportError:
     nbformat = None
     NotebookNode = None
     v4 = None
+    NBFORMAT_MINOR = 5
 
 try:
     from jinja2 import Environment, FileSystemLoader, select_autoescape
@@ -44,21 +47,152 @@ if HAS_JINJA2 and _TEMPLATE_DIR.exists():
         autoescape=select_autoescape(["md", "py", "json"]),
         trim_blocks=True,
         lstrip_blocks=True,
+        auto_reload=False,  # templates ship with the package; no stat() per render
     )
 
 
+@functools.lru_cache(maxsize=None)
+def _compiled_template(name: str):
+    return _TEMPLATE_ENV.get_template(name)
+
+
 def _render_template(name: str, context: Mapping[str, Any] = {}) -> str:
     """Render a Jinja2 template if available, otherwise return empty string."""
     if _TEMPLATE_ENV is None:
         return ""
     try:
-        tmpl = _TEMPLATE_ENV.get_template(name)
-        return tmpl.render(**context)
+        return _compiled_template(name).render(**context)
     except Exception as e:
         logger.warning(f"Template {name} not found: {e}")
         return ""
 
 
+# ─── Cell cache ──────────────────────────────────────────────────────────────
+#
+# Most template cells do not depend on the config. They are built, validated and
+# serialized once per process. A request only renders its parameterised cells, and
+# their JSON is spliced into a pre-serialized notebook skeleton. Cells get stable
+# ids, so a notebook's cell ids are the same on every request.
+
+_CELLS_PLACEHOLDER = "@@cells@@"
+_CELL_INDENT = " " * 4  # cells sit two levels deep in the indent=2 notebook JSON
+
+_INSTALL_UNSLOTH_SOURCE = """# Install Unsloth & Dependencies (2x-4x faster, 70% less memory)
+try:
+    import unsloth
+    print("✅ Unsloth already installed")
+except ImportError:
+    print("📦 Installing Unsloth and dependencies...")
+    !pip install -q "unsloth @ https://github.com/unslothai/unsloth/releases/download/v2024.11.06/unsloth-2024.11.06-py3-none-any.whl"
+    !pip install -q --no-deps "xformers<0.0.29" "trl<0.13.0" peft accelerate bitsandbytes
+    print("✅ Installation complete")
+
+import torch
+print(f"GPU: {torch.cuda.get_device_name(0) if torch.cuda.is_available() else 'No GPU found!'}")"""
+
+_INSTALL_HF_SOURCE = """# Install standard HuggingFace dependencies
+print("📦 Installing dependencies...")
+!pip install -q -U transformers datasets peft accelerate bitsandbytes trl
+!pip install -q matplotlib seaborn pandas tqdm
+print("✅ Installation complete")
+
+import torch
+print(f"GPU: {torch.cuda.get_device_name(0) if torch.cuda.is_available() else 'No GPU found!'}")"""
+
+_INFERENCE_SOURCE = """# 🔍 Quick Inference Test
+from transformers import pipeline
+
+print("Running sample inference...")
+prompt = "The capital of France is" # Replace with your sample prompt
+inputs = tokenizer([prompt], return_tensors = "pt").to("cuda")
+
+outputs = model.generate(**inputs, max_new_tokens = 64)
+response = tokenizer.batch_decode(outputs, skip_special_tokens=True)[0]
+print(f"\\nPrompt: {prompt}\\nResponse: {response}")
+"""
+
+_EXPORT_SOURCE = """# 💾 Export & Download
+OUTPUT_DIR = "finetuned_adapter"
+model.save_pretrained(OUTPUT_DIR)
+tokenizer.save_pretrained(OUTPUT_DIR)
+
+# Zip for download
+import shutil
+shutil.make_archive("adapter", 'zip', OUTPUT_DIR)
+print(f"✅ Model saved and zipped as adapter.zip")
+
+from google.colab import files
+files.download("adapter.zip")
+"""
+
+_STATIC_SOURCES = {
+    "install-unsloth": ("code", _INSTALL_UNSLOTH_SOURCE),
+    "install-hf": ("code", _INSTALL_HF_SOURCE),
+    "testing-header": ("markdown", "## 🧪 5. Testing & Export"),
+    "inference": ("code", _INFERENCE_SOURCE),
+    "export": ("code", _EXPORT_SOURCE),
+}
+
+# id(cell) -> serialized JSON, for the shared static cells
+_STATIC_JSON: Dict[int, str] = {}
+# Skeleton metadata + cell layout combinations already checked against the schema
+_VALIDATED_LAYOUTS: set = set()
+
+
+def _cell(cell_type: str, source: str, cell_id: str) -> NotebookNode:
+    """A v4 cell without v4.new_*_cell's per-call schema validation."""
+    if cell_type == "markdown":
+        return NotebookNode(
+            id=cell_id, cell_type="markdown", source=source, metadata=NotebookNode()
+        )
+    return NotebookNode(
+        id=cell_id,
+        cell_type="code",
+        metadata=NotebookNode(),
+        execution_count=None,
+        source=source,
+        outputs=[],
+    )
+
+
+def _serialize_cell(cell: Mapping[str, Any]) -> str:
+    return json.dumps(cell, indent=2, ensure_ascii=False).replace("\n", "\n" + _CELL_INDENT)
+
+
+@functools.lru_cache(maxsize=None)
+def _static_cell(name: str) -> NotebookNode:
+    """A config-independent cell, built once per process; shared, so never mutate it."""
+    cell_type, source = _STATIC_SOURCES[name]
+    cell = _cell(cell_type, source, name)
+    _STATIC_JSON[id(cell)] = _serialize_cell(cell)
+    return cell
+
+
+def _cell_json(cell: Mapping[str, Any]) -> str:
+    cached = _STATIC_JSON.get(id(cell))
+    return cached if cached is not None else _serialize_cell(cell)
+
+
+def clear_template_cache() -> None:
+    """Drop every cached cell, template and skeleton (they are rebuilt on next use)."""
+    _static_cell.cache_clear()
+    _compiled_template.cache_clear()
+    _STATIC_JSON.clear()
+    _VALIDATED_LAYOUTS.clear()
+    _skeleton.cache_clear()
+
+
+@functools.lru_cache(maxsize=32)
+def _skeleton(metadata_json: str) -> Tuple[str, str]:
+    """The notebook JSON before and after its cells, for one metadata block."""
+    nb = v4.new_notebook(metadata=json.loads(metadata_json))
+    nb.cells = [_CELLS_PLACEHOLDER]
+    head, tail = json.dumps(nb, indent=2, ensure_ascii=False).split(
+        json.dumps(_CELLS_PLACEHOLDER), 1
+    )
+    return head, tail
+
+
 class NotebookGenerator:
     """
     Build a fully-valid Jupyter notebook for Google Colab or any Jupyter environment.
@@ -122,56 +256,45 @@ class NotebookGenerator:
 
         self._validate_config(config)
 
-        nb = v4.new_notebook(metadata=self.base_metadata)
+        if not (ai_generated and ai_response):
+            return self._render_template_notebook(config)
 
-        if ai_generated and ai_response:
-            try:
-                # Clean up AI response if it's wrapped in markdown
-                cleaned_response = ai_response.strip()
-                if cleaned_response.startswith("```json"):
-                    cleaned_response = cleaned_response[7:]
-                if cleaned_response.endswith("```"):
-                    cleaned_response = cleaned_response[:-3]
-                cleaned_response = cleaned_response.strip()
-
-                ai_nb = json.loads(cleaned_response)
-                
-                # Support both full notebook and just cells list
-                if isinstance(ai_nb, list):
-                    cells_data = ai_nb
-                elif isinstance(ai_nb, dict):
-                    cells_data = ai_nb.get("cells", [])
-                    # Merge metadata if AI provided it
-                    if "metadata" in ai_nb:
-                        self.base_metadata.update(ai_nb["metadata"])
-                else:
-                    raise ValueError("AI response is not a valid notebook format (dict or list)")
-
-                if cells_data:
-                    nb.cells = []
-                    for cell in cells_data:
-                        ctype = cell.get("cell_type", "code")
-                        source = cell.get("source", "")
-                        if ctype == "markdown":
-                            nb.cells.append(v4.new_markdown_cell(source=source))
-                        else:
-                            nb.cells.append(v4.new_code_cell(source=source))
+        nb = v4.new_notebook(metadata=self.base_metadata)
+        try:
+            # Clean up AI response if it's wrapped in markdown
+            cleaned_response = ai_response.strip()
+            if cleaned_response.startswith("```json"):
+                cleaned_response = cleaned_response[7:]
+            if cleaned_response.endswith("```"):
+                cleaned_response = cleaned_response[:-3]
+            cleaned_response = cleaned_response.strip()
+
+            ai_nb = json.loads(cleaned_response)
+
+            # Support both full notebook and just cells list
+            if isinstance(ai_nb, list):
+                cells_data = ai_nb
+            elif isinstance(ai_nb, dict):
+                cells_data = ai_nb.get("cells", [])
+                # Merge metadata if AI provided it (into this notebook only)
+                if "metadata" in ai_nb:
+                    nb.metadata.update(ai_nb["metadata"])
+            else:
+                raise ValueError("AI response is not a valid notebook format (dict or list)")
+
+            if not cells_data:
+                raise ValueError("No cells found in AI response")
+            for cell in cells_data:
+                ctype = cell.get("cell_type", "code")
+                source = cell.get("source", "")
+                if ctype == "markdown":
+                    nb.cells.append(v4.new_markdown_cell(source=source))
                 else:
-                    raise ValueError("No cells found in AI response")
-
-            except (json.JSONDecodeError, ValueError, KeyError) as e:
-                logger.warning(f"AI response parsing failed, using enhanced template: {e}")
-                nb.cells.extend(self._build_header_cell(config))
-                nb.cells.extend(self._build_installation_cells(config))
-                nb.cells.extend(self._build_data_preparation_cells(config))
-                nb.cells.extend(self._build_training_cells(config))
-                nb.cells.extend(self._build_postprocessing_cells(config))
-        else:
-            nb.cells.extend(self._build_header_cell(config))
-            nb.cells.extend(self._build_installation_cells(config))
-            nb.cells.extend(self._build_data_preparation_cells(config))
-            nb.cells.extend(self._build_training_cells(config))
-            nb.cells.extend(self._build_postprocessing_cells(config))
+                    nb.cells.append(v4.new_code_cell(source=source))
+
+        except (json.JSONDecodeError, ValueError, KeyError) as e:
+            logger.warning(f"AI response parsing failed, using enhanced template: {e}")
+            return self._render_template_notebook(config)
 
         try:
             nbformat.validate(nb)
@@ -180,6 +303,33 @@ class NotebookGenerator:
 
         return json.dumps(nb, indent=2, ensure_ascii=False)
 
+    def _template_cells(self, cfg: Mapping[str, Any]) -> List[NotebookNode]:
+        return [
+            *self._build_header_cell(cfg),
+            *self._build_installation_cells(cfg),
+            *self._build_data_preparation_cells(cfg),
+            *self._build_training_cells(cfg),
+            *self._build_postprocessing_cells(cfg),
+        ]
+
+    def _render_template_notebook(self, cfg: Mapping[str, Any]) -> str:
+        """Splice the template cells into the cached skeleton for this generator's metadata."""
+        metadata_json = json.dumps(self.base_metadata, default=str)
+        head, tail = _skeleton(metadata_json)
+        cells = self._template_cells(cfg)
+        notebook_json = head + (",\n" + _CELL_INDENT).join(map(_cell_json, cells)) + tail
+
+        # Only the layout (which cells, which metadata) can break the schema; the
+        # parameterised cells only vary in their source text. Check each layout once.
+        layout = (metadata_json, tuple(cell["id"] for cell in cells))
+        if layout not in _VALIDATED_LAYOUTS:
+            try:
+                nbformat.validate(json.loads(notebook_json))
+                _VALIDATED_LAYOUTS.add(layout)
+            except Exception as e:
+                logger.error(f"Notebook validation failed: {e}")
+        return notebook_json
+
     def _validate_config(self, cfg: Mapping[str, Any]) -> None:
         """Validate required config keys."""
         required = {"model_id", "method"}
@@ -217,36 +367,13 @@ This notebook implements a production-ready fine-tuning pipeline for `{cfg.get("
 2. **Upload** your dataset when prompted
 3. **Run All** cells (`Ctrl + F9`)
 """
-        return [v4.new_markdown_cell(source=header)]
+        return [_cell("markdown", header, "header")]
 
     def _build_installation_cells(self, cfg: Mapping[str, Any]) -> List[NotebookNode]:
         """Create installation cell with optimized dependencies."""
         use_unsloth = cfg.get("use_unsloth", any(m in cfg.get("model_id", "").lower() for m in ["llama", "mistral", "gemma", "phi"]))
         
-        if use_unsloth:
-            install_code = """# Install Unsloth & Dependencies (2x-4x faster, 70% less memory)
-try:
-    import unsloth
-    print("✅ Unsloth already installed")
-except ImportError:
-    print("📦 Installing Unsloth and dependencies...")
-    !pip install -q "unsloth @ https://github.com/unslothai/unsloth/releases/download/v2024.11.06/unsloth-2024.11.06-py3-none-any.whl"
-    !pip install -q --no-deps "xformers<0.0.29" "trl<0.13.0" peft accelerate bitsandbytes
-    print("✅ Installation complete")
-
-import torch
-print(f"GPU: {torch.cuda.get_device_name(0) if torch.cuda.is_available() else 'No GPU found!'}")"""
-        else:
-            install_code = """# Install standard HuggingFace dependencies
-print("📦 Installing dependencies...")
-!pip install -q -U transformers datasets peft accelerate bitsandbytes trl
-!pip install -q matplotlib seaborn pandas tqdm
-print("✅ Installation complete")
-
-import torch
-print(f"GPU: {torch.cuda.get_device_name(0) if torch.cuda.is_available() else 'No GPU found!'}")"""
-
-        return [v4.new_code_cell(source=install_code)]
+        return [_static_cell("install-unsloth" if use_unsloth else "install-hf")]
 
     def _build_data_preparation_cells(self, cfg: Mapping[str, Any]) -> List[NotebookNode]:
         """Create data preparation cells with profiling and visualization."""
@@ -291,7 +418,7 @@ plt.title(f"Distribution of '{{label_col}}'")
 plt.xticks(rotation=45)
 plt.show()
 '''
-        return [v4.new_code_cell(source=code)]
+        return [_cell("code", code, "data-preparation")]
 
     def _build_training_cells(self, cfg: Mapping[str, Any]) -> List[NotebookNode]:
         """Create comprehensive training cells."""
@@ -420,40 +547,11 @@ print("🚀 Starting training...")
 trainer_stats = trainer.train()
 print(f"✅ Training finished! Total time: {{trainer_stats.metrics['train_runtime']:.2f}}s")
 '''
-        return [v4.new_code_cell(source=code), v4.new_code_cell(source=trainer_code)]
+        return [_cell("code", code, "model-setup"), _cell("code", trainer_code, "training")]
 
     def _build_postprocessing_cells(self, cfg: Mapping[str, Any]) -> List[NotebookNode]:
         """Create post-processing, inference and export cells."""
-        inference_code = """# 🔍 Quick Inference Test
-from transformers import pipeline
-
-print("Running sample inference...")
-prompt = "The capital of France is" # Replace with your sample prompt
-inputs = tokenizer([prompt], return_tensors = "pt").to("cuda")
-
-outputs = model.generate(**inputs, max_new_tokens = 64)
-response = tokenizer.batch_decode(outputs, skip_special_tokens=True)[0]
-print(f"\\nPrompt: {prompt}\\nResponse: {response}")
-"""
-
-        export_code = """# 💾 Export & Download
-OUTPUT_DIR = "finetuned_adapter"
-model.save_pretrained(OUTPUT_DIR)
-tokenizer.save_pretrained(OUTPUT_DIR)
-
-# Zip for download
-import shutil
-shutil.make_archive("adapter", 'zip', OUTPUT_DIR)
-print(f"✅ Model saved and zipped as adapter.zip")
-
-from google.colab import files
-files.download("adapter.zip")
-"""
-
-        return [v4.new_markdown_cell(source="## 🧪 5. Testing & Export"),
-                v4.new_code_cell(source=inference_code),
-                v4.new_code_cell(source=export_code)]
-
+        return [_static_cell("testing-header"), _static_cell("inference"), _static_cell("export")]
 
 
 def validate_notebook(notebook_json: str) -> tuple[bool, Optional[str]]:
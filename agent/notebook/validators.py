@@ -51,6 +51,65 @@ def validate_notebook(notebook_json: str) -> Tuple[bool, Optional[str]]:
         return False, f"Validation error: {e}"
 
 
+CELL_TYPES = {"code", "markdown", "raw"}
+
+
+def _is_source(source: Any) -> bool:
+    return isinstance(source, str) or (
+        isinstance(source, list) and all(isinstance(line, str) for line in source)
+    )
+
+
+def normalize_notebook(data: Any) -> Optional[Dict[str, Any]]:
+    """
+    Check the shape of a notebook parsed from model output, without nbformat.
+
+    Accepts a notebook dict or a bare list of cells. Missing metadata, outputs and
+    execution counts are filled in; a cell without a type and source, or any field
+    of the wrong type, rejects the whole notebook.
+
+    Returns
+    -------
+    Optional[Dict[str, Any]]
+        The notebook with every required key present, or None.
+    """
+    if isinstance(data, list):
+        data = {"cells": data}
+    if not isinstance(data, dict) or not isinstance(data.get("cells"), list):
+        return None
+    if not data["cells"]:
+        return None
+
+    cells = []
+    for cell in data["cells"]:
+        if not isinstance(cell, dict) or cell.get("cell_type") not in CELL_TYPES:
+            return None
+        if not _is_source(cell.get("source")):
+            return None
+        cell = {**cell, "metadata": cell.get("metadata", {})}
+        if not isinstance(cell["metadata"], dict):
+            return None
+        if cell["cell_type"] == "code":
+            cell.setdefault("outputs", [])
+            cell.setdefault("execution_count", None)
+            if not isinstance(cell["outputs"], list):
+                return None
+        cells.append(cell)
+
+    notebook = {
+        **data,
+        "cells": cells,
+        "metadata": data.get("metadata", {}),
+        "nbformat": data.get("nbformat", 4),
+        "nbformat_minor": data.get("nbformat_minor", 4),
+    }
+    if not isinstance(notebook["metadata"], dict):
+        return None
+    if not all(isinstance(notebook[k], int) for k in ("nbformat", "nbformat_minor")):
+        return None
+    return notebook
+
+
 def validate_config(config: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
     """
     Validate training configuration for notebook generation.
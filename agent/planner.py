@@ -2,6 +2,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
+from collections import deque
 from dataclasses import dataclass, field
 from typing import Optional, Literal
 import uuid
@@ -54,6 +55,12 @@ ALGORITHM_LIBRARY = {
 }
 
 
+# Most recent infeasible constraint sets kept by ConstraintValidator
+MAX_INFEASIBILITY_LOG = 1000
+
+# Models that need a GPU to train/serve in reasonable time
+GPU_HEAVY_MODELS = ["BERT", "RoBERTa", "ViT", "ResNet50", "EfficientNet", "LSTM", "DistilBERT", "Prophet"]
+
 @dataclass
 class ConstraintSpec:
     data_type: Literal["tabular", "text", "image", "time-series"]
@@ -81,10 +88,10 @@ class FeasibilityResult:
 
 
 class ConstraintValidator:
-    def __init__(self):
-        self.infeasibility_log = []
+    def __init__(self, max_log_entries: int = MAX_INFEASIBILITY_LOG):
+        self.infeasibility_log = deque(maxlen=max_log_entries)
     
-    def validate(self, constraints: ConstraintSpec) -> FeasibilityResult:
+    def validate(self, constraints: ConstraintSpec, record: bool = True) -> FeasibilityResult:
         violations = []
         suggestions = []
         
@@ -119,7 +126,7 @@ class ConstraintValidator:
         
         is_feasible = len(violations) == 0
         
-        if not is_feasible:
+        if not is_feasible and record:
             self.infeasibility_log.append({
                 "constraints": constraints.__dict__,
                 "violations": violations,
@@ -142,15 +149,7 @@ class DesignAgent:
         feasibility = self.validator.validate(constraints)
         
         if not feasibility.is_feasible:
-            return {
-                "status": "infeasible",
-                "feasibility": {
-                    "is_feasible": False,
-                    "violations": feasibility.violations,
-                    "suggestions": feasibility.suggestions,
-                },
-                "designs": [],
-            }
+            return self._infeasible_result(feasibility)
         
         algorithms = ALGORITHM_LIBRARY.get(constraints.data_type, ALGORITHM_LIBRARY["tabular"])
         models = algorithms.get("models", {})
@@ -165,33 +164,153 @@ class DesignAgent:
         filtered = self._apply_hard_filters(candidates, constraints)
         
         if not filtered:
-            return {
-                "status": "no_feasible",
-                "feasibility": {
-                    "is_feasible": False,
-                    "violations": ["No pipeline meets all constraints"],
-                    "suggestions": [
-                        f"Increase budget from ${constraints.max_cost}",
-                        f"Increase latency from {constraints.max_latency}ms",
-                        f"Increase carbon from {constraints.max_carbon}kg",
-                    ],
-                },
-                "designs": [],
-            }
+            return self._no_feasible_result(constraints)
         
         ranked = self._rank_pipelines(filtered, constraints)
         
+        return self._success_result(constraints, ranked[:self.max_designs])
+    
+    def generate_designs_batch(self, constraint_sets: list, detail: bool = True) -> list:
+        """Run generate_designs for many constraint sets in one pass.
+        
+        Candidates are built once per data type. The hardware/deployment checks and
+        the ranking score are the same helpers generate_designs uses, evaluated once
+        per distinct setting instead of once per set; the cost/carbon/latency limits
+        go through HardConstraintFilter.feasibility_matrix for every set at once.
+        Batch validation is not recorded in the validator's infeasibility_log. With
+        detail=False designs only carry the model, its estimates and score.
+        """
+        import numpy as np
+        from lib.feasibility.engine import HardConstraintFilter
+        from lib.validation.schemas import Constraints, ModelFamily, PipelineCandidate
+        
+        hard_filter = HardConstraintFilter()
+        results: list = [None] * len(constraint_sets)
+        by_data_type: dict = {}
+        for i, constraints in enumerate(constraint_sets):
+            by_data_type.setdefault(constraints.data_type, []).append(i)
+        
+        for data_type, indices in by_data_type.items():
+            algorithms = ALGORITHM_LIBRARY.get(data_type, ALGORITHM_LIBRARY["tabular"])
+            models = algorithms.get("models", {})
+            names = list(models)
+            estimates = {name: self._estimates(models[name]) for name in names}
+            candidates = [
+                PipelineCandidate(
+                    id=name,
+                    name=name,
+                    description="",
+                    model_families=[ModelFamily.CLASSICAL],
+                    estimated_cost=estimates[name]["estimated_cost"],
+                    estimated_carbon=estimates[name]["estimated_carbon"],
+                    estimated_latency_ms=estimates[name]["estimated_latency"],
+                    estimated_accuracy=estimates[name]["estimated_accuracy"],
+                    components=[],
+                )
+                for name in names
+            ]
+            sets = [constraint_sets[i] for i in indices]
+            
+            eligible_rows: dict = {}
+            score_rows: dict = {}
+            
+            def eligible(constraints):
+                key = (constraints.hardware, constraints.deployment, constraints.max_latency)
+                if key not in eligible_rows:
+                    eligible_rows[key] = [
+                        self._check_hardware_constraint(name, constraints)
+                        and self._check_deployment_constraint(models[name], constraints)
+                        for name in names
+                    ]
+                return eligible_rows[key]
+            
+            def scores(objective):
+                if objective not in score_rows:
+                    score_rows[objective] = [self._score(estimates[name], objective) for name in names]
+                return score_rows[objective]
+            
+            # Grids repeat the same limits a lot, so filter each distinct triple once
+            limit_rows: dict = {}
+            for c in sets:
+                limit_rows.setdefault((c.max_cost, c.max_carbon, c.max_latency), len(limit_rows))
+            # min_accuracy=None: the planner has no accuracy floor
+            limits = [
+                Constraints.model_construct(
+                    max_cost_usd=cost, max_carbon_kg=carbon, max_latency_ms=latency, min_accuracy=None
+                )
+                for cost, carbon, latency in limit_rows
+            ]
+            within_limits = hard_filter.feasibility_matrix(candidates, limits)
+            feasible = np.array([eligible(c) for c in sets], dtype=bool)
+            feasible &= within_limits[
+                [limit_rows[(c.max_cost, c.max_carbon, c.max_latency)] for c in sets]
+            ]
+            score_table = np.where(feasible, np.array([scores(c.objective) for c in sets]), -np.inf)
+            # Stable, so ties keep library order exactly like sorted(..., reverse=True)
+            order = np.argsort(-score_table, axis=1, kind="stable")
+            feasible_counts = feasible.sum(axis=1)
+            
+            for row, i in enumerate(indices):
+                constraints = sets[row]
+                feasibility = self.validator.validate(constraints, record=False)
+                if not feasibility.is_feasible:
+                    results[i] = self._infeasible_result(feasibility)
+                    continue
+                if feasible_counts[row] == 0:
+                    results[i] = self._no_feasible_result(constraints)
+                    continue
+                
+                designs = []
+                for j in order[row, : min(feasible_counts[row], self.max_designs)]:
+                    name = names[j]
+                    if detail:
+                        design = self._create_pipeline_design(name, models[name], constraints)
+                        design["meets_constraints"] = True
+                    else:
+                        design = {"model": name, **estimates[name]}
+                    design["score"] = float(score_table[row, j])
+                    designs.append(design)
+                results[i] = self._success_result(constraints, designs)
+        
+        return results
+    
+    def _infeasible_result(self, feasibility: FeasibilityResult) -> dict:
+        return {
+            "status": "infeasible",
+            "feasibility": {
+                "is_feasible": False,
+                "violations": feasibility.violations,
+                "suggestions": feasibility.suggestions,
+            },
+            "designs": [],
+        }
+    
+    def _no_feasible_result(self, constraints: ConstraintSpec) -> dict:
+        return {
+            "status": "no_feasible",
+            "feasibility": {
+                "is_feasible": False,
+                "violations": ["No pipeline meets all constraints"],
+                "suggestions": [
+                    f"Increase budget from ${constraints.max_cost}",
+                    f"Increase latency from {constraints.max_latency}ms",
+                    f"Increase carbon from {constraints.max_carbon}kg",
+                ],
+            },
+            "designs": [],
+        }
+    
+    def _success_result(self, constraints: ConstraintSpec, designs: list) -> dict:
         return {
             "status": "success",
             "feasibility": {"is_feasible": True},
             "constraints_used": constraints.__dict__,
-            "designs": ranked[:self.max_designs],
+            "designs": designs,
         }
     
     def _check_hardware_constraint(self, model_name: str, constraints: ConstraintSpec) -> bool:
         if constraints.hardware == "CPU-only":
-            expensive_models = ["BERT", "RoBERTa", "ViT", "ResNet50", "EfficientNet", "LSTM", "DistilBERT", "Prophet"]
-            if any(m in model_name for m in expensive_models):
+            if any(m in model_name for m in GPU_HEAVY_MODELS):
                 return False
         return True
     
@@ -227,28 +346,35 @@ class DesignAgent:
     
     def _rank_pipelines(self, candidates: list, constraints: ConstraintSpec) -> list:
         for c in candidates:
-            if constraints.objective == "accuracy":
-                c["score"] = c["estimated_accuracy"]
-            elif constraints.objective == "cost":
-                c["score"] = 1.0 - (c["estimated_cost"] / 50.0)
-            elif constraints.objective == "carbon":
-                c["score"] = 1.0 - (c["estimated_carbon"] / 5.0)
-            elif constraints.objective == "latency":
-                c["score"] = 1.0 - (c["estimated_latency"] / 1000.0)
-            else:
-                c["score"] = c["estimated_accuracy"]
+            c["score"] = self._score(c, constraints.objective)
         
         return sorted(candidates, key=lambda x: x["score"], reverse=True)
     
-    def _create_pipeline_design(self, model_name: str, model_specs: dict, constraints: ConstraintSpec) -> dict:
+    def _score(self, candidate: dict, objective: str) -> float:
+        if objective == "accuracy":
+            return candidate["estimated_accuracy"]
+        elif objective == "cost":
+            return 1.0 - (candidate["estimated_cost"] / 50.0)
+        elif objective == "carbon":
+            return 1.0 - (candidate["estimated_carbon"] / 5.0)
+        elif objective == "latency":
+            return 1.0 - (candidate["estimated_latency"] / 1000.0)
+        return candidate["estimated_accuracy"]
+    
+    def _estimates(self, model_specs: dict) -> dict:
         return {
-            "rank": 0,
-            "model": model_name,
-            "model_family": "transformer" if "BERT" in model_name or "RoBERTa" in model_name else "classical",
             "estimated_accuracy": model_specs.get("accuracy", 0.8),
             "estimated_cost": model_specs.get("cost", 10),
             "estimated_carbon": model_specs.get("carbon", 0.5),
             "estimated_latency": model_specs.get("latency", 100),
+        }
+    
+    def _create_pipeline_design(self, model_name: str, model_specs: dict, constraints: ConstraintSpec) -> dict:
+        return {
+            "rank": 0,
+            "model": model_name,
+            "model_family": "transformer" if "BERT" in model_name or "RoBERTa" in model_name else "classical",
+            **self._estimates(model_specs),
             "pipeline_spec": {
                 "data": {
                     "cleaning": ["dedup", "impute"],
@@ -8,6 +8,16 @@ import json
 import logging
 from datetime import datetime
 
+from agent.artifact_store import get_artifact_store
+from agent.throughput_calibration import record_job_throughput
+from agent.training_data import load_tokenized_dataset, padding_stats
+from lib.training.packing import (
+    PackedSequenceCollator,
+    pack_examples,
+    packing_stats,
+    supports_packed_sequences,
+)
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -46,12 +56,11 @@ def run_finetuning_task(self, job_id: str, config: dict):
         TrainingArguments,
         Trainer,
         BitsAndBytesConfig,
+        DataCollatorForLanguageModeling,
     )
     from peft import LoraConfig, get_peft_model, TaskType, prepare_model_for_kbit_training
     from datasets import Dataset
-    import pandas as pd
     import torch
-    import shutil
 
     logger.info(f"Starting finetuning job {job_id} with config: {config}")
 
@@ -94,59 +103,85 @@ def run_finetuning_task(self, job_id: str, config: dict):
         model = get_peft_model(model, lora_config)
 
     logger.info("Preparing dataset...")
-    if dataset_path and os.path.exists(dataset_path):
-        df = pd.read_csv(dataset_path)
-        label_candidates = ["label", "target", "y", "class", "output"]
-        label_col = next((c for c in df.columns if c.lower() in label_candidates), None)
-
-        if label_col:
-            df["text"] = df.apply(
-                lambda row: (
-                    f"Input: {', '.join([f'{k}: {v}' for k, v in row.drop(label_col).items()])} Output: {row[label_col]}"
-                ),
-                axis=1,
-            )
-        else:
-            df["text"] = df.apply(
-                lambda row: " | ".join([f"{k}: {v}" for k, v in row.items()]), axis=1
-            )
-
-        def tokenize(examples):
-            tokens = tokenizer(
-                examples["text"],
-                padding="max_length",
-                truncation=True,
-                max_length=config.get("max_length", 512),
-            )
-            tokens["labels"] = tokens["input_ids"].copy()
-            return tokens
-
-        dataset = Dataset.from_pandas(df[["text"]])
-        tokenized = dataset.map(tokenize, batched=True, remove_columns=["text"])
-    else:
+    if not (dataset_path and os.path.exists(dataset_path)):
         raise ValueError(f"Dataset not found at {dataset_path}")
 
+    max_length = config.get("max_length", 512)
+    batch_size = config.get("batch_size", 1)
+    packing = config.get("packing", False)
+    if packing and not supports_packed_sequences(model):
+        # Without a block-diagonal mask packed examples would attend to each other
+        logger.warning(
+            f"Packing disabled: {model_id} with "
+            f"{getattr(model.config, '_attn_implementation', None)} attention does not "
+            f"support packed sequences"
+        )
+        packing = False
+    table, cache_report = load_tokenized_dataset(dataset_path, tokenizer, max_length)
+    stats = padding_stats(table, max_length, batch_size)
+    if packing:
+        # Several short examples per row; position_ids keep them from attending to each other
+        packed = pack_examples(table.column("input_ids").to_pylist(), max_length)
+        tokenized = Dataset.from_dict(packed)
+        stats.update(packing_stats(table.column("length").to_pylist(), max_length, batch_size))
+        collator = PackedSequenceCollator(tokenizer.pad_token_id, pad_to_multiple_of=8)
+        logger.info(
+            f"Packed {stats['examples']} examples into {stats['packs']} rows: packing "
+            f"efficiency {stats['packing_efficiency']:.0%}, steps per epoch "
+            f"{stats['steps_per_epoch_unpacked']} -> {stats['steps_per_epoch_packed']}"
+        )
+    else:
+        # Unpadded rows; the collator pads each batch to its longest sequence
+        tokenized = Dataset(table)
+        collator = DataCollatorForLanguageModeling(
+            tokenizer=tokenizer, mlm=False, pad_to_multiple_of=8
+        )
+    logger.info(
+        f"Dataset ready ({'cached' if cache_report['cache_hit'] else 'tokenized'}): "
+        f"{stats['tokens']} tokens, padding efficiency "
+        f"{stats['padding_efficiency_max_length']:.0%} at max_length -> "
+        f"{stats['padding_efficiency_dynamic']:.0%} per batch"
+    )
+
     logger.info("Training model...")
+    num_epochs = config.get("num_epochs", 1)
     args = TrainingArguments(
         output_dir=output_dir,
-        num_train_epochs=config.get("num_epochs", 1),
-        per_device_train_batch_size=config.get("batch_size", 1),
+        num_train_epochs=num_epochs,
+        per_device_train_batch_size=batch_size,
         learning_rate=config.get("learning_rate", 2e-4),
         fp16=torch.cuda.is_available(),
         logging_steps=1,
         save_strategy="no",
         report_to="none",
         gradient_accumulation_steps=1,
+        group_by_length=not packing,
+        length_column_name="length",
+        # seq_lengths is not a model input but the packing collator needs it
+        remove_unused_columns=not packing,
     )
 
-    trainer = Trainer(model=model, args=args, train_dataset=tokenized)
-    trainer.train()
+    trainer = Trainer(model=model, args=args, train_dataset=tokenized, data_collator=collator)
+    train_output = trainer.train()
+    train_runtime = train_output.metrics.get("train_runtime") or 0.0
+    tokens_per_sec = stats["tokens"] * num_epochs / train_runtime if train_runtime else None
+    # Measured throughput feeds the estimates for the next job on this model and hardware
+    record_job_throughput(
+        job_id,
+        model_id,
+        method,
+        config.get("lora_r", 16),
+        max_length,
+        tokens_per_sec,
+        torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+    )
 
     logger.info("Saving model...")
     model.save_pretrained(output_dir)
     tokenizer.save_pretrained(output_dir)
 
-    shutil.make_archive(output_dir, "zip", output_dir)
+    # Deduplicated against earlier runs; download through the Adapter Hub instead of a zip copy
+    manifest = get_artifact_store().ingest(job_id, output_dir)
 
     result = {
         "status": "completed",
@@ -154,6 +189,15 @@ def run_finetuning_task(self, job_id: str, config: dict):
         "job_id": job_id,
         "model_id": model_id,
         "method": method,
+        "train_tokens": stats["tokens"] * num_epochs,
+        "tokens_per_sec": tokens_per_sec,
+        "padding_efficiency": stats["padding_efficiency_dynamic"],
+        "packing": packing,
+        "packing_efficiency": stats.get("packing_efficiency"),
+        "tokenized_cache_hit": cache_report["cache_hit"],
+        "artifact_id": job_id,
+        "artifact_bytes": manifest["total_bytes"],
+        "artifact_new_bytes": manifest["new_bytes"],
     }
 
     logger.info(f"Finetuning completed: {result}")
@@ -0,0 +1,392 @@
+"""
+Measured training throughput for fine-tuning estimates
+
+/api/finetuning/estimate used to divide an assumed token count by one constant per
+method. This module keeps the tokens/sec actually measured for a
+(base model, method, LoRA rank, sequence length, hardware) combination, and turns
+them into an estimate with a 95% interval:
+
+- completed jobs record a "job" sample: run_finetuning_task for the ones trained
+  here, and job progress reports for the ones trained on Colab/Kaggle;
+- POST /calibration/samples records a "manual" sample;
+- run_cpu_benchmark() times float32 matmuls on this machine and converts the
+  FLOP/s into a "benchmark" sample for a given model (6 FLOPs per parameter per
+  token for full fine-tuning, 4 with frozen base weights).
+
+Estimates fall back from the exact combination, to the same model on the same
+hardware, to any model on the same hardware (scaled by parameter count), to the
+built-in per-method defaults. Each step widens the interval. Measured samples
+are preferred over benchmark ones at every step.
+
+Hardware fingerprints are short normalised strings: "gpu:t4",
+"gpu:a100-sxm4-40gb", "cpu:x86_64-8c-amd-epyc-7b13".
+
+Configuration: THROUGHPUT_CALIBRATION_DB_PATH (defaults to FINETUNING_DB_PATH,
+so samples live next to the jobs they came from).
+"""
+
+import logging
+import math
+import os
+import platform
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tokens/sec of a ~7B model on a Colab T4, the previous fixed estimate
+DEFAULT_TOKENS_PER_SEC = {"qlora": 800, "lora": 600, "full_ft": 300}
+REFERENCE_PARAMS_B = 7.0
+# Training FLOPs per parameter per token: forward 2, backward 4 (2 with frozen weights)
+FLOPS_PER_PARAM_TOKEN = {"full_ft": 6.0, "lora": 4.0, "qlora": 4.0}
+# Share of peak matmul FLOP/s a training step achieves; QLoRA also dequantizes weights
+BENCHMARK_EFFICIENCY = {"full_ft": 0.35, "lora": 0.35, "qlora": 0.25}
+MAX_SAMPLES_PER_KEY = 50
+
+# Default hardware when a request names a platform but not the hardware
+PLATFORM_HARDWARE = {"colab": "gpu:t4", "kaggle": "gpu:t4", "runpod": "gpu:a100"}
+
+Z_95 = 1.96
+_PRIOR_LOG_SD = 0.15  # run-to-run spread assumed until 3 samples exist
+# Extra log-space uncertainty for each fallback level
+_LEVEL_SPREAD = {"exact": 0.0, "model": 0.2, "hardware": 0.4, "default": 0.7}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS throughput_samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hardware TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    method TEXT NOT NULL,
+    lora_r INTEGER NOT NULL,
+    seq_len INTEGER NOT NULL,
+    params_b REAL,
+    tokens_per_sec REAL NOT NULL,
+    source TEXT NOT NULL,
+    job_id TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_throughput_samples_key
+    ON throughput_samples(hardware, method, model_id);
+"""
+
+_COLUMNS = (
+    "hardware",
+    "model_id",
+    "method",
+    "lora_r",
+    "seq_len",
+    "params_b",
+    "tokens_per_sec",
+    "source",
+    "job_id",
+    "created_at",
+)
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1]
+    except OSError:
+        pass
+    return platform.processor() or "unknown"
+
+
+def hardware_fingerprint(name: Optional[str] = None) -> str:
+    """Normalise a reported GPU/CPU name; no name fingerprints this machine's CPU."""
+    if name:
+        if name.startswith(("gpu:", "cpu:")):
+            return name.lower()
+        slug = _slug(name)
+        slug = re.sub(r"^(nvidia-)?(tesla-|geforce-)?", "", slug)
+        return f"gpu:{slug}"
+    cpu = _slug(re.sub(r"\(r\)|\(tm\)|cpu @ .*", "", _cpu_model().lower()))
+    return f"cpu:{platform.machine().lower()}-{os.cpu_count() or 1}c-{cpu}"
+
+
+def params_from_model_id(model_id: str) -> Optional[float]:
+    """Parameter count in billions from names like "Llama-3.1-8B" or "Qwen2.5-0.5B"."""
+    match = re.search(r"(\d+(?:\.\d+)?)\s*([bm])(?![a-z])", model_id.lower())
+    if not match:
+        return None
+    value = float(match.group(1))
+    return value / 1000 if match.group(2) == "m" else value
+
+
+def seq_bucket(seq_len: int) -> int:
+    """Nearest power of two, so 2000 and 2048 count as the same sequence length."""
+    return 2 ** round(math.log2(max(seq_len, 1)))
+
+
+# ─── CPU Micro-benchmark ─────────────────────────────────────────────────────
+
+
+def run_cpu_benchmark(seconds: float = 0.5, size: int = 512) -> float:
+    """Sustained float32 matmul FLOP/s on this machine (best of several rounds)."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal((size, size), dtype=np.float32)
+    b = rng.standard_normal((size, size), dtype=np.float32)
+    np.dot(a, b)  # warm up threads and caches
+    flops_per_matmul = 2.0 * size**3
+    best = 0.0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(4):
+            np.dot(a, b)
+        elapsed = time.perf_counter() - start
+        best = max(best, 4 * flops_per_matmul / elapsed)
+    return best
+
+
+def benchmark_tokens_per_sec(flops_per_sec: float, params_b: float, method: str) -> float:
+    """Training tokens/sec a model of params_b billion parameters would reach."""
+    flops_per_token = FLOPS_PER_PARAM_TOKEN.get(method, 4.0) * params_b * 1e9
+    return flops_per_sec * BENCHMARK_EFFICIENCY.get(method, 0.3) / flops_per_token
+
+
+# ─── Estimates ───────────────────────────────────────────────────────────────
+
+
+@dataclass
+class ThroughputEstimate:
+    tokens_per_sec: float
+    low: float
+    high: float
+    basis: str  # exact | model | hardware | default
+    samples: int
+    hardware: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: round(v, 2) if isinstance(v, float) else v for k, v in asdict(self).items()}
+
+
+def _interval(values: List[float], level: str) -> tuple:
+    logs = [math.log(v) for v in values]
+    n = len(logs)
+    mean = sum(logs) / n
+    if n >= 3:
+        sd = math.sqrt(sum((x - mean) ** 2 for x in logs) / (n - 1))
+    else:
+        sd = _PRIOR_LOG_SD
+    # Prediction interval for the next run, widened by the fallback level
+    half = math.hypot(Z_95 * sd * math.sqrt(1 + 1 / n), _LEVEL_SPREAD[level])
+    return math.exp(mean), math.exp(mean - half), math.exp(mean + half)
+
+
+class ThroughputCalibration:
+    """SQLite-backed throughput samples and the estimates derived from them."""
+
+    def __init__(self, path: str = "finetuning.db"):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ThroughputCalibration":
+        return cls(
+            path=os.environ.get("THROUGHPUT_CALIBRATION_DB_PATH")
+            or os.environ.get("FINETUNING_DB_PATH", "finetuning.db")
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None, timeout=10
+            )
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def record(
+        self,
+        model_id: str,
+        method: str,
+        lora_r: int,
+        seq_len: int,
+        hardware: str,
+        tokens_per_sec: float,
+        params_b: Optional[float] = None,
+        source: str = "manual",
+        job_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Store one measurement, keeping the newest MAX_SAMPLES_PER_KEY per combination."""
+        if not tokens_per_sec or tokens_per_sec <= 0:
+            raise ValueError("tokens_per_sec must be positive")
+        sample = {
+            "hardware": hardware_fingerprint(hardware),
+            "model_id": model_id,
+            "method": method,
+            "lora_r": int(lora_r),
+            "seq_len": int(seq_len),
+            "params_b": params_b if params_b is not None else params_from_model_id(model_id),
+            "tokens_per_sec": float(tokens_per_sec),
+            "source": source,
+            "job_id": job_id,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        key = (sample["hardware"], method, model_id, sample["lora_r"], sample["seq_len"])
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT INTO throughput_samples ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+                tuple(sample[c] for c in _COLUMNS),
+            )
+            conn.execute(
+                "DELETE FROM throughput_samples WHERE hardware = ? AND method = ? "
+                "AND model_id = ? AND lora_r = ? AND seq_len = ? AND id NOT IN ("
+                "SELECT id FROM throughput_samples WHERE hardware = ? AND method = ? "
+                "AND model_id = ? AND lora_r = ? AND seq_len = ? ORDER BY id DESC LIMIT ?)",
+                (*key, *key, MAX_SAMPLES_PER_KEY),
+            )
+        logger.info(
+            f"[Calibration] {sample['model_id']} {method} r={lora_r} seq={seq_len} on "
+            f"{sample['hardware']}: {tokens_per_sec:.0f} tok/s ({source})"
+        )
+        return sample
+
+    def samples(
+        self,
+        hardware: Optional[str] = None,
+        method: Optional[str] = None,
+        model_id: Optional[str] = None,
+        limit: int = 500,
+    ) -> List[Dict[str, Any]]:
+        """Newest samples first, optionally filtered."""
+        clauses, params = [], []
+        for column, value in (("hardware", hardware), ("method", method), ("model_id", model_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(hardware_fingerprint(value) if column == "hardware" else value)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM throughput_samples{where} "
+                f"ORDER BY id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def estimate(
+        self,
+        model_id: str,
+        method: str,
+        lora_r: int,
+        seq_len: int,
+        hardware: str,
+        params_b: Optional[float] = None,
+    ) -> ThroughputEstimate:
+        """Tokens/sec with a 95% interval from the closest calibrated combination."""
+        hardware = hardware_fingerprint(hardware)
+        if params_b is None:
+            params_b = params_from_model_id(model_id)
+        candidates = self.samples(hardware=hardware, method=method)
+        bucket = seq_bucket(seq_len)
+        same_model = [s for s in candidates if s["model_id"] == model_id]
+        exact = [
+            s
+            for s in same_model
+            if s["lora_r"] == lora_r and seq_bucket(s["seq_len"]) == bucket
+        ]
+        scalable = [s for s in candidates if s["params_b"] and params_b]
+        levels = (("exact", exact), ("model", same_model), ("hardware", scalable))
+        for level, matches in levels:
+            measured = [s for s in matches if s["source"] != "benchmark"]
+            matches = measured or matches
+            if not matches:
+                continue
+            values = [
+                s["tokens_per_sec"] * (s["params_b"] / params_b if level == "hardware" else 1.0)
+                for s in matches
+            ]
+            mid, low, high = _interval(values, level)
+            return ThroughputEstimate(mid, low, high, level, len(matches), hardware)
+
+        base = DEFAULT_TOKENS_PER_SEC.get(method, 600)
+        if params_b:
+            base *= REFERENCE_PARAMS_B / params_b
+        mid, low, high = _interval([base], "default")
+        return ThroughputEstimate(mid, low, high, "default", 0, hardware)
+
+    def clear(self) -> int:
+        with self._lock:
+            return max(self._connection().execute("DELETE FROM throughput_samples").rowcount, 0)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_calibration: Optional[ThroughputCalibration] = None
+_calibration_lock = threading.Lock()
+
+
+def get_throughput_calibration() -> ThroughputCalibration:
+    """Process-wide calibration store configured from the environment."""
+    global _calibration
+    if _calibration is None:
+        with _calibration_lock:
+            if _calibration is None:
+                _calibration = ThroughputCalibration.from_env()
+    return _calibration
+
+
+def record_job_throughput(
+    job_id: Optional[str],
+    model_id: str,
+    method: str,
+    lora_r: int,
+    seq_len: int,
+    tokens_per_sec: Optional[float],
+    hardware: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Calibrate from a finished job; without a hardware name this machine's CPU is assumed."""
+    if not tokens_per_sec:
+        return None
+    try:
+        return get_throughput_calibration().record(
+            model_id,
+            method,
+            lora_r,
+            seq_len,
+            hardware or hardware_fingerprint(),
+            float(tokens_per_sec),
+            source="job",
+            job_id=job_id,
+        )
+    except (TypeError, ValueError) as e:
+        logger.warning(f"[Calibration] Ignoring throughput from job {job_id}: {e}")
+        return None
+
+
+__all__ = [
+    "DEFAULT_TOKENS_PER_SEC",
+    "PLATFORM_HARDWARE",
+    "ThroughputCalibration",
+    "ThroughputEstimate",
+    "benchmark_tokens_per_sec",
+    "get_throughput_calibration",
+    "hardware_fingerprint",
+    "params_from_model_id",
+    "record_job_throughput",
+    "run_cpu_benchmark",
+    "seq_bucket",
+]
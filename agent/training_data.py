@@ -0,0 +1,227 @@
+"""
+Training data preparation for System2ML fine-tuning tasks
+
+Turns a tabular dataset into tokenized causal-LM examples:
+- Prompt text is built column-wise with vectorised string ops instead of a
+  row-wise DataFrame.apply.
+- Sequences are stored unpadded, together with their lengths. Padding happens
+  per batch in the data collator, so every batch pads only to its own longest
+  sequence rather than to max_length.
+- Tokenized datasets are cached as Arrow IPC files keyed by (dataset hash,
+  tokenizer, template, max_length). Fine-tuning the same dataset again
+  memory-maps the cache instead of formatting and tokenizing it again.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+TOKENIZED_CACHE_DIR = os.environ.get("TOKENIZED_CACHE_DIR", "./tokenized_cache")
+# Bump when the cached layout or the tokenization procedure changes
+CACHE_FORMAT_VERSION = 1
+TOKENIZE_BATCH_ROWS = 1000
+LABEL_CANDIDATES = ["label", "target", "y", "class", "output"]
+
+# Prompt templates; part of the cache key, so editing one invalidates old entries
+INPUT_PREFIX = "Input: "
+OUTPUT_PREFIX = " Output: "
+FEATURE_SEPARATOR = ", "
+UNLABELED_SEPARATOR = " | "
+
+
+# ─── Prompt Formatting ───────────────────────────────────────────────────────
+
+
+def find_label_column(df: pd.DataFrame) -> Optional[str]:
+    return next((c for c in df.columns if str(c).lower() in LABEL_CANDIDATES), None)
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    # str() of every cell, so missing values render as "nan" like an f-string would
+    return pd.Series(values.to_numpy(dtype=object).astype(str), index=values.index)
+
+
+def _join_fields(df: pd.DataFrame, columns, sep: str) -> pd.Series:
+    fields = [f"{column}: " + _as_text(df[column]) for column in columns]
+    if not fields:
+        return pd.Series("", index=df.index, dtype=object)
+    return fields[0].str.cat(fields[1:], sep=sep) if len(fields) > 1 else fields[0]
+
+
+def format_prompts(df: pd.DataFrame, label_column: Optional[str] = None) -> pd.Series:
+    """
+    One training text per row.
+
+    With a label column: "Input: a: 1, b: x Output: <label>".
+    Without one: "a: 1 | b: x".
+    """
+    if label_column is None:
+        return _join_fields(df, df.columns, UNLABELED_SEPARATOR)
+    features = _join_fields(df, [c for c in df.columns if c != label_column], FEATURE_SEPARATOR)
+    return INPUT_PREFIX + features + OUTPUT_PREFIX + _as_text(df[label_column])
+
+
+def template_fingerprint() -> str:
+    return repr((INPUT_PREFIX, OUTPUT_PREFIX, FEATURE_SEPARATOR, UNLABELED_SEPARATOR))
+
+
+# ─── Tokenization ────────────────────────────────────────────────────────────
+
+
+def tokenize_texts(tokenizer, texts, max_length: int) -> pa.Table:
+    """Unpadded input_ids (truncated to max_length) and their lengths, as an Arrow table."""
+    texts = list(texts)
+    ids = []
+    for start in range(0, len(texts), TOKENIZE_BATCH_ROWS):
+        encoded = tokenizer(
+            texts[start : start + TOKENIZE_BATCH_ROWS],
+            truncation=True,
+            max_length=max_length,
+            return_attention_mask=False,
+        )
+        ids.extend(encoded["input_ids"])
+    input_ids = pa.array(ids, type=pa.list_(pa.int32()))
+    return pa.table({"input_ids": input_ids, "length": pc.list_value_length(input_ids)})
+
+
+def padding_stats(table: pa.Table, max_length: int, batch_size: int) -> Dict[str, Any]:
+    """Real vs padded token counts for fixed max_length padding and per-batch padding."""
+    lengths = table.column("length").to_numpy()
+    real = int(lengths.sum())
+    dynamic = sum(
+        int(lengths[i : i + batch_size].max()) * len(lengths[i : i + batch_size])
+        for i in range(0, len(lengths), batch_size)
+    )
+    fixed = len(lengths) * max_length
+    return {
+        "rows": len(lengths),
+        "tokens": real,
+        "padded_tokens_max_length": fixed,
+        "padded_tokens_dynamic": dynamic,
+        "padding_efficiency_max_length": round(real / fixed, 4) if fixed else 1.0,
+        "padding_efficiency_dynamic": round(real / dynamic, 4) if dynamic else 1.0,
+    }
+
+
+# ─── Tokenized Dataset Cache ─────────────────────────────────────────────────
+
+
+def dataset_fingerprint(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    parts = [
+        type(tokenizer).__name__,
+        getattr(tokenizer, "name_or_path", ""),
+        str(len(tokenizer)) if hasattr(tokenizer, "__len__") else "",
+        getattr(tokenizer, "truncation_side", "right"),
+    ]
+    return "|".join(parts)
+
+
+class TokenizedDatasetCache:
+    """Arrow IPC files of tokenized datasets, read back memory-mapped."""
+
+    def __init__(self, cache_dir: str = TOKENIZED_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    @classmethod
+    def from_env(cls) -> "TokenizedDatasetCache":
+        return cls(os.environ.get("TOKENIZED_CACHE_DIR", TOKENIZED_CACHE_DIR))
+
+    def key(self, dataset_hash: str, tokenizer, max_length: int) -> str:
+        raw = "\0".join(
+            [
+                str(CACHE_FORMAT_VERSION),
+                dataset_hash,
+                tokenizer_fingerprint(tokenizer),
+                template_fingerprint(),
+                str(max_length),
+            ]
+        )
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.arrow"
+
+    def load(self, key: str) -> Optional[pa.Table]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with pa.memory_map(str(path)) as source:
+                return pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f"[TokenCache] Ignoring unreadable cache entry {path.name}: {e}")
+            return None
+
+    def store(self, key: str, table: pa.Table) -> Path:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path)  # readers never see a partial file
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return path
+
+
+def load_tokenized_dataset(
+    dataset_path: str,
+    tokenizer,
+    max_length: int,
+    cache: Optional[TokenizedDatasetCache] = None,
+) -> Tuple[pa.Table, Dict[str, Any]]:
+    """
+    Tokenized (input_ids, length) table for a CSV dataset, from the cache when possible.
+
+    Returns the table and a small report: cache key, whether it was a hit, and
+    the seconds spent preparing it.
+    """
+    cache = cache if cache is not None else TokenizedDatasetCache.from_env()
+    start = time.perf_counter()
+    key = cache.key(dataset_fingerprint(dataset_path), tokenizer, max_length)
+    table = cache.load(key)
+    hit = table is not None
+    if not hit:
+        df = pd.read_csv(dataset_path)
+        texts = format_prompts(df, find_label_column(df))
+        table = tokenize_texts(tokenizer, texts.tolist(), max_length)
+        cache.store(key, table)
+    report = {"cache_key": key, "cache_hit": hit, "seconds": time.perf_counter() - start}
+    logger.info(
+        f"[TokenCache] {'Hit' if hit else 'Miss'} for {dataset_path}: "
+        f"{table.num_rows} rows in {report['seconds']:.2f}s"
+    )
+    return table, report
+
+
+__all__ = [
+    "TOKENIZED_CACHE_DIR",
+    "TokenizedDatasetCache",
+    "dataset_fingerprint",
+    "find_label_column",
+    "format_prompts",
+    "load_tokenized_dataset",
+    "padding_stats",
+    "tokenize_texts",
+    "tokenizer_fingerprint",
+]
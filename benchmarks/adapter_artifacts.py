@@ -0,0 +1,98 @@
+"""
+Adapter artifacts: whole-directory copies + zips vs the content-addressed store
+
+Writes a series of synthetic adapter versions (new LoRA weights each time, the
+same tokenizer files and config). It compares the disk used by keeping every
+version as a directory copy plus its zip (the old layout) with the disk used
+by AdapterArtifactStore. It then measures download throughput: zipping a
+version when it is requested vs streaming it from the store's blobs.
+
+Run with: python -m benchmarks.adapter_artifacts [--versions 10] [--weights-mb 32]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from agent.artifact_store import AdapterArtifactStore
+
+
+def _write_version(root: Path, weights_mb: int, tokenizer: bytes) -> Path:
+    root.mkdir(parents=True)
+    (root / "adapter_model.safetensors").write_bytes(os.urandom(weights_mb * 1024 * 1024))
+    (root / "adapter_config.json").write_text('{"r": 16, "lora_alpha": 32}')
+    (root / "tokenizer.json").write_bytes(tokenizer)
+    (root / "tokenizer_config.json").write_text('{"model_max_length": 2048}')
+    return root
+
+
+def _du(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _best_of(fn, repeat: int):
+    return min(_timed(fn) for _ in range(repeat))
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--versions", type=int, default=10)
+    parser.add_argument("--weights-mb", type=int, default=32)
+    parser.add_argument("--tokenizer-mb", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tokenizer = os.urandom(args.tokenizer_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        legacy = tmp / "legacy"
+        store = AdapterArtifactStore(str(tmp / "store"), staging_root=str(tmp / "src"))
+        for version in range(1, args.versions + 1):
+            source = _write_version(tmp / "src" / f"v{version}", args.weights_mb, tokenizer)
+            shutil.copytree(source, legacy / f"v{version}")
+            shutil.make_archive(str(legacy / f"v{version}"), "zip", source)
+            store.ingest(f"v{version}", str(source))
+
+        legacy_bytes, stats = _du(legacy), store.stats()
+        size = stats["logical_bytes"] / args.versions
+        print(f"{args.versions} versions, {size / 2**20:.0f} MB each")
+        print(f"{'storage':<24}{'MB':>10}")
+        print(f"{'  copies + zips':<24}{legacy_bytes / 2**20:>10.1f}")
+        print(f"{'  artifact store':<24}{stats['stored_bytes'] / 2**20:>10.1f}")
+        print(f"  saved {1 - stats['stored_bytes'] / legacy_bytes:.0%} vs the old layout")
+
+        latest = tmp / "src" / f"v{args.versions}"
+
+        def zip_on_request():
+            archive = shutil.make_archive(str(tmp / "download"), "zip", latest)
+            with open(archive, "rb") as f:
+                while f.read(1 << 20):
+                    pass
+
+        def stream_from_store():
+            for _ in store.stream_zip(f"v{args.versions}"):
+                pass
+
+        print(f"{'download':<24}{'seconds':>10}{'MB/s':>10}")
+        for name, fn in (
+            ("  zip on request", zip_on_request),
+            ("  stream from store", stream_from_store),
+        ):
+            elapsed = _best_of(fn, args.repeat)
+            print(f"{name:<24}{elapsed:>10.3f}{size / 2**20 / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Exact vs approximate dataset profiling
+
+Profiles a synthetic instruction dataset (long text column, class label,
+numeric columns with gaps) with profile_dataset in both modes and reports wall
+time and how far each run raised peak RSS. Every run happens in a fresh
+process that reads the file first, so the peaks are independent. The exact
+mode loads the whole frame; the approximate mode streams it through
+fixed-size sketches.
+
+Run with: python -m benchmarks.dataset_profiling [--rows 500000] [--format csv]
+"""
+
+import argparse
+import io
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+import pandas as pd
+
+from agent.finetuning_service import profile_dataset
+
+
+def _make_dataset(rows: int, file_format: str) -> bytes:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "instruction": ["lorem ipsum " * int(n) for n in rng.integers(5, 200, rows)],
+            "label": rng.choice(["pos", "neg", "neutral"], rows, p=[0.5, 0.3, 0.2]),
+            "score": rng.normal(size=rows),
+            "id": np.arange(rows),
+        }
+    )
+    df.loc[::7, "score"] = np.nan
+    buffer = io.BytesIO()
+    if file_format == "csv":
+        df.to_csv(buffer, index=False)
+    elif file_format == "jsonl":
+        df.to_json(buffer, orient="records", lines=True)
+    else:
+        df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _status_mb(field: str) -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _measure(path: str, file_format: str, approximate: bool):
+    content = Path(path).read_bytes()
+    baseline = _status_mb("VmRSS")
+    start = time.perf_counter()
+    profile = profile_dataset(content, file_format, approximate=approximate)
+    elapsed = time.perf_counter() - start
+    peak = _status_mb("VmHWM")
+    return elapsed, peak - baseline, profile
+
+
+def _best_of(fn, repeat: int):
+    return min((fn() for _ in range(repeat)), key=lambda result: result[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], default="csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    content = _make_dataset(args.rows, args.format)
+    print(f"{args.rows} rows, {len(content) / (1024 * 1024):.1f} MB {args.format}")
+    context = multiprocessing.get_context("spawn")
+    with tempfile.NamedTemporaryFile(suffix=f".{args.format}") as dataset:
+        dataset.write(content)
+        dataset.flush()
+        del content
+        print(f"{'mode':<14}{'seconds':>10}{'+RSS MB':>10}{'distinct id':>14}{'p90 chars':>11}")
+        for name, approximate in (("exact", False), ("approximate", True)):
+
+            def run():
+                with context.Pool(1) as pool:
+                    return pool.apply(_measure, (dataset.name, args.format, approximate))
+
+            elapsed, peak, profile = _best_of(run, args.repeat)
+            p90 = profile.text_lengths["instruction"]["p90_chars"]
+            distinct = profile.distinct_counts["id"]
+            print(f"{name:<14}{elapsed:>10.2f}{peak:>10.0f}{distinct:>14}{p90:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+API import-time benchmark
+
+Imports ui.api in a fresh interpreter under `python -X importtime` and reports the
+total import time and the slowest modules. Exits non-zero when the total exceeds
+the budget or when a module that must stay lazy (pandas, sklearn, torch, the
+finetuning router, the LLM services, ...) gets imported, so CI can enforce both.
+
+Run with: python -m benchmarks.import_time [--budget-ms 1500] [--runs 3] [--top 15]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Must not be imported by `import ui.api`; they load on first use of their routes
+LAZY_MODULES = (
+    "numpy",
+    "pandas",
+    "sklearn",
+    "torch",
+    "transformers",
+    "nbformat",
+    "jinja2",
+    "redis",
+    "agent.planner",
+    "agent.finetuning_service",
+    "agent.ai_service",
+    "agent.notebook.ai_generator",
+    "agent.colab_service",
+)
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def measure(target: str = "ui.api") -> dict:
+    """Import target in a subprocess; returns its cumulative time (µs) and every module loaded."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(ROOT / "src"), str(ROOT)]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us))
+    return {"target_us": modules.get(target, (0, 0))[1], "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=3, help="best of N fresh interpreters")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--target", default="ui.api")
+    args = parser.parse_args()
+
+    results = [measure(args.target) for _ in range(args.runs)]
+    best = min(results, key=lambda r: r["target_us"])
+    target_ms = best["target_us"] / 1000
+
+    print(f"import {args.target}: {target_ms:.1f} ms (best of {args.runs})")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    slowest = sorted(best["modules"].items(), key=lambda kv: kv[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[: args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    failures = []
+    eager = [m for m in LAZY_MODULES if m in best["modules"]]
+    if eager:
+        failures.append(f"modules that must load lazily were imported: {', '.join(eager)}")
+    if target_ms > args.budget_ms:
+        failures.append(f"{target_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"OK: within {args.budget_ms:.0f} ms budget, no heavy modules imported")
+
+
+if __name__ == "__main__":
+    main()
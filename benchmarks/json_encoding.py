@@ -0,0 +1,116 @@
+"""
+JSON response encoding benchmark
+
+Captures the payloads of the largest API responses (every parameterless GET route
+plus the notebook/design generators), then times FastAPI's default path
+(jsonable_encoder + stdlib json, as JSONResponse renders) against
+ui.responses.dumps (orjson when installed) on the ten largest.
+
+Run with: python -m benchmarks.json_encoding [--scale 50] [--repeat 20]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from ui.api import app
+from ui.responses import HAS_ORJSON, dumps
+
+SAMPLE_POSTS = {
+    "/api/finetuning/notebook/generate": {
+        "model_id": "meta-llama/Llama-3.2-1B",
+        "model_name": "Llama 3.2 1B",
+    },
+    "/api/design/request": {
+        "data_profile": {"type": "tabular", "size_mb": 120, "features": 40},
+        "objective": "accuracy",
+        "constraints": {"max_cost_usd": 50, "max_carbon_kg": 5, "max_latency_ms": 200},
+        "deployment": "batch",
+        "retraining": "drift",
+    },
+}
+
+
+def _stdlib_render(payload) -> bytes:
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _scale(payload, factor: int):
+    """Repeat list entries to approximate a database with more history."""
+    if factor <= 1:
+        return payload
+    if isinstance(payload, list):
+        return [_scale(item, 1) for item in payload] * factor
+    if isinstance(payload, dict):
+        return {k: _scale(v, factor) for k, v in payload.items()}
+    return payload
+
+
+def collect_payloads(client: TestClient) -> dict:
+    payloads = {}
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        if "{" in route.path or route.path.startswith("/api/admin"):
+            continue
+        try:
+            response = client.get(route.path)
+        except Exception:
+            continue
+        if response.status_code == 200 and "json" in response.headers.get("content-type", ""):
+            payloads[f"GET {route.path}"] = response.json()
+
+    for path, body in SAMPLE_POSTS.items():
+        response = client.post(path, json=body)
+        if response.status_code == 200:
+            payloads[f"POST {path}"] = response.json()
+    return payloads
+
+
+def _time(fn, payload, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(payload)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=50, help="list length multiplier")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    payloads = {name: _scale(p, args.scale) for name, p in collect_payloads(client).items()}
+    largest = sorted(payloads.items(), key=lambda kv: len(dumps(kv[1])), reverse=True)[: args.top]
+
+    print(f"encoder: {'orjson' if HAS_ORJSON else 'stdlib json (orjson not installed)'}")
+    print(f"{'endpoint':<48}{'KB':>9}{'default ms':>12}{'fast ms':>10}{'speedup':>9}")
+    total_before = total_after = 0.0
+    for name, payload in largest:
+        size_kb = len(dumps(payload)) / 1024
+        before = _time(_stdlib_render, payload, args.repeat)
+        after = _time(dumps, payload, args.repeat)
+        total_before += before
+        total_after += after
+        print(f"{name[:47]:<48}{size_kb:>9.1f}{before:>12.2f}{after:>10.2f}{before / after:>8.1f}x")
+    print(f"{'total':<57}{total_before:>12.2f}{total_after:>10.2f}{total_before / total_after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+JSON extraction benchmark on large model outputs
+
+Builds ~1 MB LLM-style responses (a design wrapped in prose, prose full of braces
+before the JSON, a notebook cut off by max_tokens) and times the previous
+find/rfind + regex + repeated json.loads recovery against agent.json_extract.
+
+Run with: python -m benchmarks.json_extract [--size-mb 1] [--repeat 3]
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from agent.json_extract import extract_json
+
+
+def _is_design(data) -> bool:
+    return isinstance(data, dict) and ("pipeline" in data or "decision_summary" in data)
+
+
+def legacy_extract(content: str):
+    """The recovery chain agent/ai_service.py used before json_extract."""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        start = content.find("{")
+        end = content.rfind("}")
+        if start != -1 and end != -1 and end > start:
+            try:
+                data = json.loads(content[start : end + 1])
+                if _is_design(data):
+                    return data
+            except ValueError:
+                pass
+        for match in re.findall(r"\{[^{}]*\}", content):
+            try:
+                data = json.loads(match)
+                if _is_design(data):
+                    return data
+            except ValueError:
+                continue
+        # ai_generator's truncation fix: count braces, append the missing ones
+        if start != -1:
+            fragment = content[start:]
+            fragment += "}" * (fragment.count("{") - fragment.count("}"))
+            try:
+                return json.loads(fragment)
+            except ValueError:
+                return None
+        return None
+
+
+def build_cases(size: int) -> dict:
+    stage = {"algorithm": "xgboost", "params": {"depth": 6, "eta": 0.1}, "notes": "a {b} c " * 8}
+    pipeline, i = {}, 0
+    while len(json.dumps(pipeline)) < size:
+        pipeline[f"stage_{i}"] = stage
+        i += 1
+    design = json.dumps({"status": "success", "pipeline": pipeline}, indent=2)
+    cells = [{"cell_type": "code", "source": ["x = {'a': [1, 2]}\n"] * 20} for _ in range(400)]
+    notebook = json.dumps({"cells": cells * max(1, size // 400_000)}, indent=1)
+    return {
+        "fenced design": f"Here is the design:\n```json\n{design}\n```\nLet me know!",
+        "braces in prose": "Use {x} and {y}, e.g. {z: 1}. " * (size // 400)
+        + f"\n{design[: size // 2]}",
+        "truncated notebook": "```json\n" + notebook[: len(notebook) * 3 // 4],
+    }
+
+
+def _best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = build_cases(int(args.size_mb * 1024 * 1024))
+    print(f"{'case':<22}{'MB':>6}{'legacy ms':>11}{'single-pass ms':>16}{'recovered':>11}")
+    for name, text in cases.items():
+        legacy = legacy_extract(text)
+        result = extract_json(text)
+        legacy_ms = _best_of(lambda: legacy_extract(text), args.repeat)
+        new_ms = _best_of(lambda: extract_json(text), args.repeat)
+        recovered = f"{legacy is not None}/{result is not None}"
+        print(
+            f"{name:<22}{len(text) / 1e6:>6.2f}{legacy_ms:>11.1f}{new_ms:>16.1f}{recovered:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
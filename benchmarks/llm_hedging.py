@@ -0,0 +1,205 @@
+"""
+Hedged LLM request latency benchmark
+
+Starts two local stub servers speaking the OpenAI-compatible chat API: a primary
+with a slow tail and occasional 5xx errors, and a slightly slower but steadier
+secondary. Sends the same workload through the strict fallback chain (primary,
+then secondary on error) and through LLMClient.hedged_chat, and reports latency
+percentiles, extra requests and estimated spend for each.
+
+Run with: python -m benchmarks.llm_hedging [--requests 200] [--delay 0.25]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from agent.llm_client import BackendConfig, ChatAttempt, LLMClient, LLMError, user_message
+
+
+class Profile:
+    """Latency distribution of one stub backend."""
+
+    def __init__(self, base: float, tail: float, tail_rate: float, error_rate: float, seed: int):
+        self.base = base
+        self.tail = tail
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def sample(self):
+        with self.lock:
+            self.requests += 1
+            roll = self.rng.random()
+            jitter = self.rng.uniform(0.8, 1.2)
+        if roll < self.error_rate:
+            return self.base * jitter, 500
+        if roll < self.error_rate + self.tail_rate:
+            return self.tail * jitter, 200
+        return self.base * jitter, 200
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    profile: Profile
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        delay, status = self.profile.sample()
+        time.sleep(delay)
+        payload = {
+            "model": body["model"],
+            "choices": [{"message": {"role": "assistant", "content": '{"status": "success"}'}}],
+        }
+        data = json.dumps(payload if status == 200 else {"error": "overloaded"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # hedged losers hang up mid-response
+
+
+def start_stub(profile: Profile) -> ThreadingHTTPServer:
+    handler = type("Handler", (StubHandler,), {"profile": profile})
+    server = StubServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+async def run_sequential(client: LLMClient, attempts, n: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            for attempt in attempts:
+                try:
+                    await client.chat(**attempt.kwargs(), cache=False)
+                    break
+                except LLMError:
+                    continue
+            else:
+                failures += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(n)))
+    return latencies, failures, 0.0
+
+
+async def run_hedged(client: LLMClient, attempts, n: int, concurrency: int, delay: float, cap):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures, spent = [], 0, 0.0
+
+    async def one():
+        nonlocal failures, spent
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await client.hedged_chat(
+                    attempts, delay=delay, max_cost_usd=cap, cache=False
+                )
+                spent += result.estimated_cost_usd
+            except LLMError:
+                failures += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(n)))
+    return latencies, failures, spent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.25, help="hedge delay in seconds")
+    parser.add_argument("--cost-cap", type=float, default=0.05, help="USD per request")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    primary = Profile(base=0.08, tail=1.5, tail_rate=0.10, error_rate=0.05, seed=args.seed)
+    secondary = Profile(base=0.15, tail=0.6, tail_rate=0.02, error_rate=0.01, seed=args.seed + 1)
+    servers = [start_stub(primary), start_stub(secondary)]
+    urls = [f"http://127.0.0.1:{s.server_address[1]}/v1" for s in servers]
+
+    backends = {
+        "primary": BackendConfig(
+            "primary", urls[0], api_key="bench", max_concurrency=64, cost_per_1k_tokens=0.0007
+        ),
+        "secondary": BackendConfig(
+            "secondary", urls[1], api_key="bench", max_concurrency=64, cost_per_1k_tokens=0.0004
+        ),
+    }
+    for config in backends.values():
+        config.failure_threshold = 10**6  # measure raw latency, not the circuit breaker
+
+    attempts = [
+        ChatAttempt("primary", "bench", user_message("design a pipeline"), max_tokens=1000),
+        ChatAttempt("secondary", "bench", user_message("design a pipeline"), max_tokens=1000),
+    ]
+    client = LLMClient(backends)
+    try:
+        modes = []
+        for name, run in (
+            (
+                "sequential fallback",
+                lambda: run_sequential(client, attempts, args.requests, args.concurrency),
+            ),
+            (
+                f"hedged ({args.delay * 1000:.0f} ms)",
+                lambda: run_hedged(
+                    client, attempts, args.requests, args.concurrency, args.delay, args.cost_cap
+                ),
+            ),
+        ):
+            before = primary.requests + secondary.requests
+            latencies, failures, spent = asyncio.run(run())
+            sent = primary.requests + secondary.requests - before
+            modes.append((name, latencies, failures, sent, spent))
+    finally:
+        client.close()
+        for server in servers:
+            server.shutdown()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print(
+        f"{'mode':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        f"{'sent':>7}{'failed':>8}"
+    )
+    for name, latencies, failures, sent, spent in modes:
+        print(
+            f"{name:<22}{percentile(latencies, 50):>9.0f}{percentile(latencies, 95):>9.0f}"
+            f"{percentile(latencies, 99):>9.0f}{max(latencies):>9.0f}{sent:>7}{failures:>8}"
+        )
+    hedged_spent = modes[1][4]
+    print(f"hedged estimated spend: ${hedged_spent:.4f} (cap ${args.cost_cap:.2f}/request)")
+
+
+if __name__ == "__main__":
+    main()
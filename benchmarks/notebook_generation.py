@@ -0,0 +1,75 @@
+"""
+Template notebook generation throughput
+
+Times NotebookGenerator.create_notebook(ai_generated=False) and
+ColabTrainingService._build_notebook over a mix of models, methods and epochs.
+"warm" reuses the per-process cell and skeleton caches; "cold" clears them
+before every notebook, which is the cost of building every cell each time.
+
+Run with: python -m benchmarks.notebook_generation [--seconds 2] [--repeat 3]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from agent import colab_service
+from agent.colab_service import ColabTrainingService
+from agent.notebook.generator import NotebookGenerator, clear_template_cache
+
+CONFIGS = [
+    {"model_id": model, "method": method, "num_epochs": epochs, "dataset_path": "data.csv"}
+    for model in ("meta-llama/Llama-3.1-8B-Instruct", "Qwen/Qwen2.5-7B")
+    for method in ("lora", "qlora", "full_ft", "unsloth")
+    for epochs in (1, 3)
+]
+
+
+def _clear_colab_cache():
+    colab_service._static_cell_json.cache_clear()
+    colab_service._method_cells_json.cache_clear()
+
+
+def _rate(build, seconds: float, before=None) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for config in CONFIGS:
+            if before is not None:
+                before()
+            build(config)
+            count += 1
+    return count / (time.perf_counter() - start)
+
+
+def _best_of(fn, repeat: int) -> float:
+    return max(fn() for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    generator = NotebookGenerator()
+    service = ColabTrainingService()
+    cases = {
+        "NotebookGenerator": (
+            lambda config: generator.create_notebook(config, ai_generated=False),
+            clear_template_cache,
+        ),
+        "ColabTrainingService": (service._build_notebook, _clear_colab_cache),
+    }
+    print(f"{'generator':<22}{'cold nb/s':>12}{'warm nb/s':>12}{'speedup':>10}")
+    for name, (build, clear) in cases.items():
+        cold = _best_of(lambda: _rate(build, args.seconds, before=clear), args.repeat)
+        warm = _best_of(lambda: _rate(build, args.seconds), args.repeat)
+        print(f"{name:<22}{cold:>12.0f}{warm:>12.0f}{warm / cold:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Fine-tuning data preparation: row-wise apply + max_length padding vs cached, dynamically padded
+
+Builds a synthetic tabular dataset and compares the old run_finetuning_task
+preparation (DataFrame.apply prompt text, tokenizing with padding="max_length")
+with agent.training_data: vectorised formatting, unpadded tokenization into an
+Arrow cache (cold, then warm), and per-batch padding. Reports preparation
+time and the padding efficiency, i.e. real tokens / tokens the model actually
+processes. With torch installed it then trains a tiny causal LM on CPU over
+the first --train-rows examples, batches padded to max_length vs padded per
+batch by the collator run_finetuning_task uses, and reports real (non-pad)
+training tokens/sec for each. Tokenization needs transformers (--tokenizer
+gpt2); without it only prompt formatting is timed.
+
+Run with: python -m benchmarks.training_data [--rows 20000] [--tokenizer gpt2] [--train-rows 256]
+"""
+
+import argparse
+import importlib.util
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+import pandas as pd
+
+from agent.training_data import (
+    TokenizedDatasetCache,
+    find_label_column,
+    format_prompts,
+    load_tokenized_dataset,
+    padding_stats,
+    tokenize_texts,
+)
+
+TINY_MODEL = "hf-internal-testing/tiny-random-LlamaForCausalLM"
+
+
+def _make_dataset(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "review": [
+                " ".join(["pretty decent product"] * int(n)) for n in rng.lognormal(1.5, 0.8, rows)
+            ],
+            "stars": rng.integers(1, 6, rows),
+            "price": rng.normal(30, 10, rows).round(2),
+            "label": rng.choice(["positive", "negative"], rows),
+        }
+    )
+
+
+def _apply_prompts(df: pd.DataFrame) -> pd.Series:
+    """The row-wise formatting run_finetuning_task used before."""
+    label_col = find_label_column(df)
+    return df.apply(
+        lambda row: (
+            f"Input: {', '.join([f'{k}: {v}' for k, v in row.drop(label_col).items()])}"
+            f" Output: {row[label_col]}"
+        ),
+        axis=1,
+    )
+
+
+def _best_of(fn, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+    return best
+
+
+def _train_tokens_per_sec(model, batches) -> float:
+    """Real (attention-masked) tokens per second over one pass of optimizer steps."""
+    import torch
+
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    model.train()
+    tokens = 0
+    start = time.perf_counter()
+    for batch in batches:
+        loss = model(**batch).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        tokens += int(batch["attention_mask"].sum())
+    return tokens / (time.perf_counter() - start)
+
+
+def _compare_training(texts, max_length, batch_size, model_id):
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer, DataCollatorForLanguageModeling
+
+    torch.manual_seed(0)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(model_id)
+    collator = DataCollatorForLanguageModeling(tokenizer=tokenizer, mlm=False, pad_to_multiple_of=8)
+
+    padded = tokenizer(texts, padding="max_length", truncation=True, max_length=max_length)
+    fixed_rows = [
+        {"input_ids": ids, "attention_mask": mask}
+        for ids, mask in zip(padded["input_ids"], padded["attention_mask"])
+    ]
+    dynamic_rows = [
+        {"input_ids": ids}
+        for ids in tokenize_texts(tokenizer, texts, max_length).column("input_ids").to_pylist()
+    ]
+    print(f"{'training (tiny model, CPU)':<28}{'steps':>10}{'tokens/s':>14}")
+    for name, rows in (("  max_length padding", fixed_rows), ("  per-batch padding", dynamic_rows)):
+        batches = [collator(rows[i : i + batch_size]) for i in range(0, len(rows), batch_size)]
+        rate = _train_tokens_per_sec(model, batches)
+        print(f"{name:<28}{len(batches):>10}{rate:>14,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--tokenizer", default="gpt2")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--train-rows", type=int, default=256)
+    parser.add_argument("--model", default=TINY_MODEL)
+    args = parser.parse_args()
+
+    df = _make_dataset(args.rows)
+    print(f"{args.rows} rows")
+    apply_time, old_texts = _best_of(lambda: _apply_prompts(df), args.repeat)
+    vector_time, new_texts = _best_of(lambda: format_prompts(df, "label"), args.repeat)
+    assert old_texts.tolist() == new_texts.tolist()
+    print(f"{'formatting':<28}{'seconds':>10}")
+    print(f"{'  row-wise apply':<28}{apply_time:>10.3f}")
+    print(f"{'  vectorised':<28}{vector_time:>10.3f}")
+
+    if importlib.util.find_spec("transformers") is None:
+        print("transformers not installed; skipping tokenization")
+        return
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    texts = old_texts.tolist()
+
+    def old_tokenize():
+        return tokenizer(texts, padding="max_length", truncation=True, max_length=args.max_length)
+
+    old_time, _ = _best_of(old_tokenize, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "train.csv"
+        df.to_csv(path, index=False)
+        cache = TokenizedDatasetCache(str(Path(tmp) / "cache"))
+        cold_time, (table, _) = _best_of(
+            lambda: load_tokenized_dataset(str(path), tokenizer, args.max_length, cache), 1
+        )
+        warm_time, _ = _best_of(
+            lambda: load_tokenized_dataset(str(path), tokenizer, args.max_length, cache),
+            args.repeat,
+        )
+
+    stats = padding_stats(table, args.max_length, args.batch_size)
+    print(f"{'preparation':<28}{'seconds':>10}{'tokens/s':>14}")
+    for name, elapsed in (
+        ("  apply + max_length pad", apply_time + old_time),
+        ("  cache miss", cold_time),
+        ("  cache hit", warm_time),
+    ):
+        print(f"{name:<28}{elapsed:>10.3f}{stats['tokens'] / elapsed:>14,.0f}")
+    print(
+        f"padding efficiency: {stats['padding_efficiency_max_length']:.1%} at max_length "
+        f"{args.max_length} -> {stats['padding_efficiency_dynamic']:.1%} with batch padding "
+        f"({stats['padded_tokens_max_length'] / stats['padded_tokens_dynamic']:.1f}x fewer "
+        f"tokens per epoch)"
+    )
+
+    if importlib.util.find_spec("torch") is None:
+        print("torch not installed; skipping the training comparison")
+        return
+    _compare_training(texts[: args.train_rows], args.max_length, args.batch_size, args.model)
+
+
+if __name__ == "__main__":
+    main()
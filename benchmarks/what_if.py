@@ -0,0 +1,88 @@
+"""
+Design what-if benchmark
+
+Builds a grid of constraint sets (cost x carbon x latency x deployment x objective)
+and times DesignAgent.generate_designs in a loop against generate_designs_batch,
+which enumerates candidates once and checks every set with numpy masks.
+
+Run with: python -m benchmarks.what_if [--steps 8] [--repeat 3]
+"""
+
+import argparse
+import itertools
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+from agent.planner import ConstraintSpec, DesignAgent
+
+
+def build_grid(steps: int, data_type: str) -> list:
+    costs = np.geomspace(0.01, 100, steps)
+    carbons = np.geomspace(0.001, 10, steps)
+    latencies = np.geomspace(5, 5000, steps).astype(int)
+    return [
+        ConstraintSpec(
+            data_type=data_type,
+            task="classification",
+            objective=objective,
+            max_cost=float(cost),
+            max_carbon=float(carbon),
+            max_latency=int(latency),
+            deployment=deployment,
+            compliance="standard",
+            retraining="none",
+        )
+        for cost, carbon, latency, deployment, objective in itertools.product(
+            costs, carbons, latencies, ["batch", "realtime", "edge"], ["accuracy", "cost"]
+        )
+    ]
+
+
+def _best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--steps", type=int, default=8, help="values per numeric axis")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-type", default="tabular")
+    args = parser.parse_args()
+
+    agent = DesignAgent()
+    specs = build_grid(args.steps, args.data_type)
+
+    loop_results = [agent.generate_designs(spec) for spec in specs]
+    batch_results = agent.generate_designs_batch(specs)
+    mismatches = sum(
+        a["status"] != b["status"]
+        or [d["model"] for d in a["designs"]] != [d["model"] for d in b["designs"]]
+        for a, b in zip(loop_results, batch_results)
+    )
+    feasible = sum(r["status"] == "success" for r in batch_results)
+
+    loop_ms = _best_of(lambda: [agent.generate_designs(spec) for spec in specs], args.repeat)
+    batch_ms = _best_of(lambda: agent.generate_designs_batch(specs), args.repeat)
+    compact_ms = _best_of(lambda: agent.generate_designs_batch(specs, detail=False), args.repeat)
+
+    print(f"{len(specs)} constraint sets, {feasible} feasible, {mismatches} mismatches")
+    print(f"{'mode':<28}{'ms':>10}{'speedup':>9}")
+    print(f"{'generate_designs loop':<28}{loop_ms:>10.1f}{1:>8.1f}x")
+    print(f"{'batch (detail)':<28}{batch_ms:>10.1f}{loop_ms / batch_ms:>8.1f}x")
+    print(f"{'batch (compact)':<28}{compact_ms:>10.1f}{loop_ms / compact_ms:>8.1f}x")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+WebSocket fan-out benchmark
+
+Broadcasts a burst of progress updates to simulated clients, a fraction of which
+are slow, and compares the old sequential send loop with the queued FanoutHub.
+Reports how long a broadcast call blocks and how long fast clients wait for the
+final update.
+
+Run with: python -m benchmarks.ws_fanout --clients 1000 --slow-fraction 0.05
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from lib.realtime.fanout import FanoutHub
+
+
+class SimulatedSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+        self.last_progress = None
+        self.last_received_at = 0.0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_json(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        self.last_progress = message.get("progress")
+        self.last_received_at = time.perf_counter()
+
+
+def _make_clients(n: int, slow_fraction: float, slow_delay: float):
+    n_slow = int(n * slow_fraction)
+    return [SimulatedSocket(slow_delay if i < n_slow else 0.0) for i in range(n)]
+
+
+def _message(i: int) -> dict:
+    return {"type": "training_update", "run_id": "bench", "status": "running", "progress": i}
+
+
+async def bench_sequential(clients, broadcasts: int) -> dict:
+    """The pre-fanout ConnectionManager.broadcast: await every send in turn."""
+    start = time.perf_counter()
+    call_times = []
+    for i in range(broadcasts):
+        t0 = time.perf_counter()
+        for ws in clients:
+            try:
+                await ws.send_json(_message(i))
+            except Exception:
+                pass
+        call_times.append(time.perf_counter() - t0)
+    fast = [ws for ws in clients if not ws.delay]
+    return {
+        "broadcast_call_ms": statistics.mean(call_times) * 1000,
+        "fast_client_done_ms": (max(ws.last_received_at for ws in fast) - start) * 1000,
+    }
+
+
+async def bench_fanout(clients, broadcasts: int, send_timeout: float) -> dict:
+    hub = FanoutHub(send_timeout=send_timeout)
+    for ws in clients:
+        await hub.connect(ws, "training")
+
+    start = time.perf_counter()
+    call_times = []
+    for i in range(broadcasts):
+        t0 = time.perf_counter()
+        hub.publish("training", _message(i))
+        call_times.append(time.perf_counter() - t0)
+        await asyncio.sleep(0)
+
+    fast = [ws for ws in clients if not ws.delay]
+    while any(ws.last_progress != broadcasts - 1 for ws in fast):
+        await asyncio.sleep(0.001)
+    stats = hub.stats()
+
+    for ws in clients:
+        hub.disconnect(ws, "training")
+    await asyncio.sleep(0)
+
+    return {
+        "broadcast_call_ms": statistics.mean(call_times) * 1000,
+        "fast_client_done_ms": (max(ws.last_received_at for ws in fast) - start) * 1000,
+        "coalesced": stats["coalesced"],
+        "dropped": stats["dropped"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-delay", type=float, default=0.02, help="seconds per send")
+    parser.add_argument("--broadcasts", type=int, default=10)
+    parser.add_argument("--send-timeout", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(
+        f"{args.clients} clients, {args.slow_fraction:.0%} slow "
+        f"({args.slow_delay * 1000:.0f} ms/send), {args.broadcasts} broadcasts"
+    )
+
+    seq = asyncio.run(
+        bench_sequential(
+            _make_clients(args.clients, args.slow_fraction, args.slow_delay), args.broadcasts
+        )
+    )
+    fan = asyncio.run(
+        bench_fanout(
+            _make_clients(args.clients, args.slow_fraction, args.slow_delay),
+            args.broadcasts,
+            args.send_timeout,
+        )
+    )
+
+    print(f"{'':<12}{'broadcast() ms':>16}{'fast clients done ms':>24}")
+    print(f"{'sequential':<12}{seq['broadcast_call_ms']:>16.2f}{seq['fast_client_done_ms']:>24.1f}")
+    print(f"{'fanout':<12}{fan['broadcast_call_ms']:>16.2f}{fan['fast_client_done_ms']:>24.1f}")
+    print(f"fanout coalesced {fan['coalesced']} stale snapshots, dropped {fan['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
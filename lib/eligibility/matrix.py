@@ -1,6 +1,6 @@
 from typing import List, Dict, Optional, Tuple
 from enum import Enum
-from .schemas import (
+from ..validation.schemas import (
     ModelFamily, DataType, TaskType, ObjectiveType, 
     DeploymentType, HardwareType, ComplianceLevel, Constraints
 )
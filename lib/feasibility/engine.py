@@ -4,6 +4,7 @@ from ..validation.schemas import (
     ModelFamily, PipelineCandidate, ConstraintViolation
 )
 from ..eligibility.matrix import EligibilityMatrix, MODEL_PROFILES
+import numpy as np
 import uuid
 
 
@@ -108,6 +109,56 @@ class HardConstraintFilter:
         
         return feasible, infeasible
     
+    def violation_masks(
+        self,
+        candidates: List[PipelineCandidate],
+        constraint_sets: List[Constraints]
+    ) -> Dict[str, np.ndarray]:
+        """Per-constraint violation masks, shape (len(constraint_sets), len(candidates)).
+        
+        Same checks as _check_hard_constraints, evaluated for every pair at once.
+        """
+        cost = np.array([c.estimated_cost for c in candidates], dtype=float)
+        carbon = np.array([c.estimated_carbon for c in candidates], dtype=float)
+        latency = np.array([c.estimated_latency_ms for c in candidates], dtype=float)
+        accuracy = np.array([c.estimated_accuracy for c in candidates], dtype=float)
+        
+        def limits(field: str) -> np.ndarray:
+            # An unset (None) limit becomes NaN, which no comparison violates
+            values = [getattr(s, field) for s in constraint_sets]
+            return np.array([np.nan if v is None else v for v in values], dtype=float)[:, None]
+        
+        return {
+            "max_cost_usd": cost > limits("max_cost_usd"),
+            "max_carbon_kg": carbon > limits("max_carbon_kg"),
+            "max_latency_ms": latency > limits("max_latency_ms"),
+            "min_accuracy": accuracy < limits("min_accuracy"),
+        }
+    
+    def feasibility_matrix(
+        self,
+        candidates: List[PipelineCandidate],
+        constraint_sets: List[Constraints]
+    ) -> np.ndarray:
+        """Boolean (sets x candidates) matrix: True where a candidate meets every hard constraint."""
+        masks = self.violation_masks(candidates, constraint_sets)
+        return ~np.logical_or.reduce(list(masks.values()))
+    
+    def filter_candidates_batch(
+        self,
+        candidates: List[PipelineCandidate],
+        constraint_sets: List[Constraints]
+    ) -> List[Tuple[List[PipelineCandidate], List[PipelineCandidate]]]:
+        """filter_candidates for many constraint sets; candidates are not mutated."""
+        feasible = self.feasibility_matrix(candidates, constraint_sets)
+        return [
+            (
+                [c for c, ok in zip(candidates, row) if ok],
+                [c for c, ok in zip(candidates, row) if not ok],
+            )
+            for row in feasible
+        ]
+    
     def _check_hard_constraints(
         self,
         candidate: PipelineCandidate,
@@ -0,0 +1,248 @@
+"""
+Streaming sketches for System2ML dataset profiling
+
+Fixed-memory summaries that are fed one chunk at a time and can be merged, so
+multi-GB datasets can be profiled without holding a column in memory:
+
+- ReservoirSample keeps a uniform random sample of everything offered
+  (Algorithm L, so skipped items cost nothing once the reservoir is full).
+- HyperLogLog estimates the number of distinct values with a relative
+  standard error of 1.04 / sqrt(2 ** precision).
+- QuantileSketch is a DDSketch: every quantile it returns is within
+  ``relative_accuracy`` of the true value, while count, sum, min and max are
+  exact.
+"""
+
+import math
+import random
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RESERVOIR_SIZE = 10_000
+DEFAULT_HLL_PRECISION = 14
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Two-sided z-score used for every confidence interval reported by the sketches.
+Z_95 = 1.96
+
+
+def hash_values(values: Any) -> np.ndarray:
+    """64-bit hashes of array-like values, stable across processes and chunks."""
+    array = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+    if array.dtype.kind in "biuf":
+        # 1 and 1.0 must hash alike even when a chunk gets upcast by its NaNs.
+        array = array.astype(np.float64)
+    elif array.dtype.kind != "O":
+        array = array.astype(object)
+    try:
+        return pd.util.hash_array(array, categorize=False)
+    except (TypeError, ValueError):
+        # Unhashable cells (lists/dicts from JSON records) are hashed by their repr.
+        as_text = np.fromiter(map(str, array), dtype=object, count=len(array))
+        return pd.util.hash_array(as_text, categorize=False)
+
+
+# ─── Reservoir Sampling ───────────────────────────────────────────────────────
+
+
+class ReservoirSample:
+    """Uniform sample of at most ``size`` items from a stream of unknown length."""
+
+    def __init__(self, size: int = DEFAULT_RESERVOIR_SIZE, seed: Optional[int] = 0):
+        if size < 1:
+            raise ValueError("Reservoir size must be at least 1")
+        self.size = size
+        self.seen = 0
+        self.items: List[Any] = []
+        self._rng = random.Random(seed)
+        self._w = 1.0
+        self._next = 0  # stream position of the next item to admit once full
+
+    def _advance(self):
+        self._w *= math.exp(math.log(1.0 - self._rng.random()) / self.size)
+        skip = math.floor(math.log(1.0 - self._rng.random()) / math.log1p(-self._w))
+        self._next += skip + 1
+
+    def extend(self, values: Iterable[Any]):
+        """Offer every item of ``values``; only the admitted ones are touched."""
+        values = values if isinstance(values, (list, tuple, np.ndarray)) else list(values)
+        start = self.seen
+        end = start + len(values)
+        position = start
+        if len(self.items) < self.size:
+            take = min(self.size - len(self.items), len(values))
+            self.items.extend(values[:take])
+            position += take
+            if len(self.items) == self.size:
+                self._next = position - 1
+                self._advance()
+        while self._next < end and len(self.items) == self.size:
+            self.items[self._rng.randrange(self.size)] = values[self._next - start]
+            self._advance()
+        self.seen = end
+
+    def add(self, value: Any):
+        self.extend([value])
+
+    @property
+    def sampling_fraction(self) -> float:
+        return len(self.items) / self.seen if self.seen else 1.0
+
+    def proportion_margin(self, proportion: float) -> float:
+        """95% half-width for a proportion estimated from the sample."""
+        n = len(self.items)
+        if n == 0 or n >= self.seen:
+            return 0.0
+        finite_population = math.sqrt((self.seen - n) / max(self.seen - 1, 1))
+        return Z_95 * math.sqrt(proportion * (1 - proportion) / n) * finite_population
+
+
+# ─── HyperLogLog ──────────────────────────────────────────────────────────────
+
+
+class HyperLogLog:
+    """Distinct-count estimator over 64-bit hashes."""
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def update_hashes(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << suffix_bits) - 1)
+        # Rank = position of the leftmost 1-bit in the remainder; exact in float64
+        # because the remainder has at most 60 bits and only its exponent matters.
+        rank = np.full(len(hashes), suffix_bits + 1, dtype=np.uint8)
+        nonzero = remainder > 0
+        highest_bit = np.floor(np.log2(remainder[nonzero].astype(np.float64)))
+        rank[nonzero] = (suffix_bits - highest_bit).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def update(self, values: Any):
+        self.update_hashes(hash_values(values))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return raw
+
+    def interval(self) -> Dict[str, float]:
+        """Point estimate with a 95% interval."""
+        estimate = self.estimate()
+        margin = Z_95 * self.relative_error * estimate
+        return {"estimate": estimate, "low": max(estimate - margin, 0.0), "high": estimate + margin}
+
+
+# ─── Quantile Sketch ──────────────────────────────────────────────────────────
+
+
+class QuantileSketch:
+    """DDSketch over non-negative values with relative-accuracy quantiles."""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: Any):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        if (values < 0).any():
+            raise ValueError("QuantileSketch only accepts non-negative values")
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.zero_count += int(values.size - positive.size)
+        if positive.size:
+            keys, counts = np.unique(
+                np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True
+            )
+            for key, n in zip(keys.tolist(), counts.tolist()):
+                self.bins[key] = self.bins.get(key, 0) + n
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                value = 2 * self.gamma**key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, float]:
+        stats = {"count": self.count, "mean": self.mean, "min": self.min, "max": self.max}
+        if self.count == 0:
+            stats.update(min=0.0, max=0.0)
+        for q in quantiles:
+            stats[f"p{round(q * 100):g}"] = self.quantile(q)
+        return stats
+
+
+__all__ = [
+    "DEFAULT_HLL_PRECISION",
+    "DEFAULT_RELATIVE_ACCURACY",
+    "DEFAULT_RESERVOIR_SIZE",
+    "HyperLogLog",
+    "QuantileSketch",
+    "ReservoirSample",
+    "Z_95",
+    "hash_values",
+]
@@ -0,0 +1,189 @@
+"""
+Cross-worker WebSocket backplane for System2ML
+
+Each uvicorn worker only holds its own sockets, so broadcasts are published on a
+Redis pub/sub channel (the broker already configured for Celery) and every worker
+relays what it receives to its local FanoutHubs. Without Redis the backplane
+degrades to delivering in-process, which is all a single-node setup needs.
+
+Environment:
+    WS_BACKPLANE      auto (default) | redis | memory
+    WS_BACKPLANE_URL  defaults to CELERY_BROKER_URL
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from lib.realtime.fanout import FanoutHub
+
+logger = logging.getLogger(__name__)
+
+# redis.asyncio is imported in start(), off the API's import path
+HAS_REDIS = importlib.util.find_spec("redis") is not None
+
+DEFAULT_REDIS_CHANNEL = "system2ml:ws"
+CONNECT_TIMEOUT = 2.0
+
+
+class Backplane:
+    """Relays (namespace, channel, message) events to the attached hubs of every worker."""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        mode: Optional[str] = None,
+        redis_channel: str = DEFAULT_REDIS_CHANNEL,
+    ):
+        self.url = (
+            url
+            or os.environ.get("WS_BACKPLANE_URL")
+            or os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
+        )
+        self.mode = (mode or os.environ.get("WS_BACKPLANE", "auto")).lower()
+        self.redis_channel = redis_channel
+        self.published = 0
+        self.relayed = 0
+        self._hubs: Dict[str, FanoutHub] = {}
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self._redis is not None else "memory"
+
+    def attach(self, namespace: str, hub: FanoutHub) -> None:
+        """Register the local hub that receives events for a namespace."""
+        self._hubs[namespace] = hub
+
+    async def start(self, client=None) -> str:
+        """Connect to Redis if configured and reachable; returns the backend in use."""
+        self._loop = asyncio.get_running_loop()
+        if self._redis is not None or self.mode == "memory":
+            return self.backend
+        if client is None and not HAS_REDIS:
+            if self.mode == "redis":
+                logger.warning("[Backplane] redis package not installed; relaying in-process")
+            return self.backend
+
+        try:
+            if client is None:
+                import redis.asyncio as aioredis
+
+                client = aioredis.from_url(self.url)
+            await asyncio.wait_for(client.ping(), CONNECT_TIMEOUT)
+            pubsub = client.pubsub()
+            await pubsub.subscribe(self.redis_channel)
+        except Exception as e:
+            logger.warning(f"[Backplane] Redis unavailable at {self.url} ({e}); relaying in-process")
+            return self.backend
+
+        self._redis = client
+        self._pubsub = pubsub
+        self._listener = self._loop.create_task(self._listen())
+        logger.info(f"[Backplane] Relaying WebSocket events via Redis channel {self.redis_channel}")
+        return self.backend
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.redis_channel)
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception:
+                pass
+            self._redis = None
+
+    async def _listen(self) -> None:
+        try:
+            async for raw in self._pubsub.listen():
+                if raw.get("type") != "message":
+                    continue
+                try:
+                    event = json.loads(raw["data"])
+                    self._deliver(event["ns"], event["ch"], event["msg"])
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"[Backplane] Ignoring malformed event: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Keep local clients served even if the broker goes away
+            logger.error(f"[Backplane] Redis subscription lost ({e}); relaying in-process")
+            self._redis = None
+            self._pubsub = None
+
+    def _deliver(self, namespace: str, channel: str, message: Dict[str, Any]) -> None:
+        hub = self._hubs.get(namespace)
+        if hub is not None:
+            self.relayed += 1
+            hub.publish_threadsafe(channel, message)
+
+    async def publish(self, namespace: str, channel: str, message: Dict[str, Any]) -> None:
+        """Send an event to every worker (including this one) for local fan-out."""
+        self.published += 1
+        if self._redis is not None:
+            payload = json.dumps({"ns": namespace, "ch": channel, "msg": message}, default=str)
+            try:
+                await self._redis.publish(self.redis_channel, payload)
+                return
+            except Exception as e:
+                logger.warning(f"[Backplane] Publish failed ({e}); delivering locally only")
+        self._deliver(namespace, channel, message)
+
+    def publish_threadsafe(self, namespace: str, channel: str, message: Dict[str, Any]) -> None:
+        """publish() for sync callers, e.g. endpoints running in the threadpool."""
+        loop = self._loop
+        if self._redis is None or loop is None or loop.is_closed():
+            self.published += 1
+            self._deliver(namespace, channel, message)
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            loop.create_task(self.publish(namespace, channel, message))
+        else:
+            asyncio.run_coroutine_threadsafe(self.publish(namespace, channel, message), loop)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "channel": self.redis_channel if self._redis is not None else None,
+            "published": self.published,
+            "relayed": self.relayed,
+            "namespaces": sorted(self._hubs),
+        }
+
+
+_backplane: Optional[Backplane] = None
+
+
+def get_backplane() -> Backplane:
+    """Get or create the process-wide backplane."""
+    global _backplane
+    if _backplane is None:
+        _backplane = Backplane()
+    return _backplane
+
+
+__all__ = ["Backplane", "get_backplane", "HAS_REDIS", "DEFAULT_REDIS_CHANNEL"]
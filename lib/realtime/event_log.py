@@ -0,0 +1,158 @@
+"""
+Sequenced event logs for System2ML
+
+An EventLog is a bounded ring buffer of events with monotonically increasing
+sequence numbers. Producers append from any thread; consumers (SSE streams,
+WebSocket replays) read everything after the last sequence they saw and then
+wait for new events, so reconnecting clients can resume exactly where they left
+off as long as their position is still in the buffer.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+DEFAULT_BUFFER_SIZE = 500
+
+
+@dataclass
+class Event:
+    seq: int
+    type: str
+    data: Dict[str, Any]
+    ts: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"seq": self.seq, "type": self.type, "data": self.data, "ts": self.ts}
+
+
+class EventLog:
+    """Bounded, thread-safe, sequenced event buffer with async waiting."""
+
+    def __init__(self, maxlen: int = DEFAULT_BUFFER_SIZE):
+        self._events: Deque[Event] = deque(maxlen=maxlen)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.closed = False
+        self.updated_at = time.time()
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest sequence number still buffered (last_seq + 1 when empty)."""
+        with self._lock:
+            return self._events[0].seq if self._events else self._seq + 1
+
+    def append(self, type_: str, data: Dict[str, Any], seq: Optional[int] = None) -> Optional[Event]:
+        """Append an event; pass seq to mirror a producer's numbering (duplicates are ignored)."""
+        with self._lock:
+            if seq is None:
+                seq = self._seq + 1
+            elif seq <= self._seq:
+                return None
+            self._seq = seq
+            event = Event(seq=seq, type=type_, data=data)
+            self._events.append(event)
+            self.updated_at = event.ts
+            waiters, self._waiters = self._waiters, []
+        self._wake(waiters)
+        return event
+
+    def close(self) -> None:
+        """Mark the stream finished; waiting consumers return immediately."""
+        with self._lock:
+            self.closed = True
+            waiters, self._waiters = self._waiters, []
+        self._wake(waiters)
+
+    @staticmethod
+    def _wake(waiters) -> None:
+        for loop, future in waiters:
+            if loop.is_closed():
+                continue
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def since(self, last_seq: int) -> Tuple[List[Event], bool]:
+        """Events after last_seq, and whether some were already evicted (a gap)."""
+        with self._lock:
+            if not self._events:
+                return [], last_seq < self._seq
+            gap = last_seq < self._events[0].seq - 1
+            return [e for e in self._events if e.seq > last_seq], gap
+
+    async def wait(self, last_seq: int, timeout: float) -> Tuple[List[Event], bool]:
+        """Return events after last_seq, waiting up to timeout for the first one."""
+        events, gap = self.since(last_seq)
+        if events or gap or self.closed:
+            return events, gap
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._seq > last_seq or self.closed:
+                future = None
+            else:
+                self._waiters.append((loop, future))
+        if future is not None:
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._waiters = [w for w in self._waiters if w[1] is not future]
+        return self.since(last_seq)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class EventLogRegistry:
+    """Event logs by key (run id, job id), evicting the least recently updated beyond a cap."""
+
+    def __init__(self, maxlen: int = DEFAULT_BUFFER_SIZE, max_logs: int = 1000):
+        self.maxlen = maxlen
+        self.max_logs = max_logs
+        self._logs: "OrderedDict[str, EventLog]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, create: bool = True) -> Optional[EventLog]:
+        with self._lock:
+            log = self._logs.get(key)
+            if log is None and create:
+                log = self._logs[key] = EventLog(self.maxlen)
+                while len(self._logs) > self.max_logs:
+                    self._logs.popitem(last=False)
+            elif log is not None:
+                self._logs.move_to_end(key)
+            return log
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            log = self._logs.pop(key, None)
+        if log is not None:
+            log.close()
+
+    def prune_closed(self, max_idle_seconds: float) -> int:
+        """Drop closed logs (finished runs/jobs) not updated for max_idle_seconds."""
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            stale = [
+                key for key, log in self._logs.items() if log.closed and log.updated_at < cutoff
+            ]
+            for key in stale:
+                del self._logs[key]
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+
+__all__ = ["Event", "EventLog", "EventLogRegistry", "DEFAULT_BUFFER_SIZE"]
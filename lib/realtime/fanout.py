@@ -0,0 +1,272 @@
+"""
+WebSocket fan-out for System2ML
+
+Every connected client owns a bounded outbound queue that is drained by its own
+writer task, so a broadcast only enqueues and returns immediately. Slow clients
+lose their oldest pending messages (progress snapshots are coalesced in place)
+and clients whose sends fail or stall past the send timeout are evicted.
+
+Messages carrying an integer "seq" are sequenced: each client receives a given
+seq at most once and never one older than it has already been sent, so a replay
+from an EventLog can race with live broadcasts without duplicating events.
+"""
+
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_SEND_TIMEOUT = 5.0
+
+# Message types that carry a full progress snapshot, and the fields that identify
+# which stream they belong to. A newer snapshot makes any still-queued one obsolete.
+PROGRESS_MESSAGE_TYPES = {
+    "training_update": ("run_id",),
+    "pipeline_update": ("pipeline_id",),
+    "kpi_update": ("kpi_type",),
+    "progress": ("job_id",),
+}
+
+CoalesceKeyFn = Callable[[Dict[str, Any]], Optional[Hashable]]
+PublishHook = Callable[[str, Dict[str, Any]], None]
+
+
+def progress_coalesce_key(message: Dict[str, Any]) -> Optional[Hashable]:
+    """Return the coalescing key for progress snapshots, None for everything else."""
+    msg_type = message.get("type")
+    fields = PROGRESS_MESSAGE_TYPES.get(msg_type)
+    if fields is None:
+        return None
+    return (msg_type,) + tuple(message.get(f) for f in fields)
+
+
+class ClientSession:
+    """One WebSocket plus its bounded outbound queue and writer task."""
+
+    def __init__(
+        self,
+        websocket,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        send_timeout: float = DEFAULT_SEND_TIMEOUT,
+        on_close: Optional[Callable[["ClientSession"], None]] = None,
+    ):
+        self.websocket = websocket
+        self.max_queue = max(1, max_queue)
+        self.send_timeout = send_timeout
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.duplicates = 0
+        self.last_seq: Optional[int] = None  # highest sequenced message queued so far
+        self.closed = False
+        self._on_close = on_close
+        self._pending: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._writer())
+
+    def enqueue(self, message: Dict[str, Any], coalesce_key: Optional[Hashable] = None) -> bool:
+        """Queue a message without blocking. Returns False once the session is closed."""
+        if self.closed:
+            return False
+
+        seq = message.get("seq")
+        if isinstance(seq, int):
+            if self.last_seq is not None and seq <= self.last_seq:
+                self.duplicates += 1
+                return True
+            self.last_seq = seq
+
+        if coalesce_key is not None:
+            key = ("coalesce", coalesce_key)
+            if key in self._pending:
+                # Replace the stale snapshot in place, keeping its queue position
+                self._pending[key] = message
+                self.coalesced += 1
+                return True
+        else:
+            key = ("seq", next(self._seq))
+
+        if len(self._pending) >= self.max_queue:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+
+        self._pending[key] = message
+        self._wakeup.set()
+        return True
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                if not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                _, message = self._pending.popitem(last=False)
+                await asyncio.wait_for(self.websocket.send_json(message), self.send_timeout)
+                self.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            logger.info(f"[Fanout] Evicting client: send stalled for more than {self.send_timeout}s")
+            try:
+                await asyncio.wait_for(self.websocket.close(code=1011), 1.0)
+            except Exception:
+                pass
+        except Exception as e:
+            logger.info(f"[Fanout] Evicting client after send failure: {e}")
+        finally:
+            self.closed = True
+            self._pending.clear()
+            if self._on_close:
+                self._on_close(self)
+
+    async def close(self) -> None:
+        self.closed = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class FanoutHub:
+    """Channel -> client sessions registry with non-blocking broadcast."""
+
+    def __init__(
+        self,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        send_timeout: float = DEFAULT_SEND_TIMEOUT,
+        coalesce_key: CoalesceKeyFn = progress_coalesce_key,
+        on_publish: Optional[PublishHook] = None,
+    ):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.coalesce_key = coalesce_key
+        # Runs for every published message, even with no local clients (e.g. to
+        # mirror sequenced events into this worker's replay log)
+        self.on_publish = on_publish
+        self.channels: Dict[str, Dict[Any, ClientSession]] = {}
+        self.evicted = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def ensure_channel(self, channel: str) -> Dict[Any, ClientSession]:
+        return self.channels.setdefault(channel, {})
+
+    async def connect(self, websocket, channel: str, accept: bool = True) -> ClientSession:
+        if accept:
+            await websocket.accept()
+        self._loop = asyncio.get_running_loop()
+
+        clients = self.ensure_channel(channel)
+        previous = clients.pop(websocket, None)
+        if previous is not None:
+            await previous.close()
+
+        session = ClientSession(
+            websocket,
+            max_queue=self.max_queue,
+            send_timeout=self.send_timeout,
+            on_close=lambda s: self._evict(channel, s),
+        )
+        clients[websocket] = session
+        session.start()
+        return session
+
+    def disconnect(self, websocket, channel: str) -> None:
+        session = self.channels.get(channel, {}).pop(websocket, None)
+        if session is not None and not session.closed:
+            session.closed = True
+            if session._task is not None:
+                session._task.cancel()
+
+    def _evict(self, channel: str, session: ClientSession) -> None:
+        clients = self.channels.get(channel)
+        if clients is not None and clients.get(session.websocket) is session:
+            del clients[session.websocket]
+            self.evicted += 1
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> int:
+        """Enqueue a message for every client on the channel; returns the number queued.
+
+        Must be called from the event loop thread (see publish_threadsafe).
+        """
+        if self.on_publish is not None:
+            self.on_publish(channel, message)
+        clients = self.channels.get(channel)
+        if not clients:
+            return 0
+        key = self.coalesce_key(message) if self.coalesce_key else None
+        delivered = 0
+        for session in list(clients.values()):
+            if session.enqueue(message, key):
+                delivered += 1
+        return delivered
+
+    def publish_threadsafe(self, channel: str, message: Dict[str, Any]) -> None:
+        """Publish from any thread, including sync endpoints running in the threadpool."""
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if loop is None or running is loop:
+            self.publish(channel, message)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self.publish, channel, message)
+
+    def session(self, websocket) -> Optional[ClientSession]:
+        for clients in self.channels.values():
+            session = clients.get(websocket)
+            if session is not None:
+                return session
+        return None
+
+    def send_to(self, websocket, message: Dict[str, Any]) -> bool:
+        """Queue a message for a single client, behind anything already pending for it."""
+        session = self.session(websocket)
+        return session.enqueue(message) if session is not None else False
+
+    def client_count(self, channel: Optional[str] = None) -> int:
+        if channel is not None:
+            return len(self.channels.get(channel, {}))
+        return sum(len(clients) for clients in self.channels.values())
+
+    def stats(self) -> Dict[str, Any]:
+        sessions: List[ClientSession] = [
+            s for clients in self.channels.values() for s in clients.values()
+        ]
+        return {
+            "clients": len(sessions),
+            "channels": {name: len(clients) for name, clients in self.channels.items()},
+            "queued": sum(s.queued for s in sessions),
+            "sent": sum(s.sent for s in sessions),
+            "dropped": sum(s.dropped for s in sessions),
+            "coalesced": sum(s.coalesced for s in sessions),
+            "duplicates": sum(s.duplicates for s in sessions),
+            "evicted": self.evicted,
+        }
+
+
+__all__ = [
+    "ClientSession",
+    "FanoutHub",
+    "progress_coalesce_key",
+    "PROGRESS_MESSAGE_TYPES",
+    "DEFAULT_QUEUE_SIZE",
+    "DEFAULT_SEND_TIMEOUT",
+]
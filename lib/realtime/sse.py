@@ -0,0 +1,105 @@
+"""
+Server-Sent Events helpers for System2ML
+
+stream_event_log turns an EventLog into an SSE frame stream: a full snapshot on
+first connect (or when the client's Last-Event-ID has fallen out of the buffer),
+then only the delta events, each tagged with its sequence number as the SSE id so
+browsers resume automatically after a reconnect.
+"""
+
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from lib.realtime.event_log import EventLog
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+}
+
+
+def format_sse(
+    event: str, data: Any, event_id: Optional[int] = None, retry_ms: Optional[int] = None
+) -> str:
+    lines = []
+    if retry_ms is not None:
+        lines.append(f"retry: {retry_ms}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    payload = json.dumps(data, default=str, separators=(",", ":"))
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_last_event_id(headers, query_value: Optional[str] = None) -> Optional[int]:
+    """Last-Event-ID header (browser reconnects) or ?last_event_id= (first connect)."""
+    raw = headers.get("last-event-id") or query_value
+    if raw is None or raw == "":
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        return None
+
+
+async def stream_event_log(
+    log: EventLog,
+    snapshot: Callable[[], Dict[str, Any]],
+    last_event_id: Optional[int] = None,
+    poll_interval: float = 1.0,
+    heartbeat: float = 15.0,
+    on_idle: Optional[Callable[[], None]] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+) -> AsyncIterator[str]:
+    """Yield SSE frames for a log until it is closed and drained.
+
+    on_idle is called whenever no event arrived within poll_interval; producers that
+    advance lazily (simulated runs) use it so one watcher drives updates for all.
+    """
+
+    def snapshot_frame() -> Tuple[int, str]:
+        # Read the position before the snapshot: events racing with it are replayed,
+        # and since deltas carry absolute values replaying them is harmless
+        seq = log.last_seq
+        frame = format_sse("snapshot", snapshot(), seq, retry_ms=3000)
+        return seq, frame
+
+    if last_event_id is None:
+        last, frame = snapshot_frame()
+        yield frame
+    else:
+        last = last_event_id
+
+    last_sent = time.monotonic()
+    while True:
+        if is_disconnected is not None and await is_disconnected():
+            return
+
+        events, gap = await log.wait(last, timeout=poll_interval)
+        if gap:
+            last, frame = snapshot_frame()
+            yield frame
+            last_sent = time.monotonic()
+            continue
+
+        for event in events:
+            yield format_sse(event.type, event.data, event.seq)
+            last = event.seq
+        if events:
+            last_sent = time.monotonic()
+            continue
+
+        if log.closed:
+            yield format_sse("end", {"last_event_id": last}, last)
+            return
+        if on_idle is not None:
+            on_idle()
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+
+__all__ = ["format_sse", "parse_last_event_id", "stream_event_log", "SSE_HEADERS"]
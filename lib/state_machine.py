@@ -18,7 +18,7 @@ def get_db():
 
 
 def init_projects_table():
-    conn = get_db()
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS projects (
@@ -389,8 +389,6 @@ class ProjectStore:
         return False
 
 
-init_projects_table()
-
 
 __all__ = [
     "LifecycleState",
@@ -0,0 +1,175 @@
+"""
+Sequence packing for causal-LM fine-tuning
+
+Instruction datasets are mostly short examples, so a padded batch is largely
+pad tokens. Packing concatenates several tokenized examples into one row of at
+most max_length tokens (best-fit decreasing), and the collator keeps the
+examples independent:
+
+- position_ids restart at 0 at every example boundary. Attention
+  implementations that support packed sequences (flash-attention varlen, and
+  sdpa/eager in models built on transformers' masking utilities) read these
+  resets and build a block-diagonal causal mask, so tokens never attend across
+  examples. For that reason the collator sends no attention_mask. Other models
+  would treat a packed row as one long sequence, so callers check
+  supports_packed_sequences() and train unpacked when it is False.
+- The first token of every example gets label -100, so no token is predicted
+  from the previous example. Each example therefore contributes the same
+  next-token targets it would have contributed unpacked.
+
+The total loss over an epoch is unchanged; only the number of rows (and so
+the steps per epoch) drops.
+"""
+
+import bisect
+import math
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+IGNORE_INDEX = -100
+# Kernels that split a row at position_ids resets whatever the modeling code does
+PACKED_ATTENTION_IMPLEMENTATIONS = ("flash_attention_2", "flash_attention_3")
+
+
+def supports_packed_sequences(model) -> bool:
+    """
+    Whether model keeps packed examples apart given position_ids and no attention_mask.
+
+    sdpa and eager only do when the model builds its mask with transformers'
+    create_causal_mask and that version detects packed position_ids.
+    """
+    if hasattr(model, "get_base_model"):
+        model = model.get_base_model()
+    implementation = getattr(getattr(model, "config", None), "_attn_implementation", None)
+    if implementation in PACKED_ATTENTION_IMPLEMENTATIONS:
+        return True
+    modeling = sys.modules.get(type(model).__module__)
+    masking = sys.modules.get("transformers.masking_utils")
+    return (
+        implementation in ("sdpa", "eager")
+        and hasattr(modeling, "create_causal_mask")
+        and hasattr(masking, "find_packed_sequence_indices")
+    )
+
+
+def pack_sequences(lengths: Sequence[int], max_length: int) -> List[List[int]]:
+    """
+    Group example indices into packs of at most max_length tokens.
+
+    Best-fit decreasing: longest examples first, each into the fullest pack it
+    still fits in. Indices inside a pack keep dataset order.
+    """
+    if max_length < 1:
+        raise ValueError("max_length must be at least 1")
+    packs: List[List[int]] = []
+    # (remaining capacity, pack index), kept sorted for the best-fit lookup
+    free: List[tuple] = []
+    for index in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        length = int(lengths[index])
+        if length > max_length:
+            raise ValueError(f"Example {index} has {length} tokens, more than {max_length}")
+        slot = bisect.bisect_left(free, (length, -1))
+        if slot < len(free):
+            remaining, pack = free.pop(slot)
+        else:
+            remaining, pack = max_length, len(packs)
+            packs.append([])
+        packs[pack].append(index)
+        if remaining - length > 0:
+            bisect.insort(free, (remaining - length, pack))
+    return [sorted(pack) for pack in packs]
+
+
+def pack_examples(input_ids: Sequence[Sequence[int]], max_length: int) -> Dict[str, List[Any]]:
+    """Packed rows as columns: concatenated input_ids and the seq_lengths they were built from."""
+    packs = pack_sequences([len(ids) for ids in input_ids], max_length)
+    return {
+        "input_ids": [[token for i in pack for token in input_ids[i]] for pack in packs],
+        "seq_lengths": [[len(input_ids[i]) for i in pack] for pack in packs],
+    }
+
+
+def packing_stats(
+    lengths: Sequence[int], max_length: int, batch_size: int, packs: Optional[List] = None
+) -> Dict[str, Any]:
+    """
+    Token efficiency and steps per epoch with and without packing.
+
+    Efficiency is real tokens / tokens processed. Unpacked batches are padded
+    to their longest example; packed rows are assumed to be max_length tokens.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    packs = packs if packs is not None else pack_sequences(lengths.tolist(), max_length)
+    tokens = int(lengths.sum())
+    padded = sum(
+        int(lengths[i : i + batch_size].max()) * len(lengths[i : i + batch_size])
+        for i in range(0, len(lengths), batch_size)
+    )
+    packed = len(packs) * max_length
+    return {
+        "examples": int(len(lengths)),
+        "packs": len(packs),
+        "tokens": tokens,
+        "examples_per_pack": round(len(lengths) / len(packs), 2) if packs else 0.0,
+        "padding_efficiency": round(tokens / padded, 4) if padded else 1.0,
+        "packing_efficiency": round(tokens / packed, 4) if packed else 1.0,
+        "steps_per_epoch_unpacked": math.ceil(len(lengths) / batch_size),
+        "steps_per_epoch_packed": math.ceil(len(packs) / batch_size),
+    }
+
+
+class PackedSequenceCollator:
+    """
+    Batches packed rows into input_ids, position_ids and labels.
+
+    Rows are right-padded to the longest row in the batch (optionally rounded up
+    to pad_to_multiple_of). The padding is treated as one more segment whose
+    labels are all -100.
+    """
+
+    def __init__(
+        self,
+        pad_token_id: int,
+        pad_to_multiple_of: Optional[int] = None,
+        return_tensors: str = "pt",
+    ):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.return_tensors = return_tensors
+
+    def __call__(self, features: List[Dict[str, Any]]) -> Dict[str, Any]:
+        width = max(len(f["input_ids"]) for f in features)
+        if self.pad_to_multiple_of:
+            width = -(-width // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        input_ids = np.full((len(features), width), self.pad_token_id, dtype=np.int64)
+        position_ids = np.zeros((len(features), width), dtype=np.int64)
+        labels = np.full((len(features), width), IGNORE_INDEX, dtype=np.int64)
+        for row, feature in enumerate(features):
+            ids = feature["input_ids"]
+            input_ids[row, : len(ids)] = ids
+            labels[row, : len(ids)] = ids
+            start = 0
+            for length in list(feature["seq_lengths"]) + [width - len(ids)]:
+                position_ids[row, start : start + length] = np.arange(length)
+                if 0 < length and start < len(ids):
+                    labels[row, start] = IGNORE_INDEX  # not predictable from the previous example
+                start += length
+        batch = {"input_ids": input_ids, "position_ids": position_ids, "labels": labels}
+        if self.return_tensors == "pt":
+            import torch
+
+            batch = {key: torch.from_numpy(value) for key, value in batch.items()}
+        return batch
+
+
+__all__ = [
+    "IGNORE_INDEX",
+    "PACKED_ATTENTION_IMPLEMENTATIONS",
+    "PackedSequenceCollator",
+    "pack_examples",
+    "pack_sequences",
+    "packing_stats",
+    "supports_packed_sequences",
+]
@@ -1,4 +1,5 @@
 from .failure_store import FailureStore
 from .embeddings import Embeddings
+from .design_index import DesignIndex, DesignMatch
 
-__all__ = ["FailureStore", "Embeddings"]
+__all__ = ["FailureStore", "Embeddings", "DesignIndex", "DesignMatch"]
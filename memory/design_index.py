@@ -0,0 +1,492 @@
+"""
+Nearest-neighbour index of accepted pipeline designs
+
+Datasets with near-identical profiles and constraints get near-identical designs,
+so an accepted design is stored under a feature embedding of the (dataset profile,
+constraints) it was generated for. A new request close enough to a stored one
+(cosine similarity >= threshold) reuses that design as a warm start, provided the
+design still holds under the new request: its stored limits must be as strict as
+the request's (max_* no higher, min_* no lower) and its cost/carbon estimates must
+fit them. Otherwise the design is generated in full.
+
+    index = DesignIndex(path="design_index.db")
+    match = index.lookup(profile, constraints)
+    if match is None:
+        design = generate(profile, constraints)
+        index.add(profile, constraints, design)
+
+The embedding is deterministic: the same inputs give the same vector in every
+process, and no model is involved. Every feature fills its own block of the
+vector and is scaled to unit norm, so cosine similarity is the weighted mean of
+the per-feature similarities:
+
+- categorical values (task type, deployment, ...) are hashed to one slot of their block;
+- sizes and limits (rows, budget, latency, ...) are log-scaled and mapped to an
+  angle, so two values a decade apart lose the same similarity at any magnitude;
+- the column type mix and any other scalar fields are hashed into count blocks.
+
+Entries (inputs and design JSON) live in a small SQLite file. The vectors are
+recomputed from the stored inputs on load, so a changed embedding needs no
+migration. Search is one matrix-vector product over the in-memory matrix.
+
+Configuration: DESIGN_INDEX_ENABLED, DESIGN_INDEX_PATH, DESIGN_INDEX_THRESHOLD,
+DESIGN_INDEX_MAX_ENTRIES.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_CATEGORY_SLOTS = 16
+_MIX_SLOTS = 8
+_EXTRA_SLOTS = 32
+
+# (section, key, kind, weight, range): numeric ranges are in decades, log10(value)
+FEATURES: Tuple[Tuple[str, str, str, float, Tuple[float, ...]], ...] = (
+    ("profile", "label_type", "category", 2.0, ()),
+    ("profile", "rows", "numeric", 1.5, (2.0, 7.0)),
+    ("profile", "num_features", "numeric", 1.0, (0.0, 3.0)),
+    ("profile", "data_types", "mix", 1.0, ()),
+    ("constraints", "max_cost_usd", "numeric", 1.5, (-1.0, 3.0)),
+    ("constraints", "max_carbon_kg", "numeric", 1.0, (-2.0, 2.0)),
+    ("constraints", "max_latency_ms", "numeric", 1.0, (1.0, 4.0)),
+    ("constraints", "deployment", "category", 1.0, ()),
+    ("constraints", "compliance_level", "category", 1.0, ()),
+)
+_KNOWN_KEYS = {(section, key) for section, key, *_ in FEATURES}
+
+# Design estimates a reused design must still fit: limit -> (section, key)
+DESIGN_ESTIMATES = {
+    "max_cost_usd": ("cost_estimate", "monthly_usd"),
+    "max_carbon_kg": ("carbon_estimate", "monthly_kg"),
+}
+# Entries above the threshold checked against the request's limits per lookup
+LOOKUP_CANDIDATES = 5
+_EXTRA_WEIGHT = 1.0
+
+_BLOCK_SIZES = {"category": _CATEGORY_SLOTS, "numeric": 2, "mix": _MIX_SLOTS}
+EMBEDDING_DIM = sum(_BLOCK_SIZES[kind] for _, _, kind, _, _ in FEATURES) + _EXTRA_SLOTS
+
+
+def _slot(token: str, slots: int) -> int:
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % slots
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value) if math.isfinite(value) else None
+
+
+def _extra_tokens(section: str, values: Mapping[str, Any]) -> List[str]:
+    """Scalar fields outside FEATURES; numbers are bucketed to quarter decades."""
+    tokens = []
+    for key, value in values.items():
+        if (section, key) in _KNOWN_KEYS:
+            continue
+        number = _number(value)
+        if number is not None:
+            bucket = round(math.copysign(math.log10(1 + abs(number)), number) * 4)
+            tokens.append(f"{section}.{key}~{bucket}")
+        elif isinstance(value, (str, bool)) or value is None:
+            tokens.append(f"{section}.{key}={str(value).strip().lower()}")
+    return tokens
+
+
+def embed(
+    profile: Optional[Mapping[str, Any]],
+    constraints: Optional[Mapping[str, Any]],
+    extra: Optional[Mapping[str, Any]] = None,
+) -> np.ndarray:
+    """Unit-norm float32 vector for a request; all zeros if it carries no features."""
+    sections = {"profile": profile or {}, "constraints": constraints or {}}
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float64)
+    offset = 0
+    for section, key, kind, weight, decades in FEATURES:
+        size = _BLOCK_SIZES[kind]
+        value = sections[section].get(key)
+        block = vector[offset : offset + size]
+        offset += size
+        if value is None:
+            continue
+        if kind == "category":
+            block[_slot(str(value).strip().lower(), size)] = weight
+        elif kind == "numeric":
+            number = _number(value)
+            if number is None:
+                continue
+            # The range maps onto half a circle, clipped so outliers don't wrap around
+            low, high = decades
+            position = (math.log10(max(number, 1e-6)) - low) / (high - low)
+            angle = min(max(position, 0.0), 1.0) * math.pi
+            block[0] = weight * math.cos(angle)
+            block[1] = weight * math.sin(angle)
+        elif isinstance(value, Mapping) and value:
+            for column_type in value.values():
+                block[_slot(str(column_type).lower(), size)] += 1.0
+            block *= weight / np.linalg.norm(block)
+
+    tokens = _extra_tokens("profile", sections["profile"])
+    tokens += _extra_tokens("constraints", sections["constraints"])
+    tokens += _extra_tokens("extra", extra or {})
+    if tokens:
+        block = vector[offset:]
+        for token in tokens:
+            block[_slot(token, _EXTRA_SLOTS)] += 1.0
+        block *= _EXTRA_WEIGHT / np.linalg.norm(block)
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.astype(np.float32)
+
+
+@dataclass
+class DesignMatch:
+    """A stored design and how close its inputs are to the query's."""
+
+    id: str
+    similarity: float
+    design: Dict[str, Any]
+    profile: Dict[str, Any]
+    constraints: Dict[str, Any]
+
+
+def within_limits(match: DesignMatch, constraints: Mapping[str, Any]) -> bool:
+    """Whether a stored design is valid under a request's constraints.
+
+    Similar limits are not enough: a design made for a $40 budget is no answer to a
+    $10 one. Every max_*/min_* limit of the request must be met by the stored
+    entry's own limit, and by the design's estimate where DESIGN_ESTIMATES has one.
+    """
+    for key, value in constraints.items():
+        limit = _number(value)
+        if limit is None or not key.startswith(("max_", "min_")):
+            continue
+        stored = _number(match.constraints.get(key))
+        if stored is None:
+            return False
+        looser = stored > limit if key.startswith("max_") else stored < limit
+        if looser:
+            return False
+        if key in DESIGN_ESTIMATES:
+            section, field = DESIGN_ESTIMATES[key]
+            values = match.design.get(section)
+            estimate = _number(values.get(field)) if isinstance(values, Mapping) else None
+            if estimate is not None and estimate > limit:
+                return False
+    return True
+
+
+class DesignIndex:
+    """SQLite-backed design store with an in-memory cosine-similarity matrix."""
+
+    # Inputs at least this similar to a stored entry replace it instead of adding a row
+    DUPLICATE_SIMILARITY = 0.9999
+
+    def __init__(
+        self,
+        path: str = "design_index.db",
+        threshold: float = 0.98,
+        max_entries: int = 2000,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "out_of_limits": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional["DesignIndex"]:
+        """Index configured from the environment; None when DESIGN_INDEX_ENABLED is off."""
+        if os.environ.get("DESIGN_INDEX_ENABLED", "1").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            path=os.environ.get("DESIGN_INDEX_PATH", "design_index.db"),
+            threshold=float(os.environ.get("DESIGN_INDEX_THRESHOLD", "0.98")),
+            max_entries=int(os.environ.get("DESIGN_INDEX_MAX_ENTRIES", "2000")),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """The database, with every stored entry embedded into the matrix on first use."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS design_index (
+                    id TEXT PRIMARY KEY,
+                    profile TEXT NOT NULL,
+                    constraints TEXT NOT NULL,
+                    extra TEXT,
+                    design TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    hits INTEGER DEFAULT 0
+                )
+                """
+            )
+            rows = conn.execute(
+                "SELECT id, profile, constraints, extra FROM design_index ORDER BY created_at"
+            ).fetchall()
+            self._ids = [row[0] for row in rows]
+            self._matrix = np.zeros((len(rows), EMBEDDING_DIM), dtype=np.float32)
+            for i, (_, profile, constraints, extra) in enumerate(rows):
+                self._matrix[i] = embed(
+                    json.loads(profile), json.loads(constraints), json.loads(extra or "{}")
+                )
+            self._conn = conn
+        return self._conn
+
+    # ─── Search ──────────────────────────────────────────────────────────────
+
+    def _search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if not self._ids or not query.any():
+            return []
+        scores = self._matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def _load(self, conn: sqlite3.Connection, row: int, similarity: float) -> DesignMatch:
+        entry_id = self._ids[row]
+        profile, constraints, design = conn.execute(
+            "SELECT profile, constraints, design FROM design_index WHERE id = ?", (entry_id,)
+        ).fetchone()
+        return DesignMatch(
+            id=entry_id,
+            similarity=round(similarity, 6),
+            design=json.loads(design),
+            profile=json.loads(profile),
+            constraints=json.loads(constraints),
+        )
+
+    def nearest(
+        self,
+        profile: Mapping[str, Any],
+        constraints: Mapping[str, Any],
+        k: int = 5,
+        extra: Optional[Mapping[str, Any]] = None,
+    ) -> List[DesignMatch]:
+        """The k most similar stored entries, best first (no threshold applied)."""
+        query = embed(profile, constraints, extra)
+        with self._lock:
+            try:
+                conn = self._connection()
+                return [self._load(conn, row, score) for row, score in self._search(query, k)]
+            except sqlite3.Error as e:
+                self._counters["errors"] += 1
+                logger.warning(f"[DesignIndex] Search failed: {e}")
+                return []
+
+    def lookup(
+        self,
+        profile: Mapping[str, Any],
+        constraints: Mapping[str, Any],
+        extra: Optional[Mapping[str, Any]] = None,
+        threshold: Optional[float] = None,
+    ) -> Optional[DesignMatch]:
+        """The closest threshold-similar stored design that is within_limits(), else None."""
+        threshold = self.threshold if threshold is None else threshold
+        query = embed(profile, constraints, extra)
+        with self._lock:
+            try:
+                conn = self._connection()
+                match = None
+                for row, score in self._search(query, LOOKUP_CANDIDATES):
+                    if score < threshold:
+                        break
+                    candidate = self._load(conn, row, score)
+                    if within_limits(candidate, constraints):
+                        match = candidate
+                        break
+                    self._counters["out_of_limits"] += 1
+                if match is None:
+                    self._counters["misses"] += 1
+                    return None
+                conn.execute(
+                    "UPDATE design_index SET last_used_at = ?, hits = hits + 1 WHERE id = ?",
+                    (time.time(), match.id),
+                )
+            except sqlite3.Error as e:
+                self._counters["errors"] += 1
+                logger.warning(f"[DesignIndex] Lookup failed: {e}")
+                return None
+            self._counters["hits"] += 1
+        return match
+
+    # ─── Writes ──────────────────────────────────────────────────────────────
+
+    def add(
+        self,
+        profile: Mapping[str, Any],
+        constraints: Mapping[str, Any],
+        design: Mapping[str, Any],
+        extra: Optional[Mapping[str, Any]] = None,
+    ) -> Optional[str]:
+        """Store design for these inputs; returns its id, or None if it can't be indexed."""
+        query = embed(profile, constraints, extra)
+        if not query.any():
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                best = self._search(query, 1)
+                if best and best[0][1] >= self.DUPLICATE_SIMILARITY:
+                    self._delete(conn, [self._ids[best[0][0]]])
+                entry_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO design_index "
+                    "(id, profile, constraints, extra, design, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        entry_id,
+                        json.dumps(dict(profile), default=str),
+                        json.dumps(dict(constraints), default=str),
+                        json.dumps(dict(extra or {}), default=str),
+                        json.dumps(design, default=str),
+                        now,
+                        now,
+                    ),
+                )
+                self._ids.append(entry_id)
+                self._matrix = np.vstack([self._matrix, query[None, :]])
+                self._counters["stores"] += 1
+                self._evict(conn)
+            except sqlite3.Error as e:
+                self._counters["errors"] += 1
+                logger.warning(f"[DesignIndex] Store failed: {e}")
+                return None
+        return entry_id
+
+    def _delete(self, conn: sqlite3.Connection, ids: List[str]) -> None:
+        conn.executemany("DELETE FROM design_index WHERE id = ?", [(i,) for i in ids])
+        doomed = set(ids)
+        keep = [row for row, entry_id in enumerate(self._ids) if entry_id not in doomed]
+        self._ids = [self._ids[row] for row in keep]
+        self._matrix = self._matrix[keep]
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop least recently used entries beyond max_entries."""
+        excess = len(self._ids) - self.max_entries
+        if excess <= 0:
+            return
+        victims = [
+            row[0]
+            for row in conn.execute(
+                "SELECT id FROM design_index ORDER BY last_used_at ASC LIMIT ?", (excess,)
+            )
+        ]
+        self._delete(conn, victims)
+        self._counters["evictions"] += len(victims)
+
+    def remove(self, entry_id: str) -> bool:
+        with self._lock:
+            conn = self._connection()
+            if entry_id not in self._ids:
+                return False
+            self._delete(conn, [entry_id])
+        return True
+
+    def clear(self) -> int:
+        with self._lock:
+            conn = self._connection()
+            count = len(self._ids)
+            conn.execute("DELETE FROM design_index")
+            self._ids = []
+            self._matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        return count
+
+    # ─── Metrics ─────────────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._connection()
+            return len(self._ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            try:
+                self._connection()
+                entries = len(self._ids)
+            except sqlite3.Error:
+                entries = 0
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": True,
+            "path": self.path,
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def warm_start(match: DesignMatch) -> Dict[str, Any]:
+    """A copy of the matched design, tagged with where it came from."""
+    design = copy.deepcopy(match.design)
+    design["warm_start"] = {"design_id": match.id, "similarity": round(match.similarity, 4)}
+    return design
+
+
+_design_index: Optional[DesignIndex] = None
+_design_index_loaded = False
+_design_index_lock = threading.Lock()
+
+
+def get_design_index() -> Optional[DesignIndex]:
+    """Process-wide index from the environment (None when disabled)."""
+    global _design_index, _design_index_loaded
+    if not _design_index_loaded:
+        with _design_index_lock:
+            if not _design_index_loaded:
+                _design_index = DesignIndex.from_env()
+                _design_index_loaded = True
+    return _design_index
+
+
+__all__ = [
+    "DesignIndex",
+    "DesignMatch",
+    "EMBEDDING_DIM",
+    "FEATURES",
+    "embed",
+    "get_design_index",
+    "warm_start",
+    "within_limits",
+]
@@ -1,5 +1,22 @@
-from .metrics import MetricsCollector
-from .carbon import CarbonTracker
-from .drift import DriftDetector
+"""Observability: metrics, carbon tracking, drift detection and request profiling.
+
+Submodules are imported on first attribute access so that importing a light
+module such as observability.request_profiler does not pull in numpy.
+"""
+
+import importlib
+
+_LAZY = {
+    "MetricsCollector": ".metrics",
+    "CarbonTracker": ".carbon",
+    "DriftDetector": ".drift",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["MetricsCollector", "CarbonTracker", "DriftDetector"]
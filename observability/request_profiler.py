@@ -0,0 +1,370 @@
+"""
+Per-route request profiling for the System2ML API
+
+ProfilingMiddleware records, per route template:
+- latency histogram (and p50/p95/p99 estimated from it), errors, requests in flight
+- response size histogram
+- queue wait: request arrival -> sync endpoint starting on a worker thread, which is
+  dominated by threadpool queueing when the pool is saturated
+
+Optionally a sample of requests (PROFILE_SAMPLE_RATE) runs under cProfile, and the
+profile is kept when the request exceeds PROFILE_THRESHOLD_MS. Sync endpoints are
+profiled on their worker thread; async endpoints on the event loop thread, where
+other requests' work can interleave.
+"""
+
+import bisect
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus-style upper bounds plus +Inf)."""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside the matching bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return lower + (upper - lower) * ((rank - seen) / n)
+            seen += n
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [str(b) for b in self.bounds] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "p50": round(self.quantile(0.50), 3),
+            "p95": round(self.quantile(0.95), 3),
+            "p99": round(self.quantile(0.99), 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    latency_ms: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS_MS))
+    queue_wait_ms: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS_MS))
+    response_bytes: Histogram = field(default_factory=lambda: Histogram(SIZE_BUCKETS_BYTES))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "latency_ms": self.latency_ms.to_dict(),
+            "queue_wait_ms": self.queue_wait_ms.to_dict(),
+            "response_bytes": self.response_bytes.to_dict(),
+        }
+
+
+@dataclass
+class _RequestContext:
+    started_at: float
+    profile: Optional[cProfile.Profile] = None
+
+
+_current_request: contextvars.ContextVar[Optional[_RequestContext]] = contextvars.ContextVar(
+    "system2ml_request_profile", default=None
+)
+
+
+class RequestProfiler:
+    """Thread-safe store of per-route stats and captured profiles."""
+
+    def __init__(
+        self,
+        sample_rate: Optional[float] = None,
+        threshold_ms: Optional[float] = None,
+        max_profiles: int = 20,
+    ):
+        self.sample_rate = (
+            float(os.environ.get("PROFILE_SAMPLE_RATE", "0")) if sample_rate is None else sample_rate
+        )
+        self.threshold_ms = (
+            float(os.environ.get("PROFILE_THRESHOLD_MS", "500"))
+            if threshold_ms is None
+            else threshold_ms
+        )
+        self.in_flight = 0
+        self.started_at = datetime.utcnow().isoformat()
+        self._routes: Dict[str, RouteStats] = {}
+        self._profiles: Deque[Dict[str, Any]] = deque(maxlen=max_profiles)
+        self._profile_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _stats(self, route: str) -> RouteStats:
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes.setdefault(route, RouteStats())
+        return stats
+
+    # Called from the middleware (event loop thread)
+
+    def begin(self) -> _RequestContext:
+        ctx = _RequestContext(started_at=time.perf_counter())
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            ctx.profile = cProfile.Profile()
+        with self._lock:
+            self.in_flight += 1
+        return ctx
+
+    def finish(self, ctx: _RequestContext, route: str, status: int, size: int) -> None:
+        elapsed_ms = (time.perf_counter() - ctx.started_at) * 1000
+        with self._lock:
+            self.in_flight -= 1
+            stats = self._stats(route)
+            stats.requests += 1
+            if status >= 500:
+                stats.errors += 1
+            stats.latency_ms.observe(elapsed_ms)
+            stats.response_bytes.observe(size)
+
+        if ctx.profile is not None and elapsed_ms >= self.threshold_ms:
+            self._keep_profile(ctx.profile, route, elapsed_ms, status)
+
+    def _keep_profile(
+        self, profile: cProfile.Profile, route: str, elapsed_ms: float, status: int
+    ) -> None:
+        out = io.StringIO()
+        try:
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(40)
+        except TypeError:  # profile never enabled (no Python frames recorded)
+            return
+        with self._lock:
+            self._profiles.append(
+                {
+                    "id": next(self._profile_ids),
+                    "route": route,
+                    "elapsed_ms": round(elapsed_ms, 2),
+                    "status": status,
+                    "captured_at": datetime.utcnow().isoformat(),
+                    "stats": out.getvalue(),
+                }
+            )
+
+    # Called around endpoint execution (see instrument)
+
+    def _enter_endpoint(self, route: str, on_worker_thread: bool) -> Optional[_RequestContext]:
+        ctx = _current_request.get()
+        with self._lock:
+            stats = self._stats(route)
+            stats.in_flight += 1
+            if ctx is not None and on_worker_thread:
+                stats.queue_wait_ms.observe((time.perf_counter() - ctx.started_at) * 1000)
+        return ctx
+
+    def _exit_endpoint(self, route: str) -> None:
+        with self._lock:
+            self._stats(route).in_flight -= 1
+
+    def _wrap(self, route_key: str, call):
+        profiler = self
+
+        if inspect.iscoroutinefunction(call):
+
+            @functools.wraps(call)
+            async def async_endpoint(*args, **kwargs):
+                ctx = profiler._enter_endpoint(route_key, on_worker_thread=False)
+                profile = _enable(ctx.profile if ctx is not None else None)
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    if profile is not None:
+                        profile.disable()
+                    profiler._exit_endpoint(route_key)
+
+            return async_endpoint
+
+        @functools.wraps(call)
+        def sync_endpoint(*args, **kwargs):
+            ctx = profiler._enter_endpoint(route_key, on_worker_thread=True)
+            profile = _enable(ctx.profile if ctx is not None else None)
+            try:
+                return call(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                profiler._exit_endpoint(route_key)
+
+        return sync_endpoint
+
+    def instrument(self, app) -> int:
+        """Wrap every API route's endpoint call; returns the number of routes instrumented.
+
+        Call once after all routes (including routers) are registered.
+        """
+        from fastapi.routing import APIRoute
+
+        count = 0
+        for route in app.routes:
+            if not isinstance(route, APIRoute) or route.dependant.call is None:
+                continue
+            if getattr(route.dependant.call, "__profiled__", False):
+                continue
+            methods = ",".join(sorted(route.methods or []))
+            wrapped = self._wrap(f"{methods} {route.path}", route.dependant.call)
+            wrapped.__profiled__ = True
+            route.dependant.call = wrapped
+            count += 1
+        return count
+
+    # Reporting
+
+    def snapshot(self, top: Optional[int] = None, sort: str = "p95") -> Dict[str, Any]:
+        with self._lock:
+            routes = {name: stats.to_dict() for name, stats in self._routes.items()}
+            in_flight = self.in_flight
+            profiles = [{k: v for k, v in p.items() if k != "stats"} for p in self._profiles]
+
+        def sort_key(item):
+            data = item[1]
+            if sort == "requests":
+                return data["requests"]
+            if sort == "total":
+                return data["latency_ms"]["sum"]
+            return data["latency_ms"].get(sort, data["latency_ms"]["p95"])
+
+        ordered = sorted(routes.items(), key=sort_key, reverse=True)
+        if top:
+            ordered = ordered[:top]
+
+        return {
+            "since": self.started_at,
+            "in_flight": in_flight,
+            "threadpool": _threadpool_stats(),
+            "profiling": {
+                "sample_rate": self.sample_rate,
+                "threshold_ms": self.threshold_ms,
+                "captured": profiles,
+            },
+            "routes": dict(ordered),
+        }
+
+    def get_profile(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for p in self._profiles:
+                if p["id"] == profile_id:
+                    return dict(p)
+        return None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self._profiles.clear()
+            self.started_at = datetime.utcnow().isoformat()
+
+
+def _enable(profile: Optional[cProfile.Profile]) -> Optional[cProfile.Profile]:
+    """Enable a profile on the current thread; None if another profiler is active."""
+    if profile is None:
+        return None
+    try:
+        profile.enable()
+    except ValueError:
+        return None
+    return profile
+
+
+def _threadpool_stats() -> Dict[str, Any]:
+    try:
+        import anyio.to_thread
+
+        stats = anyio.to_thread.current_default_thread_limiter().statistics()
+        return {
+            "total_tokens": stats.total_tokens,
+            "borrowed_tokens": stats.borrowed_tokens,
+            "waiting": stats.tasks_waiting,
+        }
+    except Exception:
+        # Only available from inside a running event loop
+        return {}
+
+
+class ProfilingMiddleware:
+    """ASGI middleware feeding RequestProfiler."""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ctx = self.profiler.begin()
+        token = _current_request.set(ctx)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None)
+            if path is not None:
+                key = f"{','.join(sorted(getattr(route, 'methods', None) or []))} {path}"
+            else:
+                key = "unmatched"
+            self.profiler.finish(ctx, key.strip(), status, size)
+
+
+__all__ = [
+    "RequestProfiler",
+    "ProfilingMiddleware",
+    "Histogram",
+    "RouteStats",
+    "LATENCY_BUCKETS_MS",
+    "SIZE_BUCKETS_BYTES",
+]
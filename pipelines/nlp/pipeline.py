@@ -127,6 +127,7 @@ class FinetuneNLPPipeline(NLPPipeline):
         model_id: str,
         method: str = "lora",
         quantise: bool = False,
+        packing: bool = False,
         **train_kwargs,
     ):
         """Run fine‑tuning on a CSV dataset.
@@ -141,10 +142,16 @@ class FinetuneNLPPipeline(NLPPipeline):
             ``lora`` or ``qlora`` – determines adapter configuration.
         quantise: bool
             Whether to use 4‑bit quantisation (QLoRA).
+        packing: bool
+            Pack several short examples into each ``MAX_SEQ_LENGTH`` row, with
+            position ids restarting per example so they stay independent.
+            Ignored (with a warning) when the model's attention implementation
+            cannot keep packed examples apart.
         train_kwargs: dict
             Additional ``TrainingArguments`` fields (e.g., ``num_train_epochs``).
         """
         import pandas as pd
+        from datasets import Dataset
         from transformers import TrainingArguments
         from trl import SFTTrainer
 
@@ -156,8 +163,21 @@ class FinetuneNLPPipeline(NLPPipeline):
         # Load backend and model
         self.load_backend("hf", model_id=model_id, method=method, quantise=quantise)
 
-        # Prepare dataset for SFTTrainer – simple dict format
-        train_data = [{"prompt": txt, "completion": str(lbl)} for txt, lbl in zip(texts, labels)]
+        # One text per example, "<text> <label>" + EOS, for both the packed and the SFT path
+        train_texts = [f"{txt} {lbl}" for txt, lbl in zip(texts, labels)]
+        tokenizer = self.model_obj["tokenizer"]
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        if packing:
+            from lib.training.packing import supports_packed_sequences
+
+            if not supports_packed_sequences(self.model_obj["model"]):
+                logger.warning(
+                    "Packing disabled: %s attention does not support packed sequences",
+                    getattr(self.model_obj["model"].config, "_attn_implementation", None),
+                )
+                packing = False
 
         output_dir = os.environ.get("FINETUNE_OUTPUT_DIR", "./outputs/finetune")
 
@@ -172,16 +192,49 @@ class FinetuneNLPPipeline(NLPPipeline):
             "fp16": not quantise,
             "logging_steps": int(os.environ.get("LOGGING_STEPS", "10")),
         }
+        if packing:
+            # seq_lengths is not a model input but the packing collator needs it
+            default_args["remove_unused_columns"] = False
         default_args.update(train_kwargs)
         training_args = TrainingArguments(**default_args)
 
-        trainer = SFTTrainer(
-            model=self.model_obj["model"],
-            tokenizer=self.model_obj["tokenizer"],
-            train_dataset=train_data,
-            max_seq_length=int(os.environ.get("MAX_SEQ_LENGTH", "512")),
-            args=training_args,
-        )
+        max_seq_length = int(os.environ.get("MAX_SEQ_LENGTH", "512"))
+        packing_report = None
+        if packing:
+            # SFTTrainer's own packing lets examples attend to each other; pack here instead
+            from transformers import Trainer
+            from lib.training.packing import PackedSequenceCollator, pack_examples, packing_stats
+
+            encoded = tokenizer(train_texts, truncation=True, max_length=max_seq_length - 1)
+            input_ids = [ids + [tokenizer.eos_token_id] for ids in encoded["input_ids"]]
+            packing_report = packing_stats(
+                [len(ids) for ids in input_ids],
+                max_seq_length,
+                training_args.per_device_train_batch_size,
+            )
+            logger.info(
+                "Packed %d examples into %d rows (%.0f%% of tokens are real)",
+                packing_report["examples"],
+                packing_report["packs"],
+                packing_report["packing_efficiency"] * 100,
+            )
+            trainer = Trainer(
+                model=self.model_obj["model"],
+                args=training_args,
+                train_dataset=Dataset.from_dict(pack_examples(input_ids, max_seq_length)),
+                data_collator=PackedSequenceCollator(tokenizer.pad_token_id),
+            )
+        else:
+            trainer = SFTTrainer(
+                model=self.model_obj["model"],
+                tokenizer=tokenizer,
+                train_dataset=Dataset.from_dict(
+                    {"text": [text + tokenizer.eos_token for text in train_texts]}
+                ),
+                dataset_text_field="text",
+                max_seq_length=max_seq_length,
+                args=training_args,
+            )
         try:
             trainer.train()
         except Exception as e:
@@ -198,4 +251,5 @@ class FinetuneNLPPipeline(NLPPipeline):
         return {
             "status": "finetuned",
             "output_dir": adapter_dir,
+            "packing": packing_report,
         }
@@ -1,9 +1,18 @@
 import pytest
 import sys
 import os
+import tempfile
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+# Designs accepted in one test must not warm-start another (or the next run)
+os.environ.setdefault("DESIGN_INDEX_ENABLED", "0")
+# Fine-tuning jobs created by API tests go to a throwaway database
+os.environ.setdefault(
+    "FINETUNING_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="system2ml-tests-"), "ft.db")
+)
+os.environ.setdefault("ADAPTER_ARTIFACT_DIR", tempfile.mkdtemp(prefix="system2ml-artifacts-"))
+
 
 @pytest.fixture
 def mock_env(monkeypatch):
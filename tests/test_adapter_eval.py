@@ -0,0 +1,271 @@
+"""Adapter comparison: batched evaluation harness and the /api/finetuning/compare endpoint."""
+
+from collections import OrderedDict
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent.adapter_eval as adapter_eval
+import agent.finetuning_service as finetuning_service
+from agent.adapter_eval import (
+    AdapterEvalHarness,
+    EvalExample,
+    Generation,
+    GenerationBackend,
+    PeftBackend,
+    rouge_l,
+    score,
+    token_f1,
+)
+from agent.artifact_store import AdapterArtifactStore
+from ui.api import app
+
+EXAMPLES = [
+    EvalExample("capital of france?", "paris"),
+    EvalExample("2 + 2 =", "4"),
+    EvalExample("colour of the clear daytime sky?", "blue"),
+    EvalExample("opposite of hot", "cold"),
+    EvalExample("largest planet?", "jupiter"),
+]
+ANSWERS = {e.prompt: e.reference for e in EXAMPLES}
+
+
+class FakeBackend(GenerationBackend):
+    """Base model answers 'unknown'; the 'good' adapter answers correctly."""
+
+    model_id = "tiny-base"
+
+    def __init__(self):
+        self.active = None
+        self.loaded = []
+        self.calls = []
+
+    def activate(self, adapter):
+        if adapter is not None and adapter not in self.loaded:
+            self.loaded.append(adapter)
+        self.active = adapter
+
+    def generate(self, prompts, max_new_tokens):
+        self.calls.append((self.active, list(prompts)))
+        if self.active == "good":
+            return [Generation(ANSWERS.get(p, ""), 1) for p in prompts]
+        return [Generation("unknown", 1) for _ in prompts]
+
+    def nll(self, prompts, references):
+        per_token = 0.1 if self.active == "good" else 2.0
+        return per_token * len(prompts), len(prompts)
+
+
+def test_text_metrics():
+    assert token_f1("The Paris!", "paris") == pytest.approx(2 / 3)
+    assert rouge_l("a b c d", "a c d") == pytest.approx(2 * 0.75 * 1 / 1.75)
+    assert score(["Paris", "x"], ["paris", ""], ["exact_match"]) == {"exact_match": 1.0}
+
+
+def test_backends_must_implement_the_model_calls():
+    class ActivateOnly(GenerationBackend):
+        def activate(self, adapter):
+            pass
+
+    with pytest.raises(TypeError):
+        ActivateOnly()
+    with pytest.raises(TypeError):
+        GenerationBackend()
+
+
+def test_harness_batches_by_length_and_caches_base_outputs():
+    backend = FakeBackend()
+    harness = AdapterEvalHarness(backend, batch_size=2)
+    report = harness.compare(EXAMPLES, ["good", "bad"], ["accuracy", "f1", "perplexity"])
+
+    assert backend.loaded == ["good", "bad"] and backend.active is None
+    base_batches = [prompts for adapter, prompts in backend.calls if adapter is None]
+    assert [len(batch) for batch in base_batches] == [2, 2, 1]
+    lengths = [len(p) for batch in base_batches for p in batch]
+    assert lengths == sorted(lengths)
+
+    good, bad = report["adapters"]
+    assert report["base"]["metrics"]["exact_match"] == 0.0
+    assert good["metrics"]["exact_match"] == 1.0
+    assert good["outputs"] == [e.reference for e in EXAMPLES]
+    assert good["improvement"]["exact_match"] == 1.0 and bad["improvement"]["f1"] == 0.0
+    assert good["metrics"]["perplexity"] < report["base"]["metrics"]["perplexity"]
+    assert good["tokens_per_sec"] > 0 and good["latency_ms"]["p95"] is not None
+
+    backend.calls.clear()
+    again = harness.compare(EXAMPLES + [EvalExample("new prompt", "x")], ["good"])
+    assert [p for adapter, p in backend.calls if adapter is None] == [["new prompt"]]
+    assert again["base"]["cached_examples"] == len(EXAMPLES)
+    assert harness.cache_hits == len(EXAMPLES)
+
+
+def test_harnesses_are_dropped_with_their_evicted_backend(monkeypatch):
+    monkeypatch.setattr(adapter_eval, "PeftBackend", lambda model_id, device: FakeBackend())
+    monkeypatch.setattr(adapter_eval, "_backends", OrderedDict())
+    monkeypatch.setattr(adapter_eval, "_harnesses", {})
+
+    first = adapter_eval.get_eval_harness("m1")
+    assert adapter_eval.get_eval_harness("m1") is first
+    assert adapter_eval.get_eval_harness("m1", batch_size=2).backend is first.backend
+    second = adapter_eval.get_eval_harness("m2")  # evicts m1's backend
+    assert list(adapter_eval._harnesses.values()) == [second]
+    assert adapter_eval.get_eval_harness("m1").backend is not first.backend
+
+
+class FakePeftModel:
+    def __init__(self):
+        self.adapters = []
+
+    def load_adapter(self, source, adapter_name):
+        self.adapters.append(adapter_name)
+
+    def set_adapter(self, name):
+        assert name in self.adapters
+
+    def delete_adapter(self, name):
+        self.adapters.remove(name)
+
+
+def test_peft_backend_unloads_least_recently_used_adapters():
+    # Skip loading a model: only the adapter bookkeeping is under test
+    backend = PeftBackend.__new__(PeftBackend)
+    backend.model_id, backend.base, backend.model = "tiny", object(), FakePeftModel()
+    backend.max_adapters, backend._loaded, backend._names = 2, OrderedDict(), 0
+
+    for adapter in ("x", "y", "x", "z", "y"):
+        backend.activate(adapter)
+    assert list(backend._loaded) == ["z", "y"]
+    assert backend.model.adapters == sorted(backend._loaded.values())
+    backend.activate(None)
+    assert len(backend.model.adapters) == 2
+
+
+def test_compare_endpoint_runs_the_harness(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(finetuning_service, "HAS_EVAL_DEPS", True)
+    monkeypatch.setattr(finetuning_service, "EVAL_ADAPTER_ALLOWLIST", frozenset({"good", "bad"}))
+    monkeypatch.setattr(
+        finetuning_service,
+        "get_eval_harness",
+        lambda model_id, device, batch_size, max_new_tokens: AdapterEvalHarness(
+            backend, batch_size, max_new_tokens
+        ),
+    )
+    response = TestClient(app).post(
+        "/api/finetuning/compare",
+        json={
+            "base_model_id": "tiny-base",
+            "fine_tuned_model_id": "good",
+            "adapters": ["bad"],
+            "examples": [{"prompt": e.prompt, "reference": e.reference} for e in EXAMPLES],
+            "metrics": ["accuracy"],
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "completed"
+    assert body["improvement"] == {"exact_match": 1.0}
+    assert [a["id"] for a in body["adapters"]] == ["good", "bad"]
+
+    response = TestClient(app).post(
+        "/api/finetuning/compare",
+        json={
+            "base_model_id": "tiny-base",
+            "fine_tuned_model_id": "/srv/models/private-adapter",
+            "examples": [{"prompt": "2 + 2 =", "reference": "4"}],
+        },
+    )
+    assert response.status_code == 400 and "Unknown adapter" in response.json()["detail"]
+
+
+def test_compare_endpoint_reads_benchmark_file(monkeypatch, tmp_path):
+    datasets = tmp_path / "eval_datasets"
+    datasets.mkdir()
+    (datasets / "eval.jsonl").write_text('{"instruction": "opposite of hot", "output": "cold"}\n')
+    (tmp_path / "private.jsonl").write_text('{"prompt": "secret", "output": "x"}\n')
+    monkeypatch.setattr(finetuning_service, "EVAL_DATASET_DIR", str(datasets))
+    monkeypatch.setattr(finetuning_service, "EVAL_ADAPTER_ALLOWLIST", frozenset({"good"}))
+    captured = {}
+
+    class Recorder(AdapterEvalHarness):
+        def compare(self, examples, adapters, metrics=()):
+            captured["examples"] = examples
+            return super().compare(examples, adapters, metrics)
+
+    monkeypatch.setattr(finetuning_service, "HAS_EVAL_DEPS", True)
+    monkeypatch.setattr(
+        finetuning_service, "get_eval_harness", lambda *args: Recorder(FakeBackend())
+    )
+    request = {"base_model_id": "tiny-base", "fine_tuned_model_id": "good"}
+    client = TestClient(app)
+    response = client.post(
+        "/api/finetuning/compare", json={**request, "benchmark_dataset": "eval.jsonl"}
+    )
+    assert response.status_code == 200
+    assert captured["examples"] == [EvalExample("opposite of hot", "cold")]
+    for outside in (str(tmp_path / "private.jsonl"), "../private.jsonl"):
+        response = client.post(
+            "/api/finetuning/compare", json={**request, "benchmark_dataset": outside}
+        )
+        assert response.status_code == 400
+
+
+def test_compare_endpoint_falls_back_to_template(monkeypatch):
+    monkeypatch.setattr(finetuning_service, "HAS_EVAL_DEPS", False)
+    response = TestClient(app).post(
+        "/api/finetuning/compare",
+        json={
+            "base_model_id": "base",
+            "fine_tuned_model_id": "adapter",
+            "benchmark_dataset": "glue",
+        },
+    )
+    body = response.json()
+    assert body["status"] == "ready_for_benchmark"
+    assert body["base_model"]["metrics"] == {"accuracy": None, "f1": None, "perplexity": None}
+    assert body["harness"]["available"] is False
+
+
+def test_compare_loads_hub_adapters_from_their_stored_files(monkeypatch, tmp_path):
+    store = AdapterArtifactStore(str(tmp_path / "store"), staging_root=str(tmp_path))
+    monkeypatch.setattr(finetuning_service, "get_artifact_store", lambda: store)
+    backend = FakeBackend()
+    monkeypatch.setattr(finetuning_service, "HAS_EVAL_DEPS", True)
+    monkeypatch.setattr(
+        finetuning_service, "get_eval_harness", lambda *args: AdapterEvalHarness(backend)
+    )
+    client = TestClient(app)
+    for adapter_id in ("hub-stored", "hub-empty"):
+        adapter = {
+            "id": adapter_id,
+            "name": adapter_id,
+            "model_id": "tiny-base",
+            "base_model_name": "tiny-base",
+            "method": "lora",
+            "lora_r": 8,
+            "lora_alpha": 16,
+            "dataset_name": "qa",
+            "dataset_rows": 5,
+            "epochs": 1,
+            "created_at": "2024-01-01T00:00:00",
+        }
+        assert client.post("/api/finetuning/adapters", json=adapter).status_code == 200
+    source = tmp_path / "out"
+    source.mkdir()
+    (source / "adapter_config.json").write_text('{"r": 8}')
+    store.ingest("hub-stored", str(source))
+
+    request = {
+        "base_model_id": "tiny-base",
+        "examples": [{"prompt": e.prompt, "reference": e.reference} for e in EXAMPLES],
+    }
+    response = client.post(
+        "/api/finetuning/compare", json={**request, "fine_tuned_model_id": "hub-stored"}
+    )
+    assert response.status_code == 200
+    assert backend.loaded == [str(store.checkout("hub-stored"))]
+    assert (store.checkout("hub-stored") / "adapter_config.json").read_text() == '{"r": 8}'
+    response = client.post(
+        "/api/finetuning/compare", json={**request, "fine_tuned_model_id": "hub-empty"}
+    )
+    assert response.status_code == 400 and "no stored artifacts" in response.json()["detail"]
@@ -0,0 +1,160 @@
+"""Adapter artifact store: file dedupe across versions, manifests and streamed zip downloads."""
+
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent.finetuning_service as finetuning_service
+from agent.artifact_store import AdapterArtifactStore
+from ui.api import app
+
+
+def _adapter_dir(root, weights: bytes):
+    root.mkdir(parents=True)
+    (root / "adapter_model.safetensors").write_bytes(weights)
+    (root / "adapter_config.json").write_text('{"r": 16}')
+    (root / "tokenizer").mkdir()
+    (root / "tokenizer" / "tokenizer.json").write_bytes(b"vocab" * 10_000)
+    return root
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    store = AdapterArtifactStore(str(tmp_path / "store"), staging_root=str(tmp_path))
+    monkeypatch.setattr(finetuning_service, "get_artifact_store", lambda: store)
+    return store
+
+
+def test_versions_share_unchanged_files(tmp_path, artifacts):
+    v1 = artifacts.ingest("a1", str(_adapter_dir(tmp_path / "v1", os.urandom(4096))))
+    v2 = artifacts.ingest("a2", str(_adapter_dir(tmp_path / "v2", os.urandom(4096))), parent="a1")
+
+    assert [f["path"] for f in v2["files"]] == [
+        "adapter_config.json",
+        "adapter_model.safetensors",
+        "tokenizer/tokenizer.json",
+    ]
+    assert v1["new_bytes"] == v1["total_bytes"]
+    assert v2["new_bytes"] == 4096 and v2["parent"] == "a1"
+    linked = artifacts.link("a3", "a2")
+    assert linked["files"] == v2["files"] and linked["new_bytes"] == 0
+
+    stats = artifacts.stats()
+    assert stats["artifacts"] == 3 and stats["blobs"] == 4
+    assert stats["stored_bytes"] == v1["total_bytes"] + 4096
+    assert stats["saved_bytes"] == stats["logical_bytes"] - stats["stored_bytes"]
+
+    assert artifacts.delete("a1") and artifacts.gc() == 4096
+    assert artifacts.gc() == 0
+    with pytest.raises(ValueError):
+        artifacts.ingest("../escape", str(tmp_path / "v1"))
+
+
+def test_stream_zip_reproduces_the_directory(tmp_path, artifacts):
+    source = _adapter_dir(tmp_path / "v1", os.urandom(300_000))
+    artifacts.ingest("a1", str(source))
+    chunks = list(artifacts.stream_zip("a1", chunk_size=64 * 1024))
+    assert len(chunks) > 3 and all(chunks)
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        for name in archive.namelist():
+            assert archive.read(name) == (source / name).read_bytes()
+    assert b"".join(artifacts.stream_zip("a1")) == b"".join(chunks)
+    assert artifacts.stream_zip("missing") is None
+
+
+def test_adapter_hub_endpoints_use_the_store(tmp_path, artifacts):
+    client = TestClient(app)
+    adapter = {
+        "id": "hub-adapter",
+        "name": "sentiment",
+        "model_id": "org/sentiment-lora",
+        "base_model_name": "tiny",
+        "method": "lora",
+        "lora_r": 16,
+        "lora_alpha": 32,
+        "dataset_name": "reviews",
+        "dataset_rows": 100,
+        "epochs": 1,
+        "created_at": "2024-01-01T00:00:00",
+    }
+    assert client.post("/api/finetuning/adapters", json=adapter).status_code == 200
+    source = _adapter_dir(tmp_path / "v1", os.urandom(2048))
+    artifacts.ingest("job-1", str(source))  # what the training worker does
+    response = client.post(
+        "/api/finetuning/adapters/hub-adapter/artifacts", json={"from_artifact": "job-1"}
+    )
+    assert response.status_code == 200 and response.json()["manifest"]["new_bytes"] == 0
+
+    versioned = client.put(
+        "/api/finetuning/adapters/hub-adapter/version", json={"description": "v2"}
+    )
+    new_id = versioned.json()["adapter"]["id"]
+    manifest = client.get(f"/api/finetuning/adapters/{new_id}/manifest").json()
+    assert manifest["parent"] == "hub-adapter" and manifest["new_bytes"] == 0
+
+    download = client.get(f"/api/finetuning/adapters/{new_id}/download")
+    assert download.status_code == 200
+    assert download.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(download.content)) as archive:
+        assert archive.read("adapter_model.safetensors") == (
+            source / "adapter_model.safetensors"
+        ).read_bytes()
+    assert client.get(f"/api/finetuning/adapters/{new_id}").json()["download_count"] == 1
+
+    stats = client.get("/api/finetuning/artifacts/stats").json()
+    assert stats["logical_bytes"] == 3 * stats["stored_bytes"]
+    assert client.get("/api/finetuning/adapters/nope/download").status_code == 404
+    upload = "/api/finetuning/adapters/hub-adapter/artifacts"
+    assert client.post(upload, json={"path": str(source)}).status_code == 422
+    assert client.post(upload, json={"from_artifact": "nope"}).status_code == 404
+    versioned = client.put(
+        "/api/finetuning/adapters/hub-adapter/version", json={"artifact_id": "nope"}
+    )
+    assert versioned.status_code == 400
+
+
+def test_checkout_lays_out_the_files_until_the_manifest_changes(tmp_path, artifacts):
+    source = _adapter_dir(tmp_path / "v1", os.urandom(1024))
+    artifacts.ingest("a1", str(source))
+    checkout = artifacts.checkout("a1")
+    for name in ("adapter_model.safetensors", "adapter_config.json", "tokenizer/tokenizer.json"):
+        assert (checkout / name).read_bytes() == (source / name).read_bytes()
+    assert artifacts.checkout("a1") == checkout
+    assert artifacts.checkout("missing") is None
+
+    artifacts.ingest("a1", str(_adapter_dir(tmp_path / "v2", os.urandom(1024))))
+    assert artifacts.checkout("a1") != checkout
+    artifacts.gc()
+    assert not checkout.exists()
+    assert artifacts.delete("a1") and not any(artifacts.checkouts_dir.iterdir())
+
+
+def test_ingest_only_reads_regular_files_under_the_staging_root(tmp_path):
+    store = AdapterArtifactStore(str(tmp_path / "store"), staging_root=str(tmp_path / "outputs"))
+    secret = tmp_path / "secret.txt"
+    secret.write_text("do not ship")
+    outside = _adapter_dir(tmp_path / "elsewhere", b"weights")
+    with pytest.raises(ValueError, match="outside"):
+        store.ingest("a1", str(outside))
+    job = _adapter_dir(tmp_path / "outputs" / "job-1", b"weights")
+    with pytest.raises(ValueError, match="outside"):
+        store.ingest("a1", str(tmp_path / "outputs" / ".." / "elsewhere"))
+    (job / "leak.txt").symlink_to(secret)
+    with pytest.raises(ValueError, match="Symlinks"):
+        store.ingest("a1", str(job))
+    (job / "leak.txt").unlink()
+    (job / "linked").symlink_to(tmp_path, target_is_directory=True)
+    with pytest.raises(ValueError, match="Symlinks"):
+        store.ingest("a1", str(job))
+    (job / "linked").unlink()
+    (tmp_path / "outputs" / "alias").symlink_to(outside, target_is_directory=True)
+    with pytest.raises(ValueError, match="not found"):
+        store.ingest("a1", str(tmp_path / "outputs" / "alias"))
+
+    assert store.ingest("a1", str(job))["total_bytes"] > 0
+    assert store.manifest("a1")["files"][0]["path"] == "adapter_config.json"
@@ -0,0 +1,113 @@
+"""Backplane integration tests: a local redis-server if one answers, otherwise fakeredis."""
+
+import asyncio
+import os
+
+import pytest
+
+from lib.realtime.backplane import HAS_REDIS, Backplane
+from lib.realtime.fanout import FanoutHub
+
+REDIS_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
+
+
+class FakeSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.messages.append(message)
+
+
+async def _redis_client_factory():
+    """Return a callable producing clients that share one Redis server, or None."""
+    if HAS_REDIS:
+        import redis.asyncio as aioredis
+
+        probe = aioredis.from_url(REDIS_URL)
+        try:
+            await asyncio.wait_for(probe.ping(), 0.5)
+            return lambda: aioredis.from_url(REDIS_URL)
+        except Exception:
+            pass
+        finally:
+            await probe.aclose()
+
+    try:
+        import fakeredis
+    except ImportError:
+        return None
+    server = fakeredis.FakeServer()
+    return lambda: fakeredis.FakeAsyncRedis(server=server)
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def test_broadcast_reaches_clients_on_other_workers():
+    async def scenario():
+        factory = await _redis_client_factory()
+        if factory is None:
+            return "skip"
+
+        channel = f"system2ml:ws:test:{os.getpid()}"
+        workers = []
+        for _ in range(2):
+            hub = FanoutHub()
+            backplane = Backplane(mode="redis", redis_channel=channel)
+            backplane.attach("ui", hub)
+            assert await backplane.start(client=factory()) == "redis"
+            workers.append((backplane, hub))
+
+        (bp_a, hub_a), (bp_b, hub_b) = workers
+        sock_a, sock_b = FakeSocket(), FakeSocket()
+        await hub_a.connect(sock_a, "training")
+        await hub_b.connect(sock_b, "training")
+
+        message = {"type": "log", "line": "epoch 1 done"}
+        await bp_a.publish("ui", "training", message)
+
+        assert await _wait_for(lambda: sock_a.messages and sock_b.messages)
+        assert sock_a.messages == [message]
+        assert sock_b.messages == [message]
+
+        # Events for a namespace a worker never attached are ignored there
+        await bp_b.publish("finetuning", "job-1", {"type": "progress"})
+        await asyncio.sleep(0.05)
+        assert sock_a.messages == [message]
+
+        for backplane, hub in workers:
+            hub.disconnect(sock_a, "training")
+            hub.disconnect(sock_b, "training")
+            await backplane.stop()
+
+    if asyncio.run(scenario()) == "skip":
+        pytest.skip("neither redis-server nor fakeredis available")
+
+
+def test_falls_back_to_in_process_delivery():
+    async def scenario():
+        hub = FanoutHub()
+        backplane = Backplane(url="redis://127.0.0.1:1/0", mode="auto")
+        backplane.attach("ui", hub)
+        assert await backplane.start() == "memory"
+
+        sock = FakeSocket()
+        await hub.connect(sock, "dashboard")
+        await backplane.publish("ui", "dashboard", {"type": "kpi_update", "kpi_type": "cost"})
+        backplane.publish_threadsafe("ui", "dashboard", {"type": "log"})
+
+        assert await _wait_for(lambda: len(sock.messages) == 2)
+        hub.disconnect(sock, "dashboard")
+        await backplane.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,117 @@
+"""Dataset profiling: streaming sketches and the approximate profile_dataset mode."""
+
+import io
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import agent.finetuning_service as finetuning_service
+from agent.finetuning_service import profile_dataset
+from lib.profiling.sketches import HyperLogLog, QuantileSketch, ReservoirSample
+
+
+def _dataset(rows=20_000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "instruction": ["word " * int(n) for n in rng.integers(5, 60, rows)],
+            "label": rng.choice(["pos", "neg", "neutral"], rows, p=[0.5, 0.3, 0.2]),
+            "score": rng.normal(size=rows),
+            "id": np.arange(rows),
+        }
+    )
+    df.loc[::7, "score"] = np.nan
+    return df
+
+
+def _encode(df, file_format):
+    buffer = io.BytesIO()
+    if file_format == "csv":
+        df.to_csv(buffer, index=False)
+    elif file_format == "jsonl":
+        df.to_json(buffer, orient="records", lines=True)
+    else:
+        df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_reservoir_is_uniform_across_chunked_offers():
+    hits = Counter()
+    for seed in range(500):
+        sample = ReservoirSample(size=10, seed=seed)
+        for chunk in np.array_split(np.arange(100), 7):
+            sample.extend(chunk)
+        assert len(sample.items) == 10 and sample.seen == 100
+        hits.update(int(x) for x in sample.items)
+    assert len(hits) == 100
+    assert max(hits.values()) < 2 * 50 and min(hits.values()) > 50 / 2
+
+
+def test_hyperloglog_is_within_its_error_and_merges():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update(np.arange(60_000))
+    right.update(np.arange(40_000, 100_000).astype(float))  # NaN-upcast chunk
+    estimate = left.merge(right).interval()
+    assert estimate["low"] <= 100_000 <= estimate["high"]
+
+    small = HyperLogLog()
+    small.update(pd.Series(["a", "b", "a", "c"]))
+    assert round(small.estimate()) == 3
+
+
+def test_quantile_sketch_has_relative_accuracy_and_exact_moments():
+    values = np.random.default_rng(1).lognormal(5, 1, 50_000)
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for chunk in np.array_split(values, 5):
+        sketch.update(chunk)
+    for q in (0.5, 0.9, 0.99):
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
+    assert sketch.count == len(values) and sketch.max == values.max()
+    assert sketch.mean == pytest.approx(values.mean())
+    with pytest.raises(ValueError):
+        sketch.update([-1.0])
+
+
+@pytest.mark.parametrize("file_format", ["csv", "jsonl", "parquet"])
+def test_approximate_profile_matches_exact_within_bounds(monkeypatch, file_format):
+    monkeypatch.setattr(finetuning_service, "PROFILE_CHUNK_ROWS", 3_000)
+    content = _encode(_dataset(), file_format)
+    exact = profile_dataset(content, file_format, approximate=False)
+    approx = profile_dataset(content, file_format, approximate=True)
+
+    assert approx.approximate and not exact.approximate
+    for field in ("rows", "columns", "label_column", "label_type", "task_type", "missing_values"):
+        assert getattr(approx, field) == getattr(exact, field)
+    assert approx.text_columns == exact.text_columns == ["instruction"]
+    assert approx.numeric_columns == exact.numeric_columns == ["score", "id"]
+
+    margins = approx.error_bounds["class_balance"]
+    for label, count in exact.class_balance.items():
+        assert abs(approx.class_balance[label] - count) <= margins[label]
+    for column, count in exact.distinct_counts.items():
+        relative = approx.error_bounds["distinct_counts_relative_error"]
+        assert abs(approx.distinct_counts[column] - count) <= relative * count + 1
+    exact_lengths = exact.text_lengths["instruction"]
+    approx_lengths = approx.text_lengths["instruction"]
+    assert approx_lengths["mean_chars"] == exact_lengths["mean_chars"]
+    assert approx_lengths["p90_chars"] == pytest.approx(exact_lengths["p90_chars"], rel=0.02)
+
+
+def test_mode_is_chosen_by_size_and_handles_ragged_json_records(monkeypatch):
+    records = (
+        b'{"messages": [{"role": "user", "content": "hi"}], "label": "a"}\n'
+        b'{"messages": [], "label": "b"}\n'
+        b'{"other": "x"}\n'
+    )
+    assert not profile_dataset(records, "jsonl").approximate
+
+    monkeypatch.setattr(finetuning_service, "PROFILE_EXACT_MAX_MB", 0)
+    monkeypatch.setattr(finetuning_service, "PROFILE_CHUNK_ROWS", 2)
+    profile = profile_dataset(records, "jsonl")
+    assert profile.approximate
+    assert profile.columns == ["messages", "label", "other"]
+    assert profile.missing_values == {"messages": 1, "label": 1, "other": 2}
+    assert profile.distinct_counts == {"messages": 2, "label": 2, "other": 1}
+    assert profile.class_balance == {"a": 1, "b": 1}
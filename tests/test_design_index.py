@@ -0,0 +1,142 @@
+"""Nearest-neighbour design index: embedding, warm-start lookups and persistence."""
+
+import numpy as np
+
+import agent.ai_service as ai_service
+from memory.design_index import DesignIndex, embed
+
+PROFILE = {
+    "label_type": "classification",
+    "rows": 5000,
+    "num_features": 12,
+    "data_types": {"age": "numeric", "income": "numeric", "city": "categorical"},
+}
+CONSTRAINTS = {"max_cost_usd": 10, "max_carbon_kg": 1.0, "max_latency_ms": 200}
+DESIGN = {
+    "status": "success",
+    "decision_summary": {"recommended_model_family": "xgboost"},
+    "pipeline": {"model_training": {"algorithm": "xgboost"}},
+    "alternatives_considered": ["random_forest"],
+}
+
+
+def _near(**changes):
+    profile = {**PROFILE, **{k: v for k, v in changes.items() if k in PROFILE}}
+    constraints = {**CONSTRAINTS, **{k: v for k, v in changes.items() if k in CONSTRAINTS}}
+    return profile, constraints
+
+
+def test_embedding_is_deterministic_and_tracks_closeness():
+    query = embed(PROFILE, CONSTRAINTS)
+    assert np.array_equal(query, embed(dict(PROFILE), dict(CONSTRAINTS)))
+    assert abs(float(np.linalg.norm(query)) - 1.0) < 1e-6
+    assert not embed({}, {}).any()
+
+    def similarity(**changes):
+        return float(embed(*_near(**changes)) @ query)
+
+    assert similarity(rows=5400, max_cost_usd=11) > 0.999
+    assert similarity(rows=50_000) < similarity(rows=10_000) < 1.0
+    assert similarity(label_type="regression") < 0.8
+    assert similarity(max_cost_usd=2) < 0.98
+
+
+def test_lookup_hits_close_requests_and_misses_distant_ones():
+    index = DesignIndex(path=":memory:", threshold=0.98)
+    entry_id = index.add(PROFILE, CONSTRAINTS, DESIGN)
+
+    match = index.lookup(*_near(rows=5200, num_features=13))
+    assert match is not None and match.id == entry_id and match.design == DESIGN
+    assert match.similarity > 0.99
+    assert index.lookup(*_near(label_type="regression")) is None
+    assert index.lookup({}, {}) is None
+    assert index.add({}, {}, DESIGN) is None  # nothing to embed
+
+    index.add(*_near(rows=5000.2), {**DESIGN, "status": "replaced"})
+    assert len(index) == 1  # same inputs replace the entry
+    assert index.stats()["hits"] == 1 and index.stats()["misses"] == 2
+
+
+def test_lookup_rejects_designs_made_for_looser_limits():
+    index = DesignIndex(path=":memory:", threshold=0.9)
+    # Each stored design is close, but was made for a looser limit than requested
+    for key, stored, requested in [
+        ("max_cost_usd", 40, 10),
+        ("max_latency_ms", 500, 100),
+        ("max_carbon_kg", 9, 1),
+    ]:
+        index.clear()
+        index.add(PROFILE, {**CONSTRAINTS, key: stored}, DESIGN)
+        assert index.lookup(PROFILE, {**CONSTRAINTS, key: requested}) is None
+        # A design made for stricter limits is a valid answer to looser ones
+        assert index.lookup(PROFILE, {**CONSTRAINTS, key: stored * 1.2}) is not None
+    assert index.stats()["out_of_limits"] == 3
+
+    # ... unless its own estimate breaks the request's limit
+    index.clear()
+    index.add(PROFILE, CONSTRAINTS, {**DESIGN, "cost_estimate": {"monthly_usd": 12}})
+    assert index.lookup(PROFILE, CONSTRAINTS) is None
+    assert index.lookup(PROFILE, {**CONSTRAINTS, "max_cost_usd": 12}) is not None
+
+
+def test_nearest_orders_by_similarity_and_eviction_keeps_recent_hits():
+    index = DesignIndex(path=":memory:", max_entries=3)
+    for rows in (1_000, 10_000, 100_000):
+        index.add(*_near(rows=rows), {**DESIGN, "rows": rows})
+    ranked = index.nearest(*_near(rows=8_000), k=3)
+    assert [m.design["rows"] for m in ranked] == [10_000, 1_000, 100_000]
+
+    index.lookup(*_near(rows=1_000), threshold=0.0)  # touch the oldest entry
+    index.add(*_near(rows=1_000_000), {**DESIGN, "rows": 1_000_000})
+    assert len(index) == 3
+    rows = {m.design["rows"] for m in index.nearest(PROFILE, CONSTRAINTS, k=5)}
+    assert rows == {1_000, 100_000, 1_000_000}
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "designs.db")
+    index = DesignIndex(path=path)
+    index.add(PROFILE, CONSTRAINTS, DESIGN, extra={"cloud": "aws"})
+    index.close()
+
+    reopened = DesignIndex(path=path)
+    assert reopened.lookup(PROFILE, CONSTRAINTS, extra={"cloud": "aws"}).design == DESIGN
+    assert reopened.lookup(PROFILE, CONSTRAINTS, extra={"cloud": "gcp"}) is None
+    reopened.close()
+
+
+def test_design_service_warm_starts_from_accepted_designs(monkeypatch):
+    index = DesignIndex(path=":memory:")
+    service = ai_service.AIDesignService(api_key="", design_index=index)
+    calls = []
+
+    def generate(profile, constraints, infra_context, on_partial):
+        calls.append(profile["rows"])
+        return dict(DESIGN)
+
+    monkeypatch.setattr(service, "_generate", generate)
+    assert service.generate_pipeline(PROFILE, CONSTRAINTS) == DESIGN
+
+    partials = []
+    design = service.generate_pipeline(
+        *_near(rows=5100), on_partial=lambda path, value: partials.append(path)
+    )
+    assert calls == [5000]
+    assert design["warm_start"]["similarity"] > 0.99
+    assert partials == [
+        ("decision_summary",),
+        ("pipeline", "model_training"),
+        ("alternatives_considered", 0),
+    ]
+
+    service.generate_pipeline(*_near(rows=5100), use_cache=False)
+    assert calls == [5000, 5100]
+
+
+def test_rule_based_fallback_is_not_indexed(monkeypatch):
+    index = DesignIndex(path=":memory:")
+    service = ai_service.AIDesignService(api_key="", design_index=index)
+    monkeypatch.setattr(service, "_pipeline_chain", lambda: [])
+    result = service.generate_pipeline(PROFILE, CONSTRAINTS)
+    assert result["status"] == "success" and "warm_start" not in result
+    assert len(index) == 0
@@ -0,0 +1,112 @@
+import asyncio
+
+from lib.realtime.fanout import ClientSession, FanoutHub
+
+
+class FakeSocket:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.messages = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_json(self, message):
+        if self.fail:
+            raise RuntimeError("socket closed")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages.append(message)
+
+
+def _update(progress):
+    return {"type": "training_update", "run_id": "r1", "progress": progress}
+
+
+def test_slow_client_does_not_block_fast_clients():
+    async def scenario():
+        hub = FanoutHub()
+        fast, slow = FakeSocket(), FakeSocket(delay=10)
+        await hub.connect(fast, "training")
+        await hub.connect(slow, "training")
+
+        assert hub.publish("training", {"type": "log", "line": "epoch 1"}) == 2
+        await asyncio.sleep(0.01)
+        assert fast.messages == [{"type": "log", "line": "epoch 1"}]
+        assert slow.messages == []
+
+        hub.disconnect(slow, "training")
+        hub.disconnect(fast, "training")
+
+    asyncio.run(scenario())
+
+
+def test_progress_snapshots_are_coalesced():
+    async def scenario():
+        session = ClientSession(FakeSocket())
+        for i in range(5):
+            session.enqueue(_update(i), coalesce_key=("training_update", "r1"))
+        session.enqueue({"type": "log"})
+        assert session.queued == 2
+        assert session.coalesced == 4
+
+        session.start()
+        await asyncio.sleep(0.01)
+        assert session.websocket.messages == [_update(4), {"type": "log"}]
+        await session.close()
+
+    asyncio.run(scenario())
+
+
+def test_queue_is_bounded_and_drops_oldest():
+    async def scenario():
+        session = ClientSession(FakeSocket(), max_queue=3)
+        for i in range(5):
+            session.enqueue({"type": "log", "n": i})
+        assert session.queued == 3
+        assert session.dropped == 2
+
+        session.start()
+        await asyncio.sleep(0.01)
+        assert [m["n"] for m in session.websocket.messages] == [2, 3, 4]
+        await session.close()
+
+    asyncio.run(scenario())
+
+
+def test_dead_and_stalled_clients_are_evicted():
+    async def scenario():
+        hub = FanoutHub(send_timeout=0.05)
+        ok, broken, stalled = FakeSocket(), FakeSocket(fail=True), FakeSocket(delay=10)
+        for ws in (ok, broken, stalled):
+            await hub.connect(ws, "pipeline")
+
+        hub.publish("pipeline", {"type": "log"})
+        await asyncio.sleep(0.2)
+
+        assert hub.client_count("pipeline") == 1
+        assert hub.stats()["evicted"] == 2
+        assert ok.messages == [{"type": "log"}]
+        hub.disconnect(ok, "pipeline")
+
+    asyncio.run(scenario())
+
+
+def test_sequenced_messages_are_delivered_once_in_order():
+    async def scenario():
+        hub = FanoutHub(coalesce_key=None)
+        sock = FakeSocket()
+        session = await hub.connect(sock, "job")
+        for seq in (1, 2, 2, 1, 3):
+            hub.publish("job", {"type": "log", "seq": seq})
+        hub.publish("job", {"type": "subscribed"})
+        await asyncio.sleep(0.01)
+        assert [m.get("seq") for m in sock.messages] == [1, 2, 3, None]
+        assert session.duplicates == 2 and session.last_seq == 3
+        hub.disconnect(sock, "job")
+
+    asyncio.run(scenario())
@@ -0,0 +1,118 @@
+"""Persistent fine-tuning job and adapter store: pagination, filters, workers, finished jobs."""
+
+from fastapi.testclient import TestClient
+
+from agent.finetuning_store import FinetuningStore
+from lib.realtime.event_log import EventLogRegistry
+from ui.api import app
+
+client = TestClient(app)
+
+
+def _job(i, status="notebook_ready", model_id="m/a"):
+    return {
+        "job_id": f"job{i:03d}",
+        "status": status,
+        "model_id": model_id,
+        "method": "qlora",
+        "platform": "colab",
+        "created_at": f"2026-01-01T00:00:{i:02d}",
+        "notebook": {"cells": [i]},
+    }
+
+
+def test_jobs_are_paginated_filtered_and_listed_without_notebooks():
+    store = FinetuningStore(path=":memory:")
+    for i in range(30):
+        store.create_job(_job(i, model_id="m/a" if i % 3 else "m/b"))
+
+    page, total = store.list_jobs(limit=10, offset=5)
+    assert total == 30
+    assert [j["job_id"] for j in page] == [f"job{i:03d}" for i in range(24, 14, -1)]
+    assert all("notebook" not in j for j in page)
+
+    page, total = store.list_jobs(model_id="m/b", limit=100)
+    assert total == 10 and {j["model_id"] for j in page} == {"m/b"}
+    assert store.get_notebook("job007") == (store.get_job("job007"), {"cells": [7]})
+    assert store.get_notebook("missing") == (None, None)
+
+
+def test_workers_sharing_a_file_see_the_same_jobs_and_versions(tmp_path):
+    path = str(tmp_path / "ft.db")
+    worker_a, worker_b = FinetuningStore(path=path), FinetuningStore(path=path)
+    before = worker_b.versions("finetuning_jobs")
+
+    worker_a.create_job(_job(1))
+    assert worker_b.get_job("job001")["status"] == "notebook_ready"
+    after_insert = worker_b.versions("finetuning_jobs")
+    assert after_insert != before and after_insert[0] == before[0]  # same epoch
+
+    worker_b.update_job("job001", status="running", progress=0.5)
+    assert worker_a.get_job("job001")["progress"] == 0.5
+    assert worker_a.versions("finetuning_jobs") != after_insert
+    assert worker_a.delete_job("job001") and worker_b.get_job("job001") is None
+    worker_a.close()
+    worker_b.close()
+
+
+def test_finished_jobs_are_stamped_and_kept():
+    store = FinetuningStore(path=":memory:")
+    store.create_job(_job(1))
+    store.create_job(_job(2))
+    finished = store.update_job("job001", status="completed")
+    assert finished["finished_at"]
+    assert store.update_job("nope", status="failed") is None
+    assert [j["job_id"] for j in store.list_jobs(status="completed")[0]] == ["job001"]
+
+
+def test_adapters_filter_by_model_and_visibility():
+    store = FinetuningStore(path=":memory:")
+    for i, (model_id, public) in enumerate([("m/a", True), ("m/a", False), ("m/b", True)]):
+        store.save_adapter(
+            {
+                "id": f"ad{i}",
+                "model_id": model_id,
+                "is_public": public,
+                "created_at": f"2026-01-0{i + 1}",
+            }
+        )
+    assert [a["id"] for a in store.list_adapters()[0]] == ["ad2", "ad1", "ad0"]
+    assert [a["id"] for a in store.list_adapters(model_id="m/a")[0]] == ["ad1", "ad0"]
+    assert [a["id"] for a in store.list_adapters(is_public=False)[0]] == ["ad1"]
+    store.update_adapter("ad1", is_public=True)
+    assert store.list_adapters(is_public=False) == ([], 0)
+
+
+def test_closed_event_logs_expire_from_memory():
+    registry = EventLogRegistry()
+    registry.get("running").append("progress", {})
+    finished = registry.get("finished")
+    finished.close()
+    finished.updated_at -= 120
+    assert registry.prune_closed(max_idle_seconds=60) == 1
+    assert registry.get("finished", create=False) is None
+    assert registry.get("running", create=False) is not None
+
+
+def test_jobs_api_pages_and_survives_a_fresh_store(monkeypatch):
+    from agent import finetuning_service
+
+    request = {"model_id": "org/tiny-model", "model_name": "Tiny", "method": "lora"}
+    created = [
+        client.post("/api/finetuning/notebook/generate", json=request).json()["job_id"]
+        for _ in range(3)
+    ]
+    listing = client.get(
+        "/api/finetuning/jobs", params={"model_id": "org/tiny-model", "limit": 2}
+    ).json()
+    assert listing["total"] >= 3 and len(listing["jobs"]) == 2
+    assert listing["next_offset"] == 2
+
+    # A new process (or another worker) opening the same database sees the jobs
+    store = finetuning_service.get_finetuning_store()
+    fresh = FinetuningStore(path=store.path)
+    monkeypatch.setattr(finetuning_service, "get_finetuning_store", lambda: fresh)
+    assert client.get(f"/api/finetuning/jobs/{created[0]}").json()["status"] == "notebook_ready"
+    download = client.get(f"/api/finetuning/notebook/{created[0]}/download")
+    assert download.status_code == 200 and download.json()["cells"]
+    fresh.close()
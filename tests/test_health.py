@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from ui.api import app
+from ui.health import HealthChecker, sqlite_check
+
+client = TestClient(app)
+
+
+def test_livez_is_constant_and_dependency_free():
+    response = client.get("/livez")
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+
+def test_readyz_reports_each_dependency():
+    response = client.get("/readyz")
+    data = response.json()
+    assert response.status_code in (200, 503)
+    assert {"database", "redis", "llm_backends", "disk"} <= set(data["checks"])
+    assert data["checks"]["database"] == "ok"
+
+
+def test_health_detail_includes_latency_per_check():
+    data = client.get("/health/detail").json()
+    assert data["checks"]["database"]["latency_ms"] >= 0
+    assert data["checks"]["database"]["critical"] is True
+
+
+def test_checks_run_concurrently_with_timeouts_and_are_cached():
+    calls = {"n": 0}
+
+    def counted():
+        calls["n"] += 1
+        return {}
+
+    async def hangs():
+        await asyncio.sleep(10)
+
+    checker = HealthChecker(ttl=60, default_timeout=0.2)
+    checker.register("counted", counted)
+    checker.register("hangs", hangs, critical=False)
+    checker.register("slow", lambda: time.sleep(0.1) or {})
+
+    async def scenario():
+        start = time.perf_counter()
+        first = await checker.readiness()
+        elapsed = time.perf_counter() - start
+        second = await checker.readiness()
+        return first, second, elapsed
+
+    first, second, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.5
+    assert first["checks"] == {"counted": "ok", "hangs": "down", "slow": "ok"}
+    assert first["status"] == "ready"  # only a non-critical check is down
+    assert second["checks"] == first["checks"]
+    assert calls["n"] == 1
+
+
+def test_critical_failure_makes_service_not_ready():
+    def broken():
+        raise RuntimeError("database is locked")
+
+    checker = HealthChecker()
+    checker.register("database", broken)
+    result = asyncio.run(checker.readiness())
+    assert result["status"] == "not_ready"
+
+
+def test_missing_database_is_down_and_not_created(tmp_path):
+    missing = tmp_path / "gone.db"
+    checker = HealthChecker()
+    checker.register("database", sqlite_check(str(missing)))
+    result = asyncio.run(checker.readiness())
+    assert result["status"] == "not_ready" and result["checks"]["database"] == "down"
+    assert not missing.exists()
@@ -0,0 +1,60 @@
+from fastapi.testclient import TestClient
+
+from ui.api import app
+from ui.database import ActivityStore
+from ui.http_cache import etag_matches
+
+client = TestClient(app)
+
+
+def test_list_endpoint_returns_weak_etag_and_cache_control():
+    response = client.get("/api/pipelines")
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('W/"')
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_if_none_match_returns_304_until_table_changes():
+    first = client.get("/api/activities")
+    etag = first.headers["etag"]
+
+    cached = client.get("/api/activities", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    ActivityStore.log("test", "ETag invalidation")
+
+    refreshed = client.get("/api/activities", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert refreshed.json()["activities"][0]["title"] == "ETag invalidation"
+
+
+def test_etags_are_scoped_per_endpoint():
+    runs = client.get("/api/runs").headers["etag"]
+    metrics = client.get("/api/metrics").headers["etag"]
+    assert runs != metrics
+    assert client.get("/api/metrics", headers={"If-None-Match": runs}).status_code == 200
+
+
+def test_finetuning_jobs_etag_tracks_job_changes():
+    from agent import finetuning_service
+
+    etag = client.get("/api/finetuning/jobs").headers["etag"]
+    assert client.get("/api/finetuning/jobs", headers={"If-None-Match": etag}).status_code == 304
+
+    store = finetuning_service.get_finetuning_store()
+    store.create_job({"job_id": "etag-job", "status": "pending"})
+    try:
+        changed = client.get("/api/finetuning/jobs", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+    finally:
+        store.delete_job("etag-job")
+
+
+def test_etag_matching_is_weak_and_handles_lists():
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('W/"x", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('W/"abd"', 'W/"abc"')
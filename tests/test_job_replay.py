@@ -0,0 +1,81 @@
+"""Finetuning job WebSocket: sequenced events, replay on (re)connect, cross-worker mirroring."""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from agent import finetuning_service
+from agent.finetuning_service import broadcast_training_progress
+from lib.realtime.event_log import EventLogRegistry
+from ui.api import app
+
+client = TestClient(app)
+
+
+def _broadcast(job_id, step, **extra):
+    asyncio.run(broadcast_training_progress(job_id, {"type": "log", "step": step, **extra}))
+
+
+def _url(job_id, last_seq=None):
+    url = f"/api/finetuning/ws/training/{job_id}"
+    return url if last_seq is None else f"{url}?last_seq={last_seq}"
+
+
+def test_late_and_reconnecting_clients_get_an_exact_replay_then_live_events():
+    job_id = "replay-job"
+    for step in (1, 2, 3):
+        _broadcast(job_id, step)
+
+    with client.websocket_connect(_url(job_id)) as ws:
+        replay = ws.receive_json()
+        assert replay["type"] == "replay" and not replay["gap"]
+        assert [(e["seq"], e["step"]) for e in replay["events"]] == [(1, 1), (2, 2), (3, 3)]
+        _broadcast(job_id, 4)
+        assert ws.receive_json() == {"type": "log", "step": 4, "seq": 4}
+
+    _broadcast(job_id, 5)
+    _broadcast(job_id, 6)
+    with client.websocket_connect(_url(job_id, last_seq=4)) as ws:
+        assert [e["seq"] for e in ws.receive_json()["events"]] == [5, 6]
+        # An explicit subscribe replays from where the client asks, even events
+        # this connection was already sent
+        ws.send_json({"type": "subscribe", "last_seq": 2})
+        assert [e["seq"] for e in ws.receive_json()["events"]] == [3, 4, 5, 6]
+        assert ws.receive_json()["last_seq"] == 6
+        ws.send_json({"type": "subscribe", "last_seq": 6})
+        assert ws.receive_json()["events"] == []
+        assert ws.receive_json()["last_seq"] == 6
+        # Live events after a replay are still delivered once
+        _broadcast(job_id, 7)
+        assert ws.receive_json() == {"type": "log", "step": 7, "seq": 7}
+
+
+def test_evicted_position_replays_a_snapshot(monkeypatch):
+    monkeypatch.setattr(finetuning_service, "_job_events", EventLogRegistry(maxlen=2))
+    job_id = "replay-gap-job"
+    for step in range(1, 6):
+        _broadcast(job_id, step)
+
+    with client.websocket_connect(_url(job_id, last_seq=1)) as ws:
+        replay = ws.receive_json()
+    assert replay["gap"] and replay["snapshot"] == {}
+    assert [e["seq"] for e in replay["events"]] == [4, 5]
+
+
+def test_events_from_other_workers_are_mirrored_with_their_seq(monkeypatch):
+    registry = EventLogRegistry()
+    monkeypatch.setattr(finetuning_service, "_job_events", registry)
+    job_id = "replay-mirror-job"
+    hub = finetuning_service._progress_hub
+
+    # What the backplane relays from the producing worker
+    hub.publish(job_id, {"type": "log", "step": 1, "seq": 7})
+    hub.publish(job_id, {"type": "log", "step": 1, "seq": 7})  # duplicate delivery
+    hub.publish(job_id, {"type": "progress", "status": "completed", "seq": 8})
+    log = registry.get(job_id)
+    assert [e.seq for e in log.since(0)[0]] == [7, 8]
+    assert log.closed and log.since(0)[0][0].data == {"type": "log", "step": 1}
+
+    with client.websocket_connect(_url(job_id, last_seq=7)) as ws:
+        replay = ws.receive_json()
+    assert replay["events"] == [{"type": "progress", "status": "completed", "seq": 8}]
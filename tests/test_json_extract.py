@@ -0,0 +1,154 @@
+"""Single-pass JSON extraction: prose, fences, trailing commas and truncated output."""
+
+import json
+import random
+
+from agent.ai_service import AIDesignService
+from agent.json_extract import extract_candidate, extract_json, iter_candidates, repair_json
+from agent.llm_client import LLMResponse
+from agent.notebook.ai_generator import AINotebookGenerator
+
+
+def _random_value(rng, depth=0):
+    kind = rng.randint(0, 9 if depth < 4 else 4)
+    if kind == 0:
+        return rng.choice([True, False, None])
+    if kind == 1:
+        return rng.randint(-1000, 1000)
+    if kind == 2:
+        return round(rng.uniform(-1e3, 1e3), 3)
+    if kind <= 5:
+        alphabet = 'ab {}[]:,"\\\n\t/é✓'
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+    if kind <= 7:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    keys = [f"k{i}{rng.choice('{}[]')}" for i in range(rng.randint(0, 4))]
+    return {key: _random_value(rng, depth + 1) for key in keys}
+
+
+def _is_prefix(partial, full) -> bool:
+    """partial is full with a tail of (nested) members cut off."""
+    if isinstance(full, dict):
+        if not isinstance(partial, dict) or list(partial) != list(full)[: len(partial)]:
+            return False
+        keys = list(partial)
+        return all(partial[k] == full[k] for k in keys[:-1]) and (
+            not keys or _is_prefix(partial[keys[-1]], full[keys[-1]])
+        )
+    if isinstance(full, list):
+        if not isinstance(partial, list) or len(partial) > len(full):
+            return False
+        return all(a == b for a, b in zip(partial[:-1], full)) and (
+            not partial or _is_prefix(partial[-1], full[len(partial) - 1])
+        )
+    return partial == full
+
+
+def test_fuzz_documents_wrapped_in_prose_are_recovered_exactly():
+    rng = random.Random(1)
+    for _ in range(300):
+        doc = {"root": _random_value(rng)}
+        indent = rng.choice([None, 2])
+        text = f"Sure {{name}} here you go:\n```json\n{json.dumps(doc, indent=indent)}\n```\nDone."
+        assert extract_json(text, accept=lambda d: isinstance(d, dict) and "root" in d) == doc
+
+
+def test_fuzz_truncation_yields_a_prefix_of_the_document():
+    rng = random.Random(2)
+    for _ in range(200):
+        doc = {"root": _random_value(rng), "tail": [_random_value(rng) for _ in range(3)]}
+        text = json.dumps(doc, ensure_ascii=rng.random() < 0.5)
+        for cut in sorted(rng.sample(range(1, len(text)), min(20, len(text) - 1))):
+            found = extract_candidate(text[:cut])
+            assert found is not None, text[:cut]
+            value, candidate = found
+            assert candidate.truncated
+            assert _is_prefix(value, doc), (text[:cut], value)
+
+
+def test_trailing_commas_and_brackets_inside_strings():
+    text = 'Result: {"steps": ["a", "b}",], "n": {"x": "[",},}'
+    assert extract_json(text) == {"steps": ["a", "b}"], "n": {"x": "["}}
+
+
+def test_skips_non_json_spans_and_rejected_values():
+    text = 'Use {placeholder} or [1, 2] then {"cells": [{"cell_type": "code"}]}'
+    spans = [c.text for c in iter_candidates(text)]
+    assert spans == ["[1, 2]", '{"cells": [{"cell_type": "code"}]}']
+    assert extract_json(text, accept=lambda d: isinstance(d, dict)) == {
+        "cells": [{"cell_type": "code"}]
+    }
+
+
+def test_truncation_never_invents_values():
+    assert extract_json('{"pipeline": {"a": {"x": 1}, "b": {"y": tru') == {
+        "pipeline": {"a": {"x": 1}}
+    }
+    assert extract_json('{"a": 12') == {}  # 12 might have been 123
+    assert repair_json('{"a": 1, "b"') == '{"a": 1}'
+    assert extract_json("{'single': 'quotes'}") is None
+    assert extract_json('{"a": 1}', repair=False) == {"a": 1}
+    assert extract_json('{"a": 1', repair=False) is None
+
+
+def test_complete_depth_drops_half_received_elements():
+    text = '{"pipeline": {"a": {"x": 1}, "b": {"y": 1, "z": tru'
+    assert extract_json(text) == {"pipeline": {"a": {"x": 1}, "b": {"y": 1}}}
+    assert extract_json(text, complete_depth=2) == {"pipeline": {"a": {"x": 1}}}
+    cells = '{"cells": [{"source": ["a"]}, {"source": ["b", "c'
+    assert extract_json(cells, complete_depth=2) == {"cells": [{"source": ["a"]}]}
+    # Nothing open below the depth: the usual repair
+    assert extract_json('{"cells": [{"source": "a"}, ', complete_depth=2) == {
+        "cells": [{"source": "a"}]
+    }
+
+
+def test_fuzz_complete_depth_keeps_only_whole_elements():
+    rng = random.Random(3)
+    for _ in range(100):
+        doc = {"items": [_random_value(rng, depth=2) for _ in range(4)]}
+        text = json.dumps(doc)
+        for cut in sorted(rng.sample(range(1, len(text)), min(20, len(text) - 1))):
+            value = extract_json(text[:cut], complete_depth=2)
+            assert value is not None, text[:cut]
+            items = value.get("items", [])
+            assert items == doc["items"][: len(items)], (text[:cut], value)
+
+
+def test_deep_nesting_is_treated_as_unparsed():
+    deep = "[" * 5000 + "]" * 5000
+    assert extract_json(deep) is None
+    assert extract_json(f'{deep} then {{"a": 1}}') == {"a": 1}
+    assert extract_json('{"a": 1, "b": ' + "[" * 5000) == {"a": 1}
+    assert repair_json(deep) is None
+
+
+def test_design_and_notebook_parsers_keep_whole_stages_and_cells(monkeypatch):
+    design = AIDesignService._extract_pipeline_json(
+        '{"pipeline": {"data_ingestion": {"source": "csv"}, '
+        '"model_training": {"algorithm": "xgb", "hyperpar'
+    )
+    assert design["truncated"] and list(design["pipeline"]) == ["data_ingestion"]
+
+    generator = AINotebookGenerator()
+    forgotten = []
+    monkeypatch.setattr(generator.llm, "forget", forgotten.append)
+
+    def response(text):
+        return LLMResponse(text=text, backend="groq", model="m", latency_ms=1.0)
+
+    assert generator._parse_ai_response('{"cells": [{"cell_type": "code", "source": "abc') is None
+    cut = response('{"cells": [{"cell_type": "markdown", "source": "# T"}, {"cell_type": "co')
+    notebook = json.loads(generator._parse_or_forget(cut))
+    assert notebook["cells"] == [{"cell_type": "markdown", "source": "# T", "metadata": {}}]
+    assert notebook["nbformat"] == 4 and notebook["metadata"] == {}
+    assert forgotten == [cut]
+
+    # Cells without a source, or with outputs of the wrong type, are rejected
+    for bad in (
+        '{"cells": [{"cell_type": "code"}]}',
+        '{"cells": [{"cell_type": "code", "source": "x", "outputs": {}}]}',
+        '{"cells": [{"cell_type": "code", "source": "x"}], "metadata": []}',
+    ):
+        assert generator._parse_or_forget(response(bad)) is None
+    assert len(forgotten) == 4
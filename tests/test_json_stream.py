@@ -0,0 +1,77 @@
+"""IncrementalJSONParser: values emitted as they complete, however the text is chunked."""
+
+import json
+import random
+
+from agent.json_stream import WILDCARD, IncrementalJSONParser
+
+DESIGN = {
+    "status": "success",
+    "decision_summary": {"task_type": "classification", "rationale": ["small data", "a \"b\" {"]},
+    "pipeline": {
+        "data_ingestion": {"source_type": "csv", "schema_validation": True},
+        "model_training": {"algorithm": "xgboost", "params": [1, 2.5, -3e-2, None]},
+        "deployment": {"mode": "batch", "latency_budget_ms": 120},
+    },
+    "cost_estimate": {"monthly_usd": 4.2, "confidence": 0.9},
+    "alternatives_considered": [{"model": "rf"}, "logistic_regression", 7],
+}
+PATTERNS = [
+    ("decision_summary",),
+    ("pipeline", WILDCARD),
+    ("cost_estimate",),
+    ("alternatives_considered", WILDCARD),
+]
+
+
+def _chunks(text, rng):
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 12)
+        yield text[i : i + size]
+        i += size
+
+
+def test_emits_watched_values_in_document_order_for_any_chunking():
+    text = "Here is the design:\n```json\n" + json.dumps(DESIGN, indent=2) + "\n```"
+    expected = [
+        (("decision_summary",), DESIGN["decision_summary"]),
+        *((("pipeline", k), v) for k, v in DESIGN["pipeline"].items()),
+        (("cost_estimate",), DESIGN["cost_estimate"]),
+        *(
+            (("alternatives_considered", i), v)
+            for i, v in enumerate(DESIGN["alternatives_considered"])
+        ),
+    ]
+    rng = random.Random(0)
+    for _ in range(50):
+        parser = IncrementalJSONParser(PATTERNS)
+        events = [event for chunk in _chunks(text, rng) for event in parser.feed(chunk)]
+        assert events == expected
+        assert parser.done and parser.result() == DESIGN
+
+
+def test_stages_are_emitted_before_the_document_closes():
+    parser = IncrementalJSONParser([("pipeline", WILDCARD)])
+    assert parser.feed('{"pipeline": {"a": {"x": 1}, "b": ') == [(("pipeline", "a"), {"x": 1})]
+    assert parser.feed('"done"') == [(("pipeline", "b"), "done")]
+    assert parser.result() is None
+    assert parser.feed("}} trailing chatter {") == []
+    assert parser.result() == {"pipeline": {"a": {"x": 1}, "b": "done"}}
+
+
+def test_assemble_rebuilds_a_truncated_document_from_completed_values():
+    text = json.dumps(
+        {"cells": [{"cell_type": "markdown", "source": ["# T"]}, {"cell_type": "code"}]}
+    )
+    parser = IncrementalJSONParser([("cells", WILDCARD)])
+    parser.feed(text[: text.rindex("{") + 10])  # cut off inside the second cell
+    assert not parser.done and parser.result() is None
+    assert parser.assemble() == {"cells": [{"cell_type": "markdown", "source": ["# T"]}]}
+
+
+def test_root_array_and_escaped_keys():
+    parser = IncrementalJSONParser([(WILDCARD, "v")])
+    events = parser.feed('[{"v": 1}, {"w\\"": 2, "v": "x}"}]')
+    assert events == [((0, "v"), 1), ((1, "v"), "x}")]
+    assert parser.result() == [{"v": 1}, {'w"': 2, "v": "x}"}]
@@ -0,0 +1,542 @@
+"""LLMClient against a local stub server speaking the OpenAI-compatible and Ollama APIs."""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import agent.ai_service as ai_service
+from agent.llm_cache import ResponseCache, cache_bypass
+from agent.llm_client import (
+    KIND_OLLAMA,
+    BackendConfig,
+    ChatAttempt,
+    LLMClient,
+    LLMError,
+    LLMResponse,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    user_message,
+)
+from agent.llm_health import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker
+
+
+class StubState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ports = set()
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.delay = 0.0
+        self.status = 200
+        self.path_delays = {}
+        self.path_status = {}
+        self.stream_pieces = None  # streamed completion, as the fragments to send
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    state: StubState
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, lines, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for line in lines:
+            data = (line + "\n").encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(0.005)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        self.state.ports.add(self.client_address[1])
+        if self.path == "/api/tags":
+            self._reply({"models": [{"name": "llama3.1:8b"}, {"name": "mistral"}]})
+        else:
+            self._reply({"error": "not found"}, 404)
+
+    def do_POST(self):
+        state = self.state
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with state.lock:
+            state.ports.add(self.client_address[1])
+            state.requests.append((self.path, dict(self.headers), body))
+            state.active += 1
+            state.max_active = max(state.max_active, state.active)
+        try:
+            time.sleep(state.path_delays.get(self.path, state.delay))
+        finally:
+            with state.lock:
+                state.active -= 1
+
+        status = state.path_status.get(self.path, state.status)
+        if status != 200:
+            self._reply({"error": "boom"}, status)
+        elif body.get("stream") and self.path == "/v1/chat/completions":
+            events = [
+                {"model": body["model"], "choices": [{"delta": {"content": piece}}]}
+                for piece in state.stream_pieces
+            ]
+            events.append({"model": body["model"], "choices": [], "usage": {"total_tokens": 9}})
+            lines = [f"data: {json.dumps(e)}\n" for e in events] + ["data: [DONE]\n"]
+            self._stream(lines, "text/event-stream")
+        elif body.get("stream"):
+            lines = [
+                json.dumps({"message": {"content": piece}, "done": False})
+                for piece in state.stream_pieces
+            ]
+            lines.append(json.dumps({"message": {"content": ""}, "done": True, "eval_count": 4}))
+            self._stream(lines, "application/x-ndjson")
+        elif self.path == "/v1/chat/completions":
+            content = body["messages"][-1]["content"].upper()
+            self._reply(
+                {
+                    "model": body["model"],
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "usage": {"total_tokens": 3},
+                }
+            )
+        elif self.path == "/api/chat":
+            self._reply(
+                {
+                    "model": body["model"],
+                    "message": {"role": "assistant", "content": "local"},
+                    "eval_count": 1,
+                }
+            )
+        else:
+            self._reply({"error": "not found"}, 404)
+
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # clients hanging up after a timeout
+
+
+@pytest.fixture
+def stub():
+    state = StubState()
+    handler = type("Handler", (StubHandler,), {"state": state})
+    server = StubServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub):
+    llm = LLMClient(
+        {
+            "cloud": BackendConfig("cloud", f"{stub.url}/v1", api_key="k-123", max_concurrency=2),
+            "ollama": BackendConfig("ollama", stub.url, kind=KIND_OLLAMA, http2=False),
+        }
+    )
+    yield llm
+    llm.close()
+
+
+def test_openai_compatible_chat(stub, client):
+    response = client.chat_sync("cloud", user_message("hi"), model="m", json_mode=True)
+    assert response.text == "HI"
+    assert response.backend == "cloud" and response.usage == {"total_tokens": 3}
+
+    path, headers, body = stub.requests[0]
+    assert headers["Authorization"] == "Bearer k-123"
+    assert body["response_format"] == {"type": "json_object"}
+
+
+def test_ollama_chat_and_models(client):
+    assert client.list_models_sync("ollama") == ["llama3.1:8b", "mistral"]
+    assert client.chat_sync("ollama", user_message("hi"), model="mistral").text == "local"
+
+
+def test_connections_are_reused(stub, client):
+    for _ in range(5):
+        client.chat_sync("cloud", user_message("x"), model="m")
+    assert len(stub.ports) == 1
+
+
+def test_per_backend_concurrency_limit_from_async_callers(stub, client):
+    stub.delay = 0.1
+
+    async def burst():
+        return await asyncio.gather(
+            *(client.chat("cloud", user_message(str(i)), model="m") for i in range(6))
+        )
+
+    responses = asyncio.run(burst())
+    assert [r.text for r in responses] == [str(i) for i in range(6)]
+    assert stub.max_active == 2
+    assert client.stats()["cloud"]["requests"] == 6
+
+
+def test_errors_and_timeouts(stub, client):
+    stub.status = 500
+    with pytest.raises(LLMError) as exc:
+        client.chat_sync("cloud", user_message("x"), model="m")
+    assert exc.value.status_code == 500
+
+    stub.status = 200
+    stub.delay = 0.5
+    with pytest.raises(LLMTimeoutError):
+        client.chat_sync("cloud", user_message("x"), model="m", timeout=0.1)
+    assert client.stats()["cloud"]["errors"] == 2
+
+
+@pytest.fixture
+def cached_client(stub, tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm_cache.db"), ttl_seconds=60, max_entries=3)
+    llm = LLMClient(
+        {"cloud": BackendConfig("cloud", f"{stub.url}/v1", api_key="k-123")}, cache=cache
+    )
+    yield llm
+    llm.close()
+
+
+def test_repeat_prompts_are_served_from_cache(stub, cached_client):
+    first = cached_client.chat_sync("cloud", user_message("hello  world"), model="m")
+    # Whitespace-only differences share the entry; a different model does not
+    again = cached_client.chat_sync("cloud", user_message("hello world\n"), model="m")
+    other = cached_client.chat_sync("cloud", user_message("hello world"), model="m2")
+
+    assert not first.cached and again.cached and not other.cached
+    assert again.text == first.text
+    assert len(stub.requests) == 2
+
+    stats = cached_client.cache_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["hit_rate"] == 0.3333
+
+
+def test_cache_bypass_regenerates_and_refreshes(stub, cached_client):
+    cached_client.chat_sync("cloud", user_message("x"), model="m")
+    assert not cached_client.chat_sync("cloud", user_message("x"), model="m", cache=False).cached
+
+    async def bypassed():
+        with cache_bypass():
+            return await cached_client.chat("cloud", user_message("x"), model="m")
+
+    assert not asyncio.run(bypassed()).cached
+    assert len(stub.requests) == 3
+    assert cached_client.cache_stats()["bypassed"] == 2
+    assert cached_client.chat_sync("cloud", user_message("x"), model="m").cached
+
+
+def test_cache_evicts_least_recently_used_and_expires(stub, cached_client):
+    for prompt in ["a", "b", "c"]:
+        cached_client.chat_sync("cloud", user_message(prompt), model="m")
+    cached_client.chat_sync("cloud", user_message("a"), model="m")  # refresh "a"
+    cached_client.chat_sync("cloud", user_message("d"), model="m")  # evicts "b"
+
+    stats = cached_client.cache_stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 1
+    assert cached_client.chat_sync("cloud", user_message("a"), model="m").cached
+    assert not cached_client.chat_sync("cloud", user_message("b"), model="m").cached
+
+    cached_client.cache.ttl_seconds = 1e-9
+    assert not cached_client.chat_sync("cloud", user_message("a"), model="m").cached
+
+
+def test_forget_drops_unusable_response(stub, cached_client):
+    response = cached_client.chat_sync("cloud", user_message("x"), model="m")
+    cached_client.forget(response)
+    assert not cached_client.chat_sync("cloud", user_message("x"), model="m").cached
+
+
+def test_design_service_forgets_responses_it_cannot_parse(monkeypatch):
+    service = ai_service.AIDesignService(api_key="")
+    forgotten = []
+    monkeypatch.setattr(service.llm, "forget", forgotten.append)
+
+    def response(text):
+        return LLMResponse(text=text, backend="groq", model="m", latency_ms=1.0, cache_key=text)
+
+    design = response('{"status": "success", "pipeline": {"data_ingestion": {}}}')
+    assert service._parse_ai_response(design)["pipeline"] == {"data_ingestion": {}}
+    notebook = response('{"cells": [{"cell_type": "markdown", "source": "# T"}], "nbformat": 4}')
+    assert json.loads(service._parse_notebook_response(notebook))["cells"][0]["source"] == "# T"
+    assert forgotten == []
+
+    prose = response("Sorry, I can't help with that.")
+    assert service._parse_ai_response(prose)["status"]  # rule-based fallback
+    assert json.loads(service._parse_notebook_response(prose))["cells"]  # template
+    assert forgotten == [prose, prose]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_breaker_backs_off_exponentially():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, backoff=5, max_backoff=12, clock=clock)
+
+    breaker.record_failure("boom")
+    assert breaker.allow() and breaker.state == STATE_CLOSED
+    breaker.record_failure("boom")
+    assert breaker.state == STATE_OPEN and not breaker.allow()
+
+    clock.now = 5
+    assert breaker.allow() and breaker.state == STATE_HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+    breaker.record_failure("still down")
+    assert breaker.snapshot()["retry_in_seconds"] == 10
+
+    clock.now = 15
+    assert breaker.allow()
+    breaker.record_failure("still down")
+    assert breaker.backoff == 12  # capped
+
+    clock.now = 27
+    assert breaker.allow()
+    breaker.record_success(latency_ms=40)
+    assert breaker.state == STATE_CLOSED and breaker.backoff == 5
+
+
+def test_open_circuit_fails_fast_without_a_request(stub, client):
+    stub.status = 503
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.chat_sync("cloud", user_message("x"), model="m")
+
+    stub.status = 200
+    with pytest.raises(LLMUnavailableError):
+        client.chat_sync("cloud", user_message("x"), model="m")
+    assert len(stub.requests) == 2
+    assert not client.is_available("cloud")
+    assert client.stats()["cloud"]["circuit"]["state"] == STATE_OPEN
+
+    client.breaker("cloud").reset()
+    assert client.chat_sync("cloud", user_message("x"), model="m").text == "X"
+
+
+def test_timeout_opens_circuit_immediately_but_bad_request_does_not(stub, client):
+    stub.status = 400
+    with pytest.raises(LLMError):
+        client.chat_sync("cloud", user_message("x"), model="m")
+    assert client.is_available("cloud")
+
+    stub.status = 200
+    stub.delay = 0.3
+    with pytest.raises(LLMTimeoutError):
+        client.chat_sync("cloud", user_message("x"), model="m", timeout=0.05)
+    assert not client.is_healthy("cloud")
+
+
+def test_order_prefers_healthy_then_fastest(client):
+    assert client.order(["cloud", "ollama"]) == ["cloud", "ollama"]
+    client.breaker("cloud").record_success(latency_ms=900)
+    client.breaker("ollama").record_success(latency_ms=100)
+    assert client.order(["cloud", "ollama"]) == ["ollama", "cloud"]
+    assert client.order(["cloud", "ollama"], by_latency=False) == ["cloud", "ollama"]
+
+    client.breaker("ollama").record_failure("down", trip=True)
+    assert client.order(["cloud", "ollama"]) == ["cloud", "ollama"]
+
+
+def test_model_list_is_cached(stub, client):
+    assert client.cached_models("ollama") == ["llama3.1:8b", "mistral"]
+    assert client.cached_models("ollama") == ["llama3.1:8b", "mistral"]
+    assert len(stub.ports) == 1 and stub.requests == []  # GETs are not recorded as chats
+
+
+def test_design_service_does_not_probe_on_construction_and_skips_dead_ollama(monkeypatch):
+    dead = LLMClient(
+        {"ollama": BackendConfig("ollama", "http://127.0.0.1:9", kind=KIND_OLLAMA, http2=False)}
+    )
+    monkeypatch.setattr(ai_service, "get_llm_client", lambda: dead)
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+    try:
+        service = ai_service.AIDesignService(prefer_backend="auto")
+        assert dead.stats()["ollama"]["requests"] == 0
+
+        result = service.generate_pipeline({"label_type": "classification"}, {})
+        assert result  # rule-based fallback
+        service.generate_pipeline({"label_type": "classification"}, {})
+        # One failed model-list probe, then the cached health answers
+        assert dead.stats()["ollama"]["requests"] == 1
+    finally:
+        dead.close()
+
+
+CLOUD_PATH = "/v1/chat/completions"
+OLLAMA_PATH = "/api/chat"
+
+
+def _hedge_attempts():
+    return [
+        ChatAttempt("cloud", "m", user_message("hi"), max_tokens=100),
+        ChatAttempt("ollama", "mistral", user_message("hi")),
+    ]
+
+
+def test_hedge_fires_backup_after_delay_and_cancels_the_loser(stub, client):
+    stub.path_delays = {CLOUD_PATH: 1.0}
+    start = time.perf_counter()
+    result = client.hedged_chat_sync(_hedge_attempts(), delay=0.1)
+
+    assert time.perf_counter() - start < 0.8
+    assert result.response.backend == "ollama" and result.value.text == "local"
+    assert result.launched == ["cloud", "ollama"]
+    assert client.stats()["cloud"]["in_flight"] == 0  # cancelled, not left running
+
+
+def test_hedge_moves_on_immediately_after_a_failure(stub, client):
+    stub.path_status = {CLOUD_PATH: 500}
+    start = time.perf_counter()
+    result = client.hedged_chat_sync(_hedge_attempts(), delay=5.0)
+    assert time.perf_counter() - start < 1.0
+    assert result.response.backend == "ollama"
+
+
+def test_hedge_uses_first_response_the_parser_accepts(stub, client):
+    stub.path_delays = {OLLAMA_PATH: 0.2}
+    result = client.hedged_chat_sync(
+        _hedge_attempts(),
+        parse=lambda r: r.text if r.text == "local" else None,
+        delay=5.0,
+    )
+    assert result.value == "local" and result.launched == ["cloud", "ollama"]
+
+
+def test_hedge_cost_cap_skips_paid_backups(stub, client):
+    client.backends["cloud"].cost_per_1k_tokens = 1.0
+    stub.path_delays = {OLLAMA_PATH: 0.3}
+    attempts = list(reversed(_hedge_attempts()))  # free local model first
+
+    capped = client.hedged_chat_sync(attempts, delay=0.05, max_cost_usd=0.01)
+    assert capped.launched == ["ollama"] and capped.estimated_cost_usd == 0.0
+
+    uncapped = client.hedged_chat_sync(attempts, delay=0.05, max_cost_usd=1.0)
+    assert uncapped.response.backend == "cloud" and uncapped.estimated_cost_usd > 0
+
+    stub.path_status = {OLLAMA_PATH: 500}
+    with pytest.raises(LLMError, match="cost cap"):
+        client.hedged_chat_sync(attempts, delay=0.05, max_cost_usd=0.01)
+
+
+def test_stream_chat_delivers_fragments_as_they_arrive(stub, client):
+    stub.stream_pieces = ['{"pipeline": {"a": 1', '}, "b"', ": [1, 2]}"]
+    for backend in ("cloud", "ollama"):
+        deltas = []
+        response = client.stream_chat_sync(
+            backend, user_message("x"), model="m", on_delta=deltas.append
+        )
+        assert deltas == stub.stream_pieces
+        assert json.loads(response.text) == {"pipeline": {"a": 1}, "b": [1, 2]}
+    assert client.stream_chat_sync(
+        "cloud", user_message("x"), model="m", on_delta=lambda _: None
+    ).usage == {"total_tokens": 9}
+    assert stub.requests[0][2]["stream"] is True
+
+
+def test_streamed_success_closes_the_circuit_and_updates_latency(stub, client):
+    stub.stream_pieces = ["o", "k"]
+    for backend in ("cloud", "ollama"):
+        breaker = client.breaker(backend)
+        breaker.record_failure("down")
+        breaker.state, breaker.probe_at = STATE_HALF_OPEN, 0.0
+        assert breaker.latency_ms is None
+
+        response = client.stream_chat_sync(backend, user_message("x"), model="m", on_delta=print)
+        assert response.text == "ok"
+        assert breaker.state == STATE_CLOSED and breaker.consecutive_failures == 0
+        assert breaker.latency_ms is not None and breaker.latency_ms > 0
+        assert client.is_healthy(backend)
+
+
+def test_streamed_completion_is_cached_and_replayed_whole(stub, cached_client):
+    stub.stream_pieces = ["he", "llo"]
+    first, second = [], []
+    cached_client.stream_chat_sync("cloud", user_message("x"), model="m", on_delta=first.append)
+    response = cached_client.stream_chat_sync(
+        "cloud", user_message("x"), model="m", on_delta=second.append
+    )
+    assert first == ["he", "llo"] and second == ["hello"]
+    assert response.cached and len(stub.requests) == 1
+    # A non-streamed call with the same prompt shares the entry
+    assert cached_client.chat_sync("cloud", user_message("x"), model="m").text == "hello"
+
+
+def test_stream_errors_count_against_the_circuit(stub, client):
+    stub.path_status["/v1/chat/completions"] = 503
+    for _ in range(2):
+        with pytest.raises(LLMError) as err:
+            client.stream_chat_sync("cloud", user_message("x"), model="m", on_delta=print)
+        assert err.value.status_code == 503
+    with pytest.raises(LLMUnavailableError):
+        client.stream_chat_sync("cloud", user_message("x"), model="m", on_delta=print)
+    assert client.stats()["cloud"]["in_flight"] == 0
+
+
+def test_design_service_streams_stages_and_salvages_a_cut_off_design(stub, monkeypatch):
+    llm = LLMClient(
+        {"groq": BackendConfig("groq", f"{stub.url}/v1", api_key="k", stream_json_mode=False)}
+    )
+    monkeypatch.setattr(ai_service, "get_llm_client", lambda: llm)
+    design = json.dumps(
+        {
+            "status": "success",
+            "decision_summary": {"recommended_model_family": "xgboost"},
+            "pipeline": {"data_ingestion": {"source_type": "csv"}, "model_training": {"a": 1}},
+        }
+    )
+    try:
+        service = ai_service.AIDesignService(api_key="k", prefer_backend="groq")
+        stub.stream_pieces = [design[i : i + 7] for i in range(0, len(design), 7)]
+        partials = []
+        result = service.generate_pipeline({}, {}, on_partial=lambda p, v: partials.append(p))
+        assert result == json.loads(design)
+        assert partials == [
+            ("decision_summary",),
+            ("pipeline", "data_ingestion"),
+            ("pipeline", "model_training"),
+        ]
+        assert stub.requests[-1][2]["stream"] is True
+        assert "response_format" not in stub.requests[-1][2]
+
+        stub.stream_pieces = [design[: design.index('"model_training"')]]
+        result = service.generate_pipeline(
+            {}, {"max_cost_usd": 1}, on_partial=lambda p, v: None
+        )
+        assert result["truncated"] and list(result["pipeline"]) == ["data_ingestion"]
+    finally:
+        llm.close()
+
+
+def test_readiness_probes_ollama_through_the_shared_client(stub, client):
+    from ui.health import llm_backends_check
+
+    check = llm_backends_check(client)
+    for _ in range(2):
+        result = check()
+    assert result["backends"]["ollama"] == {"circuit": STATE_CLOSED, "reachable": True, "models": 2}
+    assert result["available"] == ["ollama"] and len(stub.ports) == 1
+
+    client.breaker("ollama").record_failure("down", trip=True)
+    ollama = check()["backends"]["ollama"]
+    assert ollama == {"circuit": STATE_OPEN, "reachable": False}
@@ -0,0 +1,74 @@
+"""Template notebooks: cached static cells spliced into a pre-serialized skeleton."""
+
+import json
+
+import nbformat
+
+from agent.colab_service import ColabTrainingService
+from agent.notebook.generator import (
+    NotebookGenerator,
+    _static_cell,
+    clear_template_cache,
+    validate_notebook,
+)
+
+CONFIG = {"model_id": "meta-llama/Llama-3.1-8B-Instruct", "method": "lora", "num_epochs": 1}
+
+
+def _cells(notebook_json):
+    return {cell["id"]: cell["source"] for cell in json.loads(notebook_json)["cells"]}
+
+
+def test_spliced_notebook_is_valid_and_matches_a_plain_dump():
+    clear_template_cache()
+    generator = NotebookGenerator()
+    for config in (CONFIG, {**CONFIG, "model_id": "Qwen/Qwen2.5-7B", "method": "qlora"}):
+        notebook_json = generator.create_notebook(config, ai_generated=False)
+        assert validate_notebook(notebook_json) == (True, None)
+        parsed = json.loads(notebook_json)
+        assert notebook_json == json.dumps(parsed, indent=2, ensure_ascii=False)
+        nbformat.validate(nbformat.reads(notebook_json, as_version=4))
+
+
+def test_only_parameterised_cells_differ_between_configs():
+    generator = NotebookGenerator()
+    first = _cells(generator.create_notebook(CONFIG, ai_generated=False))
+    second = _cells(generator.create_notebook({**CONFIG, "num_epochs": 7}, ai_generated=False))
+    assert list(first) == list(second)
+    changed = {cell_id for cell_id in first if first[cell_id] != second[cell_id]}
+    assert changed <= {"header", "data-preparation", "model-setup", "training"}
+    assert "training" in changed
+    assert _static_cell("export") is _static_cell("export")
+
+
+def test_custom_metadata_gets_its_own_skeleton():
+    plain = json.loads(NotebookGenerator().create_notebook(CONFIG, ai_generated=False))
+    custom = NotebookGenerator(metadata={"colab": {"provenance": []}})
+    notebook = json.loads(custom.create_notebook(CONFIG, ai_generated=False))
+    assert notebook["metadata"]["colab"] == {"provenance": []}
+    assert "colab" not in plain["metadata"]
+
+
+def test_ai_metadata_does_not_leak_into_later_notebooks():
+    generator = NotebookGenerator()
+    ai_response = json.dumps(
+        {"metadata": {"accelerator": "GPU"}, "cells": [{"cell_type": "code", "source": "1"}]}
+    )
+    notebook = json.loads(generator.create_notebook(CONFIG, ai_response=ai_response))
+    assert notebook["metadata"]["accelerator"] == "GPU"
+    template = json.loads(generator.create_notebook(CONFIG, ai_generated=False))
+    assert "accelerator" not in template["metadata"]
+
+
+def test_colab_notebook_layout_per_method():
+    service = ColabTrainingService()
+    for method, count in (("qlora", 13), ("lora", 13), ("unsloth", 13), ("full_ft", 12)):
+        notebook_json = service._build_notebook({"model_id": "org/Model-Instruct", "method": method})
+        notebook = json.loads(notebook_json)
+        assert notebook_json == json.dumps(notebook)
+        assert len(notebook["cells"]) == count
+        assert notebook["cells"][0]["source"] == [
+            f"# Fine-Tuning Model with {method.upper()}\n\nSystem2ML - AI-Powered Pipeline Training"
+        ]
+        assert f'TRAINING_METHOD = "{method}"' in notebook["cells"][3]["source"][0]
+        assert notebook["nbformat_minor"] == 0
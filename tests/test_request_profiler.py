@@ -0,0 +1,65 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from observability.request_profiler import Histogram, ProfilingMiddleware, RequestProfiler
+
+
+def _make_app(profiler: RequestProfiler) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        time.sleep(0.02)
+        return {"id": item_id, "payload": "x" * 1000}
+
+    @app.get("/fail")
+    async def fail():
+        raise RuntimeError("boom")
+
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+    profiler.instrument(app)
+    return app
+
+
+def test_stats_are_grouped_by_route_template():
+    profiler = RequestProfiler(sample_rate=0)
+    client = TestClient(_make_app(profiler), raise_server_exceptions=False)
+    for i in range(3):
+        assert client.get(f"/items/{i}").status_code == 200
+    client.get("/fail")
+
+    routes = profiler.snapshot()["routes"]
+    item = routes["GET /items/{item_id}"]
+    assert item["requests"] == 3
+    assert item["in_flight"] == 0
+    assert item["latency_ms"]["mean"] >= 20
+    assert item["queue_wait_ms"]["count"] == 3
+    assert item["response_bytes"]["mean"] > 1000
+    assert routes["GET /fail"]["errors"] == 1
+
+
+def test_slow_sampled_requests_keep_a_profile():
+    profiler = RequestProfiler(sample_rate=1.0, threshold_ms=10)
+    client = TestClient(_make_app(profiler))
+    client.get("/items/1")
+
+    captured = profiler.snapshot()["profiling"]["captured"]
+    assert len(captured) == 1
+    assert "get_item" in profiler.get_profile(captured[0]["id"])["stats"]
+
+
+def test_fast_requests_are_not_kept():
+    profiler = RequestProfiler(sample_rate=1.0, threshold_ms=10_000)
+    client = TestClient(_make_app(profiler))
+    client.get("/items/1")
+    assert profiler.snapshot()["profiling"]["captured"] == []
+
+
+def test_histogram_quantiles_stay_within_bucket_bounds():
+    hist = Histogram((10, 100, 1000))
+    for value in [5] * 90 + [500] * 10:
+        hist.observe(value)
+    assert 0 < hist.quantile(0.5) <= 10
+    assert 100 < hist.quantile(0.99) <= 1000
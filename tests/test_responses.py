@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from ui import responses
+from ui.responses import FastJSONResponse, FastJSONRoute
+
+PAYLOAD = {
+    "count": np.int64(3),
+    "score": np.float32(0.5),
+    "flags": np.array([True, False]),
+    "when": datetime(2024, 1, 2, 3, 4, 5),
+    "ts": pd.Timestamp("2024-01-02T03:04:05"),
+    "missing": pd.NaT,
+    1: "int key",
+}
+
+EXPECTED = {
+    "count": 3,
+    "score": 0.5,
+    "flags": [True, False],
+    "when": "2024-01-02T03:04:05",
+    "ts": "2024-01-02T03:04:05",
+    "missing": None,
+    "1": "int key",
+}
+
+
+def test_dumps_handles_numpy_pandas_and_datetimes():
+    assert json.loads(responses.dumps(PAYLOAD)) == EXPECTED
+
+
+def test_stdlib_fallback_matches_orjson_output():
+    with patch.object(responses, "HAS_ORJSON", False):
+        assert json.loads(responses.dumps(PAYLOAD)) == EXPECTED
+
+
+class Item(BaseModel):
+    name: str
+    size: int
+
+
+def test_plain_endpoints_bypass_jsonable_encoder_but_models_are_still_validated():
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.router.route_class = FastJSONRoute
+
+    @app.get("/plain")
+    def plain(n: int = 2):
+        return {"values": np.arange(n), "item": Item(name="a", size=1)}
+
+    @app.get("/typed", response_model=Item)
+    def typed():
+        return {"name": "b", "size": "7"}
+
+    client = TestClient(app)
+    with patch("fastapi.routing.jsonable_encoder", side_effect=AssertionError("encoder used")):
+        assert client.get("/plain?n=3").json() == {
+            "values": [0, 1, 2],
+            "item": {"name": "a", "size": 1},
+        }
+    assert client.get("/typed").json() == {"name": "b", "size": 7}
@@ -0,0 +1,122 @@
+"""Sequence packing: best-fit packs, efficiency report and the packed-batch collator."""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from lib.training.packing import (
+    IGNORE_INDEX,
+    PackedSequenceCollator,
+    pack_examples,
+    pack_sequences,
+    packing_stats,
+    supports_packed_sequences,
+)
+
+
+def test_packs_cover_every_example_within_capacity():
+    lengths = np.random.default_rng(0).integers(1, 60, 1_000).tolist()
+    packs = pack_sequences(lengths, 128)
+    assert sorted(i for pack in packs for i in pack) == list(range(len(lengths)))
+    assert all(sum(lengths[i] for i in pack) <= 128 for pack in packs)
+    assert all(pack == sorted(pack) for pack in packs)
+    # Best-fit decreasing stays close to the lower bound
+    assert len(packs) <= np.ceil(sum(lengths) / 128) * 1.05
+
+    with pytest.raises(ValueError):
+        pack_sequences([10, 200], 128)
+
+
+def test_stats_report_efficiency_and_fewer_steps():
+    lengths = [10, 50, 20, 30, 40, 14]
+    stats = packing_stats(lengths, max_length=64, batch_size=2)
+    assert stats["tokens"] == 164 and stats["packs"] == 3
+    assert stats["packing_efficiency"] == pytest.approx(164 / 192, abs=1e-4)
+    assert stats["padding_efficiency"] == pytest.approx(164 / (2 * 50 + 2 * 30 + 2 * 40), abs=1e-4)
+    assert stats["steps_per_epoch_unpacked"] == 3 and stats["steps_per_epoch_packed"] == 2
+
+
+def test_collator_restarts_positions_and_masks_boundaries():
+    packed = pack_examples([[1, 2, 3], [4, 5], [6, 7, 8, 9]], max_length=6)
+    assert packed == {"input_ids": [[4, 5, 6, 7, 8, 9], [1, 2, 3]], "seq_lengths": [[2, 4], [3]]}
+    features = [
+        {"input_ids": [1, 2, 3, 4, 5], "seq_lengths": [3, 2]},
+        {"input_ids": [6, 7, 8, 9], "seq_lengths": [4]},
+    ]
+    batch = PackedSequenceCollator(pad_token_id=0, pad_to_multiple_of=4, return_tensors="np")(
+        features
+    )
+    assert batch["input_ids"].tolist() == [[1, 2, 3, 4, 5, 0, 0, 0], [6, 7, 8, 9, 0, 0, 0, 0]]
+    assert batch["position_ids"].tolist() == [[0, 1, 2, 0, 1, 0, 1, 2], [0, 1, 2, 3, 0, 1, 2, 3]]
+    x = IGNORE_INDEX
+    assert batch["labels"].tolist() == [[x, 2, 3, x, 5, x, x, x], [x, 7, 8, 9, x, x, x, x]]
+    assert "attention_mask" not in batch
+
+
+def test_packing_needs_an_attention_implementation_that_splits_rows(monkeypatch):
+    def model(implementation, module):
+        cls = type("TinyForCausalLM", (), {"__module__": module})
+        instance = cls()
+        instance.config = types.SimpleNamespace(_attn_implementation=implementation)
+        return instance
+
+    legacy = types.ModuleType("legacy_modeling")
+    masked = types.ModuleType("masked_modeling")
+    masked.create_causal_mask = lambda *args, **kwargs: None
+    masking = types.ModuleType("transformers.masking_utils")
+    masking.find_packed_sequence_indices = lambda position_ids: None
+    for module in (legacy, masked):
+        monkeypatch.setitem(sys.modules, module.__name__, module)
+    monkeypatch.setitem(sys.modules, masking.__name__, masking)
+
+    assert supports_packed_sequences(model("flash_attention_2", "legacy_modeling"))
+    assert not supports_packed_sequences(model("sdpa", "legacy_modeling"))
+    assert supports_packed_sequences(model("sdpa", "masked_modeling"))
+    peft_wrapped = types.SimpleNamespace(get_base_model=lambda: model("eager", "legacy_modeling"))
+    assert not supports_packed_sequences(peft_wrapped)
+    monkeypatch.delattr(masking, "find_packed_sequence_indices")
+    assert not supports_packed_sequences(model("sdpa", "masked_modeling"))
+
+
+def test_packed_loss_matches_unpacked_on_a_tiny_model():
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=64,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=64,
+    )
+    model = transformers.LlamaForCausalLM._from_config(config, attn_implementation="sdpa").eval()
+    if not supports_packed_sequences(model):
+        pytest.skip("this transformers version does not split packed rows for sdpa")
+
+    rng = np.random.default_rng(0)
+    examples = [rng.integers(1, 64, n).tolist() for n in (5, 9, 3, 12, 7, 4)]
+
+    def summed_loss(logits, labels):
+        return torch.nn.functional.cross_entropy(
+            logits[:, :-1].reshape(-1, logits.shape[-1]), labels[:, 1:].reshape(-1), reduction="sum"
+        )
+
+    with torch.no_grad():
+        unpacked = sum(
+            float(summed_loss(model(input_ids=torch.tensor([ids])).logits, torch.tensor([ids])))
+            for ids in examples
+        )
+        packed = pack_examples(examples, max_length=16)
+        rows = [
+            {"input_ids": ids, "seq_lengths": lengths}
+            for ids, lengths in zip(packed["input_ids"], packed["seq_lengths"])
+        ]
+        batch = PackedSequenceCollator(pad_token_id=0)(rows)
+        logits = model(input_ids=batch["input_ids"], position_ids=batch["position_ids"]).logits
+        packed_loss = float(summed_loss(logits, batch["labels"]))
+    assert len(rows) < len(examples)
+    assert packed_loss == pytest.approx(unpacked, rel=1e-4)
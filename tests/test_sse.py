@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+import ui.api as api
+from lib.realtime.event_log import EventLog
+from lib.realtime.sse import format_sse, stream_event_log
+
+client = TestClient(api.app)
+
+RUN_REQUEST = {
+    "pipeline_id": "p1",
+    "dataset_id": "d1",
+    "constraints": {
+        "max_cost_usd": 1000,
+        "max_carbon_kg": 1000,
+        "max_latency_ms": 100,
+        "compliance_level": "none",
+    },
+    "estimated_cost": 1.0,
+    "estimated_carbon": 0.1,
+    "estimated_time_seconds": 60,
+}
+
+
+def _parse(text: str):
+    events = []
+    for block in text.split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            if line.startswith(":"):
+                continue
+            key, _, value = line.partition(": ")
+            fields[key] = value
+        if "event" in fields:
+            events.append(
+                {
+                    "id": int(fields["id"]) if "id" in fields else None,
+                    "event": fields["event"],
+                    "data": json.loads(fields["data"]),
+                }
+            )
+    return events
+
+
+def test_event_log_resumes_and_reports_gaps():
+    log = EventLog(maxlen=3)
+    for i in range(5):
+        log.append("progress", {"i": i})
+
+    events, gap = log.since(3)
+    assert [e.seq for e in events] == [4, 5] and not gap
+    events, gap = log.since(1)
+    assert gap  # seq 2 was evicted
+    assert log.append("progress", {}, seq=5) is None  # duplicate producer seq
+
+
+def test_wait_wakes_on_append_from_another_thread():
+    log = EventLog()
+
+    async def scenario():
+        threading.Timer(0.05, lambda: log.append("log", {"line": "hi"})).start()
+        return await log.wait(0, timeout=2.0)
+
+    events, gap = asyncio.run(scenario())
+    assert [e.data for e in events] == [{"line": "hi"}]
+
+
+def test_stream_sends_snapshot_again_after_gap():
+    log = EventLog(maxlen=2)
+    for i in range(4):
+        log.append("progress", {"i": i})
+    log.close()
+
+    async def collect():
+        frames = []
+        async for frame in stream_event_log(log, lambda: {"i": 3}, last_event_id=1):
+            frames.append(frame)
+        return "".join(frames)
+
+    events = _parse(asyncio.run(collect()))
+    assert [e["event"] for e in events] == ["snapshot", "end"]
+    assert events[0]["id"] == 4
+
+
+def test_format_sse_frame():
+    assert format_sse("progress", {"a": 1}, 7) == 'id: 7\nevent: progress\ndata: {"a":1}\n\n'
+
+
+def test_training_run_stream_pushes_deltas_until_finished(monkeypatch):
+    monkeypatch.setattr(api, "TRAINING_EVENTS_TICK_SECONDS", 0.01)
+    run_id = client.post("/api/training/run/start", json=RUN_REQUEST).json()["run_id"]
+
+    with client.stream("GET", f"/api/training/run/{run_id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _parse("".join(response.iter_text()))
+
+    assert events[0]["event"] == "snapshot"
+    assert events[0]["data"]["run"]["run_id"] == run_id
+    assert events[-1]["event"] == "end"
+    assert events[-2]["event"] == "status"
+    assert events[-2]["data"]["status"] == "completed"
+    assert any(e["event"] == "metrics" for e in events)
+    ids = [e["id"] for e in events[1:-1]]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    # Progress events only carry the fields that changed
+    assert all("pipeline_id" not in e["data"] for e in events if e["event"] == "progress")
+
+
+def test_training_run_stream_resumes_from_last_event_id():
+    run_id = client.post("/api/training/run/start", json=RUN_REQUEST).json()["run_id"]
+    client.get(f"/api/training/run/{run_id}")
+    client.get(f"/api/training/run/{run_id}")
+    client.post(f"/api/training/run/{run_id}/stop")
+
+    with client.stream(
+        "GET", f"/api/training/run/{run_id}/events", headers={"Last-Event-ID": "1"}
+    ) as response:
+        events = _parse("".join(response.iter_text()))
+
+    assert events[0]["event"] != "snapshot"
+    assert events[0]["id"] == 2
+    assert events[-2]["data"]["status"] == "cancelled"
+
+
+def test_stream_unknown_run_is_404():
+    assert client.get("/api/training/run/missing/events").status_code == 404
@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+from benchmarks.import_time import LAZY_MODULES, measure
+
+
+def test_importing_the_api_does_not_load_heavy_modules():
+    modules = measure("ui.api")["modules"]
+    assert "ui.api" in modules
+    assert [m for m in LAZY_MODULES if m in modules] == []
+
+
+def test_finetuning_router_loads_on_first_request():
+    import ui.api as api
+
+    client = TestClient(api.app)
+    assert client.get("/api/finetuning/jobs").status_code == 200
+    assert api.finetuning_router.loaded
+    assert "/api/finetuning/jobs" in client.get("/openapi.json").json()["paths"]
+
+
+def test_lifespan_initialises_the_database():
+    import ui.api as api
+    import ui.database as database
+
+    with TestClient(api.app) as client:
+        assert database._db_ready
+        assert client.get("/api/pipelines").status_code == 200
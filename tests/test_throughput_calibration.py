@@ -0,0 +1,139 @@
+"""Throughput calibration: measured samples, fallbacks, intervals and the /estimate API."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent.throughput_calibration as calibration_module
+from agent import finetuning_service
+from agent.throughput_calibration import (
+    ThroughputCalibration,
+    hardware_fingerprint,
+    params_from_model_id,
+    record_job_throughput,
+)
+from ui.api import app
+
+client = TestClient(app)
+LLAMA = "meta-llama/Llama-3.1-8B-Instruct"
+REQUEST = {"model_id": LLAMA, "model_name": "Llama", "method": "qlora", "platform": "colab"}
+
+
+@pytest.fixture
+def calibration(monkeypatch):
+    store = ThroughputCalibration(path=":memory:")
+    monkeypatch.setattr(finetuning_service, "get_throughput_calibration", lambda: store)
+    monkeypatch.setattr(calibration_module, "get_throughput_calibration", lambda: store)
+    yield store
+    store.close()
+
+
+def test_fingerprints_and_model_sizes():
+    assert hardware_fingerprint("Tesla T4") == hardware_fingerprint("gpu:t4") == "gpu:t4"
+    assert hardware_fingerprint("NVIDIA A100-SXM4-40GB") == "gpu:a100-sxm4-40gb"
+    assert hardware_fingerprint().startswith("cpu:")
+    assert params_from_model_id(LLAMA) == 8.0
+    assert params_from_model_id("Qwen/Qwen2.5-0.5B") == 0.5
+    assert params_from_model_id("org/tiny-model") is None
+
+
+def test_estimates_fall_back_and_widen(calibration):
+    default = calibration.estimate(LLAMA, "qlora", 16, 2048, "gpu:t4")
+    assert default.basis == "default" and default.samples == 0
+
+    for tokens_per_sec in (900, 1000, 1100):
+        calibration.record(LLAMA, "qlora", 16, 2048, "Tesla T4", tokens_per_sec, source="job")
+    calibration.record(LLAMA, "qlora", 16, 2048, "Tesla T4", 50, source="benchmark")
+
+    exact = calibration.estimate(LLAMA, "qlora", 16, 2000, "gpu:t4")
+    assert exact.basis == "exact" and exact.samples == 3  # measured beats benchmark
+    assert exact.low < 996 < exact.high and exact.tokens_per_sec == pytest.approx(997, abs=1)
+
+    other_rank = calibration.estimate(LLAMA, "qlora", 64, 4096, "gpu:t4")
+    assert other_rank.basis == "model"
+    assert other_rank.high / other_rank.low > exact.high / exact.low
+
+    smaller = calibration.estimate("Qwen/Qwen2.5-0.5B", "qlora", 16, 2048, "gpu:t4")
+    assert smaller.basis == "hardware"
+    assert smaller.tokens_per_sec == pytest.approx(exact.tokens_per_sec * 16, rel=0.01)
+    assert calibration.estimate(LLAMA, "qlora", 16, 2048, "gpu:a100").basis == "default"
+
+
+def test_samples_per_combination_are_capped(calibration, monkeypatch):
+    monkeypatch.setattr(calibration_module, "MAX_SAMPLES_PER_KEY", 3)
+    for tokens_per_sec in range(100, 106):
+        calibration.record(LLAMA, "lora", 8, 1024, "gpu:t4", tokens_per_sec)
+    calibration.record(LLAMA, "lora", 8, 512, "gpu:t4", 1)
+    kept = [s["tokens_per_sec"] for s in calibration.samples(hardware="Tesla T4")]
+    assert kept == [1, 105, 104, 103]
+    with pytest.raises(ValueError):
+        calibration.record(LLAMA, "lora", 8, 1024, "gpu:t4", 0)
+
+
+def test_estimate_api_uses_calibrated_throughput_and_dataset_size(calibration):
+    payload = {**REQUEST, "dataset_rows": 1000, "avg_tokens_per_sample": 300}
+    default = client.post("/api/finetuning/estimate", json=payload).json()
+    assert default["throughput"]["basis"] == "default" and not default["assumed_dataset"]
+    low, high = default["confidence_interval"]["time_minutes"]
+    assert low < default["estimated_time_minutes"] < high
+
+    sample = {"model_id": LLAMA, "hardware": "Tesla T4", "tokens_per_sec": 1500}
+    assert client.post("/api/finetuning/calibration/samples", json=sample).status_code == 200
+    calibrated = client.post("/api/finetuning/estimate", json=payload).json()
+    assert calibrated["throughput"]["basis"] == "exact"
+    assert calibrated["total_tokens"] == 1000 * 300 * 3
+    assert calibrated["estimated_time_minutes"] == round(900_000 / 1500 / 60, 1)
+
+    assumed = client.post("/api/finetuning/estimate", json=REQUEST).json()
+    assert assumed["assumed_dataset"] and assumed["total_tokens"] == 500 * 256 * 3
+
+
+def test_completed_jobs_and_benchmarks_record_samples(calibration):
+    created = client.post("/api/finetuning/notebook/generate", json=REQUEST).json()
+    progress = {"status": "completed", "train_tokens_per_second": 1234.0, "gpu_name": "Tesla T4"}
+    asyncio.run(finetuning_service.broadcast_training_progress(created["job_id"], progress))
+    (sample,) = calibration.samples(model_id=LLAMA)
+    assert sample["job_id"] == created["job_id"] and sample["source"] == "job"
+    assert (sample["hardware"], sample["lora_r"], sample["seq_len"]) == ("gpu:t4", 16, 2048)
+
+    response = client.post(
+        "/api/finetuning/calibration/benchmark",
+        json={"model_id": "org/tiny-model", "params_b": 0.1, "seconds": 0.05},
+    )
+    assert response.status_code == 200
+    assert response.json()["source"] == "benchmark" and response.json()["tokens_per_sec"] > 0
+    missing = client.post("/api/finetuning/calibration/benchmark", json={"model_id": "org/x"})
+    assert missing.status_code == 400
+
+
+def test_jobs_trained_here_record_this_machines_throughput(calibration):
+    assert record_job_throughput("job-0", LLAMA, "lora", 8, 512, None) is None
+    sample = record_job_throughput("job-1", LLAMA, "lora", 8, 512, 321.0)
+    assert sample["hardware"] == hardware_fingerprint() and sample["source"] == "job"
+    assert record_job_throughput("job-2", LLAMA, "lora", 8, 512, -1.0) is None
+    assert [s["job_id"] for s in calibration.samples()] == ["job-1"]
+
+
+def test_completed_finetuning_task_adds_a_calibration_sample(calibration, tmp_path, monkeypatch):
+    for name in ("celery", "torch", "transformers", "peft", "datasets"):
+        pytest.importorskip(name)
+    from agent.tasks import run_finetuning_task
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "train.csv").write_text(
+        "text,label\n" + "".join(f"review {i} was fine,positive\n" for i in range(16))
+    )
+    config = {
+        "model_id": "hf-internal-testing/tiny-random-LlamaForCausalLM",
+        "method": "lora",
+        "lora_r": 4,
+        "dataset_path": str(tmp_path / "train.csv"),
+        "max_length": 32,
+        "batch_size": 4,
+    }
+    result = run_finetuning_task.run("job-tiny", config)
+    (sample,) = calibration.samples(model_id=config["model_id"])
+    assert sample["job_id"] == "job-tiny" and sample["source"] == "job"
+    assert (sample["method"], sample["lora_r"], sample["seq_len"]) == ("lora", 4, 32)
+    assert sample["tokens_per_sec"] == pytest.approx(result["tokens_per_sec"])
@@ -0,0 +1,105 @@
+"""Training data preparation: vectorised prompt formatting and the tokenized dataset cache."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agent.training_data import (
+    TokenizedDatasetCache,
+    format_prompts,
+    load_tokenized_dataset,
+    padding_stats,
+)
+
+
+class WhitespaceTokenizer:
+    """Deterministic stand-in for a HF tokenizer: one id per whitespace token."""
+
+    name_or_path = "whitespace"
+
+    def __init__(self):
+        self.calls = 0
+
+    def __len__(self):
+        return 1000
+
+    def __call__(self, texts, truncation, max_length, return_attention_mask):
+        self.calls += 1
+        ids = [[sum(map(ord, word)) % 1000 for word in text.split()][:max_length] for text in texts]
+        return {"input_ids": ids}
+
+
+def _frame(rows=50):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "review": [" ".join(["good"] * int(n)) for n in rng.integers(1, 30, rows)],
+            "stars": rng.integers(1, 6, rows),
+            "score": np.where(np.arange(rows) % 5 == 0, np.nan, rng.normal(size=rows)),
+            "label": rng.choice(["pos", "neg"], rows),
+        }
+    )
+
+
+def test_format_prompts_matches_row_wise_apply():
+    df = _frame()
+    expected = df.apply(
+        lambda row: (
+            f"Input: {', '.join([f'{k}: {v}' for k, v in row.drop('label').items()])}"
+            f" Output: {row['label']}"
+        ),
+        axis=1,
+    )
+    assert format_prompts(df, "label").tolist() == expected.tolist()
+
+    unlabeled = df.drop(columns=["label"])
+    expected = unlabeled.apply(lambda row: " | ".join(f"{k}: {v}" for k, v in row.items()), axis=1)
+    assert format_prompts(unlabeled).tolist() == expected.tolist()
+
+
+def test_tokenized_cache_is_reused_and_keyed_by_max_length(tmp_path):
+    dataset = tmp_path / "train.csv"
+    _frame().to_csv(dataset, index=False)
+    cache = TokenizedDatasetCache(str(tmp_path / "cache"))
+    tokenizer = WhitespaceTokenizer()
+
+    table, report = load_tokenized_dataset(str(dataset), tokenizer, 16, cache)
+    assert not report["cache_hit"] and tokenizer.calls == 1
+    assert table.column_names == ["input_ids", "length"]
+    lengths = table.column("length").to_pylist()
+    assert max(lengths) <= 16
+    assert lengths == [len(ids) for ids in table.column("input_ids").to_pylist()]
+
+    again, report = load_tokenized_dataset(str(dataset), tokenizer, 16, cache)
+    assert report["cache_hit"] and tokenizer.calls == 1
+    assert again.equals(table)
+
+    _, report = load_tokenized_dataset(str(dataset), tokenizer, 32, cache)
+    assert not report["cache_hit"]
+
+    dataset.write_text(dataset.read_text() + "extra,1,0.5,pos\n")
+    _, report = load_tokenized_dataset(str(dataset), tokenizer, 16, cache)
+    assert not report["cache_hit"]
+    assert len(list((tmp_path / "cache").glob("*.arrow"))) == 3
+
+
+def test_corrupt_cache_entry_is_rebuilt(tmp_path):
+    dataset = tmp_path / "train.csv"
+    _frame(5).to_csv(dataset, index=False)
+    cache = TokenizedDatasetCache(str(tmp_path / "cache"))
+    _, report = load_tokenized_dataset(str(dataset), WhitespaceTokenizer(), 16, cache)
+    (tmp_path / "cache" / f"{report['cache_key']}.arrow").write_bytes(b"not arrow")
+
+    table, report = load_tokenized_dataset(str(dataset), WhitespaceTokenizer(), 16, cache)
+    assert not report["cache_hit"] and table.num_rows == 5
+
+
+def test_padding_stats_compare_fixed_and_dynamic_padding():
+    import pyarrow as pa
+
+    table = pa.table({"length": pa.array([2, 4, 8, 8], type=pa.int32())})
+    stats = padding_stats(table, max_length=16, batch_size=2)
+    assert stats["tokens"] == 22
+    assert stats["padded_tokens_max_length"] == 64
+    assert stats["padded_tokens_dynamic"] == 2 * 4 + 2 * 8
+    assert stats["padding_efficiency_dynamic"] == pytest.approx(22 / 24, abs=1e-4)
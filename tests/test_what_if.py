@@ -0,0 +1,146 @@
+"""Batch what-if evaluation: vectorized results must match the per-set loop."""
+
+import itertools
+
+from fastapi.testclient import TestClient
+
+import ui.api as api
+from agent.planner import ConstraintSpec, ConstraintValidator, DesignAgent
+from lib.feasibility.engine import HardConstraintFilter
+from lib.validation.schemas import Constraints, ModelFamily, PipelineCandidate
+
+client = TestClient(api.app)
+
+BASE_REQUEST = {
+    "data_profile": {"type": "tabular"},
+    "objective": "accuracy",
+    "constraints": {
+        "max_cost_usd": 10,
+        "max_carbon_kg": 1,
+        "max_latency_ms": 200,
+        "compliance_level": "standard",
+    },
+    "deployment": "batch",
+    "retraining": "none",
+}
+
+
+def _spec(data_type, objective, cost, carbon, latency, deployment, hardware=None):
+    return ConstraintSpec(
+        data_type=data_type,
+        task="classification",
+        objective=objective,
+        max_cost=cost,
+        max_carbon=carbon,
+        max_latency=latency,
+        deployment=deployment,
+        compliance="standard",
+        retraining="none",
+        hardware=hardware,
+    )
+
+
+def test_batch_matches_generate_designs():
+    agent = DesignAgent()
+    specs = [
+        _spec(*combo)
+        for combo in itertools.product(
+            ["tabular", "text", "image"],
+            ["accuracy", "cost", "latency", "robustness"],
+            [0.05, 1, 10, 100],
+            [0.01, 0.5, 5],
+            [20, 100, 2000],
+            ["batch", "realtime", "edge"],
+            [None, "CPU-only"],
+        )
+    ]
+
+    batch = agent.generate_designs_batch(specs)
+    assert len(batch) == len(specs)
+    assert any(r["status"] == "success" for r in batch)
+    assert any(r["status"] != "success" for r in batch)
+
+    for spec, result in zip(specs, batch):
+        expected = agent.generate_designs(spec)
+        assert result["status"] == expected["status"]
+        assert result["feasibility"] == expected["feasibility"]
+        assert [d["model"] for d in result["designs"]] == [d["model"] for d in expected["designs"]]
+        assert [d["score"] for d in result["designs"]] == [d["score"] for d in expected["designs"]]
+
+
+def test_batch_does_not_grow_the_infeasibility_log():
+    agent = DesignAgent(validator=ConstraintValidator(max_log_entries=3))
+    infeasible = _spec("text", "accuracy", 1, 0.01, 20, "realtime")
+    results = agent.generate_designs_batch([infeasible] * 50)
+    assert all(r["status"] == "infeasible" for r in results)
+    assert len(agent.validator.infeasibility_log) == 0
+
+    for _ in range(5):
+        agent.generate_designs(infeasible)
+    assert len(agent.validator.infeasibility_log) == 3
+
+
+def test_feasibility_matrix_matches_filter_candidates():
+    candidates = [
+        PipelineCandidate(
+            id=str(i),
+            name=f"c{i}",
+            description="",
+            model_families=[ModelFamily.CLASSICAL],
+            estimated_cost=cost,
+            estimated_carbon=carbon,
+            estimated_latency_ms=latency,
+            estimated_accuracy=accuracy,
+            components=[],
+        )
+        for i, (cost, carbon, latency, accuracy) in enumerate(
+            itertools.product([0.5, 5, 50], [0.1, 2], [10, 500], [0.6, 0.9])
+        )
+    ]
+    constraint_sets = [
+        Constraints(max_cost_usd=c, max_carbon_kg=k, max_latency_ms=l, min_accuracy=a)
+        for c, k, l, a in itertools.product([1, 10], [0.5, 5], [50, 1000], [0.5, 0.8])
+    ]
+
+    hard_filter = HardConstraintFilter()
+    batch = hard_filter.filter_candidates_batch(candidates, constraint_sets)
+    for constraints, (feasible, infeasible) in zip(constraint_sets, batch):
+        expected_feasible, expected_infeasible = hard_filter.filter_candidates(
+            [c.model_copy() for c in candidates], constraints
+        )
+        assert [c.id for c in feasible] == [c.id for c in expected_feasible]
+        assert [c.id for c in infeasible] == [c.id for c in expected_infeasible]
+
+
+def test_what_if_endpoint_returns_feasible_sets():
+    grid = {"max_cost_usd": [0.01, 5, 50], "max_latency_ms": [1, 100, 1000]}
+    response = client.post("/api/design/what-if", json={**BASE_REQUEST, "grid": grid})
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["total_sets"] == 9
+    assert 0 < data["feasible_sets"] < 9
+    assert len(data["results"]) == data["feasible_sets"]
+    for result in data["results"]:
+        assert result["status"] == "success" and result["designs"]
+        assert "pipeline_spec" not in result["designs"][0]
+        assert result["designs"][0]["estimated_cost"] <= result["constraints"]["max_cost_usd"]
+
+    everything = client.post(
+        "/api/design/what-if",
+        json={**BASE_REQUEST, "grid": grid, "include_infeasible": True, "detail": True},
+    ).json()
+    assert len(everything["results"]) == 9
+
+
+def test_what_if_rejects_unknown_fields_and_oversized_grids(monkeypatch):
+    response = client.post(
+        "/api/design/what-if", json={**BASE_REQUEST, "constraint_sets": [{"gpu_count": 4}]}
+    )
+    assert response.status_code == 400
+
+    monkeypatch.setattr(api, "MAX_WHAT_IF_SETS", 4)
+    response = client.post(
+        "/api/design/what-if", json={**BASE_REQUEST, "grid": {"max_cost_usd": [1, 2, 3, 4, 5]}}
+    )
+    assert response.status_code == 400
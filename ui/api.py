@@ -15,8 +15,9 @@ sys.path.insert(0, str(Path(__file__).parent / "src"))
 from fastapi import FastAPI, HTTPException, Header, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import Optional, Literal, List, Dict, Any
-from fastapi.responses import JSONResponse
+from typing import Optional, Literal, List, Dict, Any, Set
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
 import uuid
 from datetime import datetime
 import random
@@ -25,6 +26,9 @@ import logging
 import traceback
 import os
 import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
 
 # Load .env.local for GROQ_API_KEY and other secrets
 _env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env.local")
@@ -41,7 +45,6 @@ if os.path.exists(_env_path):
 
 logger = logging.getLogger(__name__)
 
-from agent.planner import DesignAgent, ConstraintSpec
 from ui.database import (
     PipelineStore,
     DesignStore,
@@ -51,7 +54,15 @@ from ui.database import (
     UserStore,
     SessionStore,
     generate_token,
+    get_table_versions,
+    init_db,
+    DB_PATH,
 )
+from observability.request_profiler import ProfilingMiddleware, RequestProfiler
+from ui.health import HealthChecker, disk_check, llm_backends_check, redis_check, sqlite_check
+from ui.http_cache import ConditionalGetMiddleware, ETagRegistry
+from ui.lazy_routers import LazyRouter, LazyRouterMiddleware, include_lazy_in_openapi
+from ui.responses import FastJSONResponse, FastJSONRoute
 from lib.state_machine import (
     LifecycleState,
     ProjectState,
@@ -60,6 +71,8 @@ from lib.state_machine import (
     ConstraintViolation,
     PAGE_TO_STATE,
     InvalidTransitionError,
+    DB_PATH as STATE_DB_PATH,
+    init_projects_table,
 )
 
 try:
@@ -86,29 +99,95 @@ def rate_limit(limit_str: str = "10/minute"):
     return decorator
 
 
-try:
-    from agent.finetuning_service import router as finetuning_router
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
 
-    HAS_FINETUNING = True
-except ImportError:
-    HAS_FINETUNING = False
+
+app = FastAPI(
+    title="System2ML API",
+    version="0.2.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
+app.router.route_class = FastJSONRoute
+
+# Heavy routers are imported and included on their first request (see ui.lazy_routers)
+finetuning_router = LazyRouter(
+    app,
+    "/api/finetuning",
+    "agent.finetuning_service",
+    on_load=lambda module: request_profiler.instrument(app),
+)
+HAS_FINETUNING = finetuning_router.available
+if not HAS_FINETUNING:
     logger.warning("Fine-tuning service not available")
+lazy_routers = [finetuning_router]
+include_lazy_in_openapi(app, lazy_routers)
+
+
+health_checker = HealthChecker(
+    ttl=float(os.environ.get("HEALTH_CACHE_TTL", "5")),
+    default_timeout=float(os.environ.get("HEALTH_CHECK_TIMEOUT", "2")),
+)
+health_checker.register("database", sqlite_check(DB_PATH))
+if STATE_DB_PATH != DB_PATH:
+    health_checker.register("project_database", sqlite_check(STATE_DB_PATH))
+health_checker.register(
+    "redis",
+    redis_check(os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")),
+    critical=False,
+)
+health_checker.register(
+    "llm_backends",
+    llm_backends_check(),
+    critical=False,
+)
+health_checker.register(
+    "disk",
+    disk_check(
+        os.path.dirname(os.path.abspath(DB_PATH)),
+        min_free_mb=int(os.environ.get("MIN_FREE_DISK_MB", "500")),
+    ),
+)
+
+_background_tasks: Set[asyncio.Task] = set()
+
 
-app = FastAPI(title="System2ML API", version="0.2.0")
+async def _log_redis_status():
+    results = await health_checker.run(force=True)
+    redis_status = results.get("redis")
+    if redis_status and redis_status.status == "ok":
+        logger.info("Redis connected successfully")
+    elif redis_status:
+        logger.warning(
+            f"Redis connection failed: {redis_status.detail.get('error')}. "
+            "Fine-tuning background tasks require Redis."
+        )
 
 
-@app.on_event("startup")
 async def startup_event():
-    """Initialize Redis connection on startup."""
-    import redis
+    """Create the schema, then probe dependencies and connect the backplane in the background."""
+    await asyncio.to_thread(init_db)
+    await asyncio.to_thread(init_projects_table)
+    for coro in (_log_redis_status(), get_backplane().start()):
+        task = asyncio.create_task(coro)
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
-    try:
-        CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
-        r = redis.from_url(CELERY_BROKER_URL)
-        r.ping()
-        logger.info(f"Redis connected successfully: {CELERY_BROKER_URL}")
-    except Exception as e:
-        logger.warning(f"Redis connection failed: {e}. Fine-tuning background tasks require Redis.")
+
+async def shutdown_event():
+    for task in list(_background_tasks):
+        task.cancel()
+    await get_backplane().stop()
+
+    from agent.llm_client import get_llm_client
+
+    await asyncio.to_thread(get_llm_client().close)
 
 
 from fastapi import WebSocket, WebSocketDisconnect
@@ -116,41 +195,42 @@ from typing import Dict, Set
 import asyncio
 import json
 
+from lib.realtime.backplane import get_backplane
+from lib.realtime.event_log import EventLogRegistry
+from lib.realtime.fanout import FanoutHub
+from lib.realtime.sse import SSE_HEADERS, parse_last_event_id, stream_event_log
+
 
 class ConnectionManager:
+    """Dashboard/training/pipeline/generation channels backed by per-client send queues.
+
+    Broadcasts go through the backplane so clients on every worker receive them.
+    """
+
     def __init__(self):
-        self.active_connections: Dict[str, Set[WebSocket]] = {
-            "dashboard": set(),
-            "training": set(),
-            "pipeline": set(),
-        }
+        self.hub = FanoutHub()
+        for channel in ("dashboard", "training", "pipeline", "generation"):
+            self.hub.ensure_channel(channel)
+        get_backplane().attach("ui", self.hub)
+
+    @property
+    def active_connections(self) -> Dict[str, Set[WebSocket]]:
+        return {channel: set(clients) for channel, clients in self.hub.channels.items()}
 
     async def connect(self, websocket: WebSocket, channel: str = "dashboard"):
-        await websocket.accept()
-        if channel not in self.active_connections:
-            self.active_connections[channel] = set()
-        self.active_connections[channel].add(websocket)
+        await self.hub.connect(websocket, channel)
 
     def disconnect(self, websocket: WebSocket, channel: str = "dashboard"):
-        if channel in self.active_connections:
-            self.active_connections[channel].discard(websocket)
+        self.hub.disconnect(websocket, channel)
 
     async def send_personal(self, message: dict, websocket: WebSocket):
-        try:
-            await websocket.send_json(message)
-        except Exception:
-            pass
+        self.hub.send_to(websocket, message)
 
     async def broadcast(self, message: dict, channel: str = "dashboard"):
-        if channel in self.active_connections:
-            disconnected = set()
-            for connection in self.active_connections[channel]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    disconnected.add(connection)
-            for conn in disconnected:
-                self.active_connections[channel].discard(conn)
+        await get_backplane().publish("ui", channel, message)
+
+    def broadcast_threadsafe(self, message: dict, channel: str = "dashboard"):
+        get_backplane().publish_threadsafe("ui", channel, message)
 
 
 manager = ConnectionManager()
@@ -169,6 +249,8 @@ async def websocket_endpoint(websocket: WebSocket, channel: str = "dashboard"):
             except json.JSONDecodeError:
                 pass
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, channel)
 
 
@@ -180,7 +262,7 @@ def broadcast_training_update(run_id: str, status: str, progress: float = 0, met
         "progress": progress,
         "metrics": metrics or {},
     }
-    asyncio.create_task(manager.broadcast(message, "training"))
+    manager.broadcast_threadsafe(message, "training")
 
 
 def broadcast_pipeline_update(pipeline_id: str, status: str, metrics: dict = None):
@@ -190,7 +272,7 @@ def broadcast_pipeline_update(pipeline_id: str, status: str, metrics: dict = Non
         "status": status,
         "metrics": metrics or {},
     }
-    asyncio.create_task(manager.broadcast(message, "pipeline"))
+    manager.broadcast_threadsafe(message, "pipeline")
 
 
 def broadcast_dashboard_kpi(kpi_type: str, data: dict):
@@ -199,7 +281,36 @@ def broadcast_dashboard_kpi(kpi_type: str, data: dict):
         "kpi_type": kpi_type,
         "data": data,
     }
-    asyncio.create_task(manager.broadcast(message, "dashboard"))
+    manager.broadcast_threadsafe(message, "dashboard")
+
+
+def broadcast_generation_partial(stream_id: str, kind: str, path, value):
+    """One completed section of a streamed LLM generation (a pipeline stage, a cell)."""
+    message = {
+        "type": "generation_partial",
+        "stream_id": stream_id,
+        "kind": kind,
+        "path": list(path),
+        "value": value,
+    }
+    manager.broadcast_threadsafe(message, "generation")
+
+
+def broadcast_generation_complete(stream_id: str, kind: str, status: str):
+    message = {
+        "type": "generation_complete",
+        "stream_id": stream_id,
+        "kind": kind,
+        "status": status,
+    }
+    manager.broadcast_threadsafe(message, "generation")
+
+
+def generation_listener(stream_id: Optional[str], kind: str):
+    """on_partial callback relaying streamed sections to /ws/generation; None without an id."""
+    if not stream_id:
+        return None
+    return lambda path, value: broadcast_generation_partial(stream_id, kind, path, value)
 
 
 def _get_state_message(state) -> str:
@@ -234,10 +345,6 @@ if HAS_RATE_LIMITING:
         )
 
 
-if HAS_FINETUNING:
-    app.include_router(finetuning_router)
-
-
 # from fastapi import HTTPException  # already imported earlier
 
 
@@ -274,6 +381,21 @@ cors_origins = os.environ.get(
     "http://localhost:3000,http://127.0.0.1:3000,http://localhost:8000,http://127.0.0.1:8000",
 ).split(",")
 
+# Weak ETags for the list endpoints the dashboard polls; If-None-Match hits return
+# 304 without running the endpoint. Registered before CORS so 304s still get CORS headers.
+etag_registry = ETagRegistry(namespace=app.version)
+etag_registry.register("/api/pipelines", lambda: get_table_versions("pipelines"))
+etag_registry.register("/api/runs", lambda: get_table_versions("runs"))
+etag_registry.register("/api/metrics", lambda: get_table_versions("pipelines", "runs"))
+etag_registry.register("/api/activities", lambda: get_table_versions("activities"))
+if HAS_FINETUNING:
+    etag_registry.register(
+        "/api/finetuning/jobs", lambda: finetuning_router.load().jobs_version()
+    )
+
+app.add_middleware(LazyRouterMiddleware, routers=lazy_routers)
+app.add_middleware(ConditionalGetMiddleware, registry=etag_registry)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
@@ -282,6 +404,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency covers every other middleware; endpoints are wrapped at the
+# bottom of this module once all routes are registered.
+request_profiler = RequestProfiler()
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
 
 API_VERSION = "v1"
 
@@ -1105,9 +1232,9 @@ def health_check():
         "dependencies": {},
     }
 
-    # Check database
+    # Check database (header read only; see /readyz for the full dependency set)
     try:
-        projects = ProjectStore.get_all()
+        sqlite_check(STATE_DB_PATH)()
         checks["dependencies"]["database"] = {"status": "healthy", "type": "sqlite"}
     except Exception as e:
         checks["dependencies"]["database"] = {"status": "unhealthy", "error": str(e)}
@@ -1129,10 +1256,135 @@ def health_check():
     return checks
 
 
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: constant time, touches no dependency."""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness(force: bool = False):
+    """Readiness probe: cached, concurrent, timeout-bounded dependency checks."""
+    result = await health_checker.readiness(force=force)
+    return JSONResponse(status_code=200 if result["status"] == "ready" else 503, content=result)
+
+
+@app.get("/health/detail")
+async def health_detail(force: bool = False):
+    """Per-dependency status, latency and details for operators."""
+    detail = await health_checker.detail(force=force)
+    detail["version"] = app.version
+    detail["backplane"] = get_backplane().stats()
+    detail["websockets"] = manager.hub.stats()
+    return detail
+
+
+def _require_admin(x_admin_token: Optional[str]):
+    """ADMIN_API_TOKEN guards admin endpoints; without it they are only open outside production."""
+    expected = os.environ.get("ADMIN_API_TOKEN")
+    if expected:
+        if x_admin_token != expected:
+            raise HTTPException(status_code=403, detail="Admin token required")
+    elif os.environ.get("ENV", "development") == "production":
+        raise HTTPException(status_code=403, detail="ADMIN_API_TOKEN is not configured")
+
+
+@app.get("/api/admin/profiling")
+async def get_request_profiling(
+    top: Optional[int] = None, sort: str = "p95", x_admin_token: Optional[str] = Header(None)
+):
+    """Per-route latency/size/queue-wait histograms and captured slow-request profiles."""
+    _require_admin(x_admin_token)
+    return request_profiler.snapshot(top=top, sort=sort)
+
+
+@app.get("/api/admin/profiling/profiles/{profile_id}")
+def get_request_profile(profile_id: int, x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    profile = request_profiler.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@app.post("/api/admin/profiling/reset")
+def reset_request_profiling(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    request_profiler.reset()
+    return {"reset": True}
+
+
+@app.get("/api/admin/llm/backends")
+def get_llm_backend_stats(x_admin_token: Optional[str] = Header(None)):
+    """Per-backend request counts, latency and circuit breaker state."""
+    from agent.llm_client import get_llm_client
+
+    _require_admin(x_admin_token)
+    return get_llm_client().stats()
+
+
+@app.post("/api/admin/llm/backends/{backend}/reset")
+def reset_llm_backend_circuit(backend: str, x_admin_token: Optional[str] = Header(None)):
+    """Close a backend's circuit now instead of waiting for the next probe."""
+    from agent.llm_client import get_llm_client
+
+    _require_admin(x_admin_token)
+    client = get_llm_client()
+    if backend not in client.backends:
+        raise HTTPException(status_code=404, detail=f"Unknown LLM backend: {backend}")
+    client.breaker(backend).reset()
+    return {"backend": backend, "circuit": client.breaker(backend).snapshot()}
+
+
+@app.get("/api/admin/llm/cache")
+def get_llm_cache_stats(x_admin_token: Optional[str] = Header(None)):
+    """LLM response cache hit rate, size and per-backend entries."""
+    from agent.llm_client import get_llm_client
+
+    _require_admin(x_admin_token)
+    return get_llm_client().cache_stats()
+
+
+@app.delete("/api/admin/llm/cache")
+def clear_llm_cache(x_admin_token: Optional[str] = Header(None)):
+    from agent.llm_client import get_llm_client
+
+    _require_admin(x_admin_token)
+    cache = get_llm_client().cache
+    if cache is None:
+        return {"enabled": False, "cleared": 0}
+    cleared = cache.clear()
+    cache.reset_stats()
+    return {"enabled": True, "cleared": cleared}
+
+
+@app.get("/api/admin/design-index")
+def get_design_index_stats(x_admin_token: Optional[str] = Header(None)):
+    """Warm-start hit rate and size of the nearest-neighbour design index."""
+    from memory.design_index import get_design_index
+
+    _require_admin(x_admin_token)
+    index = get_design_index()
+    return index.stats() if index is not None else {"enabled": False}
+
+
+@app.delete("/api/admin/design-index")
+def clear_design_index(x_admin_token: Optional[str] = Header(None)):
+    from memory.design_index import get_design_index
+
+    _require_admin(x_admin_token)
+    index = get_design_index()
+    if index is None:
+        return {"enabled": False, "cleared": 0}
+    return {"enabled": True, "cleared": index.clear()}
+
+
 @app.post("/api/design/request")
 @rate_limit("10/minute")
 def design_pipeline(request: Request, request_data: DesignRequest):
     try:
+        from agent.planner import ConstraintSpec
+
         constraints = ConstraintSpec(
             data_type=request_data.data_profile.type,
             task="classification",
@@ -1197,6 +1449,135 @@ def design_pipeline(request: Request, request_data: DesignRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class WhatIfRequest(BaseModel):
+    data_profile: DataProfile
+    objective: Literal["accuracy", "robustness", "speed", "cost"]
+    constraints: Constraints
+    deployment: Literal["batch", "realtime", "edge"]
+    retraining: Literal["time", "drift", "none"]
+    # Cartesian product of values per field, e.g. {"max_cost_usd": [5, 10, 20]}
+    grid: Dict[str, List[Any]] = Field(default_factory=dict)
+    # Explicit overrides of the base constraints, evaluated in addition to the grid
+    constraint_sets: List[Dict[str, Any]] = Field(default_factory=list)
+    include_infeasible: bool = False
+    detail: bool = False
+
+
+# What-if field -> (ConstraintSpec attribute, parser)
+WHAT_IF_FIELDS = {
+    "max_cost_usd": ("max_cost", float),
+    "max_carbon_kg": ("max_carbon", float),
+    "max_latency_ms": ("max_latency", int),
+    "compliance_level": ("compliance", str),
+    "deployment": ("deployment", str),
+    "objective": ("objective", str),
+}
+MAX_WHAT_IF_SETS = int(os.environ.get("MAX_WHAT_IF_SETS", "10000"))
+
+
+def _expand_what_if(request_data: WhatIfRequest) -> List[Dict[str, Any]]:
+    """Constraint sets (in API field names) from the base request, grid and explicit sets."""
+    import itertools
+
+    base = {
+        "max_cost_usd": request_data.constraints.max_cost_usd,
+        "max_carbon_kg": request_data.constraints.max_carbon_kg,
+        "max_latency_ms": request_data.constraints.max_latency_ms,
+        "compliance_level": request_data.constraints.compliance_level,
+        "deployment": request_data.deployment,
+        "objective": request_data.objective,
+    }
+    overrides: List[Dict[str, Any]] = []
+    if request_data.grid:
+        keys = list(request_data.grid)
+        size = 1
+        for key in keys:
+            size *= len(request_data.grid[key])
+        if size > MAX_WHAT_IF_SETS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Grid expands to {size} constraint sets (limit {MAX_WHAT_IF_SETS})",
+            )
+        overrides.extend(
+            dict(zip(keys, values))
+            for values in itertools.product(*(request_data.grid[k] for k in keys))
+        )
+    overrides.extend(request_data.constraint_sets)
+    if not overrides:
+        overrides.append({})
+    if len(overrides) > MAX_WHAT_IF_SETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(overrides)} constraint sets requested (limit {MAX_WHAT_IF_SETS})",
+        )
+
+    sets = []
+    for override in overrides:
+        unknown = set(override) - set(WHAT_IF_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported what-if fields: {sorted(unknown)}; "
+                f"expected any of {sorted(WHAT_IF_FIELDS)}",
+            )
+        values = dict(base)
+        for key, value in override.items():
+            try:
+                values[key] = WHAT_IF_FIELDS[key][1](value)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail=f"Invalid value for {key}: {value!r}")
+        sets.append(values)
+    return sets
+
+
+@app.post("/api/design/what-if")
+@rate_limit("10/minute")
+def design_what_if(request: Request, request_data: WhatIfRequest):
+    """Evaluate a grid of constraint sets against one candidate enumeration.
+
+    Nothing is persisted; returns the feasible sets (all sets with include_infeasible)
+    with their ranked designs. Use /api/design/request to save a chosen set.
+    """
+    from agent.planner import ConstraintSpec
+
+    sets = _expand_what_if(request_data)
+    specs = [
+        ConstraintSpec(
+            data_type=request_data.data_profile.type,
+            task="classification",
+            retraining=request_data.retraining,
+            **{WHAT_IF_FIELDS[key][0]: value for key, value in values.items()},
+        )
+        for values in sets
+    ]
+
+    start = time.perf_counter()
+    results = get_design_agent().generate_designs_batch(specs, detail=request_data.detail)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    evaluated = []
+    for values, result in zip(sets, results):
+        if result["status"] != "success" and not request_data.include_infeasible:
+            continue
+        evaluated.append(
+            {
+                "constraints": values,
+                "status": result["status"],
+                "feasibility": result["feasibility"],
+                "designs": result["designs"],
+            }
+        )
+
+    return {
+        "request_id": str(uuid.uuid4()),
+        "timestamp": datetime.utcnow().isoformat(),
+        "total_sets": len(sets),
+        "feasible_sets": sum(1 for r in results if r["status"] == "success"),
+        "evaluation_ms": round(elapsed_ms, 2),
+        "results": evaluated,
+    }
+
+
 @app.get("/api/pipelines")
 def list_pipelines():
     pipelines = PipelineStore.get_all()
@@ -1702,7 +2083,15 @@ def generate_pipeline_candidates(request: dict):
             "data_types": data_profile.get("data_types", {}),
         }
 
-        ai_result = ai.generate_pipeline(dataset_info, constraints)
+        stream_id = request.get("stream_id")
+        ai_result = ai.generate_pipeline(
+            dataset_info,
+            constraints,
+            use_cache=request.get("use_cache", True),
+            on_partial=generation_listener(stream_id, "pipeline"),
+        )
+        if stream_id:
+            broadcast_generation_complete(stream_id, "pipeline", ai_result.get("status", "unknown"))
 
         if ai_result.get("status") == "success":
             pipeline = ai_result.get("pipeline", {})
@@ -2142,6 +2531,13 @@ class TrainingStatus(BaseModel):
 
 training_runs: dict = {}
 
+# Per-run delta streams for SSE watchers; see stream_training_events
+training_run_events = EventLogRegistry()
+_training_run_ticks: Dict[str, float] = {}
+_training_runs_lock = threading.Lock()
+TERMINAL_RUN_STATUSES = ("completed", "cancelled", "failed")
+TRAINING_EVENTS_TICK_SECONDS = float(os.environ.get("TRAINING_EVENTS_TICK_SECONDS", "1.0"))
+
 
 @app.post("/api/dataset/convert")
 async def convert_dataset(request: Request):
@@ -2265,77 +2661,154 @@ def start_training_run(request: TrainingRequest):
     return {"run_id": run_id, "status": "started", "message": "Training started successfully"}
 
 
+def _simulate_training_tick(run_id: str, run: dict) -> None:
+    """Advance a simulated run by one step."""
+    run["progress"] = min(run["progress"] + random.uniform(0.05, 0.15), 1.0)
+    run["elapsed_time_seconds"] += int(random.uniform(5, 15))
+
+    progress_factor = run["progress"]
+    run["cost_spent"] = run["estimated_cost"] * progress_factor
+    run["carbon_used"] = run["estimated_carbon"] * progress_factor
+
+    # Update current step
+    if run["progress"] < 0.3:
+        run["current_step"] = "preprocessing"
+    elif run["progress"] < 0.6:
+        run["current_step"] = "training"
+    elif run["progress"] < 0.9:
+        run["current_step"] = "evaluating"
+    else:
+        run["current_step"] = "finalizing"
+
+    # Check constraint violations
+    violations = []
+    if run["cost_spent"] > run["constraints"]["max_cost_usd"]:
+        violations.append(
+            {
+                "constraint": "max_cost_usd",
+                "message": f"Cost ${run['cost_spent']:.2f} exceeded limit ${run['constraints']['max_cost_usd']}",
+                "value": run["cost_spent"],
+                "limit": run["constraints"]["max_cost_usd"],
+            }
+        )
+
+    if run["carbon_used"] > run["constraints"]["max_carbon_kg"]:
+        violations.append(
+            {
+                "constraint": "max_carbon_kg",
+                "message": f"Carbon {run['carbon_used']:.4f}kg exceeded limit {run['constraints']['max_carbon_kg']}kg",
+                "value": run["carbon_used"],
+                "limit": run["constraints"]["max_carbon_kg"],
+            }
+        )
+
+    run["constraint_violations"] = violations
+
+    # Complete if 100% or violated
+    if run["progress"] >= 1.0:
+        run["status"] = "completed"
+        run["progress"] = 1.0
+        run["metrics"] = {
+            "accuracy": random.uniform(0.75, 0.95),
+            "f1": random.uniform(0.70, 0.92),
+            "precision": random.uniform(0.72, 0.94),
+            "recall": random.uniform(0.70, 0.93),
+        }
+        run["artifacts"] = {
+            "model": f"/models/{run_id}/model.pt",
+            "pipeline": f"/pipelines/{run_id}/pipeline.json",
+            "config": f"/config/{run_id}/config.yaml",
+        }
+    elif len(violations) > 0:
+        run["status"] = "cancelled"
+        run["artifacts"] = None
+
+
+_PROGRESS_FIELDS = (
+    "progress",
+    "current_step",
+    "cost_spent",
+    "carbon_used",
+    "elapsed_time_seconds",
+)
+
+
+def _publish_run_changes(run_id: str, before: dict, run: dict) -> None:
+    """Append only what changed since `before` to the run's event log."""
+    log = training_run_events.get(run_id)
+
+    progress = {k: run.get(k) for k in _PROGRESS_FIELDS if before.get(k) != run.get(k)}
+    if progress:
+        log.append("progress", progress)
+    if before.get("current_step") != run.get("current_step") and run.get("current_step"):
+        log.append("log", {"line": f"Step: {run['current_step']}"})
+    if run.get("constraint_violations") and before.get("constraint_violations") != run.get(
+        "constraint_violations"
+    ):
+        log.append("violation", {"constraint_violations": run["constraint_violations"]})
+    if run.get("metrics") and before.get("metrics") != run.get("metrics"):
+        log.append("metrics", {"metrics": run["metrics"]})
+    if before.get("status") != run.get("status"):
+        log.append(
+            "status",
+            {"status": run["status"], "artifacts": run.get("artifacts")},
+        )
+        if run["status"] in TERMINAL_RUN_STATUSES:
+            log.close()
+
+
+def _advance_training_run(run_id: str, min_interval: float = 0.0) -> dict:
+    """Advance a running run and publish its deltas.
+
+    With min_interval, callers sharing a run (SSE watchers) advance it at most once
+    per interval between them.
+    """
+    run = training_runs[run_id]
+    with _training_runs_lock:
+        now = time.monotonic()
+        if run["status"] != "running" or now - _training_run_ticks.get(run_id, 0.0) < min_interval:
+            return run
+        _training_run_ticks[run_id] = now
+        before = dict(run)
+        _simulate_training_tick(run_id, run)
+        _publish_run_changes(run_id, before, run)
+    return run
+
+
 @app.get("/api/training/run/{run_id}")
 def get_training_status(run_id: str):
     """Get training run status"""
     if run_id not in training_runs:
         raise HTTPException(status_code=404, detail="Training run not found")
 
-    run = training_runs[run_id]
-
-    # Simulate progress
-    if run["status"] == "running":
-        run["progress"] = min(run["progress"] + random.uniform(0.05, 0.15), 1.0)
-        run["elapsed_time_seconds"] += int(random.uniform(5, 15))
-
-        progress_factor = run["progress"]
-        run["cost_spent"] = run["estimated_cost"] * progress_factor
-        run["carbon_used"] = run["estimated_carbon"] * progress_factor
-
-        # Update current step
-        if run["progress"] < 0.3:
-            run["current_step"] = "preprocessing"
-        elif run["progress"] < 0.6:
-            run["current_step"] = "training"
-        elif run["progress"] < 0.9:
-            run["current_step"] = "evaluating"
-        else:
-            run["current_step"] = "finalizing"
+    return {"run": _advance_training_run(run_id)}
 
-        # Check constraint violations
-        violations = []
-        if run["cost_spent"] > run["constraints"]["max_cost_usd"]:
-            violations.append(
-                {
-                    "constraint": "max_cost_usd",
-                    "message": f"Cost ${run['cost_spent']:.2f} exceeded limit ${run['constraints']['max_cost_usd']}",
-                    "value": run["cost_spent"],
-                    "limit": run["constraints"]["max_cost_usd"],
-                }
-            )
 
-        if run["carbon_used"] > run["constraints"]["max_carbon_kg"]:
-            violations.append(
-                {
-                    "constraint": "max_carbon_kg",
-                    "message": f"Carbon {run['carbon_used']:.4f}kg exceeded limit {run['constraints']['max_carbon_kg']}kg",
-                    "value": run["carbon_used"],
-                    "limit": run["constraints"]["max_carbon_kg"],
-                }
-            )
+@app.get("/api/training/run/{run_id}/events")
+async def stream_training_events(
+    run_id: str, request: Request, last_event_id: Optional[str] = None
+):
+    """Server-Sent Events stream of a run's deltas (progress, metrics, log lines).
 
-        run["constraint_violations"] = violations
-
-        # Complete if 100% or violated
-        if run["progress"] >= 1.0:
-            run["status"] = "completed"
-            run["progress"] = 1.0
-            run["metrics"] = {
-                "accuracy": random.uniform(0.75, 0.95),
-                "f1": random.uniform(0.70, 0.92),
-                "precision": random.uniform(0.72, 0.94),
-                "recall": random.uniform(0.70, 0.93),
-            }
-            run["artifacts"] = {
-                "model": f"/models/{run_id}/model.pt",
-                "pipeline": f"/pipelines/{run_id}/pipeline.json",
-                "config": f"/config/{run_id}/config.yaml",
-            }
-        elif len(violations) > 0:
-            run["status"] = "cancelled"
-            run["artifacts"] = None
+    The first message is a full snapshot; afterwards only changes are sent. Reconnecting
+    clients resume from Last-Event-ID and get a fresh snapshot if they fell too far behind.
+    """
+    if run_id not in training_runs:
+        raise HTTPException(status_code=404, detail="Training run not found")
 
-    return {"run": run}
+    log = training_run_events.get(run_id)
+    if training_runs[run_id]["status"] in TERMINAL_RUN_STATUSES:
+        log.close()
+
+    stream = stream_event_log(
+        log,
+        snapshot=lambda: {"run": dict(training_runs[run_id])},
+        last_event_id=parse_last_event_id(request.headers, last_event_id),
+        poll_interval=TRAINING_EVENTS_TICK_SECONDS,
+        on_idle=lambda: _advance_training_run(run_id, TRAINING_EVENTS_TICK_SECONDS),
+        is_disconnected=request.is_disconnected,
+    )
+    return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 @app.post("/api/training/run/{run_id}/stop")
@@ -2344,7 +2817,11 @@ def stop_training(run_id: str):
     if run_id not in training_runs:
         raise HTTPException(status_code=404, detail="Training run not found")
 
-    training_runs[run_id]["status"] = "cancelled"
+    with _training_runs_lock:
+        run = training_runs[run_id]
+        before = dict(run)
+        run["status"] = "cancelled"
+        _publish_run_changes(run_id, before, run)
 
     return {"status": "stopped", "message": "Training run stopped successfully"}
 
@@ -2463,12 +2940,16 @@ class GroqDesignRequest(BaseModel):
     dataset_profile: Dict[str, Any]
     constraints: Dict[str, Any]
     infra_context: Optional[Dict[str, Any]] = None
+    use_cache: bool = True
+    # Set to receive design sections over /ws/generation while the LLM streams them
+    stream_id: Optional[str] = None
 
 
 class GroqExplainRequest(BaseModel):
     pipeline_dsl: Dict[str, Any]
     audience: str = "product_manager"
     explain_level: str = "executive"
+    use_cache: bool = True
 
 
 @app.post("/api/groq/design")
@@ -2485,7 +2966,13 @@ def groq_design_pipeline(request: GroqDesignRequest):
             dataset_profile=request.dataset_profile,
             constraints=request.constraints,
             infra_context=request.infra_context,
+            use_cache=request.use_cache,
+            on_partial=generation_listener(request.stream_id, "pipeline"),
         )
+        if request.stream_id:
+            broadcast_generation_complete(
+                request.stream_id, "pipeline", result.get("status", "unknown")
+            )
 
         status = result.get("status", "unknown")
 
@@ -2518,7 +3005,7 @@ def groq_design_pipeline(request: GroqDesignRequest):
 
 
 @app.post("/api/groq/explain")
-def groq_explain_pipeline(request: GroqExplainRequest):
+async def groq_explain_pipeline(request: GroqExplainRequest):
     """
     Generate UI-ready explainability JSON from a pipeline DSL.
     """
@@ -2530,10 +3017,11 @@ def groq_explain_pipeline(request: GroqExplainRequest):
         from agent.groq_service import GroqExplainAgent
 
         agent = GroqExplainAgent(api_key=groq_key)
-        result = agent.explain(
+        result = await agent.aexplain(
             pipeline_dsl=request.pipeline_dsl,
             audience=request.audience,
             explain_level=request.explain_level,
+            use_cache=request.use_cache,
         )
         return result
 
@@ -2551,6 +3039,9 @@ class ColabTrainingRequest(BaseModel):
     dataset_profile: dict
     training_target: dict
     constraints: dict
+    use_cache: bool = True
+    # Set to receive notebook cells over /ws/generation while the LLM streams them
+    stream_id: Optional[str] = None
 
 
 @app.post("/api/training/colab/create")
@@ -2676,7 +3167,15 @@ def create_colab_training(request: ColabTrainingRequest):
         from agent.colab_service import ColabTrainingService
 
         svc = ColabTrainingService()
-        notebook_json = svc.create_notebook(config, use_ai=True, prefer_local=False)
+        notebook_json = svc.create_notebook(
+            config,
+            use_ai=True,
+            prefer_local=False,
+            use_cache=request.use_cache,
+            on_partial=generation_listener(request.stream_id, "notebook"),
+        )
+        if request.stream_id:
+            broadcast_generation_complete(request.stream_id, "notebook", "ready")
 
         job_id = f"job_{uuid.uuid4().hex[:8]}"
 
@@ -3196,3 +3695,6 @@ def check_approval_status(entity_type: str, entity_id: str, version: int):
         "version": version,
         "is_approved": is_approved,
     }
+
+
+request_profiler.instrument(app)
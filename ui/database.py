@@ -8,12 +8,21 @@ import json
 import hashlib
 import secrets
 import os
+import threading
 from datetime import datetime, timedelta
 from typing import Optional
 from dataclasses import dataclass, asdict
 
 DB_PATH = "system2ml.db"
 
+# Tables whose writes bump a change counter in table_versions (see get_table_versions)
+VERSIONED_TABLES = ("pipelines", "pipeline_designs", "runs", "failures", "activities")
+
+# Schema creation runs once per process: eagerly from the API lifespan, or lazily on
+# the first get_db() for scripts and tests that never start the app
+_db_ready = False
+_db_lock = threading.Lock()
+
 
 def hash_password(password: str) -> str:
     salt = os.environ.get("PASSWORD_SALT", "system2ml-default-salt-change-in-production")
@@ -29,6 +38,7 @@ def generate_token() -> str:
 
 
 def init_db():
+    global _db_ready
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
 
@@ -245,15 +255,66 @@ def init_db():
         )
     """)
 
+    # Change counters maintained by triggers, so every writer (including raw SQL in
+    # the API) is covered and ETags can be computed without running list queries
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Random per-database epoch so counters restarting on a fresh DB never repeat an ETag
+    c.execute(
+        "INSERT OR IGNORE INTO table_versions (table_name, version) VALUES ('__epoch__', ?)",
+        (secrets.randbits(62),),
+    )
+    for table in VERSIONED_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO table_versions (table_name, version) VALUES ('{table}', 1)
+                    ON CONFLICT(table_name) DO UPDATE SET version = version + 1;
+                END
+            """)
+
     conn.commit()
     conn.close()
+    _db_ready = True
     print(f"[DB] Initialized database at {DB_PATH}")
 
 
+def ensure_db():
+    if not _db_ready:
+        with _db_lock:
+            if not _db_ready:
+                init_db()
+
+
 def get_db():
+    if not _db_ready:
+        ensure_db()
     return sqlite3.connect(DB_PATH)
 
 
+def get_table_versions(*tables: str) -> tuple:
+    """Return (epoch, version per table) for the given tables.
+
+    A single primary-key lookup, cheap enough to run on every conditional GET.
+    """
+    conn = get_db()
+    c = conn.cursor()
+    names = ("__epoch__",) + tables
+    c.execute(
+        f"SELECT table_name, version FROM table_versions WHERE table_name IN ({','.join('?' * len(names))})",
+        names,
+    )
+    found = dict(c.fetchall())
+    conn.close()
+    return tuple(found.get(name, 0) for name in names)
+
+
     return uuid.uuid4().hex
 
 
@@ -742,5 +803,3 @@ class SessionStore:
         conn.commit()
         conn.close()
 
-
-init_db()
@@ -0,0 +1,251 @@
+"""
+Health probes for System2ML
+
+- liveness: the process answers, nothing else is touched
+- readiness: dependency checks (database, Redis, LLM backends, disk space) run
+  concurrently, each bounded by its own timeout, and results are cached for a
+  short TTL so frequent orchestrator probes never pile up on slow dependencies.
+
+Every check is O(1) with respect to stored data.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_DOWN = "down"
+STATUS_NOT_CONFIGURED = "not_configured"
+
+CheckFn = Callable[[], Union[Dict[str, Any], Awaitable[Dict[str, Any]]]]
+
+
+@dataclass
+class CheckResult:
+    name: str
+    status: str
+    critical: bool
+    latency_ms: float
+    checked_at: str
+    detail: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _Check:
+    name: str
+    fn: CheckFn
+    critical: bool
+    timeout: float
+    result: Optional[CheckResult] = None
+    expires_at: float = 0.0
+
+
+class HealthChecker:
+    """Runs registered dependency checks concurrently with per-check timeouts and caching."""
+
+    def __init__(self, ttl: float = 5.0, default_timeout: float = 2.0):
+        self.ttl = ttl
+        self.default_timeout = default_timeout
+        self._checks: Dict[str, _Check] = {}
+        self._inflight: Optional[asyncio.Task] = None
+        self.started_at = time.time()
+
+    def register(
+        self, name: str, fn: CheckFn, critical: bool = True, timeout: Optional[float] = None
+    ) -> None:
+        """Register a check. Sync callables run in a worker thread.
+
+        A check returns a detail dict; a "status" key in it overrides the default "ok".
+        Raising marks the dependency as down.
+        """
+        self._checks[name] = _Check(name, fn, critical, timeout or self.default_timeout)
+
+    async def _run_one(self, check: _Check) -> CheckResult:
+        start = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(check.fn):
+                detail = await asyncio.wait_for(check.fn(), check.timeout)
+            else:
+                detail = await asyncio.wait_for(asyncio.to_thread(check.fn), check.timeout)
+            detail = dict(detail or {})
+            status = detail.pop("status", STATUS_OK)
+        except asyncio.TimeoutError:
+            status, detail = STATUS_DOWN, {"error": f"timed out after {check.timeout}s"}
+        except Exception as e:
+            status, detail = STATUS_DOWN, {"error": str(e)}
+
+        return CheckResult(
+            name=check.name,
+            status=status,
+            critical=check.critical,
+            latency_ms=round((time.perf_counter() - start) * 1000, 2),
+            checked_at=datetime.utcnow().isoformat(),
+            detail=detail,
+        )
+
+    async def _refresh(self, checks: List[_Check]) -> None:
+        results = await asyncio.gather(*(self._run_one(c) for c in checks))
+        expires_at = time.monotonic() + self.ttl
+        for check, result in zip(checks, results):
+            check.result = result
+            check.expires_at = expires_at
+
+    async def run(self, force: bool = False) -> Dict[str, CheckResult]:
+        """Return results for all checks, re-running only the expired ones.
+
+        Concurrent callers share a single in-flight refresh.
+        """
+        now = time.monotonic()
+        stale = [c for c in self._checks.values() if force or c.result is None or c.expires_at <= now]
+        if stale:
+            if self._inflight is None or self._inflight.done():
+                self._inflight = asyncio.ensure_future(self._refresh(stale))
+            await asyncio.shield(self._inflight)
+        return {name: c.result for name, c in self._checks.items() if c.result is not None}
+
+    async def readiness(self, force: bool = False) -> Dict[str, Any]:
+        results = await self.run(force=force)
+        ready = all(r.status != STATUS_DOWN for r in results.values() if r.critical)
+        return {
+            "status": "ready" if ready else "not_ready",
+            "checks": {name: r.status for name, r in results.items()},
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+
+    async def detail(self, force: bool = False) -> Dict[str, Any]:
+        results = await self.run(force=force)
+        critical_down = any(r.status == STATUS_DOWN for r in results.values() if r.critical)
+        any_down = any(r.status in (STATUS_DOWN, STATUS_DEGRADED) for r in results.values())
+        return {
+            "status": "unhealthy" if critical_down else ("degraded" if any_down else "healthy"),
+            "timestamp": datetime.utcnow().isoformat(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "pid": os.getpid(),
+            "cache_ttl_seconds": self.ttl,
+            "checks": {name: r.to_dict() for name, r in results.items()},
+        }
+
+
+# ─── Built-in checks ─────────────────────────────────────────────────────────
+
+
+def sqlite_check(db_path: str) -> Callable[[], Dict[str, Any]]:
+    """Open the database read-only and read its header; never scans a table.
+
+    Read-only so that a missing file is reported down instead of being created empty.
+    """
+    uri = f"{Path(db_path).absolute().as_uri()}?mode=ro"
+
+    def check() -> Dict[str, Any]:
+        conn = sqlite3.connect(uri, uri=True, timeout=1.0)
+        try:
+            version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        finally:
+            conn.close()
+        return {"type": "sqlite", "path": db_path, "schema_version": version}
+
+    return check
+
+
+def redis_check(url: str) -> Callable[[], Awaitable[Dict[str, Any]]]:
+    async def check() -> Dict[str, Any]:
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            return {"status": STATUS_NOT_CONFIGURED, "error": "redis package not installed"}
+
+        client = aioredis.from_url(url, socket_connect_timeout=1.0, socket_timeout=1.0)
+        try:
+            await client.ping()
+        finally:
+            await client.aclose()
+        return {"url": url.split("@")[-1]}
+
+    return check
+
+
+def llm_backends_check(client=None) -> Callable[[], Dict[str, Any]]:
+    """
+    Hosted APIs only need a key, so no network call; Ollama is probed through the
+    shared LLM client (agent.llm_client), over its pooled connection.
+
+    The probe respects the client's circuit breaker: while Ollama's circuit is open
+    nothing is sent and the breaker state is reported. While a generation is in
+    flight Ollama is evidently reachable, so the probe does not queue behind it.
+    """
+
+    def check() -> Dict[str, Any]:
+        from agent.llm_client import LLMError, get_llm_client
+
+        llm = client or get_llm_client()
+        backends: Dict[str, Any] = {
+            name: {"configured": llm.is_configured(name)} for name in ("groq", "openrouter")
+        }
+
+        stats = llm.stats()["ollama"]
+        ollama: Dict[str, Any] = {"circuit": stats["circuit"]["state"], "reachable": False}
+        if stats["in_flight"]:
+            ollama["reachable"] = llm.is_healthy("ollama")
+        elif llm.is_healthy("ollama"):
+            try:
+                ollama["models"] = len(llm.list_models_sync("ollama", timeout=1.0))
+                ollama["reachable"] = True
+            except LLMError as e:
+                ollama["error"] = str(e)
+        backends["ollama"] = ollama
+
+        available = [
+            name
+            for name, info in backends.items()
+            if info.get("configured") or info.get("reachable")
+        ]
+        # The planner falls back to rule-based designs, so no backend is degraded, not down
+        return {
+            "status": STATUS_OK if available else STATUS_DEGRADED,
+            "available": available,
+            "backends": backends,
+        }
+
+    return check
+
+
+def disk_check(path: str, min_free_mb: int) -> Callable[[], Dict[str, Any]]:
+    def check() -> Dict[str, Any]:
+        usage = shutil.disk_usage(path)
+        free_mb = usage.free // (1024 * 1024)
+        return {
+            "status": STATUS_OK if free_mb >= min_free_mb else STATUS_DOWN,
+            "path": os.path.abspath(path),
+            "free_mb": free_mb,
+            "min_free_mb": min_free_mb,
+            "used_percent": round(usage.used / usage.total * 100, 1) if usage.total else 0.0,
+        }
+
+    return check
+
+
+__all__ = [
+    "HealthChecker",
+    "CheckResult",
+    "sqlite_check",
+    "redis_check",
+    "llm_backends_check",
+    "disk_check",
+    "STATUS_OK",
+    "STATUS_DEGRADED",
+    "STATUS_DOWN",
+    "STATUS_NOT_CONFIGURED",
+]
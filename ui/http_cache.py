@@ -0,0 +1,145 @@
+"""
+Conditional GET support for System2ML
+
+Read-heavy list endpoints register a cheap version function (e.g. table change
+counters) instead of hashing their response bodies. The middleware derives a weak
+ETag from that version before the endpoint runs, answers matching If-None-Match
+requests with 304 without calling the endpoint at all, and tags full responses
+with ETag and Cache-Control headers.
+"""
+
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+VersionFn = Callable[[], Any]
+
+
+def weak_etag(*parts: Any) -> str:
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison per RFC 9110: W/ prefixes are ignored."""
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+class ETagRegistry:
+    """Maps GET paths to the version function their ETag is derived from."""
+
+    def __init__(self, namespace: str = ""):
+        self.namespace = namespace
+        self._routes: Dict[str, Tuple[VersionFn, str]] = {}
+        self.not_modified = 0
+        self.full_responses = 0
+
+    def register(
+        self, path: str, version_fn: VersionFn, cache_control: str = DEFAULT_CACHE_CONTROL
+    ) -> None:
+        self._routes[path] = (version_fn, cache_control)
+
+    def lookup(self, path: str) -> Optional[Tuple[VersionFn, str]]:
+        return self._routes.get(path)
+
+    def etag_for(self, path: str, query: bytes = b"") -> Optional[str]:
+        route = self._routes.get(path)
+        if route is None:
+            return None
+        try:
+            version = route[0]()
+        except Exception as e:
+            logger.warning(f"[ETag] Version lookup failed for {path}: {e}")
+            return None
+        return weak_etag(self.namespace, path, query, version)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "routes": sorted(self._routes),
+            "not_modified": self.not_modified,
+            "full_responses": self.full_responses,
+        }
+
+
+class ConditionalGetMiddleware:
+    """ASGI middleware applying ETagRegistry to GET/HEAD requests."""
+
+    def __init__(self, app, registry: ETagRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        route = self.registry.lookup(scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Computed before the endpoint runs: a write racing with the query can only
+        # make the client refetch once more, never hide newer data behind an old tag
+        etag = self.registry.etag_for(scope["path"], scope.get("query_string", b""))
+        if etag is None:
+            await self.app(scope, receive, send)
+            return
+        cache_control = route[1]
+
+        if_none_match = None
+        for name, value in scope.get("headers", []):
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+                break
+
+        if if_none_match and etag_matches(if_none_match, etag):
+            self.registry.not_modified += 1
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [
+                        (b"etag", etag.encode()),
+                        (b"cache-control", cache_control.encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = [
+                    (k, v)
+                    for k, v in message.get("headers", [])
+                    if k not in (b"etag", b"cache-control")
+                ]
+                headers.append((b"etag", etag.encode()))
+                headers.append((b"cache-control", cache_control.encode()))
+                message = {**message, "headers": headers}
+                self.registry.full_responses += 1
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+
+__all__ = [
+    "ETagRegistry",
+    "ConditionalGetMiddleware",
+    "weak_etag",
+    "etag_matches",
+    "DEFAULT_CACHE_CONTROL",
+]
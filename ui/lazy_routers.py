@@ -0,0 +1,96 @@
+"""
+Lazily included routers for the System2ML API
+
+Routers with heavy imports (the finetuning service pulls in the notebook
+generator, LLM clients, websockets, ...) are registered by module path and only
+imported and included the first time a request hits their prefix, or when the
+OpenAPI schema is built. Cold start and test collection no longer pay for them.
+"""
+
+import importlib
+import importlib.util
+import logging
+import threading
+from types import ModuleType
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRouter:
+    """A router module (exposing `router`) included into the app on first use."""
+
+    def __init__(
+        self,
+        app,
+        prefix: str,
+        module: str,
+        on_load: Optional[Callable[[ModuleType], None]] = None,
+    ):
+        self.app = app
+        self.prefix = prefix.rstrip("/")
+        self.module_name = module
+        self.on_load = on_load
+        self.available = importlib.util.find_spec(module) is not None
+        self._module: Optional[ModuleType] = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def matches(self, path: str) -> bool:
+        return path == self.prefix or path.startswith(self.prefix + "/")
+
+    def load(self) -> Optional[ModuleType]:
+        """Import the module and include its router once; None if it cannot be imported."""
+        if self._module is not None or self._failed or not self.available:
+            return self._module
+        with self._lock:
+            if self._module is None and not self._failed:
+                try:
+                    module = importlib.import_module(self.module_name)
+                except ImportError as e:
+                    self._failed = True
+                    logger.warning(f"[LazyRouter] {self.module_name} not available: {e}")
+                    return None
+                self.app.include_router(module.router)
+                self.app.openapi_schema = None
+                if self.on_load is not None:
+                    self.on_load(module)
+                self._module = module
+                logger.info(f"[LazyRouter] Loaded {self.module_name} for {self.prefix}")
+        return self._module
+
+
+class LazyRouterMiddleware:
+    """ASGI middleware that loads a lazy router before its first request is routed."""
+
+    def __init__(self, app, routers: List[LazyRouter]):
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            path = scope.get("path", "")
+            for router in self.routers:
+                if not router.loaded and router.matches(path):
+                    router.load()
+        await self.app(scope, receive, send)
+
+
+def include_lazy_in_openapi(app, routers: List[LazyRouter]) -> None:
+    """Load every lazy router before the OpenAPI schema is first generated."""
+    build = app.openapi
+
+    def openapi():
+        if app.openapi_schema is None:
+            for router in routers:
+                router.load()
+        return build()
+
+    app.openapi = openapi
+
+
+__all__ = ["LazyRouter", "LazyRouterMiddleware", "include_lazy_in_openapi"]
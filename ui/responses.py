@@ -0,0 +1,154 @@
+"""
+Fast JSON responses for System2ML
+
+FastJSONResponse renders with orjson when it is installed (stdlib json otherwise)
+and understands numpy/pandas scalars, datetimes and pydantic models directly.
+FastJSONRoute lets plain dict/list endpoints skip FastAPI's recursive
+jsonable_encoder pass: their return value goes straight to the renderer.
+"""
+
+import asyncio
+import dataclasses
+import datetime
+import decimal
+import enum
+import functools
+import inspect
+import json
+import sys
+import uuid
+from pathlib import PurePath
+from typing import Any
+
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.responses import Response
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Encode the types orjson/json do not handle natively."""
+    # A numpy value can only exist once numpy is imported, so never import it here
+    np = sys.modules.get("numpy")
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    if hasattr(obj, "model_dump"):  # pydantic v2 models
+        return obj.model_dump(mode="json", by_alias=True)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        # Also catches pandas.Timestamp, which orjson rejects as a datetime subclass.
+        # pandas.NaT is a datetime too, and the only one not equal to itself.
+        return None if obj != obj else obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (uuid.UUID, PurePath)):
+        return str(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    # pandas NaT / NA and anything else pandas-specific
+    if type(obj).__module__.startswith("pandas"):
+        if hasattr(obj, "isoformat"):
+            try:
+                return obj.isoformat()
+            except ValueError:
+                return None
+        if hasattr(obj, "to_dict"):
+            return obj.to_dict()
+        return None
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, falling back to stdlib json."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _returns_plain_json(endpoint) -> bool:
+    if getattr(endpoint, "__fast_json__", False):
+        return False  # already wrapped (routes are re-created by include_router)
+    if inspect.isgeneratorfunction(endpoint) or inspect.isasyncgenfunction(endpoint):
+        return False
+    return inspect.signature(endpoint).return_annotation is inspect.Signature.empty
+
+
+def _wrap_endpoint(endpoint, response_class):
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            return result if isinstance(result, Response) else response_class(result)
+
+        async_wrapper.__fast_json__ = True
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def sync_wrapper(*args, **kwargs):
+        result = endpoint(*args, **kwargs)
+        return result if isinstance(result, Response) else response_class(result)
+
+    sync_wrapper.__fast_json__ = True
+    return sync_wrapper
+
+
+class FastJSONRoute(APIRoute):
+    """APIRoute that renders un-annotated endpoints' return values directly.
+
+    Endpoints with a response_model, a return annotation, a custom status code or
+    a custom response class keep FastAPI's normal validation/encoding path.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        response_model = kwargs.get("response_model", Default(None))
+        response_class = kwargs.get("response_class", Default(JSONResponse))
+        if isinstance(response_class, DefaultPlaceholder):
+            response_class = response_class.value
+        if (
+            isinstance(response_model, DefaultPlaceholder)
+            and kwargs.get("status_code") in (None, 200)
+            and isinstance(response_class, type)
+            and issubclass(response_class, FastJSONResponse)
+            and _returns_plain_json(endpoint)
+        ):
+            endpoint = _wrap_endpoint(endpoint, response_class)
+        super().__init__(path, endpoint, **kwargs)
+
+
+__all__ = ["FastJSONResponse", "FastJSONRoute", "HAS_ORJSON", "dumps"]